@@ -12,17 +12,27 @@ Provides functions for packaging image files into image packages. Generate the i
 """
 
 import argparse
+import concurrent.futures
 import copy
 import glob
 import hashlib
 import itertools
+import json
 import os
 import re
 import sys
 import tempfile
+import threading
 import zipfile
 from image_package_mapping import PACKAGE_MAPPING
 
+# Files are read in chunks of this size, so images never need to fit into memory
+CHUNK_SIZE = 4 * 1024 * 1024
+# Name of the file in which digests are cached between runs
+CACHE_FILENAME = ".package_images_cache.json"
+# Bump this when the layout of the cache changes
+CACHE_VERSION = 1
+
 
 def parse_args():
     """Setup argument parser and parse"""
@@ -62,9 +72,133 @@ def parse_args():
                         help="RegEx to select image sets from the manifest file.")
     parser.add_argument('-g', '--githash', type=str, default="",
                         help="Git hash directory name (eg. fpga-abc1234)")
+    parser.add_argument('-j', '--jobs', type=int, default=None,
+                        help="Number of packages to generate in parallel (default: one per CPU)")
+    parser.add_argument('--no-cache', action="store_true", default=False,
+                        help="Rehash all files, and don't update the cache file ({})"
+                        .format(CACHE_FILENAME))
     return parser.parse_args()
 
 
+class HashCache:
+    """
+    Cache of file digests (and of the packages generated from these files)
+
+    Digests are stored with the size and modification time of the file they were computed from,
+    and are only reused if neither changed. Packages are stored with the size and modification
+    time of all files that went into them, so an unchanged package doesn't need to be recreated.
+    The cache may be used from multiple threads.
+    """
+    def __init__(self, filename=CACHE_FILENAME, enabled=True):
+        self.filename = filename
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._data = {'version': CACHE_VERSION, 'files': {}, 'packages': {}}
+        if enabled and os.path.isfile(filename):
+            try:
+                with open(filename, 'r') as cache_file:
+                    data = json.load(cache_file)
+                if data.get('version') == CACHE_VERSION:
+                    self._data = data
+            except ValueError:
+                print("Ignoring corrupt cache file {}".format(filename), file=sys.stderr)
+
+    @staticmethod
+    def _stat(filename):
+        """Return the (size, mtime) tuple that identifies the current version of a file"""
+        stat = os.stat(filename)
+        return [stat.st_size, stat.st_mtime_ns]
+
+    def get_digests(self, filename):
+        """Return the cached digests of filename, or None if there are none or the file changed"""
+        with self._lock:
+            entry = self._data['files'].get(os.path.abspath(filename))
+        if entry is None or not os.path.isfile(filename) or entry['stat'] != self._stat(filename):
+            return None
+        return entry['digests']
+
+    def set_digests(self, filename, digests):
+        """Store the digests of filename"""
+        if not self.enabled:
+            return
+        entry = {'stat': self._stat(filename), 'digests': digests}
+        with self._lock:
+            self._data['files'][os.path.abspath(filename)] = entry
+
+    def is_package_current(self, zip_filename, files_list):
+        """Return True if zip_filename was created from the current versions of files_list"""
+        with self._lock:
+            inputs = self._data['packages'].get(os.path.abspath(zip_filename))
+        if inputs is None or self.get_digests(zip_filename) is None:
+            return False
+        try:
+            return inputs == {filename: self._stat(filename) for filename in files_list}
+        except OSError:
+            return False
+
+    def set_package(self, zip_filename, files_list):
+        """Record the versions of the files that zip_filename was created from"""
+        if not self.enabled:
+            return
+        inputs = {filename: self._stat(filename) for filename in files_list}
+        with self._lock:
+            self._data['packages'][os.path.abspath(zip_filename)] = inputs
+
+    def save(self):
+        """Write the cache to disk"""
+        if not self.enabled:
+            return
+        with self._lock:
+            with open(self.filename + '.tmp', 'w') as cache_file:
+                json.dump(self._data, cache_file, indent=1)
+            os.replace(self.filename + '.tmp', self.filename)
+
+
+def hash_file(filename, cache=None, sink=None):
+    """
+    Compute the MD5 and SHA256 digests of a file in a single pass
+    :param filename: file to hash
+    :param cache: HashCache to look up and store the digests. A cached digest is only used if
+                  there is no sink, since the file has to be read anyway otherwise.
+    :param sink: optional writable file object, which receives a copy of the file contents
+    :return: dictionary with the hex digests (keys 'md5' and 'sha256')
+    """
+    if cache is not None and sink is None:
+        digests = cache.get_digests(filename)
+        if digests is not None:
+            return digests
+    md5_sum = hashlib.md5()
+    sha256_sum = hashlib.sha256()
+    with open(filename, 'rb') as in_file:
+        for chunk in iter(lambda: in_file.read(CHUNK_SIZE), b''):
+            md5_sum.update(chunk)
+            sha256_sum.update(chunk)
+            if sink is not None:
+                sink.write(chunk)
+    digests = {'md5': md5_sum.hexdigest(), 'sha256': sha256_sum.hexdigest()}
+    if cache is not None:
+        cache.set_digests(filename, digests)
+    return digests
+
+
+def hash_files(files_list, cache=None, jobs=None):
+    """
+    Hash files concurrently (hashlib releases the GIL, so threads are sufficient)
+    :return: dictionary filename -> digests (see hash_file())
+    """
+    with concurrent.futures.ThreadPoolExecutor(max_workers=jobs) as executor:
+        return dict(zip(files_list,
+                        executor.map(lambda filename: hash_file(filename, cache), files_list)))
+
+
+def write_md5_file(filename, md5_hex):
+    """Write the <filename>.md5 file. The file is replaced atomically."""
+    newline = "{md5_hex}  {filename}\n".format(filename=filename, md5_hex=md5_hex)
+    with open(filename + '.md5.tmp', 'w') as md5_file:
+        md5_file.write(newline)
+    os.replace(filename + '.md5.tmp', filename + '.md5')
+
+
 def gen_filelist(includes, excludes=None):
     """
     Generates a list of files, first generating
@@ -90,21 +224,12 @@ def gen_filelist(includes, excludes=None):
     return included
 
 
-def gen_md5(files_list, hash_filename=""):
+def gen_md5(files_list, hash_filename="", cache=None, jobs=None):
     """Generate the .md5 files for all input files"""
-    hashes = {}
-    for filename in files_list:
-        # Read and hash the input file
-        with open(filename, 'rb') as img_file:
-            md5_sum = hashlib.md5()
-            md5_sum.update(img_file.read())
-        # Write the hash to a *.md5 file
-        with open(filename + '.md5', 'w') as md5_file:
-            md5_hex = md5_sum.hexdigest()
-            newline = "{md5_hex}  {filename}\n".format(filename=filename, md5_hex=md5_hex)
-            md5_file.write(newline)
-            # Also store it to write to a file of all the hashes
-            hashes[filename] = md5_hex
+    hashes = {filename: digests['md5']
+              for filename, digests in hash_files(files_list, cache, jobs).items()}
+    for filename, md5_hex in hashes.items():
+        write_md5_file(filename, md5_hex)
 
     # Write the MD5 hashes to file
     with open(hash_filename, 'a') as hash_file:
@@ -113,7 +238,8 @@ def gen_md5(files_list, hash_filename=""):
             hash_file.write(newline)
 
 
-def gen_sha256(files_list, hash_filename=None, manifest_fn="", repo_and_hash=""):
+def gen_sha256(files_list, hash_filename=None, manifest_fn="", repo_and_hash="", cache=None,
+               jobs=None):
     """Generate the SHA256 files for all input file"""
     # Input checking
     if hash_filename is None:
@@ -123,93 +249,152 @@ def gen_sha256(files_list, hash_filename=None, manifest_fn="", repo_and_hash="")
 
     # Make a dictionary to store the new SHA256 sums
     sha256_dict = {}
+    hashes = hash_files(files_list, cache, jobs)
     with open(hash_filename, 'a') as hash_file:
         for filename in files_list:
-            with open(filename, 'rb') as img_file:
-                sha256_sum = hashlib.sha256()
-                sha256_sum.update(img_file.read())
-                sha256_str = sha256_sum.hexdigest()
-                newline = "{sha_hex}  {filename}\n".format(filename=filename,
-                                                           sha_hex=sha256_str)
-                hash_file.write(newline)
-                # Add the sha256 to the dictionary
-                basename = os.path.basename(filename)
-                sha256_dict[basename] = sha256_str
+            sha256_str = hashes[filename]['sha256']
+            newline = "{sha_hex}  {filename}\n".format(filename=filename,
+                                                       sha_hex=sha256_str)
+            hash_file.write(newline)
+            # Add the sha256 to the dictionary
+            basename = os.path.basename(filename)
+            sha256_dict[basename] = sha256_str
 
     # If there's a manifest file to edit, put the new information in
     if os.path.isfile(manifest_fn):
         edit_manifest(manifest_fn, repo_and_hash, sha256_dict)
 
 
-def gen_zip(zip_filename, files_list):
-    """Generate the zip file for a set of images"""
+def gen_zip(zip_filename, files_list, md5_files=(), cache=None):
+    """
+    Generate the zip file for a set of images
+
+    Every file is read exactly once: The contents are compressed into the archive and hashed at
+    the same time. For every file in md5_files, the <filename>.md5 file is generated from that
+    pass, before it is added to the archive.
+    :return: dictionary filename -> MD5 hex digest of the files in md5_files, or None on failure
+    """
+    md5_hashes = {}
     try:
         with zipfile.ZipFile(zip_filename, 'w', zipfile.ZIP_DEFLATED) as zip_file:
             for filename in files_list:
-                zip_file.write(filename)
-        return True
+                source = filename[:-len('.md5')]
+                if filename.endswith('.md5') and source in md5_files:
+                    if source not in md5_hashes:
+                        md5_hashes[source] = hash_file(source, cache)['md5']
+                    write_md5_file(source, md5_hashes[source])
+                    zip_file.write(filename)
+                    continue
+                zip_info = zipfile.ZipInfo.from_file(filename)
+                zip_info.compress_type = zipfile.ZIP_DEFLATED
+                with zip_file.open(zip_info, 'w') as zip_entry:
+                    digests = hash_file(filename, cache, sink=zip_entry)
+                if filename in md5_files:
+                    md5_hashes[filename] = digests['md5']
+        # Images whose .md5 file is not part of the package still get one
+        for filename in md5_files:
+            if filename not in md5_hashes:
+                md5_hashes[filename] = hash_file(filename, cache)['md5']
+                write_md5_file(filename, md5_hashes[filename])
+        return md5_hashes
     except Exception as ex:
         print("Caught exception in gen_zip: {}".format(ex))
-        return False
+        return None
 
 
-def do_gen_package(pkg_target, install_dir="", repo_and_hash=""):
-    """Generate the entire N3XX image package, from the start to the end"""
-    print("---Generating package for {}---".format(pkg_target))
+def do_gen_package(pkg_target, install_dir="", repo_and_hash="", cache=None):
+    """
+    Generate the entire N3XX image package, from the start to the end
+    :return: tuple (zip filename, dictionary of MD5 hex digests of the image files). The
+             filename is empty if the package could not be created.
+    """
+    output = ["---Generating package for {}---".format(pkg_target)]
     filelist = PACKAGE_MAPPING[pkg_target]['files']
-    print("Required files:\n{}".format(
+    output.append("Required files:\n{}".format(
         "\n".join("--{}".format(img_fn) for img_fn in filelist)))
     md5_files = gen_filelist(includes=filelist, excludes=["*.rpt", "*.md5"])
-    print("Files to md5sum:\n{}".format(
+    output.append("Files to md5sum:\n{}".format(
         "\n".join("--{}".format(md5_fn) for md5_fn in md5_files)))
-    gen_md5(md5_files, "md5_hashes.txt")
 
     # Determine the current Git hash (w/o the repository)
     githash_l = re.findall(r"[\d\w]+-([\d\w]{7,8})", repo_and_hash)
     githash = githash_l[0] if githash_l else ""
 
-    zip_files = gen_filelist(includes=filelist)
+    # The .md5 files may not exist yet, but will be created before they are zipped
+    zip_files = [filename for filename in filelist
+                 if glob.glob(filename) or filename[:-len('.md5')] in md5_files]
     zip_filename = os.path.join(install_dir, PACKAGE_MAPPING[pkg_target]['package_name'])\
         .format(githash)
-    print("Files to zip:\n{}".format(
+    output.append("Files to zip:\n{}".format(
         "\n".join("--{}".format(zip_fn) for zip_fn in zip_files)))
-    if not gen_zip(zip_filename, zip_files):
-        zip_filename = ""
-    return zip_filename
-
-
-def gen_package(pkg_targets=(), repo_and_hash="", manifest_fn=""):
-    """Generate the entire image package, and place it in the proper directory structure"""
+    md5_hashes = None
+    if cache is not None and cache.is_package_current(zip_filename, zip_files):
+        md5_digests = [cache.get_digests(filename) for filename in md5_files]
+        if None not in md5_digests:
+            output.append("Package is up to date: {}".format(zip_filename))
+            md5_hashes = {filename: digests['md5']
+                          for filename, digests in zip(md5_files, md5_digests)}
+    if md5_hashes is None:
+        md5_hashes = gen_zip(zip_filename, zip_files, md5_files, cache)
+        if md5_hashes is None:
+            print("\n".join(output))
+            return "", {}
+        if cache is not None:
+            # Hash the archive while it's still in the page cache
+            hash_file(zip_filename, cache)
+            cache.set_package(zip_filename, zip_files)
+    print("\n".join(output))
+    return zip_filename, md5_hashes
+
+
+def gen_package(pkg_targets=(), repo_and_hash="", manifest_fn="", cache=None, jobs=None):
+    """
+    Generate the entire image package, and place it in the proper directory structure
+    Packages are generated concurrently, using up to jobs threads.
+    """
     # Make the cache/ directory if necessary
     cache_path = os.path.join(os.getcwd(), "cache")
     if not os.path.isdir(cache_path):
         os.mkdir(cache_path)
 
+    futures = []
+    with concurrent.futures.ThreadPoolExecutor(max_workers=jobs) as executor:
+        for pkg_target in pkg_targets:
+            if pkg_target in PACKAGE_MAPPING:
+                # Make the type directory
+                pkg_type = PACKAGE_MAPPING[pkg_target]["type"]
+                type_path = os.path.join(cache_path, pkg_type)
+                if not os.path.isdir(type_path):
+                    os.mkdir(type_path)
+                # Make the 'repository-hash' directory
+                if not repo_and_hash:
+                    repo_and_hash = "repo-githash"
+                git_path = os.path.join(type_path, repo_and_hash)
+                if not os.path.isdir(git_path):
+                    os.mkdir(git_path)
+
+                # Generate the package and add the the zip filename to the SHA list
+                futures.append(executor.submit(do_gen_package, pkg_target,
+                                               install_dir=git_path,
+                                               repo_and_hash=repo_and_hash,
+                                               cache=cache))
+            else:
+                print("Error: Specify a supported type from {}".format(
+                    list(PACKAGE_MAPPING.keys())))
     sha_filenames = []
-    for pkg_target in pkg_targets:
-        if pkg_target in PACKAGE_MAPPING:
-            # Make the type directory
-            pkg_type = PACKAGE_MAPPING[pkg_target]["type"]
-            type_path = os.path.join(cache_path, pkg_type)
-            if not os.path.isdir(type_path):
-                os.mkdir(type_path)
-            # Make the 'repository-hash' directory
-            if not repo_and_hash:
-                repo_and_hash = "repo-githash"
-            git_path = os.path.join(type_path, repo_and_hash)
-            if not os.path.isdir(git_path):
-                os.mkdir(git_path)
-
-            # Generate the package and add the the zip filename to the SHA list
-            sha_filenames.append(do_gen_package(pkg_target,
-                                                install_dir=git_path,
-                                                repo_and_hash=repo_and_hash))
-        else:
-            print("Error: Specify a supported type from {}".format(
-                list(PACKAGE_MAPPING.keys())))
+    # Write the MD5 hashes of all packages to file, in the order of the targets
+    with open("md5_hashes.txt", 'a') as hash_file:
+        for future in futures:
+            zip_filename, md5_hashes = future.result()
+            sha_filenames.append(zip_filename)
+            for filename, md5_hex in md5_hashes.items():
+                newline = "{md5_hex}  {filename}\n".format(filename=filename, md5_hex=md5_hex)
+                hash_file.write(newline)
     sha_filenames[:] = [sha_fn for sha_fn in sha_filenames if os.path.exists(sha_fn)]
     gen_sha256(sha_filenames, hash_filename="hashes.txt",
-               manifest_fn=manifest_fn, repo_and_hash=repo_and_hash)
+               manifest_fn=manifest_fn, repo_and_hash=repo_and_hash, cache=cache, jobs=jobs)
+    if cache is not None:
+        cache.save()
     # Return the zipfiles we've created
     return sha_filenames
 
@@ -358,9 +543,12 @@ def main():
         print("Targets to package:\n{}".format(
             "\n".join("--{}".format(pkg) for pkg in pkg_targets)))
 
+    cache = HashCache(enabled=not args.no_cache)
     zip_filenames = gen_package(pkg_targets=pkg_targets,
                                 repo_and_hash=args.githash,
-                                manifest_fn=args.manifest)
+                                manifest_fn=args.manifest,
+                                cache=cache,
+                                jobs=args.jobs)
     check_zips = [verify_package(zip_filename) for zip_filename in zip_filenames]
     return all(check_zips)
 
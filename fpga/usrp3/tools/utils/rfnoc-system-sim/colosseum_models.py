@@ -226,7 +226,7 @@ class Topology_2D_4x4_Torus:
             raise bee7fpga.SimCompError('in_chans must be 64 channels wide. Got ' + str(len(in_chans)))
         if len(out_chans) != 16:
             raise bee7fpga.SimCompError('out_chans must be 16 channels wide. Got ' + str(len(out_chans)))
-        GRP_LEN = 16 / 2   # 2 radio channesl per USRP
+        GRP_LEN = 16 // 2  # 2 radio channesl per USRP
 
         # Broadcast raw data streams to all internal and external FPGAs
         for i in range(GRP_LEN):
@@ -304,7 +304,7 @@ class Topology_2D_4x4_Torus:
             for u in range(USRPS_PER_BLADE):
                 sim_core.connect_bidir(
                     usrps[USRPS_PER_BLADE*b + u], 0, bee7grid[b][b],
-                    len(hw.Bee7Fpga.EXT_IO_LANES)*(u/8) + hw.Bee7Fpga.BP_BASE+(u%8), 'SAMP')
+                    len(hw.Bee7Fpga.EXT_IO_LANES)*(u//8) + hw.Bee7Fpga.BP_BASE+(u%8), 'SAMP')
             sim_core.connect_bidir(
                 hosts[b], 0, bee7grid[b][b], hw.Bee7Fpga.FP_BASE+8, 'CONFIG', ['blue','blue'])
 
@@ -17,13 +17,13 @@
 #
 
 import collections
-import copy
+import collections.abc
+import heapq
 import re
 import math
 import numpy as np
-import matplotlib.pyplot as plt
-import matplotlib.ticker as mticker
-from graphviz import Digraph
+# matplotlib and graphviz are only needed for visualization, and are imported
+# on demand. That way, batch simulations don't need to load them.
 
 #------------------------------------------------------------
 # Simulator Core Components
@@ -44,14 +44,40 @@ class SimulatorCore:
     Core simulation engine:
     This class owns all the simulation components and
     manages time and other housekeeping operations.
+
+    The engine is event driven. State changes (e.g. rate changes) can be
+    scheduled for a specific time using schedule(). Between two such events,
+    the network is simulated tick by tick only until it settles into a
+    periodic steady state, i.e., until the state of all components repeats.
+    From then on, the engine jumps ahead by whole periods: All byte counters
+    are advanced with a single vector operation, and components shift their
+    timestamps using fast_forward(). Only the remaining ticks up to the next
+    event are simulated again.
+
+    Components that keep state outside of what they report through
+    get_state() must either implement it, or the simulator must be created
+    with fast_forward=False.
     """
+    # Longest steady state period (in ticks) the engine looks for
+    MAX_PERIOD = 64
 
-    def __init__(self, tick_rate):
+    def __init__(self, tick_rate, fast_forward=True):
         self.__ticks = 0
         self.__tick_rate = tick_rate
         self.__tick_aware_comps = list()
+        self.__stateful_comps = list()
         self.__all_comps = dict()
         self.__edge_render_db = list()
+        self.__fast_forward = fast_forward
+        # Heap of (tick, sequence number, callback)
+        self.__events = list()
+        self.__event_seq = 0
+        # Byte counters of all components. Only the first __num_counters
+        # entries are in use.
+        self.__byte_counts = np.zeros(1024)
+        self.__num_counters = 0
+        # Recently seen states: state -> (ticks, byte counters)
+        self.__history = collections.OrderedDict()
 
     def register(self, comp, tick_aware):
         if comp.name not in self.__all_comps:
@@ -60,6 +86,31 @@ class SimulatorCore:
             raise RuntimeError('Duplicate component ' + comp.name)
         if tick_aware:
             self.__tick_aware_comps.append(comp)
+        if type(comp).get_state is not SimComp.get_state:
+            self.__stateful_comps.append(comp)
+
+    def alloc_counter(self):
+        """
+        Allocate a new byte counter and return its index
+        """
+        if self.__num_counters == len(self.__byte_counts):
+            self.__byte_counts = np.concatenate(
+                (self.__byte_counts, np.zeros(len(self.__byte_counts))))
+        self.__num_counters += 1
+        self.__history.clear()
+        return self.__num_counters - 1
+
+    def add_bytes(self, counter, num_bytes):
+        self.__byte_counts[counter] += num_bytes
+
+    def get_bytes(self, counter):
+        return float(self.__byte_counts[counter])
+
+    def get_byte_counts(self):
+        """
+        Return a copy of all byte counters, indexed by counter index
+        """
+        return self.__byte_counts[:self.__num_counters].copy()
 
     def connect(self, src, srcport, dst, dstport, render_label=None, render_color=None):
         src.connect(srcport, dst.inputs(dstport, bind=True))
@@ -116,14 +167,62 @@ class SimulatorCore:
     def lookup(self, comp_name):
         return self.__all_comps[comp_name]
 
+    def schedule(self, time_s, callback):
+        """
+        Schedule a state change. callback is called without arguments at the
+        beginning of the tick corresponding to the absolute simulation time
+        time_s, before any component is ticked.
+        """
+        tick = int(time_s * self.__tick_rate)
+        if tick <= self.__ticks:
+            raise RuntimeError('Cannot schedule an event in the past')
+        heapq.heappush(self.__events, (tick, self.__event_seq, callback))
+        self.__event_seq += 1
+
     def tick(self):
         self.__ticks += 1
+        while self.__events and self.__events[0][0] <= self.__ticks:
+            heapq.heappop(self.__events)[2]()
+            self.__history.clear()
         for c in self.__tick_aware_comps:
             c.tick()
 
     def run(self, time_s):
-        for i in range(int(time_s * self.__tick_rate)):
+        end_tick = self.__ticks + int(time_s * self.__tick_rate)
+        # The network might have been modified since the last run
+        self.__history.clear()
+        while self.__ticks < end_tick:
             self.tick()
+            if self.__fast_forward:
+                self.__try_fast_forward(end_tick)
+
+    def __try_fast_forward(self, end_tick):
+        """
+        Record the current state. If it was seen before, the network is
+        periodic, and we can skip ahead by whole periods (but not beyond
+        end_tick or the next event).
+        """
+        stop_tick = end_tick
+        if self.__events:
+            stop_tick = min(stop_tick, self.__events[0][0] - 1)
+        state = tuple(c.get_state() for c in self.__stateful_comps)
+        counts = self.__byte_counts[:self.__num_counters]
+        prev = self.__history.pop(state, None)
+        if prev is not None:
+            prev_ticks, prev_counts = prev
+            period = self.__ticks - prev_ticks
+            num_periods = (stop_tick - self.__ticks) // period
+            if num_periods > 0:
+                num_ticks = num_periods * period
+                counts += (counts - prev_counts) * num_periods
+                for c in self.__all_comps.values():
+                    c.fast_forward(num_ticks, prev_ticks)
+                self.__ticks += num_ticks
+                self.__history.clear()
+                return
+        self.__history[state] = (self.__ticks, counts.copy())
+        if len(self.__history) > self.MAX_PERIOD:
+            self.__history.popitem(last=False)
 
     def get_ticks(self):
         return self.__ticks
@@ -132,6 +231,7 @@ class SimulatorCore:
         return self.__tick_rate
 
     def network_to_dot(self):
+        from graphviz import Digraph
         dot = Digraph(comment='RFNoC Network Topology')
         node_ids = dict()
         next_node_id = 1
@@ -163,6 +263,7 @@ class SimComp:
         self.name = name
         self.type = ctype
         self.__sim_core.register(self, (ctype == comptype.producer))
+        self.__counter = self.__sim_core.alloc_counter()
 
     def get_ticks(self):
         return self.__sim_core.get_ticks()
@@ -170,6 +271,28 @@ class SimComp:
     def get_tick_rate(self):
         return self.__sim_core.get_tick_rate()
 
+    def add_bytes(self, num_bytes):
+        self.__sim_core.add_bytes(self.__counter, num_bytes)
+
+    def get_bytes(self):
+        return self.__sim_core.get_bytes(self.__counter)
+
+    def get_state(self):
+        """
+        Return a hashable representation of all internal state that affects
+        the future behavior of this component. Timestamps must be relative to
+        the current tick. Stateless components don't override this.
+        """
+        return None
+
+    def fast_forward(self, num_ticks, since_ticks):
+        """
+        Called when the simulator skips num_ticks ticks. Everything that
+        happened after since_ticks repeats periodically, so the corresponding
+        timestamps must be shifted by num_ticks.
+        """
+        pass
+
     def SimCompError(self, msg):
         raise RuntimeError(msg + ' [' + self.name + ']')
 
@@ -222,6 +345,10 @@ class DataStream:
     Holds information about a date stream that passes through various block.
     The simulator simulates event on the actual stream so each stream Object
     must have a unique payload (items) to disambiguate it from the rest.
+
+    Data streams are immutable. with_hop() returns a new stream that shares
+    the payload and the hop history with the original one, so a stream can be
+    passed to any number of destinations without copying it.
     """
     HopInfo = collections.namedtuple('HopInfo', ['location', 'latency'])
 
@@ -250,26 +377,86 @@ class DataStream:
                         break
             return latency
 
+    class HopNode():
+        """
+        One entry of the hop history. Each node points to the previous hop,
+        so streams that share a common path also share its history.
+        """
+        __slots__ = ('hop', 'prev', 'path_latency')
+
+        def __init__(self, hop, prev):
+            self.hop = hop
+            self.prev = prev
+            # Sum of all hop latencies up to here (the first hop holds the
+            # generation timestamp, which is not a latency)
+            self.path_latency = (prev.path_latency + hop.latency) if prev else 0
+
+    __slots__ = ('bpi', 'items', 'count', 'gen_ticks', '_last_hop')
+
     def __init__(self, bpi, items, count, producer=None, parent=None):
         self.bpi = bpi
-        self.items = []
-        self.items.extend(items)
+        self.items = tuple(items)
         self.count = count
-        self.__hops = list()
         if producer and parent:
             raise RuntimeError('Data stream cannot have both a producer and a parent stream')
         elif producer:
-            self.__hops.append(self.HopInfo(location='Gen@'+producer.name, latency=producer.get_ticks()))
+            self.gen_ticks = producer.get_ticks()
+            self._last_hop = self.HopNode(
+                self.HopInfo(location='Gen@'+producer.name, latency=0), None)
         elif parent:
-            self.__hops.extend(parent.get_hops())
+            self.gen_ticks = parent.gen_ticks
+            self._last_hop = parent._last_hop
         else:
             raise RuntimeError('Data stream must have a producer or a parent stream')
 
-    def add_hop(self, location, latency):
-        self.__hops.append(self.HopInfo(location=location, latency=latency))
+    def __derive(self, gen_ticks, last_hop):
+        stream = DataStream.__new__(DataStream)
+        stream.bpi = self.bpi
+        stream.items = self.items
+        stream.count = self.count
+        stream.gen_ticks = gen_ticks
+        stream._last_hop = last_hop
+        return stream
+
+    def with_hop(self, location, latency):
+        """
+        Return a copy of this stream with an additional hop
+        """
+        return self.__derive(
+            self.gen_ticks,
+            self.HopNode(self.HopInfo(location=location, latency=latency), self._last_hop))
+
+    def shifted(self, num_ticks):
+        """
+        Return a copy of this stream that was generated num_ticks later
+        """
+        return self.__derive(self.gen_ticks + num_ticks, self._last_hop)
 
     def get_hops(self):
-        return self.__hops
+        hops = []
+        node = self._last_hop
+        while node:
+            hops.append(node.hop)
+            node = node.prev
+        hops.reverse()
+        # Hop0 always has the init timestamp
+        hops[0] = self.HopInfo(location=hops[0].location, latency=self.gen_ticks)
+        return hops
+
+    def get_latency(self, ticks):
+        """
+        Return the latency of the full path at time ticks. This is equivalent
+        to HopDb(self.get_hops()).get_latency(ticks), but doesn't need to walk
+        the hop history.
+        """
+        return ticks - self.gen_ticks + self._last_hop.path_latency
+
+    def get_state(self, ticks):
+        """
+        Return a hashable representation of this stream, relative to ticks
+        """
+        return (self.items, self.count, ticks - self.gen_ticks,
+                self._last_hop.hop, self._last_hop.path_latency)
 
     def get_bytes(self):
         return self.bpi * len(self.items) * self.count
@@ -281,7 +468,7 @@ class DataStream:
     def submatrix_gen(matrix_id, coordinates):
         coord_arr = []
         for c in coordinates:
-            if isinstance(c, collections.Iterable):
+            if isinstance(c, collections.abc.Iterable):
                 coord_arr.append('(' + (','.join(str(x) for x in c)) + ')')
             else:
                 coord_arr.append('(' + str(c) + ')')
@@ -289,11 +476,11 @@ class DataStream:
 
     @staticmethod
     def submatrix_parse(stream_id):
-        m = re.match('(.+)\[(.*)\]', stream_id)
+        m = re.match(r'(.+)\[(.*)\]', stream_id)
         matrix_id = m.group(1)
         coords = []
         for cstr in m.group(2).split(';'):
-            coords.append([int(x) for x in re.match('\((.+)\)', cstr).group(1).split(',')])
+            coords.append([int(x) for x in re.match(r'\((.+)\)', cstr).group(1).split(',')])
         return (matrix_id, coords)
 
 #------------------------------------------------------------
@@ -310,12 +497,11 @@ class Producer(SimComp):
     def __init__(self, sim_core, name, bpi, items, max_samp_rate = float('inf'), latency = 0):
         SimComp.__init__(self, sim_core, name, comptype.producer)
         self.__bpi = bpi
-        self.__items = items
+        self.__items = tuple(items)
         self.__bw = max_samp_rate * bpi
         self.__latency = latency
         self.__dests = list()
         self.__data_count = 0
-        self.__byte_count = 0
         self.__backpressure_ticks = 0
         self.set_rate(self.get_tick_rate())
 
@@ -330,31 +516,29 @@ class Producer(SimComp):
 
     def tick(self):
         if len(self.__dests) > 0:
-            ready = True
-            for dest in self.__dests:
-                ready = ready and dest.is_ready()
-            if ready:
+            if all(dest.is_ready() for dest in self.__dests):
                 data = DataStream(
                     bpi=self.__bpi, items=self.__items, count=self.__data_count, producer=self)
                 if self.__backpressure_ticks > 0:
-                    data.add_hop('BP@'+self.name, self.__backpressure_ticks)
-                data.add_hop(self.name, self.__latency)
+                    data = data.with_hop('BP@'+self.name, self.__backpressure_ticks)
+                data = data.with_hop(self.name, self.__latency)
+                # Streams are immutable, so all destinations can share them
                 for dest in self.__dests:
-                    dest.push(copy.deepcopy(data))
-                self.__byte_count += data.get_bytes()
+                    dest.push(data)
+                self.add_bytes(data.get_bytes())
                 self.__backpressure_ticks = 0
             else:
                 self.__backpressure_ticks += 1
 
-    def get_bytes(self):
-        return self.__byte_count
+    def get_state(self):
+        return self.__backpressure_ticks
 
     def get_util_attrs(self):
         return ['bandwidth']
 
     def get_utilization(self, what):
         if what in self.get_util_attrs():
-            return ((self.__byte_count / (self.get_ticks() / self.get_tick_rate())) /
+            return ((self.get_bytes() / (self.get_ticks() / self.get_tick_rate())) /
                     self.__bw)
         else:
             return 0.0
@@ -368,8 +552,12 @@ class Consumer(SimComp):
 
     def __init__(self, sim_core, name, bw = float("inf"), latency = 0):
         SimComp.__init__(self, sim_core, name, comptype.consumer)
-        self.__byte_count = 0
-        self.__item_db = dict()
+        # Latest stream per item. Items are indexes into the arrays below.
+        self.__item_idx = dict()
+        self.__item_data = list()
+        self.__gen_ticks = np.zeros(0, dtype=np.int64)
+        self.__recv_ticks = np.zeros(0, dtype=np.int64)
+        self.__path_latency = np.zeros(0)
         self.__bw = bw
         self.__latency = latency
         self.__bound = False
@@ -386,32 +574,64 @@ class Consumer(SimComp):
     def is_ready(self):
         return True #TODO: Readiness can depend on bw and byte_count
 
+    def __add_item(self, item):
+        self.__item_idx[item] = len(self.__item_data)
+        self.__item_data.append(None)
+        self.__gen_ticks = np.append(self.__gen_ticks, 0)
+        self.__recv_ticks = np.append(self.__recv_ticks, 0)
+        self.__path_latency = np.append(self.__path_latency, 0.0)
+        return self.__item_idx[item]
+
     def push(self, data):
-        data.add_hop(self.name, self.__latency)
+        data = data.with_hop(self.name, self.__latency)
+        ticks = self.get_ticks()
         for item in data.items:
-            self.__item_db[item] = DataStream.HopDb(data.get_hops())
-        self.__byte_count += data.get_bytes()
+            idx = self.__item_idx.get(item)
+            if idx is None:
+                idx = self.__add_item(item)
+            self.__item_data[idx] = data
+            self.__gen_ticks[idx] = data.gen_ticks
+            self.__recv_ticks[idx] = ticks
+            self.__path_latency[idx] = data.get_latency(data.gen_ticks)
+        self.add_bytes(data.get_bytes())
+
+    def fast_forward(self, num_ticks, since_ticks):
+        # Items received during the last period will be received again
+        mask = self.__recv_ticks > since_ticks
+        shifted = dict()
+        for idx in np.flatnonzero(mask):
+            data = self.__item_data[idx]
+            if id(data) not in shifted:
+                shifted[id(data)] = data.shifted(num_ticks)
+            self.__item_data[idx] = shifted[id(data)]
+        self.__gen_ticks[mask] += num_ticks
+        self.__recv_ticks[mask] += num_ticks
 
     def get_items(self):
-        return list(self.__item_db.keys())
-
-    def get_bytes(self):
-        return self.__byte_count
+        return list(self.__item_idx.keys())
 
     def get_hops(self, item):
-        return self.__item_db[item].get_hops()
+        return DataStream.HopDb(self.__item_data[self.__item_idx[item]].get_hops()).get_hops()
 
     def get_latency(self, item, hop=None):
         if not hop:
             hop = self.get_hops(item)[-1]
-        return self.__item_db[item].get_latency(self.get_ticks(), hop) / self.get_tick_rate()
+        hop_db = DataStream.HopDb(self.__item_data[self.__item_idx[item]].get_hops())
+        return hop_db.get_latency(self.get_ticks(), hop) / self.get_tick_rate()
+
+    def get_latencies(self):
+        """
+        Return the full path latencies of all items as an array, in the same
+        order as get_items()
+        """
+        return (self.get_ticks() - self.__gen_ticks + self.__path_latency) / self.get_tick_rate()
 
     def get_util_attrs(self):
         return ['bandwidth']
 
     def get_utilization(self, what):
         if what in self.get_util_attrs():
-            return ((self.__byte_count / (self.get_ticks() / self.get_tick_rate())) /
+            return ((self.get_bytes() / (self.get_ticks() / self.get_tick_rate())) /
                     self.__bw)
         else:
             return 0.0
@@ -429,12 +649,8 @@ class Channel(SimComp):
         self.__latency = latency
         self.__lossy = lossy
         self.__dests = list()
-        self.__byte_count = 0
         self.__bound = False
 
-    def get_bytes(self):
-        return self.__byte_count
-
     def inputs(self, i, bind=False):
         if (i != 0):
             raise self.SimCompError('An IO lane has only one input.')
@@ -465,17 +681,17 @@ class Channel(SimComp):
         # If nothing is hooked up to a lossy lane, it will drop data
         if self.__lossy and not self.is_connected():
             return
-        data.add_hop(self.name, self.__latency)
+        data = data.with_hop(self.name, self.__latency)
         for dest in self.__dests:
-            dest.push(copy.deepcopy(data))
-        self.__byte_count += data.get_bytes()
+            dest.push(data)
+        self.add_bytes(data.get_bytes())
 
     def get_util_attrs(self):
         return ['bandwidth']
 
     def get_utilization(self, what):
         if what in self.get_util_attrs():
-            return ((self.__byte_count / (self.get_ticks() / self.get_tick_rate())) /
+            return ((self.get_bytes() / (self.get_ticks() / self.get_tick_rate())) /
                     self.__bw)
         else:
             return 0.0
@@ -518,6 +734,13 @@ class Function(SimComp):
             self.__bound = bind
             return retval
 
+        def get_state(self, ticks):
+            return self.__data.get_state(ticks) if self.__data else None
+
+        def fast_forward(self, num_ticks):
+            if self.__data:
+                self.__data = self.__data.shifted(num_ticks)
+
     Latencies = collections.namedtuple('Latencies', ['func','inarg','outarg'])
 
     def __init__(self, sim_core, name, num_in_args, num_out_args, ticks_per_exec = 1):
@@ -569,7 +792,7 @@ class Function(SimComp):
     def notify(self, arg_i):
         self.__in_args_pushed[arg_i] = True
         # Wait for all input args to come in
-        if (sorted(self.__in_args_pushed.keys()) == list(range(len(self.__in_args)))):
+        if len(self.__in_args_pushed) == len(self.__in_args):
             # Pop data out of each input arg
             max_in_latency = 0
             self.__max_latency_input = None
@@ -577,23 +800,33 @@ class Function(SimComp):
             for arg in self.__in_args:
                 d = arg.pop()
                 arg_data_in.append(d)
-                lat = DataStream.HopDb(d.get_hops()).get_latency(self.get_ticks())
+                lat = d.get_latency(self.get_ticks())
                 if lat > max_in_latency:
                     max_in_latency = lat
                     self.__max_latency_input = d
             # Call the function
             arg_data_out = self.do_func(arg_data_in)
-            if not isinstance(arg_data_out, collections.Iterable):
+            if not isinstance(arg_data_out, collections.abc.Iterable):
                 arg_data_out = [arg_data_out]
             # Update output args
             for i in range(len(arg_data_out)):
-                arg_data_out[i].add_hop(self.name,
-                    max(self.__latencies.inarg) + self.__latencies.func + self.__latencies.outarg[i])
-                self.__dests[i].push(arg_data_out[i])
+                self.__dests[i].push(arg_data_out[i].with_hop(self.name,
+                    max(self.__latencies.inarg) + self.__latencies.func + self.__latencies.outarg[i]))
             # Cleanup
             self.__last_exec_ticks = self.get_ticks()
             self.__in_args_pushed = dict()
 
+    def get_state(self):
+        ticks = self.get_ticks()
+        return (min(ticks - self.__last_exec_ticks, self.__ticks_per_exec),
+                tuple(arg.get_state(ticks) for arg in self.__in_args))
+
+    def fast_forward(self, num_ticks, since_ticks):
+        if self.__last_exec_ticks > since_ticks:
+            self.__last_exec_ticks += num_ticks
+        for arg in self.__in_args:
+            arg.fast_forward(num_ticks)
+
     def get_util_attrs(self):
         return []
 
@@ -649,10 +882,12 @@ class Visualizer():
         print('=================================================================')
 
     def new_figure(self, grid_dims=[1,1], fignum=1, figsize=(16, 9), dpi=72):
+        import matplotlib.pyplot as plt
         self.__figure = plt.figure(num=fignum, figsize=figsize, dpi=dpi)
         self.__fig_dims = grid_dims
 
     def show_figure(self):
+        import matplotlib.pyplot as plt
         plt.show()
         self.__figure = None
 
@@ -720,6 +955,7 @@ class Visualizer():
             ax.set_xticklabels([c_s_d[2] for c_s_d in streams], rotation=90)
             attrs = ['latency']
             ax.legend(rects, attrs)
+            import matplotlib.ticker as mticker
             ax.yaxis.set_major_formatter(mticker.FormatStrFormatter('%.2e'))
             ax.grid(b=True, which='both', color='0.65',linestyle='--')
         if show:
@@ -751,6 +987,7 @@ class Visualizer():
             rects = [ax.plot(ind, latencies, '--rs')]
             ax.set_xticks(ind)
             ax.set_xticklabels(path, rotation=90)
+            import matplotlib.ticker as mticker
             ax.yaxis.set_major_formatter(mticker.FormatStrFormatter('%.2e'))
             ax.grid(b=True, which='both', color='0.65',linestyle='--')
         if show:
@@ -22,38 +22,43 @@ import rfnocsim
 import ni_hw_models as hw
 import colosseum_models
 
-def main():
-    # Arguments
-    parser = argparse.ArgumentParser(description='Simulate the Colosseum network')
-    parser.add_argument('--topology', type=str, default='flb', choices=['torus','flb'], help='Topology')
-    parser.add_argument('--domain', type=str, default='time', choices=['time','frequency'], help='Domain')
-    parser.add_argument('--fir_taps', type=int, default=4, help='FIR Filter Taps (Time domain only)')
-    parser.add_argument('--fir_dly_line', type=int, default=512, help='FIR Delay Line (Time domain only)')
-    parser.add_argument('--fft_size', type=int, default=512, help='FFT Size (Frequency domain only)')
-    parser.add_argument('--fft_overlap', type=int, default=256, help='FFT Overlap (Frequency domain only)')
-    parser.add_argument('--samp_rate', type=float, default=100e6, help='Radio Channel Sample Rate')
-    parser.add_argument('--coherence_rate', type=float, default=1000, help='Channel coefficient update rate')
-    args = parser.parse_args()
+# Hardware configuration
+TICK_RATE   = 100e6
+NUM_USRPS   = 128
+NUM_HOSTS   = 4
+NUM_BLADES  = 16
+NUM_CHANS   = NUM_USRPS * 2
 
-    sim_core = rfnocsim.SimulatorCore(tick_rate=100e6)
-    NUM_USRPS   = 128
-    NUM_HOSTS   = 4
-    NUM_BLADES  = 16
-    NUM_CHANS   = NUM_USRPS * 2
+TOPOLOGIES = {
+    'torus': colosseum_models.Topology_2D_4x4_Torus,
+    'flb': colosseum_models.Topology_3D_4x4_FLB,
+}
 
-    # Build an application settings structure
+def get_app_settings(domain, samp_rate, coherence_rate,
+                     fir_taps=4, fir_dly_line=512, fft_size=512, fft_overlap=256):
+    """
+    Build an application settings structure
+    """
     app_settings = dict()
-    app_settings['domain'] = args.domain
-    app_settings['samp_rate'] = args.samp_rate
-    app_settings['coherence_rate'] = args.coherence_rate
-    if args.domain == 'frequency':
-        app_settings['fft_size'] = args.fft_size
-        app_settings['fft_overlap'] = args.fft_overlap
+    app_settings['domain'] = domain
+    app_settings['samp_rate'] = samp_rate
+    app_settings['coherence_rate'] = coherence_rate
+    if domain == 'frequency':
+        app_settings['fft_size'] = fft_size
+        app_settings['fft_overlap'] = fft_overlap
     else:
-        app_settings['fir_taps'] = args.fir_taps
-        app_settings['fir_dly_line'] = args.fir_dly_line
+        app_settings['fir_taps'] = fir_taps
+        app_settings['fir_dly_line'] = fir_dly_line
+    return app_settings
 
-    print('[INFO] Instantiating hardware resources...')
+def build_network(topology, app_settings, log=print):
+    """
+    Instantiate all Colosseum hardware and connect it using the requested
+    topology. Returns the simulator core.
+    """
+    sim_core = rfnocsim.SimulatorCore(tick_rate=TICK_RATE)
+
+    log('[INFO] Instantiating hardware resources...')
     # Create USRPs
     usrps = []
     for i in range(NUM_USRPS):
@@ -69,29 +74,39 @@ def main():
             num_coeffs=pow(NUM_CHANS,2)/NUM_HOSTS, switch_ports=16, app_settings=app_settings))
 
     # Build topology
-    print('[INFO] Building topology...')
-    if args.topology == 'torus':
-        colosseum_models.Topology_2D_4x4_Torus.connect(sim_core, usrps, bee7blades, hosts, app_settings)
-    elif args.topology == 'flb':
-        colosseum_models.Topology_3D_4x4_FLB.connect(sim_core, usrps, bee7blades, hosts, app_settings)
-    else:
-        raise RuntimeError('Invalid topology: ' + args.topology)
-
-    print('[INFO] Running simulation...')
-    sim_core.run(16e-9)
+    log('[INFO] Building topology...')
+    if topology not in TOPOLOGIES:
+        raise RuntimeError('Invalid topology: ' + topology)
+    TOPOLOGIES[topology].connect(sim_core, usrps, bee7blades, hosts, app_settings)
+    return sim_core
 
-    # Sanity checks
-    print('[INFO] Validating correctness...')
+def validate_correctness(sim_core):
+    """
+    Check that every USRP receives the TX data it is supposed to get. Raises
+    a RuntimeError otherwise.
+    """
     for u in sim_core.list_components(rfnocsim.comptype.hardware, 'USRP.*'):
         sim_core.lookup(u).validate(0)
-    print('[INFO] Validating feasibility...')
+
+def find_overutilized(sim_core):
+    """
+    Return a list of (component, attribute, utilization) for all resources
+    that are utilized beyond 100%
+    """
+    result = []
     for u in sim_core.list_components('', '.*'):
         c = sim_core.lookup(u)
         for a in c.get_util_attrs():
             if c.get_utilization(a) > 1.0:
-                print('[WARN] %s: %s overutilized by %.1f%%' % (u,a,(c.get_utilization(a)-1)*100))
-    print('[INFO] Validating BEE7 FPGA image IO consistency...')
-    master_fpga = 'BEE7_000/FPGA_NE'
+                result.append((u, a, c.get_utilization(a)))
+    return result
+
+def find_io_inconsistencies(sim_core, master_fpga='BEE7_000/FPGA_NE'):
+    """
+    Return a list of (lane, FPGA) for all SERDES lanes whose utilization
+    differs from the same lane on master_fpga
+    """
+    result = []
     master_stats = dict()
     for u in sim_core.list_components('', master_fpga + '/.*SER_.*'):
         c = sim_core.lookup(u)
@@ -102,7 +117,42 @@ def main():
             c = sim_core.lookup(u)
             m = re.match('(.+)/(SER_.*)', u)
             if c.get_utilization('bandwidth') != master_stats[ln]:
-                print('[WARN] Data flowing over ' + ln + ' is probably different between ' + master_fpga + ' and ' + m.group(1))
+                result.append((ln, m.group(1)))
+    return result
+
+def main():
+    # Arguments
+    parser = argparse.ArgumentParser(description='Simulate the Colosseum network')
+    parser.add_argument('--topology', type=str, default='flb', choices=['torus','flb'], help='Topology')
+    parser.add_argument('--domain', type=str, default='time', choices=['time','frequency'], help='Domain')
+    parser.add_argument('--fir_taps', type=int, default=4, help='FIR Filter Taps (Time domain only)')
+    parser.add_argument('--fir_dly_line', type=int, default=512, help='FIR Delay Line (Time domain only)')
+    parser.add_argument('--fft_size', type=int, default=512, help='FFT Size (Frequency domain only)')
+    parser.add_argument('--fft_overlap', type=int, default=256, help='FFT Overlap (Frequency domain only)')
+    parser.add_argument('--samp_rate', type=float, default=100e6, help='Radio Channel Sample Rate')
+    parser.add_argument('--coherence_rate', type=float, default=1000, help='Channel coefficient update rate')
+    parser.add_argument('--duration', type=float, default=16e-9, help='Simulated time in seconds')
+    args = parser.parse_args()
+
+    app_settings = get_app_settings(
+        args.domain, args.samp_rate, args.coherence_rate,
+        fir_taps=args.fir_taps, fir_dly_line=args.fir_dly_line,
+        fft_size=args.fft_size, fft_overlap=args.fft_overlap)
+    sim_core = build_network(args.topology, app_settings)
+
+    print('[INFO] Running simulation...')
+    sim_core.run(args.duration)
+
+    # Sanity checks
+    print('[INFO] Validating correctness...')
+    validate_correctness(sim_core)
+    print('[INFO] Validating feasibility...')
+    for (u, a, utilization) in find_overutilized(sim_core):
+        print('[WARN] %s: %s overutilized by %.1f%%' % (u,a,(utilization-1)*100))
+    print('[INFO] Validating BEE7 FPGA image IO consistency...')
+    master_fpga = 'BEE7_000/FPGA_NE'
+    for (ln, fpga) in find_io_inconsistencies(sim_core, master_fpga):
+        print('[WARN] Data flowing over ' + ln + ' is probably different between ' + master_fpga + ' and ' + fpga)
 
     # Visualize various metrics
     vis = rfnocsim.Visualizer(sim_core)
@@ -0,0 +1,341 @@
+#!/usr/bin/env python3
+#
+# Copyright 2021 Ettus Research, a National Instruments Brand
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+"""
+Run parameter sweeps of the Colosseum simulation.
+
+Every combination of the given parameters is simulated in its own worker
+process. Utilization and latency metrics of all components are collected
+into one tidy table (one row per component, metric and configuration), which
+can be written as CSV (or Parquet, if pandas is available). Results are
+cached per configuration, so extending a sweep only simulates the new points.
+
+Example:
+    sim_sweep.py --topology flb torus --domain frequency \\
+        --fft_size 256 512 1024 --output results.csv --cache_dir sim_cache
+"""
+
+import argparse
+import concurrent.futures
+import csv
+import hashlib
+import itertools
+import json
+import os
+import sys
+import time
+import rfnocsim
+import sim_colosseum
+
+# Parameters that describe a single simulation, and their default values.
+# Parameters that don't apply to a domain are dropped from the configuration.
+SWEEP_PARAMS = {
+    'topology': 'flb',
+    'domain': 'time',
+    'samp_rate': 100e6,
+    'coherence_rate': 1000,
+    'fir_taps': 4,
+    'fir_dly_line': 512,
+    'fft_size': 512,
+    'fft_overlap': 256,
+    'duration': 16e-9,
+}
+DOMAIN_PARAMS = {
+    'time': ('fir_taps', 'fir_dly_line'),
+    'frequency': ('fft_size', 'fft_overlap'),
+}
+
+# Columns of the result table (in addition to the configuration parameters)
+METRIC_COLUMNS = ['config_id', 'component', 'type', 'item', 'metric', 'value']
+
+# Files whose contents affect the simulation results
+MODEL_FILES = ['rfnocsim.py', 'ni_hw_models.py', 'colosseum_models.py', 'sim_colosseum.py']
+
+
+def normalize_config(config):
+    """
+    Fill in defaults, and remove parameters that don't apply to the domain
+    """
+    config = dict(SWEEP_PARAMS, **config)
+    for domain, params in DOMAIN_PARAMS.items():
+        if domain != config['domain']:
+            for param in params:
+                config.pop(param, None)
+    return config
+
+
+def expand_grid(grid):
+    """
+    Turn a dictionary of parameter name -> list of values into the list of
+    all combinations. Combinations that only differ in parameters that don't
+    apply to their domain are only returned once.
+    """
+    names = list(grid.keys())
+    configs = []
+    for values in itertools.product(*(grid[name] for name in names)):
+        config = normalize_config(dict(zip(names, values)))
+        if config not in configs:
+            configs.append(config)
+    return configs
+
+
+def get_model_version():
+    """
+    Return a hash over the simulation model sources
+    """
+    digest = hashlib.sha256()
+    base_dir = os.path.dirname(os.path.abspath(__file__))
+    for filename in MODEL_FILES:
+        with open(os.path.join(base_dir, filename), 'rb') as model_file:
+            digest.update(model_file.read())
+    return digest.hexdigest()
+
+
+def get_config_id(config, model_version):
+    """
+    Return a unique ID for a configuration and model version
+    """
+    key = json.dumps({'config': config, 'model': model_version}, sort_keys=True)
+    return hashlib.sha256(key.encode('utf-8')).hexdigest()[:16]
+
+
+def collect_metrics(sim_core):
+    """
+    Collect utilization and latency metrics of all components into a list of
+    (component, type, item, metric, value) tuples
+    """
+    metrics = []
+    for name in sim_core.list_components():
+        comp = sim_core.lookup(name)
+        for attr in comp.get_util_attrs():
+            metrics.append((name, comp.type, '', attr, comp.get_utilization(attr)))
+        if comp.type == rfnocsim.comptype.consumer:
+            for item, latency in zip(comp.get_items(), comp.get_latencies()):
+                metrics.append((name, comp.type, item, 'latency', float(latency)))
+    return metrics
+
+
+def run_config(config):
+    """
+    Simulate a single configuration. This runs inside a worker process and
+    must not touch any plotting code.
+
+    Returns a dictionary with the configuration, metrics, warnings, and the
+    time it took to run the simulation.
+    """
+    start_time = time.monotonic()
+    app_settings = sim_colosseum.get_app_settings(**{
+        key: value for key, value in config.items()
+        if key not in ('topology', 'duration')})
+    sim_core = sim_colosseum.build_network(
+        config['topology'], app_settings, log=lambda msg: None)
+    sim_core.run(config['duration'])
+    sim_colosseum.validate_correctness(sim_core)
+    warnings = [
+        '%s: %s overutilized by %.1f%%' % (name, attr, (utilization - 1) * 100)
+        for (name, attr, utilization) in sim_colosseum.find_overutilized(sim_core)]
+    return {
+        'config': config,
+        'metrics': collect_metrics(sim_core),
+        'warnings': warnings,
+        'elapsed': time.monotonic() - start_time,
+    }
+
+
+class ResultCache:
+    """
+    Stores simulation results as one JSON file per configuration ID
+    """
+    def __init__(self, cache_dir):
+        self.cache_dir = cache_dir
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _get_path(self, config_id):
+        return os.path.join(self.cache_dir, config_id + '.json')
+
+    def get(self, config_id):
+        """
+        Return a cached result, or None if there is none
+        """
+        try:
+            with open(self._get_path(config_id)) as cache_file:
+                return json.load(cache_file)
+        except (OSError, ValueError):
+            return None
+
+    def put(self, config_id, result):
+        tmp_path = self._get_path(config_id) + '.tmp'
+        with open(tmp_path, 'w') as cache_file:
+            json.dump(result, cache_file)
+        os.replace(tmp_path, self._get_path(config_id))
+
+
+def run_sweep(configs, jobs=None, cache=None, log=print):
+    """
+    Simulate all configurations. Cached results are reused, everything else
+    is simulated in a pool of jobs worker processes (or in this process if
+    jobs is 1).
+
+    Returns a list of results (see run_config()) in the order of configs. The
+    results have an additional 'config_id' key. If a simulation failed, its
+    result has an 'error' key instead of metrics.
+    """
+    model_version = get_model_version()
+    results = [None] * len(configs)
+    pending = []
+    for idx, config in enumerate(configs):
+        config_id = get_config_id(config, model_version)
+        result = cache.get(config_id) if cache else None
+        if result is not None:
+            log('[INFO] Using cached result for %s' % json.dumps(config))
+            results[idx] = result
+        else:
+            pending.append((idx, config_id, config))
+
+    def _store(idx, config_id, config, future):
+        try:
+            result = future.result()
+        except Exception as ex: # pylint: disable=broad-except
+            log('[ERROR] Simulation failed for %s: %s' % (json.dumps(config), str(ex)))
+            result = {'config': config, 'error': str(ex)}
+        else:
+            log('[INFO] Simulated %s in %.1fs' % (json.dumps(config), result['elapsed']))
+            if cache:
+                cache.put(config_id, dict(result, config_id=config_id))
+        results[idx] = dict(result, config_id=config_id)
+
+    if pending:
+        log('[INFO] Simulating %d configurations (%d cached)...'
+            % (len(pending), len(configs) - len(pending)))
+    if jobs == 1:
+        for idx, config_id, config in pending:
+            future = concurrent.futures.Future()
+            try:
+                future.set_result(run_config(config))
+            except Exception as ex: # pylint: disable=broad-except
+                future.set_exception(ex)
+            _store(idx, config_id, config, future)
+    elif pending:
+        with concurrent.futures.ProcessPoolExecutor(max_workers=jobs) as executor:
+            futures = {executor.submit(run_config, config): (idx, config_id, config)
+                       for idx, config_id, config in pending}
+            for future in concurrent.futures.as_completed(futures):
+                _store(*futures[future], future)
+    return results
+
+
+def get_table(results):
+    """
+    Flatten results into a tidy table: A list of dictionaries with one entry
+    per configuration parameter plus METRIC_COLUMNS
+    """
+    rows = []
+    for result in results:
+        if 'metrics' not in result:
+            continue
+        for (component, ctype, item, metric, value) in result['metrics']:
+            row = dict(result['config'])
+            row.update(zip(METRIC_COLUMNS,
+                           (result['config_id'], component, ctype, item, metric, value)))
+            rows.append(row)
+    return rows
+
+
+def get_columns(results):
+    """
+    Return the column names of the table returned by get_table()
+    """
+    params = []
+    for result in results:
+        params.extend(p for p in result['config'] if p not in params)
+    return params + METRIC_COLUMNS
+
+
+def write_table(results, filename):
+    """
+    Write the result table to filename. Files ending in .parquet are written
+    using pandas, everything else is written as CSV.
+    """
+    columns = get_columns(results)
+    rows = get_table(results)
+    if filename.endswith('.parquet'):
+        import pandas as pd
+        pd.DataFrame(rows, columns=columns).to_parquet(filename)
+        return
+    with open(filename, 'w', newline='') as out_file:
+        writer = csv.DictWriter(out_file, fieldnames=columns)
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def print_summary(results):
+    """
+    Print the peak utilization and latency for every configuration
+    """
+    print('=================================================================')
+    print('Sweep Summary')
+    print('=================================================================')
+    for result in results:
+        print(' - %s' % json.dumps(result['config']))
+        if 'metrics' not in result:
+            print('     FAILED: %s' % result['error'])
+            continue
+        for ctype in (rfnocsim.comptype.channel, rfnocsim.comptype.hardware):
+            utils = [(value, component, metric)
+                     for (component, comp_type, _, metric, value) in result['metrics']
+                     if comp_type == ctype and metric != 'latency']
+            if utils:
+                value, component, metric = max(utils)
+                print('     Peak %s utilization: %.1f%% (%s: %s)' %
+                      (ctype, value * 100, component, metric))
+        latencies = [value for (_, _, _, metric, value) in result['metrics']
+                     if metric == 'latency']
+        if latencies:
+            print('     Max. latency: %gs' % max(latencies))
+        print('     Overutilized resources: %d' % len(result['warnings']))
+    print('=================================================================')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run parameter sweeps of the Colosseum simulation')
+    parser.add_argument('--topology', type=str, nargs='+', default=['flb'], choices=['torus','flb'], help='Topologies')
+    parser.add_argument('--domain', type=str, nargs='+', default=['time'], choices=['time','frequency'], help='Domains')
+    parser.add_argument('--fir_taps', type=int, nargs='+', default=[4], help='FIR Filter Taps (Time domain only)')
+    parser.add_argument('--fir_dly_line', type=int, nargs='+', default=[512], help='FIR Delay Line (Time domain only)')
+    parser.add_argument('--fft_size', type=int, nargs='+', default=[512], help='FFT Sizes (Frequency domain only)')
+    parser.add_argument('--fft_overlap', type=int, nargs='+', default=[256], help='FFT Overlap (Frequency domain only)')
+    parser.add_argument('--samp_rate', type=float, nargs='+', default=[100e6], help='Radio Channel Sample Rates')
+    parser.add_argument('--coherence_rate', type=float, nargs='+', default=[1000], help='Channel coefficient update rates')
+    parser.add_argument('--duration', type=float, default=16e-9, help='Simulated time in seconds')
+    parser.add_argument('--jobs', type=int, default=None, help='Number of worker processes (default: one per CPU)')
+    parser.add_argument('--cache_dir', type=str, default=None, help='Directory to cache results in')
+    parser.add_argument('--output', type=str, default=None, help='Write the result table to this file (.csv or .parquet)')
+    args = parser.parse_args()
+
+    grid = {param: getattr(args, param) for param in SWEEP_PARAMS if param != 'duration'}
+    grid['duration'] = [args.duration]
+    configs = expand_grid(grid)
+    cache = ResultCache(args.cache_dir) if args.cache_dir else None
+    results = run_sweep(configs, jobs=args.jobs, cache=cache)
+    print_summary(results)
+    if args.output:
+        write_table(results, args.output)
+        print('[INFO] Results written to ' + args.output)
+    return all('metrics' in result for result in results)
+
+if __name__ == '__main__':
+    sys.exit(not main())
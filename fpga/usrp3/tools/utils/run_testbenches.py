@@ -13,8 +13,13 @@ import logging
 import re
 import time
 import datetime
-from queue import Queue
-from threading import Thread
+import hashlib
+import json
+import shutil
+import tempfile
+import threading
+import concurrent.futures
+from functools import lru_cache
 
 #-------------------------------------------------------
 # Utilities
@@ -36,6 +41,17 @@ RETCODE_EXEC_ERR    = -2
 RETCODE_COMPILE_ERR = -3
 RETCODE_UNKNOWN_ERR = -4
 
+# Bump this when the layout of the results cache changes
+CACHE_VERSION = 1
+
+# Makefile fragment that prints everything a testbench depends on: All
+# Makefiles that were read, and all files listed in *_SRCS variables
+DEPS_MAKEFILE = '''
+__print_deps:
+\t@echo $(MAKEFILE_LIST)
+\t@echo $(foreach v,$(filter %_SRCS,$(.VARIABLES)),$($(v)))
+'''
+
 def retcode_to_str(code):
     """ Convert internal status code to string
     """
@@ -189,58 +205,210 @@ def parse_output(simout):
     results['retcode'] = retcode
     return results
 
-def run_sim(path, simulator, basedir, setupenv):
+def run_sim(path, simulator, basedir, setupenv, logpath):
     """ Run the simulation at the specified path
         The simulator can be specified as the target
         A environment script can be run optionally
+        All output of the simulation is streamed to logpath, the returned
+        results are parsed from that file once the simulation is done.
     """
-    try:
-        # Optionally run an environment setup script
-        if setupenv is None:
-            setupenv = ''
-            # Check if environment was setup
-            if 'VIVADO_PATH' not in os.environ:
-                return {
-                    'retcode': RETCODE_EXEC_ERR,
-                    'passed': False,
-                    'stdout': bytes('Simulation environment was not initialized\n', 'utf-8')
-                }
-        else:
-            setupenv = '. ' + os.path.realpath(setupenv) + ';'
-        # Run the simulation
-        return parse_output(
-            subprocess.check_output(
+    os.makedirs(os.path.dirname(os.path.abspath(logpath)), exist_ok=True)
+    with open(logpath, 'wb') as logfile:
+        try:
+            # Optionally run an environment setup script
+            if setupenv is None:
+                setupenv = ''
+                # Check if environment was setup
+                if 'VIVADO_PATH' not in os.environ:
+                    logfile.write(bytes('Simulation environment was not initialized\n', 'utf-8'))
+                    return {'retcode': RETCODE_EXEC_ERR, 'passed': False}
+            else:
+                setupenv = '. ' + os.path.realpath(setupenv) + ';'
+            # Run the simulation
+            retcode = subprocess.call(
                 'cd {workingdir}; /bin/bash -c "{setupenv} make ip 2>&1; make {simulator} 2>&1"'.format(
-                    workingdir=path, setupenv=setupenv, simulator=simulator), shell=True))
-    except subprocess.CalledProcessError as e:
-        return {'retcode': int(abs(e.returncode)), 'passed':False, 'stdout':e.output}
-    except Exception as e:
-        _LOG.error('Target ' + path + ' failed to run:\n' + str(e))
-        return {'retcode': RETCODE_EXEC_ERR, 'passed':False, 'stdout':bytes(str(e), 'utf-8')}
-    except:
-        _LOG.error('Target ' + path + ' failed to run')
-        return {'retcode': RETCODE_UNKNOWN_ERR, 'passed':False, 'stdout':bytes('Unknown Exception', 'utf-8')}
+                    workingdir=path, setupenv=setupenv, simulator=simulator),
+                shell=True, stdout=logfile)
+        except Exception as e:
+            _LOG.error('Target ' + path + ' failed to run:\n' + str(e))
+            logfile.write(bytes(str(e), 'utf-8'))
+            return {'retcode': RETCODE_EXEC_ERR, 'passed':False}
+        except:
+            _LOG.error('Target ' + path + ' failed to run')
+            logfile.write(bytes('Unknown Exception', 'utf-8'))
+            return {'retcode': RETCODE_UNKNOWN_ERR, 'passed':False}
+    if retcode != 0:
+        return {'retcode': int(abs(retcode)), 'passed':False}
+    with open(logpath, 'rb') as logfile:
+        results = parse_output(logfile.read())
+    del results['stdout']
+    return results
 
-def run_sim_queue(run_queue, out_queue, simulator, basedir, setupenv):
+def run_sim_job(name, path, args):
     """ Thread worker for a simulation runner
-        Pull a job from the run queue, run the sim, then place
-        output in out_queue
+        Runs a single simulation and returns (result, elapsed seconds). The
+        simulation output goes to the log file returned by get_log_path().
+    """
+    start = time.monotonic()
+    try:
+        _LOG.info('Starting: %s', name)
+        result = run_sim(path, args.simulator, args.basedir, args.setupenv,
+                         get_log_path(args.logdir, name))
+        _LOG.info('FINISHED: %s (%s, %s)', name, retcode_to_str(result['retcode']), 'PASS' if result['passed'] else 'FAIL!')
+    except KeyboardInterrupt:
+        _LOG.warning('Target ' + name + ' received SIGINT. Aborting...')
+        result = {'retcode': RETCODE_EXEC_ERR, 'passed':False}
+    except Exception as e:
+        _LOG.error('Target ' + name + ' failed to run:\n' + str(e))
+        result = {'retcode': RETCODE_UNKNOWN_ERR, 'passed':False}
+    return result, time.monotonic() - start
+
+def get_log_path(logdir, name):
+    """ Return the path of the log file for the simulation called name
     """
-    while not run_queue.empty():
-        (name, path) = run_queue.get()
+    return os.path.join(logdir, name + '.log')
+
+#-------------------------------------------------------
+# Results Cache
+#-------------------------------------------------------
+
+def get_default_cache_path():
+    """ Return the default location of the results cache, following the XDG
+        base directory specification ($XDG_CACHE_HOME/uhd or ~/.cache/uhd)
+    """
+    cache_home = os.environ.get(
+        'XDG_CACHE_HOME', os.path.join(os.path.expanduser('~'), '.cache'))
+    return os.path.join(cache_home, 'uhd', 'run_testbenches.json')
+
+@lru_cache(maxsize=None)
+def hash_file(filename):
+    """ Return the SHA256 hex digest of a file's contents, or None if the
+        file does not exist. Most testbenches share a large number of
+        library sources, so every file only gets hashed once per run.
+    """
+    digest = hashlib.sha256()
+    try:
+        with open(filename, 'rb') as stream:
+            for chunk in iter(lambda: stream.read(1 << 16), b''):
+                digest.update(chunk)
+    except OSError:
+        return None
+    return digest.hexdigest()
+
+def get_sim_deps(path):
+    """ Return the sorted list of files the testbench at path depends on, or
+        None if its Makefile could not be evaluated. The dependencies are the
+        Makefiles themselves, all files listed in *_SRCS variables, and the
+        contents of the directories of all included IP Makefile.inc files
+        (the IP definitions are not listed in any variable).
+    """
+    with tempfile.NamedTemporaryFile('w', suffix='.mak') as deps_mak:
+        deps_mak.write(DEPS_MAKEFILE)
+        deps_mak.flush()
         try:
-            _LOG.info('Starting: %s', name)
-            result = run_sim(path, simulator, basedir, setupenv)
-            out_queue.put((name, result))
-            _LOG.info('FINISHED: %s (%s, %s)', name, retcode_to_str(result['retcode']), 'PASS' if result['passed'] else 'FAIL!')
-        except KeyboardInterrupt:
-            _LOG.warning('Target ' + name + ' received SIGINT. Aborting...')
-            out_queue.put((name, {'retcode': RETCODE_EXEC_ERR, 'passed':False, 'stdout':bytes('Aborted by user', 'utf-8')}))
-        except Exception as e:
-            _LOG.error('Target ' + name + ' failed to run:\n' + str(e))
-            out_queue.put((name, {'retcode': RETCODE_UNKNOWN_ERR, 'passed':False, 'stdout':bytes(str(e), 'utf-8')}))
-        finally:
-            run_queue.task_done()
+            output = subprocess.run(
+                ['make', '-s', '--no-print-directory', '-f', 'Makefile',
+                 '-f', deps_mak.name, '__print_deps'],
+                cwd=path, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                check=True, timeout=60).stdout
+        except (OSError, subprocess.SubprocessError):
+            return None
+        helper = os.path.realpath(deps_mak.name)
+    deps = set()
+    for dep in output.decode('utf-8', 'replace').split():
+        dep = os.path.realpath(os.path.join(path, dep))
+        if dep == helper:
+            continue
+        deps.add(dep)
+        if os.path.basename(dep) == 'Makefile.inc':
+            ipdir = os.path.dirname(dep)
+            deps.update(
+                os.path.join(ipdir, f) for f in os.listdir(ipdir)
+                if os.path.isfile(os.path.join(ipdir, f)))
+    return sorted(deps)
+
+def get_sim_digest(path, args):
+    """ Return a digest over everything that affects the outcome of the
+        testbench at path, or None if it can't be determined (in which case
+        the testbench must always be run). Files are identified by their
+        path relative to the testbench, so the digest does not depend on
+        where the repository is checked out.
+    """
+    deps = get_sim_deps(path)
+    if deps is None:
+        return None
+    digest = hashlib.sha256()
+    digest.update(bytes(args.simulator + '\0', 'utf-8'))
+    digest.update(bytes(os.environ.get('VIVADO_PATH', '') + '\0', 'utf-8'))
+    if args.setupenv is not None:
+        digest.update(bytes(str(hash_file(os.path.realpath(args.setupenv))) + '\0', 'utf-8'))
+    for dep in deps:
+        digest.update(bytes('%s:%s\0' % (os.path.relpath(dep, path), hash_file(dep)), 'utf-8'))
+    return digest.hexdigest()
+
+class ResultsCache(object):
+    """ Persistent record of passed testbenches and of the time each
+        testbench took to run the last time.
+
+        Passed results are stored together with the digest of the testbench
+        (see get_sim_digest()). A testbench whose digest did not change since
+        it last passed does not need to run again. Failures are never cached.
+        Run times are used to start the longest running testbenches first.
+    """
+    def __init__(self, filename, enabled=True):
+        self.filename = filename
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._data = {'version': CACHE_VERSION, 'results': {}, 'durations': {}}
+        if enabled:
+            try:
+                with open(filename, 'r') as cache_file:
+                    data = json.load(cache_file)
+                if data.get('version') == CACHE_VERSION:
+                    self._data = data
+            except (OSError, ValueError):
+                pass
+
+    def get_result(self, name, digest):
+        """ Return the cached result of testbench name if it passed with the
+            given digest, None otherwise
+        """
+        with self._lock:
+            entry = self._data['results'].get(name)
+            if entry is None or digest is None or entry['digest'] != digest:
+                return None
+            return dict(entry['result'])
+
+    def get_duration(self, name):
+        """ Return the last run time of testbench name in seconds, or None
+        """
+        with self._lock:
+            return self._data['durations'].get(name)
+
+    def update(self, name, digest, result, duration):
+        """ Record the outcome of a testbench run and write the cache back
+            to disk. Failure to write the cache is not an error.
+        """
+        if not self.enabled:
+            return
+        with self._lock:
+            self._data['durations'][name] = duration
+            if result['passed'] and digest is not None:
+                self._data['results'][name] = {
+                    'digest': digest,
+                    'result': {k: (str(v, 'utf-8', 'replace') if isinstance(v, bytes) else v)
+                               for k, v in result.items()},
+                }
+            else:
+                self._data['results'].pop(name, None)
+            tmp_filename = self.filename + '.tmp'
+            try:
+                os.makedirs(os.path.dirname(os.path.abspath(self.filename)), exist_ok=True)
+                with open(tmp_filename, 'w') as cache_file:
+                    json.dump(self._data, cache_file, indent=1, sort_keys=True)
+                os.replace(tmp_filename, self.filename)
+            except OSError as e:
+                _LOG.warning('Could not write results cache %s: %s', self.filename, str(e))
 
 #-------------------------------------------------------
 # Script Actions
@@ -258,59 +426,92 @@ def do_run(args):
     """ Build a simulation queue based on the specified
         args and process it
     """
-    run_queue = Queue(maxsize=0)
-    out_queue = Queue(maxsize=0)
-    _LOG.info('Queueing the following targets to simulate:')
     excludes = read_excludes_file(args.excludes)
+    targets = gather_target_sims(args.basedir, args.target, excludes)
+    cache = ResultsCache(args.cache, enabled=not args.no_cache)
+    # Hashing the dependencies is mostly waiting for make and file I/O, so
+    # do it in parallel for all targets
+    _LOG.info('Checking %d target(s) for changes...', len(targets))
+    with concurrent.futures.ThreadPoolExecutor(max_workers=os.cpu_count() or 1) as executor:
+        digests = dict(zip(
+            [name for (name, _) in targets],
+            executor.map(lambda target: get_sim_digest(target[1], args), targets)))
+    _LOG.info('Queueing the following targets to simulate:')
     name_maxlen = 0
-    for (name, path) in gather_target_sims(args.basedir, args.target, excludes):
-        run_queue.put((name, path))
+    results = {}
+    run_list = []
+    for (name, path) in targets:
         name_maxlen = max(name_maxlen, len(name))
-        _LOG.info('* ' + name)
+        cached = None if args.rerun else cache.get_result(name, digests[name])
+        if cached is not None:
+            cached['cached'] = True
+            results[name] = cached
+            _LOG.info('* %s (unchanged since last pass, skipping)', name)
+        else:
+            run_list.append((name, path))
+            _LOG.info('* ' + name)
+    # Start the longest running simulations first, so the slowest one does
+    # not end up running on its own at the end. Simulations that have never
+    # run are assumed to be the slowest.
+    run_list.sort(key=lambda target: -(cache.get_duration(target[0]) or float('inf')))
     # Spawn tasks to run builds
-    num_sims = run_queue.qsize()
-    num_jobs = min(num_sims, int(args.jobs))
+    num_sims = len(run_list)
+    num_jobs = max(1, min(num_sims, int(args.jobs)))
     _LOG.info('Started ' + str(num_jobs) + ' job(s) to process queue...')
-    results = {}
-    for i in range(num_jobs):
-        worker = Thread(target=run_sim_queue, args=(run_queue, out_queue, args.simulator, args.basedir, args.setupenv))
-        worker.setDaemon(False)
-        worker.start()
-    # Wait for build queue to become empty
+    _LOG.info('Simulation logs are written to ' + os.path.abspath(args.logdir))
+    executor = concurrent.futures.ThreadPoolExecutor(max_workers=num_jobs)
+    futures = {executor.submit(run_sim_job, name, path, args): name
+               for (name, path) in run_list}
+    pending = set(futures)
+    finished = []
+    # Wait for all simulations to complete
     start = datetime.datetime.now()
     try:
         sim_count = -1
-        while out_queue.qsize() < num_sims:
+        while True:
             tdiff = str(datetime.datetime.now() - start).split('.', 2)[0]
             if args.logged:
                 # Print number of TBs completed and elapsed time whenever a
                 # simulation completes.
-                if sim_count != out_queue.qsize():
-                    print(">>> [%s] (%d/%d simulations completed) <<<" % (tdiff, out_queue.qsize(), num_sims))
-                    sim_count = out_queue.qsize()
+                if sim_count != len(finished):
+                    print(">>> [%s] (%d/%d simulations completed) <<<" % (tdiff, len(finished), num_sims))
+                    sim_count = len(finished)
             else:
                 # Print elapsed time and number of TBs completed once per
                 # second, overwriting the same line each time.
-                print("\r>>> [%s] (%d/%d simulations completed) <<<" % (tdiff, out_queue.qsize(), num_sims), end='\r', flush=True)
-            time.sleep(1.0)
+                print("\r>>> [%s] (%d/%d simulations completed) <<<" % (tdiff, len(finished), num_sims), end='\r', flush=True)
+            if not pending:
+                break
+            done, pending = concurrent.futures.wait(
+                pending, timeout=1.0, return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in done:
+                name = futures[future]
+                (result, elapsed) = future.result()
+                results[name] = result
+                finished.append(name)
+                cache.update(name, digests[name], result, elapsed)
         sys.stdout.write("\n")
     except (KeyboardInterrupt):
         _LOG.warning('Received SIGINT. Aborting... (waiting for pending jobs to finish)')
-        # Flush run queue
-        while not run_queue.empty():
-            (name, path) = run_queue.get()
+        # Drop everything that has not started yet
+        for future in pending:
+            future.cancel()
+        executor.shutdown(wait=True)
         raise SystemExit(1)
+    executor.shutdown()
 
-    results = {}
     result_all = 0
-    while not out_queue.empty():
-        (name, result) = out_queue.get()
-        results[name] = result
+    for name in finished:
         line = "#"*70
         sys.stdout.buffer.write(bytes('%s\n Begin TB Log: %s\n%s\n' % (line, name, line), 'utf-8'))
-        sys.stdout.buffer.write(result['stdout'])
+        try:
+            with open(get_log_path(args.logdir, name), 'rb') as logfile:
+                shutil.copyfileobj(logfile, sys.stdout.buffer)
+        except OSError as e:
+            sys.stdout.buffer.write(bytes('Could not read log: %s\n' % str(e), 'utf-8'))
         sys.stdout.buffer.write(bytes('%s\n End TB Log: %s\n%s\n' % (line, name, line), 'utf-8'))
-        if not result['passed']:
+    for name in results:
+        if not results[name]['passed']:
             result_all += 1
     sys.stdout.write('\n\n\n')
     sys.stdout.flush()
@@ -321,13 +522,15 @@ def do_run(args):
     for name in sorted(results):
         r = results[name]
         if 'module' in r:
-            _LOG.info('* %s : %s (Expected=%02d, Run=%02d, Passed=%02d, Elapsed=%s)',
-                name.ljust(name_maxlen), ('Passed' if r['passed'] else 'FAILED'), r['tc_expected'], r['tc_run'], r['tc_passed'], r['wall_time'])
+            _LOG.info('* %s : %s (Expected=%02d, Run=%02d, Passed=%02d, Elapsed=%s)%s',
+                name.ljust(name_maxlen), ('Passed' if r['passed'] else 'FAILED'), r['tc_expected'], r['tc_run'], r['tc_passed'], r['wall_time'],
+                ' [cached]' if r.get('cached') else '')
         else:
             _LOG.info('* %s : %s (Status = %s)', name.ljust(name_maxlen), ('Passed' if r['passed'] else 'FAILED'), 
                 retcode_to_str(r['retcode']))
     _LOG.info('='*hdr_len)
-    _LOG.info('SUMMARY: %d out of %d tests passed. Time elapsed was %s'%(num_sims - result_all, num_sims, str(datetime.datetime.now() - start).split('.', 2)[0]))   
+    _LOG.info('SUMMARY: %d out of %d tests passed (%d unchanged and skipped). Time elapsed was %s'%(
+        len(results) - result_all, len(results), len(results) - num_sims, str(datetime.datetime.now() - start).split('.', 2)[0]))
     _LOG.info('#'*hdr_len)
     return result_all
 
@@ -389,6 +592,10 @@ def get_options():
     parser.add_argument('-x', '--excludes', default=None, help='Name of the excludes file. It contains all targets to exclude.')
     parser.add_argument('-j', '--jobs', default=1, help='Number of parallel simulation jobs to run')
     parser.add_argument('-l', '--logged', action='store_true', default=False, help='Output is logged, so don\'t show per-second timer')
+    parser.add_argument('-o', '--logdir', default='testbench_logs', help='Directory to write the simulation logs to')
+    parser.add_argument('--cache', default=get_default_cache_path(), help='Results cache file. Testbenches that passed and did not change since are skipped.')
+    parser.add_argument('--no-cache', action='store_true', default=False, help='Do not read or write the results cache')
+    parser.add_argument('--rerun', action='store_true', default=False, help='Run all testbenches, even if they are unchanged since they last passed')
     parser.add_argument('action', choices=['run', 'cleanup', 'list', 'report'], default='list', help='What to do?')
     parser.add_argument('target', nargs='*', default='.*', help='Space separated simulation target regexes')
     return parser.parse_args()
@@ -11,6 +11,8 @@ Benchmark rate using Python API
 
 import argparse
 from datetime import datetime, timedelta
+import itertools
+import json
 import sys
 import time
 import threading
@@ -22,7 +24,9 @@ import uhd
 CLOCK_TIMEOUT = 1000  # 1000mS timeout for external clock locking
 INIT_DELAY = 0.05  # 50mS initial delay before transmit
 
-def parse_args():
+logger = logging.getLogger(__name__)
+
+def parse_args(argv=None):
     """Parse the command line arguments"""
     description = """UHD Benchmark Rate (Python API)
 
@@ -65,7 +69,15 @@ def parse_args():
                         help="which RX channel(s) to use (specify \"0\", \"1\", \"0 1\", etc)")
     parser.add_argument("--tx_channels", nargs="+", type=int,
                         help="which TX channel(s) to use (specify \"0\", \"1\", \"0 1\", etc)")
-    return parser.parse_args()
+    parser.add_argument("--multi_streamer", nargs="?", const=1, type=int, metavar="N",
+                        help="create a separate streamer (and thread) for every N channels\n"
+                             "(default: one streamer per channel)")
+    parser.add_argument("--stats_interval", default=1.0, type=float,
+                        help="interval in seconds at which the throughput time series is sampled")
+    parser.add_argument("--json", nargs="?", const="-", metavar="FILE",
+                        help="write the results in JSON format to FILE (or stdout if no file\n"
+                             "is given)")
+    return parser.parse_args(argv)
 
 
 class LogFormatter(logging.Formatter):
@@ -161,21 +173,55 @@ def check_channels(usrp, args):
     return rx_channels, tx_channels
 
 
-def benchmark_rx_rate(usrp, rx_streamer, random, timer_elapsed_event, rx_statistics):
-    """Benchmark the receive chain"""
-    logger.info("Testing receive rate {:.3f} Msps on {:d} channels".format(
-        usrp.get_rx_rate()/1e6, rx_streamer.get_num_channels()))
-
+class ThroughputSeries:
+    """
+    Records the number of samples transferred per time interval
+    """
+    def __init__(self, interval, start=None):
+        self.interval = interval
+        self.series = []
+        self._start = start or time.monotonic()
+        self._next = self._start + interval if interval else float("inf")
+        self._last_samps = 0
+
+    def update(self, num_samps):
+        """Record a new data point if the current interval has elapsed"""
+        now = time.monotonic()
+        if now >= self._next:
+            self.flush(num_samps, now)
+
+    def flush(self, num_samps, now=None):
+        """Record a data point for the (partial) current interval"""
+        now = now or time.monotonic()
+        self.series.append({
+            "time": now - self._start,
+            "num_samps": num_samps - self._last_samps,
+        })
+        self._last_samps = num_samps
+        while self._next <= now:
+            self._next += self.interval
+
+
+def benchmark_rx_rate(usrp, rx_streamer, random, timer_elapsed_event, rx_statistics,
+                      stats_interval=None, stream_now=None, series_start=None):
+    """
+    Benchmark the receive chain
+
+    Unless an error occurs, the receive loop does not log or create any new
+    objects, so that multiple receive threads can run in parallel.
+    """
     # Make a receive buffer
     num_channels = rx_streamer.get_num_channels()
     max_samps_per_packet = rx_streamer.get_max_num_samps()
     # TODO: The C++ code uses rx_cpu type here. Do we want to use that to set dtype?
     recv_buffer = np.empty((num_channels, max_samps_per_packet), dtype=np.complex64)
     metadata = uhd.types.RXMetadata()
+    if stream_now is None:
+        stream_now = (num_channels == 1)
 
     # Craft and send the Stream Command
     stream_cmd = uhd.types.StreamCMD(uhd.types.StreamMode.start_cont)
-    stream_cmd.stream_now = (num_channels == 1)
+    stream_cmd.stream_now = stream_now
     stream_cmd.time_spec = uhd.types.TimeSpec(usrp.get_time_now().get_real_secs() + INIT_DELAY)
     rx_streamer.issue_stream_cmd(stream_cmd)
 
@@ -183,8 +229,10 @@ def benchmark_rx_rate(usrp, rx_streamer, random, timer_elapsed_event, rx_statist
     # On the first overflow, set had_an_overflow and record the time
     # On the next ERROR_CODE_NONE, calculate how long its been since the recorded time, and use the
     #   tick rate to estimate the number of dropped samples. Also, reset the tracking variables
+    # The time of the last overflow is stored as (full secs, frac secs), so we
+    # don't need to allocate TimeSpec objects.
     had_an_overflow = False
-    last_overflow = uhd.types.TimeSpec(0)
+    last_overflow = (0, 0.0)
     # Setup the statistic counters
     num_rx_samps = 0
     num_rx_dropped = 0
@@ -192,55 +240,73 @@ def benchmark_rx_rate(usrp, rx_streamer, random, timer_elapsed_event, rx_statist
     num_rx_seqerr = 0
     num_rx_timeouts = 0
     num_rx_late = 0
+    throughput = ThroughputSeries(stats_interval, series_start)
+
+    # Avoid repeated attribute lookups within the receive loop
+    recv = rx_streamer.recv
+    stop_requested = timer_elapsed_event.is_set
+    update_throughput = throughput.update
+    error_none = uhd.types.RXMetadataErrorCode.none
+    error_overflow = uhd.types.RXMetadataErrorCode.overflow
+    error_late = uhd.types.RXMetadataErrorCode.late
+    error_timeout = uhd.types.RXMetadataErrorCode.timeout
 
     rate = usrp.get_rx_rate()
     # Receive until we get the signal to stop
-    while not timer_elapsed_event.is_set():
+    while not stop_requested():
+        update_throughput(num_rx_samps)
         if random:
             stream_cmd.num_samps = np.random.randint(1, max_samps_per_packet+1, dtype=int)
             rx_streamer.issue_stream_cmd(stream_cmd)
         try:
-            num_rx_samps += rx_streamer.recv(recv_buffer, metadata) * num_channels
+            num_rx_samps += recv(recv_buffer, metadata) * num_channels
         except RuntimeError as ex:
             logger.error("Runtime error in receive: %s", ex)
             return
 
         # Handle the error codes
-        if metadata.error_code == uhd.types.RXMetadataErrorCode.none:
+        error_code = metadata.error_code
+        if error_code == error_none:
             # Reset the overflow flag
             if had_an_overflow:
                 had_an_overflow = False
-                num_rx_dropped += (metadata.time_spec - last_overflow).to_ticks(rate)
-        elif metadata.error_code == uhd.types.RXMetadataErrorCode.overflow:
+                time_spec = metadata.time_spec
+                num_rx_dropped += int(round(
+                    ((time_spec.get_full_secs() - last_overflow[0]) +
+                     (time_spec.get_frac_secs() - last_overflow[1])) * rate))
+        elif error_code == error_overflow:
             had_an_overflow = True
-            # Need to make sure that last_overflow is a new TimeSpec object, not
-            # a reference to metadata.time_spec, or it would not be useful
-            # further up.
-            last_overflow = uhd.types.TimeSpec(
-                metadata.time_spec.get_full_secs(),
-                metadata.time_spec.get_frac_secs())
+            time_spec = metadata.time_spec
+            last_overflow = (time_spec.get_full_secs(), time_spec.get_frac_secs())
             # If we had a sequence error, record it
             if metadata.out_of_sequence:
                 num_rx_seqerr += 1
             # Otherwise just count the overrun
             else:
                 num_rx_overruns += 1
-        elif metadata.error_code == uhd.types.RXMetadataErrorCode.late:
-            logger.warning("Receiver error: %s, restarting streaming...", metadata.strerror())
+        elif error_code == error_late:
+            if not num_rx_late:
+                logger.warning("Receiver error: %s, restarting streaming...", metadata.strerror())
             num_rx_late += 1
             # Radio core will be in the idle state. Issue stream command to restart streaming.
             stream_cmd.time_spec = uhd.types.TimeSpec(
                 usrp.get_time_now().get_real_secs() + INIT_DELAY)
-            stream_cmd.stream_now = (num_channels == 1)
+            stream_cmd.stream_now = stream_now
             rx_streamer.issue_stream_cmd(stream_cmd)
-        elif metadata.error_code == uhd.types.RXMetadataErrorCode.timeout:
-            logger.warning("Receiver error: %s, continuing...", metadata.strerror())
+        elif error_code == error_timeout:
+            if not num_rx_timeouts:
+                logger.warning("Receiver error: %s, continuing...", metadata.strerror())
             num_rx_timeouts += 1
         else:
             logger.error("Receiver error: %s", metadata.strerror())
             logger.error("Unexpected error on receive, continuing...")
 
+    if num_rx_late > 1 or num_rx_timeouts > 1:
+        logger.warning("Receiver had %d late commands and %d timeouts",
+                       num_rx_late, num_rx_timeouts)
     # Return the statistics to the main thread
+    throughput.flush(num_rx_samps)
+    rx_statistics["rx_time_series"] = throughput.series
     rx_statistics["num_rx_samps"] = num_rx_samps
     rx_statistics["num_rx_dropped"] = num_rx_dropped
     rx_statistics["num_rx_overruns"] = num_rx_overruns
@@ -251,11 +317,9 @@ def benchmark_rx_rate(usrp, rx_streamer, random, timer_elapsed_event, rx_statist
     rx_streamer.issue_stream_cmd(uhd.types.StreamCMD(uhd.types.StreamMode.stop_cont))
 
 
-def benchmark_tx_rate(usrp, tx_streamer, random, timer_elapsed_event, tx_statistics):
+def benchmark_tx_rate(usrp, tx_streamer, random, timer_elapsed_event, tx_statistics,
+                      stats_interval=None, series_start=None):
     """Benchmark the transmit chain"""
-    logger.info("Testing transmit rate %.3f Msps on %d channels",
-                 usrp.get_tx_rate() / 1e6, tx_streamer.get_num_channels())
-
     # Make a transmit buffer
     num_channels = tx_streamer.get_num_channels()
     max_samps_per_packet = tx_streamer.get_max_num_samps()
@@ -269,20 +333,27 @@ def benchmark_tx_rate(usrp, tx_streamer, random, timer_elapsed_event, tx_statist
     num_tx_samps = 0
     # TODO: The C++ has a single randomly sized packet sent here, then the thread returns
     num_timeouts_tx = 0
+    throughput = ThroughputSeries(stats_interval, series_start)
+
+    # Avoid repeated attribute lookups within the transmit loop
+    send = tx_streamer.send
+    stop_requested = timer_elapsed_event.is_set
+    update_throughput = throughput.update
     # Transmit until we get the signal to stop
     if random:
-        while not timer_elapsed_event.is_set():
+        while not stop_requested():
+            update_throughput(num_tx_samps)
             total_num_samps = np.random.randint(1, max_samps_per_packet + 1, dtype=int)
             num_acc_samps = 0
             while num_acc_samps < total_num_samps:
-                num_tx_samps += tx_streamer.send(
-                    transmit_buffer, metadata) * num_channels
+                num_tx_samps += send(transmit_buffer, metadata) * num_channels
                 num_acc_samps += min(total_num_samps - num_acc_samps,
-                                     tx_streamer.get_max_num_samps())
+                                     max_samps_per_packet)
     else:
-        while not timer_elapsed_event.is_set():
+        while not stop_requested():
+            update_throughput(num_tx_samps)
             try:
-                num_tx_samps_now = tx_streamer.send(transmit_buffer, metadata) * num_channels
+                num_tx_samps_now = send(transmit_buffer, metadata) * num_channels
                 num_tx_samps += num_tx_samps_now
                 if num_tx_samps_now == 0:
                     num_timeouts_tx += 1
@@ -294,11 +365,13 @@ def benchmark_tx_rate(usrp, tx_streamer, random, timer_elapsed_event, tx_statist
                 logger.error("Runtime error in transmit: %s", ex)
                 return
 
+    throughput.flush(num_tx_samps)
+    tx_statistics["tx_time_series"] = throughput.series
     tx_statistics["num_tx_samps"] = num_tx_samps
 
     # Send a mini EOB packet
     metadata.end_of_burst = True
-    tx_streamer.send(np.zeros((num_channels, 0), dtype=np.complex64), metadata)
+    send(np.zeros((num_channels, 0), dtype=np.complex64), metadata)
 
 
 def benchmark_tx_rate_async_helper(tx_streamer, timer_elapsed_event, tx_async_statistics):
@@ -336,11 +409,93 @@ def benchmark_tx_rate_async_helper(tx_streamer, timer_elapsed_event, tx_async_st
         tx_async_statistics["num_tx_timeouts"] = num_tx_timeouts
 
 
-def print_statistics(rx_statistics, tx_statistics, tx_async_statistics):
+def get_channel_groups(channels, channels_per_streamer=None):
+    """
+    Split the list of channels into one list per streamer. If
+    channels_per_streamer is None, all channels go into a single streamer.
+    """
+    if not channels_per_streamer:
+        return [channels] if channels else []
+    return [channels[i:i + channels_per_streamer]
+            for i in range(0, len(channels), channels_per_streamer)]
+
+
+def merge_time_series(series_list):
+    """
+    Add up the throughput time series of multiple streamers. All series must
+    have been recorded with the same interval and start time.
+    """
+    merged = []
+    for points in itertools.zip_longest(*series_list):
+        points = [point for point in points if point]
+        merged.append({
+            "time": max(point["time"] for point in points),
+            "num_samps": sum(point["num_samps"] for point in points),
+        })
+    return merged
+
+
+def aggregate_statistics(statistics, series_key):
+    """Add up the statistics dictionaries of multiple streamers"""
+    total = {}
+    for stats in statistics:
+        for key, value in stats.items():
+            if key != series_key:
+                total[key] = total.get(key, 0) + value
+    if series_key:
+        total[series_key] = merge_time_series(
+            [stats.get(series_key, []) for stats in statistics])
+    return total
+
+
+def get_results(usrp, rx_groups, tx_groups, duration,
+                rx_statistics, tx_statistics, tx_async_statistics):
+    """
+    Combine the statistics of all worker threads into a single, JSON-serializable
+    results dictionary
+
+    rx_statistics, tx_statistics and tx_async_statistics are lists with one
+    statistics dictionary per streamer, in the same order as rx_groups and
+    tx_groups. If there is more than one streamer, the per-streamer
+    statistics are also included in the results.
+    """
+    rx_total = aggregate_statistics(rx_statistics, "rx_time_series")
+    tx_total = aggregate_statistics(tx_statistics, "tx_time_series")
+    tx_async_total = aggregate_statistics(tx_async_statistics, None)
+    num_rx_channels = sum(len(group) for group in rx_groups)
+    num_tx_channels = sum(len(group) for group in tx_groups)
+    results = {
+        "rx_rate": usrp.get_rx_rate() if num_rx_channels else 0.0,
+        "tx_rate": usrp.get_tx_rate() if num_tx_channels else 0.0,
+        "num_rx_channels": num_rx_channels,
+        "num_tx_channels": num_tx_channels,
+        "duration": duration,
+        "num_rx_samps": rx_total.get("num_rx_samps", 0),
+        "num_rx_dropped": rx_total.get("num_rx_dropped", 0),
+        "num_rx_overruns": rx_total.get("num_rx_overruns", 0),
+        "num_tx_samps": tx_total.get("num_tx_samps", 0),
+        "num_tx_seqerr": tx_async_total.get("num_tx_seqerr", 0),
+        "num_rx_seqerr": rx_total.get("num_rx_seqerr", 0),
+        "num_tx_underrun": tx_async_total.get("num_tx_underrun", 0),
+        "num_rx_late": rx_total.get("num_rx_late", 0),
+        "num_tx_timeouts": tx_async_total.get("num_tx_timeouts", 0),
+        "num_rx_timeouts": rx_total.get("num_rx_timeouts", 0),
+        "rx_time_series": rx_total["rx_time_series"],
+        "tx_time_series": tx_total["tx_time_series"],
+    }
+    if len(rx_groups) > 1:
+        results["rx_streamers"] = [
+            dict(stats, channels=group) for group, stats in zip(rx_groups, rx_statistics)]
+    if len(tx_groups) > 1:
+        results["tx_streamers"] = [
+            dict(stats, channels=group, **async_stats)
+            for group, stats, async_stats in zip(tx_groups, tx_statistics, tx_async_statistics)]
+    return results
+
+
+def print_statistics(results):
     """Print TRX statistics in a formatted block"""
-    logger.debug("RX Statistics Dictionary: %s", rx_statistics)
-    logger.debug("TX Statistics Dictionary: %s", tx_statistics)
-    logger.debug("TX Async Statistics Dictionary: %s", tx_async_statistics)
+    logger.debug("Results Dictionary: %s", results)
     # Print the statistics
     statistics_msg = """Benchmark rate summary:
     Num received samples:     {}
@@ -353,33 +508,39 @@ def print_statistics(rx_statistics, tx_statistics, tx_async_statistics):
     Num late commands:        {}
     Num timeouts (Tx):        {}
     Num timeouts (Rx):        {}""".format(
-        rx_statistics.get("num_rx_samps", 0),
-        rx_statistics.get("num_rx_dropped", 0),
-        rx_statistics.get("num_rx_overruns", 0),
-        tx_statistics.get("num_tx_samps", 0),
-        tx_async_statistics.get("num_tx_seqerr", 0),
-        rx_statistics.get("num_rx_seqerr", 0),
-        tx_async_statistics.get("num_tx_underrun", 0),
-        rx_statistics.get("num_rx_late", 0),
-        tx_async_statistics.get("num_tx_timeouts", 0),
-        rx_statistics.get("num_rx_timeouts", 0))
+        results["num_rx_samps"],
+        results["num_rx_dropped"],
+        results["num_rx_overruns"],
+        results["num_tx_samps"],
+        results["num_tx_seqerr"],
+        results["num_rx_seqerr"],
+        results["num_tx_underrun"],
+        results["num_rx_late"],
+        results["num_tx_timeouts"],
+        results["num_rx_timeouts"])
     logger.info(statistics_msg)
 
 
-def main():
-    """Run the benchmarking tool"""
-    args = parse_args()
-    # Setup some argument parsing
-    if not (args.rx_rate or args.tx_rate):
-        logger.error("Please specify --rx_rate and/or --tx_rate")
-        return False
+def write_json(results, file_name):
+    """Write the results dictionary to file_name, or stdout if file_name is '-'"""
+    if file_name == "-":
+        json.dump(results, sys.stdout, indent=2)
+        sys.stdout.write("\n")
+    else:
+        with open(file_name, "w") as json_file:
+            json.dump(results, json_file, indent=2)
 
-    # Setup a usrp device
-    usrp = uhd.usrp.MultiUSRP(args.args)
-    if usrp.get_mboard_name() == "USRP1":
-        logger.warning(
-            "Benchmark results will be inaccurate on USRP1 due to insufficient features.")
 
+def run_benchmark(usrp, args):
+    """
+    Run a single benchmark on an existing MultiUSRP object.
+
+    args is a namespace as returned by parse_args(). The USRP object can be
+    reused for consecutive calls, which avoids reinitializing the device for
+    every run.
+
+    Returns the results dictionary (see get_results()), or None on failure.
+    """
     # Always select the subdevice first, the channel mapping affects the other settings
     if args.rx_subdev:
         usrp.set_rx_subdev_spec(uhd.usrp.SubdevSpec(args.rx_subdev))
@@ -391,18 +552,18 @@ def main():
     # Set the reference clock
     if args.ref and not setup_ref(usrp, args.ref, usrp.get_num_mboards()):
         # If we wanted to set a reference clock and it failed, return
-        return False
+        return None
 
     # Set the PPS source
     if args.pps and not setup_pps(usrp, args.pps, usrp.get_num_mboards()):
         # If we wanted to set a PPS source and it failed, return
-        return False
+        return None
     # At this point, we can assume our device has valid and locked clock and PPS
 
     rx_channels, tx_channels = check_channels(usrp, args)
     if not rx_channels and not tx_channels:
         # If the check returned two empty channel lists, that means something went wrong
-        return False
+        return None
     logger.info("Selected %s RX channels and %s TX channels",
                 rx_channels if rx_channels else "no",
                 tx_channels if tx_channels else "no")
@@ -417,69 +578,109 @@ def main():
     threads = []
     # Make a signal for the threads to stop running
     quit_event = threading.Event()
-    # Create a dictionary for the RX statistics
-    # Note: we're going to use this without locks, so don't access it from the main thread until
-    #       the worker has joined
-    rx_statistics = {}
-    # Spawn the receive test thread
+    # All throughput time series use the same start time, so they can be merged
+    series_start = time.monotonic()
+    # Create one dictionary of RX statistics per streamer
+    # Note: we're going to use these without locks, so don't access them from the main thread
+    #       until the workers have joined
+    rx_groups = get_channel_groups(rx_channels, args.multi_streamer)
+    rx_statistics = []
+    # Spawn the receive test threads
     if args.rx_rate:
         usrp.set_rx_rate(args.rx_rate)
-        st_args = uhd.usrp.StreamArgs(args.rx_cpu, args.rx_otw)
-        st_args.channels = rx_channels
-        st_args.args = uhd.types.DeviceAddr(args.rx_stream_args)
-        rx_streamer = usrp.get_rx_stream(st_args)
-        rx_thread = threading.Thread(target=benchmark_rx_rate,
-                                     args=(usrp, rx_streamer, args.random, quit_event,
-                                           rx_statistics))
-        threads.append(rx_thread)
-        rx_thread.start()
-        rx_thread.setName("bmark_rx_stream")
-
-    # Create a dictionary for the RX statistics
-    # Note: we're going to use this without locks, so don't access it from the main thread until
-    #       the worker has joined
-    tx_statistics = {}
-    tx_async_statistics = {}
-    # Spawn the transmit test thread
+        logger.info("Testing receive rate {:.3f} Msps on {:d} channels".format(
+            usrp.get_rx_rate()/1e6, len(rx_channels)))
+        for idx, group in enumerate(rx_groups):
+            st_args = uhd.usrp.StreamArgs(args.rx_cpu, args.rx_otw)
+            st_args.channels = group
+            st_args.args = uhd.types.DeviceAddr(args.rx_stream_args)
+            rx_streamer = usrp.get_rx_stream(st_args)
+            rx_statistics.append({})
+            rx_thread = threading.Thread(target=benchmark_rx_rate,
+                                         args=(usrp, rx_streamer, args.random, quit_event,
+                                               rx_statistics[-1], args.stats_interval,
+                                               len(rx_channels) == 1, series_start))
+            threads.append(rx_thread)
+            rx_thread.start()
+            rx_thread.setName("bmark_rx_stream" + (str(idx) if len(rx_groups) > 1 else ""))
+
+    # Create one dictionary of TX statistics per streamer
+    # Note: we're going to use these without locks, so don't access them from the main thread
+    #       until the workers have joined
+    tx_groups = get_channel_groups(tx_channels, args.multi_streamer)
+    tx_statistics = []
+    tx_async_statistics = []
+    # Spawn the transmit test threads
     if args.tx_rate:
         usrp.set_tx_rate(args.tx_rate)
-        st_args = uhd.usrp.StreamArgs(args.tx_cpu, args.tx_otw)
-        st_args.channels = tx_channels
-        st_args.args = uhd.types.DeviceAddr(args.tx_stream_args)
-        tx_streamer = usrp.get_tx_stream(st_args)
-        tx_thread = threading.Thread(target=benchmark_tx_rate,
-                                     args=(usrp, tx_streamer, args.random, quit_event,
-                                           tx_statistics))
-        threads.append(tx_thread)
-        tx_thread.start()
-        tx_thread.setName("bmark_tx_stream")
-
-        tx_async_thread = threading.Thread(target=benchmark_tx_rate_async_helper,
-                                           args=(tx_streamer, quit_event, tx_async_statistics))
-        threads.append(tx_async_thread)
-        tx_async_thread.start()
-        tx_async_thread.setName("bmark_tx_helper")
+        logger.info("Testing transmit rate %.3f Msps on %d channels",
+                    usrp.get_tx_rate() / 1e6, len(tx_channels))
+        for idx, group in enumerate(tx_groups):
+            suffix = str(idx) if len(tx_groups) > 1 else ""
+            st_args = uhd.usrp.StreamArgs(args.tx_cpu, args.tx_otw)
+            st_args.channels = group
+            st_args.args = uhd.types.DeviceAddr(args.tx_stream_args)
+            tx_streamer = usrp.get_tx_stream(st_args)
+            tx_statistics.append({})
+            tx_thread = threading.Thread(target=benchmark_tx_rate,
+                                         args=(usrp, tx_streamer, args.random, quit_event,
+                                               tx_statistics[-1], args.stats_interval,
+                                               series_start))
+            threads.append(tx_thread)
+            tx_thread.start()
+            tx_thread.setName("bmark_tx_stream" + suffix)
+
+            tx_async_statistics.append({})
+            tx_async_thread = threading.Thread(target=benchmark_tx_rate_async_helper,
+                                               args=(tx_streamer, quit_event,
+                                                     tx_async_statistics[-1]))
+            threads.append(tx_async_thread)
+            tx_async_thread.start()
+            tx_async_thread.setName("bmark_tx_helper" + suffix)
 
     # Sleep for the required duration
     # If we have a multichannel test, add some time for initialization
+    duration = args.duration
     if len(rx_channels) > 1 or len(tx_channels) > 1:
-        args.duration += INIT_DELAY
-    time.sleep(args.duration)
+        duration += INIT_DELAY
+    time.sleep(duration)
     # Interrupt and join the threads
     logger.debug("Sending signal to stop!")
     quit_event.set()
     for thr in threads:
         thr.join()
 
-    print_statistics(rx_statistics, tx_statistics, tx_async_statistics)
+    return get_results(usrp, rx_groups, tx_groups, args.duration,
+                       rx_statistics, tx_statistics, tx_async_statistics)
+
+
+def main():
+    """Run the benchmarking tool"""
+    args = parse_args()
+    # Setup some argument parsing
+    if not (args.rx_rate or args.tx_rate):
+        logger.error("Please specify --rx_rate and/or --tx_rate")
+        return False
+
+    # Setup a usrp device
+    usrp = uhd.usrp.MultiUSRP(args.args)
+    if usrp.get_mboard_name() == "USRP1":
+        logger.warning(
+            "Benchmark results will be inaccurate on USRP1 due to insufficient features.")
+
+    results = run_benchmark(usrp, args)
+    if results is None:
+        return False
+
+    print_statistics(results)
+    if args.json:
+        write_json(results, args.json)
 
     return True
 
 
 if __name__ == "__main__":
     # Setup the logger with our custom timestamp formatting
-    global logger
-    logger = logging.getLogger(__name__)
     logger.setLevel(logging.DEBUG)
     console = logging.StreamHandler()
     logger.addHandler(console)
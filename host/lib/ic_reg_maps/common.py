@@ -6,10 +6,22 @@
 #
 
 import re
+import os
 import sys
 import math
+import atexit
+import pickle
+import hashlib
+import argparse
+import runpy
+import tempfile
 from mako.template import Template
 
+# Environment variable to override the location of the generator cache
+CACHE_DIR_ENV_VAR = 'UHD_IC_REG_MAPS_CACHE_DIR'
+# Name of the cache directory, if it is placed next to the output files
+CACHE_DIR_NAME = '.ic_reg_maps_cache'
+
 COMMON_TMPL = """<% import time %>\
 /***********************************************************************
  * This file was generated by ${file} on ${time.strftime("%c")}
@@ -114,8 +126,48 @@ COMMON_PY_TMPL = """<% import time %>\
 # This file was generated by ${file} on ${time.strftime("%c")}
 <%text>##########################################################################</%text>
 
+import copy
 from enum import Enum
 
+## List type for register arrays, which reports element changes to its owner.
+## Only assignments (regs.field = [...], regs.field[i] = x) are tracked, so
+## any other in-place change (append(), sort(), del, +=, ...) is rejected.
+class _${name}_array(list):
+    def __init__(self, owner, name, values):
+        list.__init__(self, values)
+        self._owner = owner
+        self._name = name
+
+    def __setitem__(self, index, value):
+        indices = range(*index.indices(len(self))) \
+            if isinstance(index, slice) else [index % len(self)]
+        if isinstance(index, slice):
+            value = list(value)
+            if len(value) != len(indices):
+                self._untracked()
+        if self._owner._changes is not None:
+            for i in indices:
+                self._owner._changes.setdefault((self._name, i), list.__getitem__(self, i))
+        list.__setitem__(self, index, value)
+
+    def _untracked(self, *args, **kwargs):
+        raise TypeError("Register array {} has a fixed length, and can only "
+                        "be changed by assigning elements".format(self._name))
+
+    append = extend = insert = pop = remove = clear = sort = reverse = _untracked
+    __delitem__ = __iadd__ = __imul__ = _untracked
+
+    ## A shallow copy is a snapshot of the values, a deep copy (or pickle)
+    ## belongs to the copy of the owner
+    def __copy__(self):
+        return list(self)
+
+    def __deepcopy__(self, memo):
+        return type(self)(copy.deepcopy(self._owner, memo), self._name, list(self))
+
+    def __reduce__(self):
+        return (type(self), (self._owner, self._name, list(self)))
+
 ## Create a class for the register map
 class ${name}_t:
     ## Create an enum for each register which has defined values
@@ -128,9 +180,16 @@ class ${name}_t:
     % endif
     %endfor
 
+    ## Address, and address step size (for arrays) of each register
+    _reg_addrs = {
+        % for reg in regs:
+        '${reg.get_name()}': (${reg.get_addr()}, ${reg.get_addr_step_size() if reg.is_array else None}),
+        % endfor
+    }
+
     def __init__(self):
         ## Assign each register to its default value
-        self._state = None
+        self._changes = None
         % for reg in regs:
             % if reg.get_enums():
                 % if reg.is_array:
@@ -152,34 +211,66 @@ class ${name}_t:
 
     ${body}
 
+    def __setattr__(self, name, value):
+        ## Track the value every register had when the state was saved. Only
+        ## registers which were assigned since need to be compared later.
+        reg_addr = self._reg_addrs.get(name)
+        if reg_addr is not None:
+            old_value = self.__dict__.get(name)
+            if reg_addr[1] is not None:
+                if self._changes is not None:
+                    for index, old_elem in enumerate(old_value):
+                        self._changes.setdefault((name, index), old_elem)
+                value = _${name}_array(self, name, value)
+            elif self._changes is not None:
+                self._changes.setdefault((name, None), old_value)
+        object.__setattr__(self, name, value)
+
+    def _get_change_addr(self, name, index):
+        addr, step = self._reg_addrs[name]
+        return addr if index is None else addr + index * step
+
     def save_state(self):
-        if self._state is None:
-            self._state = ${name}_t()
-        % for reg in regs:
-            % if reg.is_array:
-        self._state.${reg.get_name()} = self.${reg.get_name()}.copy()
-            % else:
-        self._state.${reg.get_name()} = self.${reg.get_name()}
-            % endif
-        % endfor
+        ## Changes are tracked relative to the current state from here on
+        self._changes = {}
 
     def get_changed_addrs(self):
-        if self._state is None:
+        if self._changes is None:
             raise RuntimeError("No saved state")
-        #check each register for changes
+        #check each assigned register for changes
         addrs = set()
-        % for reg in regs:
-        % if reg.is_array:
-        for index, value in enumerate(self.${reg.get_name()}):
-            if self._state.${reg.get_name()}[index] != value:
-                addrs.add(${reg.get_addr()} + index * ${reg.get_addr_step_size()})
-        % else:
-        if self._state.${reg.get_name()} != self.${reg.get_name()}:
-            addrs.add(${reg.get_addr()})
-        % endif
-        % endfor
+        for (name, index), saved_value in self._changes.items():
+            value = getattr(self, name)
+            if index is not None:
+                value = value[index] if index < len(value) else None
+            if value != saved_value:
+                addrs.add(self._get_change_addr(name, index))
         return addrs
 
+    def clear_changed_addrs(self, addrs):
+        ## Mark the given addresses as unchanged (e.g., because they were
+        ## written to the device), without touching any other changes.
+        if self._changes is None:
+            raise RuntimeError("No saved state")
+        addrs = set(addrs)
+        for key in [key for key in self._changes if self._get_change_addr(*key) in addrs]:
+            del self._changes[key]
+
+    def get_addr_runs(self, addrs=None, addr_step=1):
+        ## Coalesce addresses (default: all changed addresses) into runs of
+        ## contiguous addresses, for burst writes. Returns a sorted list of
+        ## (start address, [register values]) tuples. The values are packed
+        ## using get_reg(), which must be provided by the register map body.
+        if addrs is None:
+            addrs = self.get_changed_addrs()
+        runs = []
+        for addr in sorted(addrs):
+            if runs and addr == runs[-1][0] + len(runs[-1][1]) * addr_step:
+                runs[-1][1].append(self.get_reg(addr))
+            else:
+                runs.append((addr, [self.get_reg(addr)]))
+        return runs
+
     % for mreg in mregs:
     def get_${mreg.get_name()}(self):
         return ( <% shift = 0 %>
@@ -201,8 +292,143 @@ class ${name}_t:
     %endfor
 """
 
-def parse_tmpl(_tmpl_text, **kwargs):
-    return Template(_tmpl_text).render(**kwargs)
+########################################################################
+# Caching
+#
+# Compiled templates and parsed register tables are cached in memory (for
+# batch generation) and on disk, keyed by the hash of their source text.
+# Outputs are only written if their contents changed (ignoring the
+# generation timestamp), so unchanged headers don't trigger rebuilds.
+########################################################################
+_cache_dir = None
+_templates = {}
+_pending_outputs = {}
+_generate_failed = False
+_flush_registered = False
+
+def _hash(*texts):
+    """
+    Return the SHA256 hex digest of a list of strings
+    """
+    digest = hashlib.sha256()
+    for text in texts:
+        digest.update(text.encode('utf-8'))
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+def _get_source_hash():
+    """
+    Return the hash of this file. It's part of all cache keys, so changes to
+    the parser or templates invalidate the cache.
+    """
+    with open(os.path.abspath(__file__.replace('.pyc', '.py')), 'r') as f:
+        return _hash(f.read())
+
+def set_cache_dir(cache_dir):
+    """
+    Set the directory in which compiled templates and parsed register tables
+    are stored. If it's never set, the directory is taken from the
+    environment variable UHD_IC_REG_MAPS_CACHE_DIR, or placed next to the
+    output file. An empty string disables the disk cache.
+    """
+    global _cache_dir
+    _cache_dir = cache_dir
+
+def get_cache_dir(out_file):
+    """
+    Return the cache directory to use when generating out_file, or None
+    """
+    cache_dir = _cache_dir
+    if cache_dir is None:
+        cache_dir = os.environ.get(
+            CACHE_DIR_ENV_VAR,
+            os.path.join(os.path.dirname(os.path.abspath(out_file)), CACHE_DIR_NAME))
+    if not cache_dir:
+        return None
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+    except OSError:
+        return None
+    return cache_dir
+
+def _write_cache_file(path, data):
+    """
+    Atomically write data (bytes) to path. Several generators may share a
+    cache directory and run at the same time, so every writer uses its own
+    temporary file.
+    """
+    fd, tmp_file = tempfile.mkstemp(dir=os.path.dirname(path))
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_file, path)
+    except OSError:
+        try:
+            os.unlink(tmp_file)
+        except OSError:
+            pass
+        raise
+
+def get_template(tmpl_text, cache_dir=None):
+    """
+    Return the compiled Mako template for tmpl_text. If a cache directory is
+    given, Mako stores the compiled template module there.
+    """
+    key = _hash(tmpl_text)
+    if key not in _templates:
+        if cache_dir:
+            # Mako only caches templates that are loaded from a file
+            tmpl_file = os.path.join(cache_dir, 'tmpl_{}.mako'.format(key))
+            try:
+                if not os.path.exists(tmpl_file):
+                    _write_cache_file(tmpl_file, tmpl_text.encode('utf-8'))
+                _templates[key] = Template(filename=tmpl_file, module_directory=cache_dir)
+            except OSError:
+                _templates[key] = Template(tmpl_text)
+        else:
+            _templates[key] = Template(tmpl_text)
+    return _templates[key]
+
+def parse_tmpl(_tmpl_text, _cache_dir=None, **kwargs):
+    return get_template(_tmpl_text, _cache_dir).render(**kwargs)
+
+def _normalize_output(code):
+    """
+    Remove the generation timestamp, which is the only part of the output
+    that changes without the inputs changing
+    """
+    return re.sub(r'This file was generated by (.*) on .*', r'\1', code)
+
+def _write_if_changed(out_file, code):
+    """
+    Write code to out_file, unless out_file already contains the same code
+    """
+    try:
+        with open(out_file, 'r') as f:
+            if _normalize_output(f.read()) == _normalize_output(code):
+                return False
+    except OSError:
+        pass
+    with open(out_file, 'w') as f:
+        f.write(code)
+    return True
+
+def flush_outputs():
+    """
+    Write all generated outputs to disk. Outputs are collected until the
+    generator script is done, because a script can append multiple register
+    maps to the same file.
+    """
+    while _pending_outputs:
+        out_file, code = _pending_outputs.popitem()
+        _write_if_changed(out_file, code)
+
+def _flush_outputs_at_exit():
+    """
+    Write outputs when a generator script exits, unless generation failed
+    """
+    if not _generate_failed:
+        flush_outputs()
 
 def to_num(arg):
     """
@@ -329,7 +555,37 @@ class mreg:
     def get_type(self):
         return 'uint%d_t'%max(2**math.ceil(math.log(self.get_bit_width(), 2)), 8)
 
+def parse_regs(regs_tmpl, cache_dir=None):
+    """
+    Evaluate the regs template and parse each line into a register. Returns a
+    tuple (regs, mregs). Results are cached on disk, if a cache directory is
+    given.
+    """
+    cache_file = None
+    if cache_dir:
+        cache_file = os.path.join(
+            cache_dir, 'regs_{}.pickle'.format(_hash(_get_source_hash(), regs_tmpl)))
+        try:
+            with open(cache_file, 'rb') as f:
+                return pickle.load(f)
+        except Exception:
+            pass
+    regs = list()
+    mregs = list()
+    for entry in parse_tmpl(regs_tmpl, cache_dir).splitlines():
+        if entry.startswith('~'):
+            mregs.append(mreg(entry, regs))
+        else:
+            regs.append(reg(entry))
+    if cache_file:
+        try:
+            _write_cache_file(cache_file, pickle.dumps((regs, mregs)))
+        except OSError:
+            pass
+    return regs, mregs
+
 def generate(name, regs_tmpl, body_tmpl='', py_body_tmpl='', file=__file__, append=False):
+    global _generate_failed, _flush_registered
     # determine if the destination file is a Python or C++ header file
     out_file = sys.argv[1]
     if out_file.endswith('.py'): # Write a Python file
@@ -338,28 +594,87 @@ def generate(name, regs_tmpl, body_tmpl='', py_body_tmpl='', file=__file__, appe
     else: # default to C++ Header
         template = COMMON_TMPL
         body_template = body_tmpl
+    cache_dir = get_cache_dir(out_file)
 
-    #evaluate the regs template and parse each line into a register
-    regs = list()
-    mregs = list()
-    for entry in parse_tmpl(regs_tmpl).splitlines():
-        if entry.startswith('~'):
-            mregs.append(mreg(entry, regs))
-        else:
-            regs.append(reg(entry))
+    try:
+        regs, mregs = parse_regs(regs_tmpl, cache_dir)
 
-    #evaluate the body template with the list of registers
-    body = '\n    '.join(parse_tmpl(body_template, regs=regs).splitlines())
+        #evaluate the body template with the list of registers
+        body = '\n    '.join(parse_tmpl(body_template, cache_dir, regs=regs).splitlines())
 
-    #evaluate the code template with the parsed registers and arguments
-    code = parse_tmpl(template,
-        name=name,
-        regs=regs,
-        mregs=mregs,
-        body=body,
-        file=file,
-    )
+        #evaluate the code template with the parsed registers and arguments
+        code = parse_tmpl(template, cache_dir,
+            name=name,
+            regs=regs,
+            mregs=mregs,
+            body=body,
+            file=file,
+        )
+    except:
+        _generate_failed = True
+        raise
+
+    #the generated code goes to the file specified by argv1. It is written
+    #when the generator script is done (see flush_outputs()).
+    if not _flush_registered:
+        atexit.register(_flush_outputs_at_exit)
+        _flush_registered = True
+    if append:
+        if out_file not in _pending_outputs:
+            with open(out_file, 'r') as f:
+                _pending_outputs[out_file] = f.read()
+        _pending_outputs[out_file] += code
+    else:
+        _pending_outputs[out_file] = code
+
+def generate_batch(jobs):
+    """
+    Run multiple generator scripts in this process, so the templates and the
+    register parser are only loaded once.
 
-    #write the generated code to file specified by argv1
-    with open(out_file, 'a' if append else 'w') as f:
-        f.write(code)
+    :param jobs: list of (generator script, output file) tuples
+    :return: list of (generator script, output file, exception) tuples for
+             all jobs that failed
+    """
+    global _generate_failed
+    failed = []
+    argv = sys.argv
+    for pyfile, out_file in jobs:
+        sys.argv = [pyfile, out_file]
+        try:
+            runpy.run_path(pyfile, run_name='__main__')
+            flush_outputs()
+        except Exception as ex:
+            failed.append((pyfile, out_file, ex))
+            _pending_outputs.clear()
+        finally:
+            _generate_failed = False
+            sys.argv = argv
+    return failed
+
+def main():
+    """
+    Batch generator entry point. Usage:
+
+    common.py [--cache-dir DIR] gen_foo_regs.py:foo_regs.hpp gen_bar_regs.py:bar_regs.py ...
+    """
+    parser = argparse.ArgumentParser(
+        description="Generate multiple register maps in a single process")
+    parser.add_argument('--cache-dir', default=None,
+                        help="Directory for compiled templates and parsed register "
+                             "tables. Pass an empty string to disable the cache.")
+    parser.add_argument('jobs', nargs='+', metavar='PYFILE:OUTFILE',
+                        help="Generator script and output file")
+    args = parser.parse_args()
+    set_cache_dir(args.cache_dir)
+    failed = generate_batch([job.rsplit(':', 1) for job in args.jobs])
+    for pyfile, out_file, ex in failed:
+        print("Error generating {} from {}: {}".format(out_file, pyfile, ex), file=sys.stderr)
+    return 1 if failed else 0
+
+if __name__ == '__main__':
+    # The generator scripts import this file as 'common'. Make sure they use
+    # the same module (and caches) when running in batch mode.
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    import common
+    sys.exit(common.main())
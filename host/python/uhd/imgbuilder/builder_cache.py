@@ -0,0 +1,202 @@
+"""
+Copyright 2021 Ettus Research, A National Instrument Brand
+
+SPDX-License-Identifier: GPL-3.0-or-later
+
+RFNoC image builder: Persistent cache for parsed configuration files, schema
+validation results and generated output files.
+
+Entries are keyed by content hashes, so a stale entry simply causes the work
+to be redone. File hashes are memoized by path, modification time and size so
+unchanged files don't even need to be read.
+"""
+
+import hashlib
+import logging
+import os
+import pickle
+
+# Bump this when the layout of the cache data changes
+CACHE_VERSION = 1
+
+CACHE_FILENAME = "rfnoc_image_builder.cache"
+
+
+def get_default_cache_path():
+    """
+    Return the default location of the cache file. This follows the XDG base
+    directory specification, i.e., $XDG_CACHE_HOME/uhd or ~/.cache/uhd.
+    """
+    cache_home = os.environ.get(
+        'XDG_CACHE_HOME', os.path.join(os.path.expanduser('~'), '.cache'))
+    return os.path.join(cache_home, 'uhd', CACHE_FILENAME)
+
+
+def hash_file(filename):
+    """
+    Return the SHA256 hex digest of a file's contents
+    """
+    digest = hashlib.sha256()
+    with open(filename, 'rb') as stream:
+        for chunk in iter(lambda: stream.read(1 << 16), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def hash_values(*values):
+    """
+    Return the SHA256 hex digest of a sequence of strings
+    """
+    digest = hashlib.sha256()
+    for value in values:
+        digest.update(str(value).encode('utf-8'))
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+
+class BuilderCache:
+    """
+    Cache for the RFNoC image builder.
+
+    The cache stores four kinds of entries:
+    - files: Maps absolute paths to (mtime, size, digest), to avoid re-hashing
+      unchanged files
+    - parsed: Maps file content digests (plus a parser tag) to the pickled
+      result of parsing that file
+    - validated: Set of (config digest, schema digest) pairs that were
+      successfully validated
+    - outputs: Maps absolute paths of generated files to the digest of the
+      inputs they were generated from, and their own digest
+
+    If enabled is False, the cache behaves as if it were always empty, and
+    nothing is written to disk.
+    """
+    def __init__(self, filename=None, enabled=True):
+        self.filename = filename or get_default_cache_path()
+        self.enabled = enabled
+        self._dirty = False
+        self._data = self._empty()
+        if enabled:
+            self._load()
+
+    @staticmethod
+    def _empty():
+        return {
+            'version': CACHE_VERSION,
+            'files': {},
+            'parsed': {},
+            'validated': set(),
+            'outputs': {},
+        }
+
+    def _load(self):
+        """
+        Load the cache from disk. Any failure results in an empty cache.
+        """
+        try:
+            with open(self.filename, 'rb') as stream:
+                data = pickle.load(stream)
+            if data.get('version') == CACHE_VERSION:
+                self._data = data
+                logging.debug("Loaded image builder cache from %s",
+                              self.filename)
+        except FileNotFoundError:
+            pass
+        except Exception as ex: # pylint: disable=broad-except
+            logging.debug("Ignoring unreadable image builder cache %s (%s)",
+                          self.filename, str(ex))
+
+    def save(self):
+        """
+        Write the cache back to disk, if anything changed. Failure to write the
+        cache is not an error.
+        """
+        if not self.enabled or not self._dirty:
+            return
+        tmp_filename = self.filename + '.tmp'
+        try:
+            os.makedirs(os.path.dirname(self.filename), exist_ok=True)
+            with open(tmp_filename, 'wb') as stream:
+                pickle.dump(self._data, stream)
+            os.replace(tmp_filename, self.filename)
+            self._dirty = False
+        except OSError as ex:
+            logging.debug("Could not write image builder cache %s (%s)",
+                          self.filename, str(ex))
+
+    def file_digest(self, filename):
+        """
+        Return the SHA256 hex digest of filename. The digest is only
+        recomputed if the modification time or size of the file changed.
+        """
+        stat = os.stat(filename)
+        key = os.path.abspath(filename)
+        entry = self._data['files'].get(key)
+        if entry and entry[0] == stat.st_mtime_ns and entry[1] == stat.st_size:
+            return entry[2]
+        digest = hash_file(filename)
+        if self.enabled:
+            self._data['files'][key] = (stat.st_mtime_ns, stat.st_size, digest)
+            self._dirty = True
+        return digest
+
+    def get_parsed(self, tag, digest):
+        """
+        Return a fresh copy of the object stored for the file contents
+        identified by digest, or None if there is none. tag identifies the
+        parser used to create the object.
+        """
+        entry = self._data['parsed'].get((tag, digest))
+        if entry is None:
+            return None
+        return pickle.loads(entry)
+
+    def set_parsed(self, tag, digest, obj):
+        """
+        Store the parsed representation of a file. The object is pickled
+        immediately, so later modifications to obj are not reflected in the
+        cache.
+        """
+        if not self.enabled:
+            return
+        self._data['parsed'][(tag, digest)] = pickle.dumps(obj)
+        self._dirty = True
+
+    def is_validated(self, config_digest, schema_digest):
+        """
+        Return True if a config with this digest was already successfully
+        validated against a schema with that digest.
+        """
+        return (config_digest, schema_digest) in self._data['validated']
+
+    def set_validated(self, config_digest, schema_digest):
+        """
+        Mark a config/schema pair as successfully validated
+        """
+        if not self.enabled:
+            return
+        self._data['validated'].add((config_digest, schema_digest))
+        self._dirty = True
+
+    def is_output_current(self, filename, inputs_digest):
+        """
+        Return True if filename exists, was generated from inputs with the
+        given digest, and was not modified since.
+        """
+        entry = self._data['outputs'].get(os.path.abspath(filename))
+        if entry is None or entry[0] != inputs_digest:
+            return False
+        try:
+            return self.file_digest(filename) == entry[1]
+        except OSError:
+            return False
+
+    def set_output(self, filename, inputs_digest):
+        """
+        Record that filename was generated from inputs with the given digest
+        """
+        if not self.enabled:
+            return
+        self._data['outputs'][os.path.abspath(filename)] = \
+            (inputs_digest, self.file_digest(filename))
+        self._dirty = True
@@ -9,7 +9,10 @@ description or a GRC file into an rfnoc_image_core.v file.
 
 from collections import deque
 from collections import OrderedDict
+from concurrent import futures
 
+import functools
+import json
 import logging
 import os
 import re
@@ -20,6 +23,8 @@ import mako.template
 from mako import exceptions
 from ruamel import yaml
 
+from .builder_cache import BuilderCache, hash_values
+
 ### DATA ######################################################################
 # Directory under the FPGA repo where the device directories are
 USRP3_TOP_DIR = os.path.join('usrp3', 'top')
@@ -29,6 +34,12 @@ USRP3_LIB_RFNOC_DIR = os.path.join('usrp3', 'lib', 'rfnoc')
 # Subdirectory for the core YAML files
 RFNOC_CORE_DIR = os.path.join('rfnoc', 'core')
 
+# Directory holding the mako templates for the generated files
+TEMPLATE_DIR = os.path.join(os.path.dirname(__file__), "templates")
+
+# Minimum number of uncached YAML files before they get parsed in parallel
+PARALLEL_LOAD_THRESHOLD = 16
+
 # Path to the system's bash executable
 BASH_EXECUTABLE = '/bin/bash' # FIXME this should come from somewhere
 
@@ -427,7 +438,48 @@ class ImageBuilderConfig:
                 logging.info("        %s", (io_port,))
             sys.exit(1)
 
-def load_config(filename):
+def load_yaml_file(filename):
+    """
+    Load a YAML file into nested OrderedDicts.
+    :param filename: YAML file to load
+    :return: the parsed file contents
+    """
+    with open(filename) as stream:
+        return ordered_load(stream)
+
+
+def load_yaml_files(filenames, cache):
+    """
+    Load a list of YAML files, using cached parse results for files that have
+    not changed. If there are many files that need to be parsed, they are
+    parsed in parallel.
+    :param filenames: list of YAML files to load
+    :param cache: BuilderCache holding previous parse results
+    :return: list of parsed file contents, in the same order as filenames
+    """
+    digests = [cache.file_digest(filename) for filename in filenames]
+    results = [cache.get_parsed('ordered_load', digest) for digest in digests]
+    misses = [idx for idx, result in enumerate(results) if result is None]
+    logging.debug("Loading %d YAML files (%d cached).",
+                  len(filenames), len(filenames) - len(misses))
+    loaded = None
+    if len(misses) >= PARALLEL_LOAD_THRESHOLD:
+        try:
+            with futures.ProcessPoolExecutor() as executor:
+                loaded = list(executor.map(
+                    load_yaml_file, [filenames[idx] for idx in misses]))
+        except (OSError, futures.process.BrokenProcessPool) as ex:
+            logging.debug("Parallel YAML loading failed (%s), falling back "
+                          "to sequential loading.", str(ex))
+    if loaded is None:
+        loaded = [load_yaml_file(filenames[idx]) for idx in misses]
+    for idx, result in zip(misses, loaded):
+        cache.set_parsed('ordered_load', digests[idx], result)
+        results[idx] = result
+    return results
+
+
+def load_config(filename, cache=None):
     """
     Loads yml configuration from filename.
 
@@ -435,20 +487,40 @@ def load_config(filename):
     This method logs error and exits on IO failure
 
     :param filename: yml configuration to load
+    :param cache: optional BuilderCache holding previous parse results
     :return: IO signatures as dictionary
     """
     dirname, basename = os.path.split(filename)
     try:
-        with open(filename) as stream:
-            logging.info(
-                "Using %s from %s.", basename, os.path.normpath(dirname))
-            config = ordered_load(stream)
-        return config
+        logging.info(
+            "Using %s from %s.", basename, os.path.normpath(dirname))
+        if cache is None:
+            return load_yaml_file(filename)
+        return load_yaml_files([filename], cache)[0]
     except IOError:
         logging.error("%s misses %s", os.path.normpath(dirname), basename)
         sys.exit(1)
 
-def device_config(config_path, device):
+def device_config_file(config_path, device):
+    """
+    Return the path to the bsp.yml of a device
+    :param config_path: location of core configuration files
+    :param device: device to build for
+    :return: path to the device configuration file
+    """
+    return os.path.join(config_path, "%s_bsp.yml" % device.lower())
+
+
+def io_signatures_file(config_path):
+    """
+    Return the path to io_signatures.yml
+    :param config_path: location of core configuration files
+    :return: path to the IO signatures file
+    """
+    return os.path.join(config_path, "io_signatures.yml")
+
+
+def device_config(config_path, device, cache=None):
     """
     Load device config from bsp.yml
 
@@ -456,19 +528,21 @@ def device_config(config_path, device):
 
     :param config_path: location of core configuration files
     :param device: device to build for
+    :param cache: optional BuilderCache holding previous parse results
     :return: device configuration as dictionary
     """
-    return load_config(os.path.join(config_path, "%s_bsp.yml" % device.lower()))
+    return load_config(device_config_file(config_path, device), cache)
 
 
-def io_signatures(config_path):
+def io_signatures(config_path, cache=None):
     """
     Load IO signatures from io_signatures.yml
 
     :param config_path: location of core configuration files
+    :param cache: optional BuilderCache holding previous parse results
     :return: IO signatures as dictionary
     """
-    return load_config(os.path.join(config_path, "io_signatures.yml"))
+    return load_config(io_signatures_file(config_path), cache)
 
 
 def read_grc_block_configs(path):
@@ -587,32 +661,58 @@ def collect_module_paths(config_path, include_paths):
     return result
 
 
-def read_block_descriptions(signatures, *paths):
+def find_block_description_files(*paths):
     """
-    Recursive search all pathes for block definitions.
-    :param signatures: signature passed to IOConfig initialization
+    Recursive search all pathes for YAML files that may contain block
+    definitions.
     :param paths: paths to be searched
-    :return: dictionary of noc blocks. Key is filename of the block, value
-             is an IOConfig object
+    :return: list of YAML file paths
     """
-    blocks = OrderedDict()
+    result = []
     for path in paths:
-        for root, dirs, files, in os.walk(path):
+        for root, _, files, in os.walk(path):
             for filename in files:
                 if re.match(r".*\.yml$", filename):
-                    with open(os.path.join(root, filename)) as stream:
-                        block = ordered_load(stream)
-                        if "schema" in block and \
-                                block["schema"] == "rfnoc_modtool_args":
-                            logging.info("Adding block description from "
-                                         "%s (%s).", filename, os.path.normpath(root))
-                            blocks[filename] = IOConfig(block, signatures)
-            for dirname in dirs:
-                blocks.update(read_block_descriptions(
-                    os.path.join(root, dirname)))
+                    result.append(os.path.join(root, filename))
+    return result
+
+
+def load_block_descriptions(signatures, block_files, cache=None):
+    """
+    Load block definitions from a list of YAML files. Files that are not
+    block definitions are skipped.
+    :param signatures: signature passed to IOConfig initialization
+    :param block_files: list of YAML file paths
+    :param cache: optional BuilderCache holding previous parse results
+    :return: dictionary of noc blocks. Key is filename of the block, value
+             is an IOConfig object
+    """
+    if cache is None:
+        cache = BuilderCache(enabled=False)
+    blocks = OrderedDict()
+    for block_file, block in zip(block_files, load_yaml_files(block_files, cache)):
+        if "schema" in block and \
+                block["schema"] == "rfnoc_modtool_args":
+            root, filename = os.path.split(block_file)
+            logging.info("Adding block description from "
+                         "%s (%s).", filename, os.path.normpath(root))
+            blocks[filename] = IOConfig(block, signatures)
     return blocks
 
 
+def read_block_descriptions(signatures, *paths, cache=None):
+    """
+    Recursive search all pathes for block definitions.
+    :param signatures: signature passed to IOConfig initialization
+    :param paths: paths to be searched
+    :param cache: optional BuilderCache holding previous parse results
+    :return: dictionary of noc blocks. Key is filename of the block, value
+             is an IOConfig object
+    """
+    return load_block_descriptions(
+        signatures, find_block_description_files(*paths), cache)
+
+
 def write_edges(config, destination):
     """
     Write edges description files. The file is a simple text file. Each line
@@ -671,6 +771,35 @@ def write_edges(config, destination):
                           ((dst[0] << 6) | dst[1])))
 
 
+@functools.lru_cache(maxsize=None)
+def get_template(tpl_name):
+    """
+    Return a compiled mako template from the local template folder. Templates
+    are only compiled once per process.
+    :param tpl_name: Filename of the template, relative to the template folder
+    :return: mako Template object
+    """
+    lookup = mako.lookup.TemplateLookup(directories=[TEMPLATE_DIR])
+    return mako.template.Template(
+        filename=os.path.join(TEMPLATE_DIR, tpl_name),
+        lookup=lookup,
+        strict_undefined=True)
+
+
+def get_generator_digest(cache):
+    """
+    Return a digest over the image builder code and all templates. Any change
+    to these invalidates previously generated files.
+    :param cache: BuilderCache used to hash the files
+    :return: hex digest
+    """
+    files = [__file__]
+    for root, _, filenames in os.walk(TEMPLATE_DIR):
+        files.extend(os.path.join(root, filename)
+                     for filename in sorted(filenames))
+    return hash_values(*(cache.file_digest(filename) for filename in files))
+
+
 def write_verilog(config, destination, source, source_hash):
     """
     Generates rfnoc_image_core.v file for the device.
@@ -686,13 +815,7 @@ def write_verilog(config, destination, source, source_hash):
     :param source_hash: Source file hash value
     :return: None
     """
-    template_dir = os.path.join(os.path.dirname(__file__), "templates")
-    lookup = mako.lookup.TemplateLookup(directories=[template_dir])
-    tpl_filename = os.path.join(template_dir, "rfnoc_image_core.v.mako")
-    tpl = mako.template.Template(
-        filename=tpl_filename,
-        lookup=lookup,
-        strict_undefined=True)
+    tpl = get_template("rfnoc_image_core.v.mako")
 
     try:
         block = tpl.render(**{
@@ -718,13 +841,7 @@ def write_verilog_header(config, destination, source, source_hash):
     :param source_hash: Source file hash value
     :return: None
     """
-    template_dir = os.path.join(os.path.dirname(__file__), "templates")
-    lookup = mako.lookup.TemplateLookup(directories=[template_dir])
-    tpl_filename = os.path.join(template_dir, "rfnoc_image_core.vh.mako")
-    tpl = mako.template.Template(
-        filename=tpl_filename,
-        lookup=lookup,
-        strict_undefined=True)
+    tpl = get_template("rfnoc_image_core.vh.mako")
 
     try:
         block = tpl.render(**{
@@ -893,6 +1010,7 @@ def build_image(config, fpga_path, config_path, device, **args):
                    clean_all: passed to Makefile
                    GUI: passed to Makefile
                    include_paths: Paths to additional blocks
+                   cache: BuilderCache to speed up repeated runs
     :return: Exit result of build process or 0 if generate-only is given.
     """
     logging.info("Selected device %s", device)
@@ -910,30 +1028,54 @@ def build_image(config, fpga_path, config_path, device, **args):
     logging.debug("Image core header output file: %s", image_core_header_path)
     logging.debug("Edge output file: %s", edge_file)
 
+    cache = args.get('cache') or BuilderCache(enabled=False)
     core_config_path = get_core_config_path(config_path)
-    signatures_conf = io_signatures(core_config_path)
-    device_conf = IOConfig(device_config(core_config_path, device),
+    signatures_conf = io_signatures(core_config_path, cache)
+    device_conf = IOConfig(device_config(core_config_path, device, cache),
                            signatures_conf)
 
     block_paths = collect_module_paths(config_path, args.get('include_paths', []))
     logging.debug("Looking for block descriptors in:")
     for path in block_paths:
         logging.debug("    %s", os.path.normpath(path))
-    blocks = read_block_descriptions(signatures_conf, *block_paths)
+    block_files = find_block_description_files(*block_paths)
+    blocks = load_block_descriptions(signatures_conf, block_files, cache)
 
     builder_conf = ImageBuilderConfig(config, blocks, device_conf)
 
-    write_edges(builder_conf, edge_file)
-    write_verilog(
-        builder_conf,
-        image_core_path,
-        source=args.get('source'),
-        source_hash=args.get('source_hash'))
-    write_verilog_header(
-        builder_conf,
-        image_core_header_path,
-        source=args.get('source'),
-        source_hash=args.get('source_hash'))
+    output_files = (edge_file, image_core_path, image_core_header_path)
+    inputs_digest = None
+    if cache.enabled:
+        inputs_digest = hash_values(
+            get_generator_digest(cache),
+            json.dumps(config, default=str),
+            device,
+            args.get('source'),
+            args.get('source_hash'),
+            cache.file_digest(io_signatures_file(core_config_path)),
+            cache.file_digest(device_config_file(core_config_path, device)),
+            *("%s:%s" % (block_file, cache.file_digest(block_file))
+              for block_file in sorted(block_files)))
+    if inputs_digest is not None and all(
+            cache.is_output_current(output_file, inputs_digest)
+            for output_file in output_files):
+        logging.info("Generated files are up to date, skipping generation.")
+    else:
+        write_edges(builder_conf, edge_file)
+        write_verilog(
+            builder_conf,
+            image_core_path,
+            source=args.get('source'),
+            source_hash=args.get('source_hash'))
+        write_verilog_header(
+            builder_conf,
+            image_core_header_path,
+            source=args.get('source'),
+            source_hash=args.get('source_hash'))
+        if inputs_digest is not None:
+            for output_file in output_files:
+                cache.set_output(output_file, inputs_digest)
+    cache.save()
     write_build_env()
 
     if "generate_only" in args and args["generate_only"]:
@@ -15,6 +15,7 @@ You should have received a copy of the GNU General Public License
 along with this program.  If not, see <http://www.gnu.org/licenses/>.
 """
 
+import functools
 import json
 import logging
 import os
@@ -30,6 +31,7 @@ except ImportError:
                     "will not be validated against their schema.")
 
 
+@functools.lru_cache(maxsize=None)
 def find_schema(schema_name, config_path):
     """
     Recursive search for schema file. Only looks for a file with appropriate
@@ -46,7 +48,18 @@ def find_schema(schema_name, config_path):
     return None
 
 
-def validate_config(config, config_path):
+@functools.lru_cache(maxsize=None)
+def load_schema(schema_file):
+    """
+    Load a JSON schema. Schemas are only loaded once per process.
+    :param schema_file: path to the schema file
+    :return: the schema as dictionary
+    """
+    with open(schema_file) as stream:
+        return json.load(stream)
+
+
+def validate_config(config, config_path, cache=None, config_digest=None):
     """
     Try to validate config.
 
@@ -61,8 +74,13 @@ def validate_config(config, config_path):
     schema defined in config cannot be found. The validation itself may throw
     a jsonschema.exceptions.ValidationError if config does not confirm to its
     schema.
+    If a BuilderCache is given together with the digest of the file config
+    was loaded from, successful validations are recorded in the cache and
+    skipped for unchanged configuration and schema files.
     :param config: a dictionary to validate (loaded from yaml file).
     :param config_path: a path holding schema definitions
+    :param cache: an optional BuilderCache
+    :param config_digest: content digest of the configuration file
     """
     if "jsonschema" not in sys.modules:
         logging.warning("Skip schema validation (missing module jsonschema).")
@@ -80,12 +98,20 @@ def validate_config(config, config_path):
 
     logging.debug("Using schema file %s.", schema_file)
 
-    with open(schema_file) as stream:
-        jsonschema.validate(instance=config, schema=json.load(stream))
-        logging.debug("Configuration successful validated.")
+    schema_digest = None
+    if cache is not None and config_digest is not None:
+        schema_digest = cache.file_digest(schema_file)
+        if cache.is_validated(config_digest, schema_digest):
+            logging.debug("Configuration unchanged since last validation.")
+            return
+
+    jsonschema.validate(instance=config, schema=load_schema(schema_file))
+    logging.debug("Configuration successful validated.")
+    if schema_digest is not None:
+        cache.set_validated(config_digest, schema_digest)
 
 
-def load_config(config_file, config_path):
+def load_config(config_file, config_path, cache=None):
     """
     Wrapper method to unify loading of configuration files.
     Beside loading the configuration (yaml file format) itself from config_file
@@ -96,12 +122,14 @@ def load_config(config_file, config_path):
     .. seealso:: validate_config.
     :param config_file: configuration to load
     :param config_path: root path of schema definition files
+    :param cache: optional BuilderCache to skip repeated validations
     :return:
     """
     logging.debug("Load configuration %s.", config_file)
+    config_digest = cache.file_digest(config_file) if cache is not None else None
     with open(config_file) as stream:
         rt_yaml = yaml.YAML(typ='rt')
         config = rt_yaml.load(stream)
         logging.debug("Configuration successful loaded.")
-        validate_config(config, config_path)
+        validate_config(config, config_path, cache, config_digest)
         return config
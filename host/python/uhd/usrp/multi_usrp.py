@@ -9,6 +9,7 @@ Python UHD module containing the MultiUSRP and other objects
 
 import numpy as np
 from .. import libpyuhd as lib
+from .waveform_streamer import WaveformStreamer
 
 
 def _get_mpm_client(token, mb_args):
@@ -137,6 +138,10 @@ class MultiUSRP(lib.usrp.multi_usrp):
                       streamer=None):
         """
         TX a finite number of samples from the USRP
+
+        The waveform is repeated for the requested duration. To transmit a
+        waveform in the background, use a WaveformStreamer object instead.
+
         :param waveform_proto: numpy array of samples to TX
         :param duration: time in seconds to transmit at the supplied rate
         :param freq: TX frequency (Hz)
@@ -166,34 +171,10 @@ class MultiUSRP(lib.usrp.multi_usrp):
 
         # Configure streamer
         streamer = _config_streamer(streamer)
-        # Set up buffers and counters
-        buffer_samps = streamer.get_max_num_samps()
-        proto_len = waveform_proto.shape[-1]
-        if proto_len < buffer_samps:
-            waveform_proto = np.tile(waveform_proto,
-                                     (1, int(np.ceil(float(buffer_samps)/proto_len))))
-            proto_len = waveform_proto.shape[-1]
-        send_samps = 0
         max_samps = int(np.floor(duration * rate))
-        if len(waveform_proto.shape) == 1:
-            waveform_proto = waveform_proto.reshape(1, waveform_proto.size)
-        if waveform_proto.shape[0] < len(channels):
-            waveform_proto = np.tile(waveform_proto[0], (len(channels), 1))
-        # Now stream
-        metadata = lib.types.tx_metadata()
-        if start_time is not None:
-            metadata.time_spec = start_time
-        while send_samps < max_samps:
-            real_samps = min(proto_len, max_samps-send_samps)
-            if real_samps < proto_len:
-                print(waveform_proto[:, :real_samps])
-                samples = streamer.send(waveform_proto[:, :real_samps], metadata)
-            else:
-                samples = streamer.send(waveform_proto, metadata)
-            send_samps += samples
-        # Send EOB to terminate Tx
-        metadata.end_of_burst = True
-        streamer.send(np.zeros((len(channels), 1), dtype=np.complex64), metadata)
+        # Pack the waveform into send()-sized blocks once, then stream
+        send_samps = WaveformStreamer(
+            streamer, waveform_proto, start_time).run(max_samps)
         # Help the garbage collection
         streamer = None
         return send_samps
@@ -0,0 +1,284 @@
+#
+# Copyright 2021 Ettus Research, a National Instruments Brand
+#
+# SPDX-License-Identifier: GPL-3.0-or-later
+#
+""" @package usrp
+Repeated-waveform TX helper for MultiUSRP
+"""
+
+import math
+import threading
+import time
+import numpy as np
+from .. import libpyuhd as lib
+
+# Upper bound on the number of samples (per channel) we're willing to allocate
+# for a burst table that wraps around seamlessly.
+MAX_TABLE_SAMPS = 1 << 22
+
+
+def make_burst_table(waveform_proto, num_channels, samps_per_block,
+                     max_table_samps=MAX_TABLE_SAMPS):
+    """
+    Pack a waveform prototype into a table of send()-ready blocks.
+
+    The prototype is repeated such that the concatenation of all blocks is a
+    whole number of prototypes, i.e., cycling through the table produces a
+    continuous waveform. If possible, every block is exactly samps_per_block
+    samples long. If that would require a table larger than max_table_samps,
+    the last block is shorter instead.
+
+    Every block is a C-contiguous array of shape (num_channels, N), so it can
+    be passed to TXStreamer.send() without further copies.
+
+    :param waveform_proto: numpy array of samples, either 1-D (will be used for
+                           all channels) or 2-D with one row per channel
+    :param num_channels: number of channels of the TX streamer
+    :param samps_per_block: samples per block, usually the return value of
+                            TXStreamer.get_max_num_samps()
+    :param max_table_samps: maximum number of samples per channel in the table
+    :return: list of numpy arrays
+    """
+    waveform_proto = np.asarray(waveform_proto, dtype=np.complex64)
+    if waveform_proto.ndim == 1:
+        waveform_proto = waveform_proto.reshape(1, waveform_proto.size)
+    if waveform_proto.shape[0] < num_channels:
+        waveform_proto = np.tile(waveform_proto[0], (num_channels, 1))
+    waveform_proto = waveform_proto[:num_channels]
+    proto_len = waveform_proto.shape[-1]
+    if proto_len == 0 or samps_per_block <= 0:
+        raise ValueError("Cannot create a burst table from an empty waveform!")
+    # Smallest number of repetitions that ends on a block boundary
+    num_reps = samps_per_block // math.gcd(proto_len, samps_per_block)
+    if num_reps * proto_len > max_table_samps:
+        # Fall back to the smallest table that still fills one block
+        num_reps = max(1, -(-samps_per_block // proto_len))
+    table = np.tile(waveform_proto, (1, num_reps))
+    table_len = table.shape[-1]
+    num_full_blocks = table_len // samps_per_block
+    full_len = num_full_blocks * samps_per_block
+    # Reorder into (block, channel, sample) so that every block is contiguous
+    full_blocks = np.ascontiguousarray(
+        table[:, :full_len]
+        .reshape(num_channels, num_full_blocks, samps_per_block)
+        .transpose(1, 0, 2))
+    blocks = list(full_blocks)
+    if full_len < table_len:
+        blocks.append(np.ascontiguousarray(table[:, full_len:]))
+    return blocks
+
+
+class WaveformStreamer:
+    """
+    Transmit a repeated waveform from a pre-packed burst table.
+
+    The waveform is packed into get_max_num_samps()-sized blocks once, and the
+    send loop then simply cycles through these blocks. Transmission can either
+    run in the calling thread (run()) or in a background thread (start() /
+    stop()). While running in the background, a second thread monitors the
+    async messages of the streamer and counts underflows and sequence errors.
+
+    Example:
+    >>> wfs = WaveformStreamer(tx_streamer, tone)
+    >>> wfs.start()
+    >>> time.sleep(10)
+    >>> wfs.stop()
+    >>> print(wfs.get_stats())
+    """
+    def __init__(self, streamer, waveform_proto, start_time=None, timeout=0.1):
+        """
+        :param streamer: A TX streamer object
+        :param waveform_proto: numpy array of samples to TX (see
+                               make_burst_table())
+        :param start_time: A valid TimeSpec object with the starting time. If
+                           None, then streaming starts immediately.
+        :param timeout: Timeout value for individual send() calls
+        """
+        self._streamer = streamer
+        self._num_channels = streamer.get_num_channels()
+        self._blocks = make_burst_table(
+            waveform_proto, self._num_channels, streamer.get_max_num_samps())
+        self._start_time = start_time
+        self._timeout = timeout
+        self._run = threading.Event()
+        self._thread = None
+        self._async_thread = None
+        self._stats_lock = threading.Lock()
+        self._reset_stats()
+
+    def _reset_stats(self):
+        """ Reset all counters """
+        with self._stats_lock:
+            self._num_tx_samps = 0
+            self._num_timeouts = 0
+            self._num_underflows = 0
+            self._num_seq_errors = 0
+            self._t_start = None
+            self._t_stop = None
+
+    def get_burst_table(self):
+        """
+        Return the list of blocks that get sent in a round-robin fashion
+        """
+        return self._blocks
+
+    def get_stats(self):
+        """
+        Return a dictionary with the TX statistics of the current or last run.
+
+        Keys:
+        - num_tx_samps: Number of samples sent per channel
+        - num_timeouts: Number of send() calls that didn't send any samples
+        - num_underflows: Number of underflows reported by the device
+        - num_seq_errors: Number of sequence errors reported by the device
+        - duration: Time in seconds since the start of transmission
+        - throughput: Average number of samples per second (per channel)
+        """
+        with self._stats_lock:
+            if self._t_start is None:
+                duration = 0.0
+            else:
+                duration = (self._t_stop or time.monotonic()) - self._t_start
+            return {
+                'num_tx_samps': self._num_tx_samps,
+                'num_timeouts': self._num_timeouts,
+                'num_underflows': self._num_underflows,
+                'num_seq_errors': self._num_seq_errors,
+                'duration': duration,
+                'throughput': self._num_tx_samps / duration if duration else 0.0,
+            }
+
+    def run(self, num_samps=None):
+        """
+        Transmit in the calling thread.
+
+        If num_samps is None, this will transmit until stop() is called from a
+        different thread. Otherwise, exactly num_samps samples per channel are
+        transmitted. In both cases, the burst is terminated with an EOB.
+
+        :param num_samps: Number of samples to transmit, per channel
+        :return: the number of transmitted samples, per channel
+        """
+        self._reset_stats()
+        self._run.set()
+        return self._worker(num_samps)
+
+    def start(self, num_samps=None):
+        """
+        Spawn the transmit and async message threads in the background
+
+        :param num_samps: Number of samples to transmit, per channel. If None,
+                          transmit until stop() is called.
+        """
+        if self.is_running():
+            raise RuntimeError("WaveformStreamer is already running!")
+        self._reset_stats()
+        self._run.set()
+        self._thread = threading.Thread(
+            target=self._worker, args=(num_samps,), name="wfs_tx")
+        self._async_thread = threading.Thread(
+            target=self._async_worker, name="wfs_tx_async")
+        self._thread.start()
+        self._async_thread.start()
+
+    def stop(self):
+        """
+        Stop the transmitter and wait for the background threads to finish
+        """
+        self._run.clear()
+        self.wait()
+
+    def wait(self, timeout=None):
+        """
+        Wait for a finite transmission started with start() to complete.
+
+        :return: True if the background threads have finished
+        """
+        for thread in (self._thread, self._async_thread):
+            if thread is not None:
+                thread.join(timeout)
+        if self.is_running():
+            return False
+        self._thread = None
+        self._async_thread = None
+        return True
+
+    def is_running(self):
+        """
+        Return True if background threads are still active
+        """
+        return any(thread is not None and thread.is_alive()
+                   for thread in (self._thread, self._async_thread))
+
+    def _worker(self, num_samps):
+        """ Here is where the action happens """
+        streamer = self._streamer
+        blocks = self._blocks
+        num_blocks = len(blocks)
+        timeout = self._timeout
+        metadata = lib.types.tx_metadata()
+        if self._start_time is not None:
+            metadata.time_spec = self._start_time
+            metadata.has_time_spec = True
+        block_idx = 0
+        offset = 0
+        send_samps = 0
+        with self._stats_lock:
+            self._t_start = time.monotonic()
+        try:
+            while self._run.is_set() and \
+                    (num_samps is None or send_samps < num_samps):
+                block = blocks[block_idx]
+                block_len = block.shape[-1]
+                end = block_len
+                if num_samps is not None:
+                    end = min(block_len, offset + num_samps - send_samps)
+                if offset == 0 and end == block_len:
+                    samples = streamer.send(block, metadata, timeout)
+                else:
+                    # Only happens for partial sends and the final block
+                    samples = streamer.send(block[:, offset:end], metadata, timeout)
+                if samples == 0:
+                    with self._stats_lock:
+                        self._num_timeouts += 1
+                    continue
+                metadata.has_time_spec = False
+                send_samps += samples
+                offset += samples
+                if offset >= block_len:
+                    offset = 0
+                    block_idx = (block_idx + 1) % num_blocks
+                with self._stats_lock:
+                    self._num_tx_samps = send_samps
+        finally:
+            # Send EOB to terminate Tx
+            metadata.end_of_burst = True
+            streamer.send(
+                np.zeros((self._num_channels, 1), dtype=np.complex64), metadata)
+            with self._stats_lock:
+                self._t_stop = time.monotonic()
+            self._run.clear()
+        return send_samps
+
+    def _async_worker(self):
+        """ Receive and count async messages until the burst is ACKed """
+        async_metadata = lib.types.async_metadata()
+        event_code = lib.types.tx_metadata_event_code
+        while True:
+            if not self._streamer.recv_async_msg(async_metadata, 0.1):
+                # Once TX has stopped and there are no more messages, we're done
+                if not self._thread.is_alive():
+                    return
+                continue
+            if async_metadata.event_code == event_code.burst_ack:
+                if not self._run.is_set():
+                    return
+            elif async_metadata.event_code in (
+                    event_code.underflow, event_code.underflow_in_packet):
+                with self._stats_lock:
+                    self._num_underflows += 1
+            elif async_metadata.event_code in (
+                    event_code.seq_error, event_code.seq_error_in_packet):
+                with self._stats_lock:
+                    self._num_seq_errors += 1
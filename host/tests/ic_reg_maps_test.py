@@ -0,0 +1,132 @@
+#
+# Copyright 2021 Ettus Research, a National Instruments Brand
+#
+# SPDX-License-Identifier: GPL-3.0-or-later
+#
+"""
+Unit test for the change tracking of generated Python register maps
+"""
+
+import os
+import copy
+import random
+import shutil
+import tempfile
+import unittest
+import importlib.util
+import subprocess
+import sys
+
+IC_REG_MAPS_DIR = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), '..', 'lib', 'ic_reg_maps')
+
+def gen_reg_map(name, out_dir):
+    """
+    Generate the Python register map for name into out_dir, and return the
+    register map class.
+    """
+    out_file = os.path.join(out_dir, '{}_regs.py'.format(name))
+    subprocess.check_call([
+        sys.executable,
+        os.path.join(IC_REG_MAPS_DIR, 'gen_{}_regs.py'.format(name)),
+        out_file])
+    spec = importlib.util.spec_from_file_location(name + '_regs', out_file)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return getattr(module, '{}_regs_t'.format(name))
+
+def get_state(regs):
+    """ Return a copy of the values of all registers """
+    return {name: copy.copy(getattr(regs, name)) for name in regs._reg_addrs}
+
+def get_changed_addrs_full(regs, saved_state):
+    """
+    Compare all registers against a full copy of the saved state (which is
+    what get_changed_addrs() did before changes were tracked)
+    """
+    addrs = set()
+    for name, (addr, step) in regs._reg_addrs.items():
+        value = getattr(regs, name)
+        if step is None:
+            if value != saved_state[name]:
+                addrs.add(addr)
+        else:
+            addrs.update(addr + index * step
+                         for index, (elem, saved_elem)
+                         in enumerate(zip(value, saved_state[name]))
+                         if elem != saved_elem)
+    return addrs
+
+def get_random_value(regs, name, value):
+    """ Return a random value that fits the given register """
+    if hasattr(value, 'value'):
+        return random.choice(list(type(value)))
+    return random.randint(0, getattr(regs, name + '_mask'))
+
+
+@unittest.skipUnless(os.path.isdir(IC_REG_MAPS_DIR),
+                     "Register map generators not available")
+class RegMapChangesTest(unittest.TestCase):
+    """ Test change tracking of generated Python register maps """
+    @classmethod
+    def setUpClass(cls):
+        cls.out_dir = tempfile.mkdtemp()
+        cls.lmx2572_regs_t = gen_reg_map('lmx2572', cls.out_dir)
+        cls.zbx_cpld_regs_t = gen_reg_map('zbx_cpld', cls.out_dir)
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.out_dir)
+
+    def _check_random_changes(self, regs_t):
+        """
+        Change random registers, and compare get_changed_addrs() against a
+        full diff of the saved state
+        """
+        random.seed(2021)
+        regs = regs_t()
+        names = sorted(regs._reg_addrs)
+        for _ in range(20):
+            regs.save_state()
+            saved_state = get_state(regs)
+            for name in random.sample(names, 10):
+                value = getattr(regs, name)
+                if regs._reg_addrs[name][1] is None:
+                    setattr(regs, name, get_random_value(regs, name, value))
+                elif random.choice((True, False)):
+                    index = random.randrange(len(value))
+                    value[index] = get_random_value(regs, name, value[index])
+                else:
+                    setattr(regs, name, [get_random_value(regs, name, elem)
+                                         for elem in value])
+            # Also assign some registers their current value
+            for name in random.sample(names, 5):
+                setattr(regs, name, getattr(regs, name))
+            self.assertEqual(regs.get_changed_addrs(),
+                             get_changed_addrs_full(regs, saved_state))
+
+    def test_lmx2572(self):
+        """ Test change tracking of a register map without arrays """
+        self._check_random_changes(self.lmx2572_regs_t)
+
+    def test_zbx_cpld(self):
+        """ Test change tracking of a register map with arrays """
+        self._check_random_changes(self.zbx_cpld_regs_t)
+
+    def test_untracked_changes(self):
+        """ Test that in-place changes which can't be tracked are rejected """
+        regs = self.zbx_cpld_regs_t()
+        name = next(name for name, (_, step) in regs._reg_addrs.items()
+                    if step is not None)
+        array = getattr(regs, name)
+        for change in (lambda: array.append(array[0]),
+                       lambda: array.sort(),
+                       lambda: array.__delitem__(0),
+                       lambda: array.__setitem__(slice(0, 2), [array[0]])):
+            with self.assertRaises(TypeError):
+                change()
+        with self.assertRaises(TypeError):
+            array += [array[0]]
+
+if __name__ == '__main__':
+    unittest.main()
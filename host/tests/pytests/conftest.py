@@ -52,6 +52,15 @@ def pytest_addoption(parser):
         required=True,
         type=str,
         help="")
+    parser.addoption(
+        "--results_cache_dir",
+        type=str,
+        help="directory for caching benchmark rate results; tests with cached results "
+             "for the same software version are not rerun")
+    parser.addoption(
+        "--sw_version",
+        type=str,
+        help="software version used for caching (default: query uhd_config_info)")
 
 
 def pytest_configure(config):
@@ -0,0 +1,56 @@
+import pytest
+import batch_run_benchmark_rate
+import benchmark_rate_matrix
+
+SINGLE_LINK = {
+    "args": "addr=192.168.10.2,master_clock_rate=153.6e6",
+    "rx_rate": "153.6e6",
+    "rx_channels": "0,1",
+}
+DUAL_LINK = {
+    "args": "addr=192.168.10.2,second_addr=192.168.20.2,master_clock_rate=153.6e6",
+    "rx_rate": "153.6e6",
+    "rx_channels": "0,1",
+}
+
+
+def test_second_addr_is_part_of_config():
+    single = benchmark_rate_matrix.TestConfig("2xRX @153.6e6", SINGLE_LINK, 1)
+    dual = benchmark_rate_matrix.TestConfig("2xRX @153.6e6", DUAL_LINK, 1)
+    assert benchmark_rate_matrix.get_config_id(single) != \
+        benchmark_rate_matrix.get_config_id(dual)
+    assert benchmark_rate_matrix.get_cache_key(single, "4.1") != \
+        benchmark_rate_matrix.get_cache_key(dual, "4.1")
+    # The value of second_addr does not identify a configuration
+    other_dual = dict(DUAL_LINK, args=DUAL_LINK["args"].replace("20.2", "30.2"))
+    assert benchmark_rate_matrix.get_config_id(dual) == \
+        benchmark_rate_matrix.get_config_id(
+            benchmark_rate_matrix.TestConfig("2xRX @153.6e6", other_dual, 1))
+
+
+def test_apply_device_links():
+    device = {"addr": "10.0.0.2", "second_addr": "10.0.1.2", "host": "testhost"}
+    single = benchmark_rate_matrix.apply_device(SINGLE_LINK, device)
+    assert benchmark_rate_matrix.split_args(single["args"]) == {
+        "addr": "10.0.0.2", "master_clock_rate": "153.6e6"}
+    dual = benchmark_rate_matrix.apply_device(DUAL_LINK, device)
+    assert benchmark_rate_matrix.split_args(dual["args"]) == {
+        "addr": "10.0.0.2", "second_addr": "10.0.1.2", "master_clock_rate": "153.6e6"}
+    with pytest.raises(ValueError):
+        benchmark_rate_matrix.apply_device(DUAL_LINK, {"addr": "10.0.0.2"})
+
+
+def test_matrix_runs_configs_differing_in_second_addr(monkeypatch):
+    runs = []
+    def fake_run(path, iterations, params, stop_on_error, runner=None, host=None):
+        runs.append(params["args"])
+        return [params["args"]]
+    monkeypatch.setattr(batch_run_benchmark_rate, "run", fake_run)
+    matrix = benchmark_rate_matrix.TestMatrix()
+    matrix.add("2xRX @153.6e6", SINGLE_LINK, 1)
+    matrix.add("2xRX @153.6e6", DUAL_LINK, 1)
+    matrix.add("2xRX @153.6e6", DUAL_LINK, 1)
+    results = matrix.run("benchmark_rate", sw_version="4.1")
+    assert sorted(runs) == sorted([SINGLE_LINK["args"], DUAL_LINK["args"]])
+    assert [result.results for result in results] == \
+        [[SINGLE_LINK["args"]], [DUAL_LINK["args"]], [DUAL_LINK["args"]]]
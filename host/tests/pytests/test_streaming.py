@@ -1,6 +1,7 @@
 import pytest
 from pathlib import Path
 import batch_run_benchmark_rate
+import benchmark_rate_matrix
 import test_length_utils
 from test_length_utils import Test_Length_Smoke, Test_Length_Full, Test_Length_Stress
 
@@ -244,9 +245,21 @@ def test_streaming(pytestconfig, dut_type, use_dpdk, dual_10G, rate, rx_rate, rx
         benchmark_rate_params["tx_rate"] = tx_rate
         benchmark_rate_params["tx_channels"] = tx_channels
 
-    # run benchmark rate
+    # run benchmark rate, unless we have cached results for this configuration
     print()
-    results = batch_run_benchmark_rate.run(benchmark_rate_path, iterations, benchmark_rate_params)
+    cache = None
+    if pytestconfig.getoption('results_cache_dir'):
+        cache = benchmark_rate_matrix.ResultCache(
+            Path(pytestconfig.getoption('results_cache_dir')) / dut_type)
+        sw_version = pytestconfig.getoption('sw_version') or benchmark_rate_matrix.get_sw_version()
+        config = benchmark_rate_matrix.TestConfig("", benchmark_rate_params, iterations)
+        cache_key = benchmark_rate_matrix.get_cache_key(config, sw_version)
+    results = cache.get(cache_key) if cache else None
+    if results is None:
+        results = batch_run_benchmark_rate.run(
+            benchmark_rate_path, iterations, benchmark_rate_params)
+        if cache:
+            cache.put(cache_key, config, results, sw_version)
     stats = batch_run_benchmark_rate.calculate_stats(results)
     print(batch_run_benchmark_rate.get_summary_string(stats, iterations, benchmark_rate_params))
 
@@ -0,0 +1,72 @@
+#
+# Copyright 2021 Ettus Research, a National Instruments Brand
+#
+# SPDX-License-Identifier: GPL-3.0-or-later
+#
+"""
+Unit test for uhd.usrp.WaveformStreamer
+"""
+
+import unittest
+import numpy as np
+from uhd.usrp.waveform_streamer import make_burst_table, WaveformStreamer
+
+class MockTXStreamer:
+    """ Records everything that gets sent """
+    def __init__(self, num_channels, max_num_samps, max_send=None):
+        self.num_channels = num_channels
+        self.max_num_samps = max_num_samps
+        self.max_send = max_send
+        self.sent = []
+        self.eob = False
+
+    def get_num_channels(self):
+        return self.num_channels
+
+    def get_max_num_samps(self):
+        return self.max_num_samps
+
+    def send(self, buf, metadata, timeout=0.1):
+        if metadata.end_of_burst:
+            self.eob = True
+            return 0
+        num_samps = buf.shape[-1]
+        if self.max_send is not None:
+            num_samps = min(num_samps, self.max_send)
+        self.sent.append(np.array(buf[:, :num_samps]))
+        return num_samps
+
+    def recv_async_msg(self, async_metadata, timeout=0.1):
+        return False
+
+class WaveformStreamerTest(unittest.TestCase):
+    """ Test WaveformStreamer and its burst table """
+    def test_burst_table(self):
+        """ Test make_burst_table() """
+        proto = np.arange(10, dtype=np.complex64)
+        blocks = make_burst_table(proto, 2, 4)
+        # 10 and 4 meet after 20 samples, so that's 5 full blocks
+        self.assertEqual(len(blocks), 5)
+        for block in blocks:
+            self.assertEqual(block.shape, (2, 4))
+            self.assertTrue(block.flags['C_CONTIGUOUS'])
+        table = np.concatenate(blocks, axis=1)
+        self.assertTrue(np.array_equal(table[0], np.tile(proto, 2)))
+        self.assertTrue(np.array_equal(table[1], np.tile(proto, 2)))
+        # If the table would get too big, we allow a short last block
+        blocks = make_burst_table(proto, 1, 4, max_table_samps=8)
+        self.assertEqual([block.shape[-1] for block in blocks], [4, 4, 2])
+
+    def test_run(self):
+        """ Test WaveformStreamer.run() including partial sends """
+        proto = np.arange(7, dtype=np.complex64)
+        streamer = MockTXStreamer(1, 4, max_send=3)
+        wfs = WaveformStreamer(streamer, proto)
+        self.assertEqual(wfs.run(30), 30)
+        sent = np.concatenate(streamer.sent, axis=1)[0]
+        self.assertTrue(np.array_equal(sent, np.resize(proto, 30)))
+        self.assertTrue(streamer.eob)
+        self.assertEqual(wfs.get_stats()['num_tx_samps'], 30)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -7,11 +7,20 @@ SPDX-License-Identifier: GPL-3.0-or-later
 Runs the benchmark rate C++ example for a specified number of iterations and
 aggregates results.
 
+If the path points to the Python benchmark rate example (benchmark_rate.py),
+the benchmark is run in this process instead. The device session is then
+reused across iterations (and across calls to run() with the same device
+args), and the results are read back directly instead of being parsed from
+the console output.
+
 Example usage:
 batch_run_benchmark_rate.py --path <benchmark_rate_dir>/benchmark_rate --iterations 1 --args "addr=192.168.30.2" --rx_rate 1e6
+batch_run_benchmark_rate.py --path <python_examples_dir>/benchmark_rate.py --iterations 10 --args "addr=192.168.30.2" --rx_rate 1e6
 """
 import argparse
 import collections
+import importlib.util
+import json
 import re
 import parse_benchmark_rate
 import run_benchmark_rate
@@ -40,18 +49,121 @@ def calculate_stats(results):
         max_vals      = result_max,
         non_zero_vals = result_nz)
 
-def run(path, iterations, benchmark_rate_params, stop_on_error=True):
+class InProcessRunner:
+    """
+    Runs the Python benchmark rate example within this process.
+
+    The MultiUSRP object is kept open between runs, so consecutive runs with
+    the same device args skip device initialization.
+    """
+    # Parameters that are comma-separated lists for the C++ example, but
+    # space-separated lists for the Python example
+    list_params = ("channels", "rx_channels", "tx_channels")
+
+    def __init__(self, path):
+        spec = importlib.util.spec_from_file_location("benchmark_rate", path)
+        self.module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(self.module)
+        self._device_args = None
+        self._usrp = None
+
+    def get_usrp(self, device_args):
+        """
+        Returns a MultiUSRP object for the given device args. The previous
+        session is only closed if the device args changed.
+        """
+        if self._usrp is None or device_args != self._device_args:
+            # Make sure the old session is gone before opening a new one
+            self._usrp = None
+            self._usrp = self.module.uhd.usrp.MultiUSRP(device_args)
+            self._device_args = device_args
+        return self._usrp
+
+    def get_argv(self, params):
+        """
+        Converts a benchmark rate parameter dictionary into an argument list
+        for the Python benchmark rate example.
+        """
+        argv = []
+        for key, val in params.items():
+            if key == "random":
+                if str(val).lower() not in ("", "0", "false"):
+                    argv.append("--random")
+            elif key in self.list_params:
+                argv.append("--" + key)
+                argv.extend(str(val).replace(",", " ").split())
+            else:
+                argv.extend(["--" + key, str(val)])
+        return argv
+
+    def run(self, params):
+        """
+        Runs benchmark rate once and returns the results dictionary, or None
+        if the benchmark failed.
+        """
+        args = self.module.parse_args(self.get_argv(params))
+        return self.module.run_benchmark(self.get_usrp(args.args), args)
+
+_in_process_runners = {}
+
+def get_in_process_runner(path):
+    """
+    Returns the (cached) in-process runner for the Python example at path.
+    """
+    if path not in _in_process_runners:
+        _in_process_runners[path] = InProcessRunner(path)
+    return _in_process_runners[path]
+
+def run_in_process(runner, iterations, benchmark_rate_params, stop_on_error=True,
+                   raw_results=None):
+    """
+    Runs the Python benchmark rate multiple times in this process and returns
+    a list of parsed results. If raw_results is a list, the full results
+    dictionaries (including the throughput time series) are appended to it.
+    """
+    parsed_results = []
+    iteration = 0
+    while iteration < iterations:
+        raw_result = runner.run(benchmark_rate_params)
+        result = parse_benchmark_rate.parse_json(raw_result)
+        if result is not None:
+            parsed_results.append(result)
+            if raw_results is not None:
+                raw_results.append(raw_result)
+            iteration += 1
+        else:
+            msg = "Benchmark rate failed with arguments:\n"
+            msg += str(runner.get_argv(benchmark_rate_params))
+            if stop_on_error:
+                raise RuntimeError(msg)
+            print(msg)
+
+    return parsed_results
+
+def run(path, iterations, benchmark_rate_params, stop_on_error=True, raw_results=None,
+        runner=None, host=None):
     """
     Runs benchmark rate multiple times and returns a list of parsed results.
+
+    runner is an optional InProcessRunner to use instead of the default one
+    for the given path (e.g., to run on multiple devices concurrently).
+    host is an optional remote host on which to run the C++ example.
     """
     print("Running benchmark rate {} times with the following arguments: ".format(iterations))
     for key, val in benchmark_rate_params.items():
         print("{:14} {}".format(key, val))
 
+    if str(path).endswith(".py"):
+        if host:
+            raise RuntimeError("The Python benchmark rate can only be run locally")
+        return run_in_process(
+            runner or get_in_process_runner(path), iterations, benchmark_rate_params,
+            stop_on_error, raw_results)
+
     parsed_results = []
     iteration = 0
     while iteration < iterations:
-        proc = run_benchmark_rate.run(path, benchmark_rate_params)
+        proc = run_benchmark_rate.run(path, benchmark_rate_params, host)
         result = parse_benchmark_rate.parse(proc.stdout.decode('ASCII'))
         if result != None:
             parsed_results.append(result)
@@ -187,11 +299,17 @@ def parse_args():
     parser = argparse.ArgumentParser()
     parser.add_argument("--path", type=str, required=True, help="path to benchmark rate example")
     parser.add_argument("--iterations", type=int, default=100, help="number of iterations to run")
+    parser.add_argument("--json", type=str,
+                        help="write the results of all iterations to this file (Python example only)")
     params = parser.parse_args(rest)
-    return params.path, params.iterations, benchmark_rate_params
+    return params.path, params.iterations, params.json, benchmark_rate_params
 
 if __name__ == "__main__":
-    path, iterations, params = parse_args();
-    results = run(path, iterations, params)
+    path, iterations, json_file, params = parse_args();
+    raw_results = []
+    results = run(path, iterations, params, raw_results=raw_results)
     stats = calculate_stats(results)
     print(get_summary_string(stats, iterations, params))
+    if json_file:
+        with open(json_file, 'w') as f:
+            json.dump(raw_results, f, indent=2)
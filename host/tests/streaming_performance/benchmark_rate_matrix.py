@@ -0,0 +1,391 @@
+"""
+Copyright 2021 Ettus Research, A National Instrument Brand
+
+SPDX-License-Identifier: GPL-3.0-or-later
+
+Shared engine for running a matrix of benchmark rate configurations.
+
+The run_*_max_rate_tests.py scripts declare their test configurations by
+adding them to a TestMatrix. The matrix is then executed in one go:
+- Configurations are distributed across all available devices (and the
+  hosts they are attached to), with one worker per device.
+- Results are cached, keyed by configuration and software version. Only
+  configurations without a cached result are run.
+- All results are merged into a single report, and regressions are flagged
+  against a stored baseline report.
+
+Devices are specified as device args strings. The keys addr, mgmt_addr,
+name, serial and resource replace the corresponding values of each
+configuration. second_addr only replaces the value of configurations that
+use a second link; configurations that differ in whether they use it are
+different configurations. Two additional keys are not passed to UHD:
+- host: Run benchmark rate on this host using ssh
+- path: Path to benchmark rate on that host (defaults to --path)
+
+Example usage:
+run_X4xx_max_rate_tests.py --path <benchmark_rate_dir>/benchmark_rate --test_type 1x10Gbe \
+    --device addr=192.168.10.2 --device addr=192.168.10.3,host=testhost2 \
+    --cache_dir ~/.cache/uhd_streaming --baseline baseline.json --report report.json
+"""
+import collections
+import hashlib
+import json
+import os
+import queue
+import subprocess
+import threading
+import batch_run_benchmark_rate
+import parse_benchmark_rate
+
+# Device args keys that identify a device, and are thus not part of a
+# configuration
+DEVICE_ARG_KEYS = ("addr", "mgmt_addr", "name", "serial", "resource")
+# Device args keys that select additional links of a device. Whether they are
+# used is part of a configuration, but their values are not.
+LINK_ARG_KEYS = ("second_addr",)
+# Device keys that are used by the test matrix only
+HOST_KEYS = ("host", "path")
+
+# Results fields which should not increase compared to the baseline
+ERROR_FIELDS = (
+    "dropped_samps",
+    "overruns",
+    "tx_seq_errs",
+    "rx_seq_errs",
+    "underruns",
+    "late_cmds",
+    "tx_timeouts",
+    "rx_timeouts",
+)
+# Results fields which should not decrease compared to the baseline
+THROUGHPUT_FIELDS = ("received_samps", "transmitted_samps")
+
+TestConfig = collections.namedtuple('TestConfig', 'label params iterations')
+
+TestResult = collections.namedtuple('TestResult', 'config key results cached device')
+
+def split_args(args):
+    """
+    Split a device args string into an (ordered) dictionary.
+    """
+    result = collections.OrderedDict()
+    for arg in args.split(","):
+        if not arg.strip():
+            continue
+        key, _, val = arg.partition("=")
+        result[key.strip()] = val.strip()
+    return result
+
+def join_args(args):
+    """
+    Join a device args dictionary into a string.
+    """
+    return ",".join("{}={}".format(key, val) for key, val in args.items())
+
+def get_config_params(params):
+    """
+    Returns the benchmark rate parameters with all device-specific args
+    removed, i.e., the parts of the parameters that define the test.
+    """
+    config_params = dict(params)
+    if "args" in config_params:
+        config_params["args"] = join_args(collections.OrderedDict(
+            (key, "*" if key in LINK_ARG_KEYS else val)
+            for key, val in split_args(config_params["args"]).items()
+            if key not in DEVICE_ARG_KEYS))
+    return {key: str(val) for key, val in config_params.items()}
+
+def apply_device(params, device):
+    """
+    Returns a copy of params that runs on the given device (a dictionary of
+    device args).
+
+    Link args (e.g., second_addr) of the device are only applied if the
+    configuration uses that link. If it does, but the device doesn't provide
+    the link, a ValueError is raised.
+    """
+    params = dict(params)
+    args = split_args(params.get("args", ""))
+    if device:
+        for key in LINK_ARG_KEYS:
+            if key in args and key not in device:
+                raise ValueError("Configuration uses {}, but device {} doesn't "
+                                 "provide it".format(key, join_args(device)))
+    args.update((key, val) for key, val in device.items()
+                if key not in HOST_KEYS and (key not in LINK_ARG_KEYS or key in args))
+    params["args"] = join_args(args)
+    return params
+
+def get_config_id(config):
+    """
+    Returns a hash that identifies a configuration independent of the device
+    it runs on and of the software version.
+    """
+    desc = json.dumps({
+        "label": config.label,
+        "params": get_config_params(config.params),
+        "iterations": config.iterations,
+    }, sort_keys=True)
+    return hashlib.sha256(desc.encode('utf-8')).hexdigest()[:16]
+
+def get_cache_key(config, sw_version):
+    """
+    Returns the key under which the results of a configuration are cached.
+    """
+    desc = get_config_id(config) + ":" + str(sw_version)
+    return hashlib.sha256(desc.encode('utf-8')).hexdigest()[:16]
+
+def get_sw_version():
+    """
+    Returns the version of the installed UHD, or "unknown".
+    """
+    try:
+        proc = subprocess.run(["uhd_config_info", "--version"],
+                              stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        return proc.stdout.decode('ASCII').split(":")[-1].strip() or "unknown"
+    except OSError:
+        return "unknown"
+
+class ResultCache:
+    """
+    Stores the results of each configuration as a JSON file in a directory.
+
+    The cache key does not identify the device type, so use a separate
+    directory per device type.
+    """
+    def __init__(self, cache_dir):
+        self.cache_dir = os.path.expanduser(cache_dir)
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def _get_file_name(self, key):
+        return os.path.join(self.cache_dir, key + ".json")
+
+    def get(self, key):
+        """
+        Returns the list of cached results for key, or None.
+        """
+        try:
+            with open(self._get_file_name(key)) as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        return [parse_benchmark_rate.Results(**result) for result in entry["results"]]
+
+    def put(self, key, config, results, sw_version):
+        """
+        Stores the results of a configuration.
+        """
+        entry = {
+            "label": config.label,
+            "params": get_config_params(config.params),
+            "iterations": config.iterations,
+            "sw_version": sw_version,
+            "results": [result._asdict() for result in results],
+        }
+        tmp_file_name = self._get_file_name(key) + ".tmp"
+        with open(tmp_file_name, 'w') as f:
+            json.dump(entry, f, indent=2)
+        os.replace(tmp_file_name, self._get_file_name(key))
+
+class TestMatrix:
+    """
+    A list of benchmark rate configurations, and the means to run them.
+    """
+    def __init__(self, stop_on_error=True):
+        self.configs = []
+        self.stop_on_error = stop_on_error
+
+    def add(self, label, params, iterations):
+        """
+        Adds a configuration to the matrix.
+        """
+        self.configs.append(TestConfig(label, dict(params), iterations))
+
+    def run(self, path, devices=None, cache=None, sw_version=None):
+        """
+        Runs all configurations that are not cached yet and returns a list of
+        TestResult objects, in the order the configurations were added.
+
+        devices is a list of device dictionaries (see apply_device()). If no
+        devices are given, the configurations are run as they are.
+        """
+        devices = devices or [{}]
+        sw_version = sw_version or get_sw_version()
+        # Identical configurations are only run once. Configurations are
+        # identical if all of their parameters are.
+        def get_run_key(config):
+            return json.dumps([config.label, config.params, config.iterations],
+                              sort_keys=True, default=str)
+        results = {}
+        pending = queue.Queue()
+        for config in self.configs:
+            key = get_cache_key(config, sw_version)
+            run_key = get_run_key(config)
+            if run_key in results:
+                continue
+            cached = cache.get(key) if cache else None
+            if cached is not None:
+                results[run_key] = TestResult(config, key, cached, True, None)
+            else:
+                results[run_key] = None
+                pending.put((run_key, key, config))
+        print("Running {} of {} configurations on {} device(s)".format(
+            pending.qsize(), len(self.configs), len(devices)))
+
+        errors = []
+        lock = threading.Lock()
+        def worker(device):
+            """ Runs configurations on one device until there are none left """
+            runner = None
+            device_path = device.get("path", path)
+            if str(device_path).endswith(".py"):
+                runner = batch_run_benchmark_rate.InProcessRunner(device_path)
+            while not errors:
+                try:
+                    run_key, key, config = pending.get_nowait()
+                except queue.Empty:
+                    return
+                try:
+                    config_results = batch_run_benchmark_rate.run(
+                        device_path, config.iterations, apply_device(config.params, device),
+                        self.stop_on_error, runner=runner, host=device.get("host"))
+                except Exception as ex:
+                    with lock:
+                        errors.append(ex)
+                    return
+                if cache:
+                    cache.put(key, config, config_results, sw_version)
+                with lock:
+                    results[run_key] = TestResult(config, key, config_results, False, device)
+
+        threads = [threading.Thread(target=worker, args=(device,)) for device in devices]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        if errors:
+            raise errors[0]
+        return [results[get_run_key(config)]._replace(config=config)
+                for config in self.configs]
+
+def check_regressions(stats, baseline_stats, tolerance=0.1, throughput_tolerance=0.01):
+    """
+    Compares the average results of a configuration against the baseline.
+    Returns a list of human-readable regression descriptions.
+    """
+    regressions = []
+    for field in ERROR_FIELDS:
+        value = getattr(stats.avg_vals, field)
+        baseline = baseline_stats[field]
+        if value > baseline * (1 + tolerance) and value - baseline >= 1:
+            regressions.append("{}: {} (baseline: {})".format(field, value, baseline))
+    for field in THROUGHPUT_FIELDS:
+        value = getattr(stats.avg_vals, field)
+        baseline = baseline_stats[field]
+        if value < baseline * (1 - throughput_tolerance):
+            regressions.append("{}: {} (baseline: {})".format(field, value, baseline))
+    return regressions
+
+def get_report(test_results, sw_version, baseline=None):
+    """
+    Merges a list of TestResult objects into a single report dictionary. If
+    a baseline report is given, configurations that got worse are flagged.
+    """
+    baseline_entries = {}
+    if baseline:
+        baseline_entries = {entry["config_id"]: entry for entry in baseline["tests"]}
+    entries = []
+    for test_result in test_results:
+        config = test_result.config
+        stats = batch_run_benchmark_rate.calculate_stats(test_result.results)
+        config_id = get_config_id(config)
+        entry = {
+            "label": config.label,
+            "config_id": config_id,
+            "cache_key": test_result.key,
+            "params": get_config_params(config.params),
+            "iterations": config.iterations,
+            "cached": test_result.cached,
+            "device": join_args(test_result.device) if test_result.device else None,
+            "avg": stats.avg_vals._asdict(),
+            "min": stats.min_vals._asdict(),
+            "max": stats.max_vals._asdict(),
+            "non_zero": stats.non_zero_vals._asdict(),
+        }
+        if config_id in baseline_entries:
+            entry["regressions"] = check_regressions(
+                stats, baseline_entries[config_id]["avg"])
+        entries.append(entry)
+    return {"sw_version": sw_version, "tests": entries}
+
+def print_report(test_results, report):
+    """
+    Prints the summary table for every configuration, followed by a list of
+    regressions.
+    """
+    for test_result, entry in zip(test_results, report["tests"]):
+        config = test_result.config
+        print("-----------------------------------------------------------")
+        print(config.label + (" (cached)" if entry["cached"] else "") + "\n")
+        stats = batch_run_benchmark_rate.calculate_stats(test_result.results)
+        print(batch_run_benchmark_rate.get_summary_string(
+            stats, config.iterations, config.params))
+    regressions = [entry for entry in report["tests"] if entry.get("regressions")]
+    if regressions:
+        print("-----------------------------------------------------------")
+        print("Regressions against baseline:\n")
+        for entry in regressions:
+            print("{} ({}):".format(entry["label"], entry["params"]))
+            for regression in entry["regressions"]:
+                print("    " + regression)
+
+def add_arguments(parser):
+    """
+    Adds the command line arguments for running a test matrix to an
+    argparse parser.
+    """
+    parser.add_argument(
+        "--device",
+        type=str,
+        action="append",
+        default=[],
+        help="device args of a device to run tests on (may be given multiple times)")
+    parser.add_argument(
+        "--cache_dir",
+        type=str,
+        help="directory for caching results across runs")
+    parser.add_argument(
+        "--sw_version",
+        type=str,
+        help="software version used for caching (default: query uhd_config_info)")
+    parser.add_argument(
+        "--baseline",
+        type=str,
+        help="report file of a previous run to compare results against")
+    parser.add_argument(
+        "--report",
+        type=str,
+        help="write a JSON report of all results to this file")
+
+def run_matrix(matrix, path, args):
+    """
+    Runs a test matrix with the options added by add_arguments() and prints
+    the report. Returns False if there were any regressions.
+    """
+    devices = [split_args(device) for device in args.device]
+    cache = None
+    if args.cache_dir:
+        # Results of different test types must not be mixed up
+        cache = ResultCache(os.path.join(args.cache_dir, getattr(args, "test_type", "")))
+    sw_version = args.sw_version or get_sw_version()
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    test_results = matrix.run(path, devices, cache, sw_version)
+    report = get_report(test_results, sw_version, baseline)
+    print_report(test_results, report)
+    if args.report:
+        with open(args.report, 'w') as f:
+            json.dump(report, f, indent=2)
+    return not any(entry.get("regressions") for entry in report["tests"])
@@ -10,6 +10,7 @@ values printed at the end of execution.
 import collections
 import re
 import csv
+import json
 
 Results = collections.namedtuple(
     'Results',
@@ -118,6 +119,36 @@ def parse(result_str):
     else:
         return None
 
+def parse_json(results):
+    """
+    Converts the results of the Python benchmark_rate example (as returned by
+    its run_benchmark() function, or as written with its --json option) into
+    numerical values.
+    """
+    if isinstance(results, (str, bytes)):
+        try:
+            results = json.loads(results)
+        except ValueError:
+            return None
+    if not results:
+        return None
+    return Results(
+        num_rx_channels   = results["num_rx_channels"],
+        num_tx_channels   = results["num_tx_channels"],
+        rx_rate           = results["rx_rate"],
+        tx_rate           = results["tx_rate"],
+        received_samps    = results["num_rx_samps"],
+        dropped_samps     = results["num_rx_dropped"],
+        overruns          = results["num_rx_overruns"],
+        transmitted_samps = results["num_tx_samps"],
+        tx_seq_errs       = results["num_tx_seqerr"],
+        rx_seq_errs       = results["num_rx_seqerr"],
+        underruns         = results["num_tx_underrun"],
+        late_cmds         = results["num_rx_late"],
+        tx_timeouts       = results["num_tx_timeouts"],
+        rx_timeouts       = results["num_rx_timeouts"]
+    )
+
 def write_benchmark_rate_csv(results, file_name):
     with open(file_name, 'w', newline='') as f:
         w = csv.writer(f)
@@ -20,7 +20,9 @@ import argparse
 import sys
 import time
 import datetime
-import batch_run_benchmark_rate
+import benchmark_rate_matrix
+
+matrix = benchmark_rate_matrix.TestMatrix(stop_on_error=False)
 
 Test_Type_E320_XG = "E320_XG"
 Test_Type_E310_Liberio = "E310_Liberio"
@@ -58,19 +60,17 @@ def parse_args():
         default="",
         help="address of management interface. only needed for DPDK test cases"
     )
+    benchmark_rate_matrix.add_arguments(parser)
     args = parser.parse_args()
 
-    return args.path, args.test_type, args.addr, args.use_dpdk, args.mgmt_addr
+    return args.path, args.test_type, args.addr, args.use_dpdk, args.mgmt_addr, args
 
 def run_test(path, params, iterations, label):
     """
-    Runs benchmark rate for the number of iterations in the command line arguments
+    Adds a benchmark rate configuration to the test matrix. The tests are run
+    once all configurations have been added.
     """
-    print("-----------------------------------------------------------")
-    print(label + "\n")
-    results = batch_run_benchmark_rate.run(path, iterations, params, False)
-    stats = batch_run_benchmark_rate.calculate_stats(results)
-    print(batch_run_benchmark_rate.get_summary_string(stats, iterations, params))
+    matrix.add(label, params, iterations)
 
 
 def run_E320_tests_for_single_10G(
@@ -168,7 +168,7 @@ def run_E320_tests_for_single_10G_long_duration(
     run_test(path, trx_params, iterations, "2xTRX @{}".format(rate))
 
 def main():
-    path, test_type, addr, use_dpdk, mgmt_addr = parse_args()
+    path, test_type, addr, use_dpdk, mgmt_addr, matrix_args = parse_args()
     start_time = time.time()
 
     if test_type == Test_Type_E320_XG:
@@ -177,10 +177,12 @@ def main():
         run_E320_tests_for_single_10G_long_duration(
             path, addr, 2, 600, use_dpdk, mgmt_addr)
 
+    success = benchmark_rate_matrix.run_matrix(matrix, path, matrix_args)
+
     end_time = time.time()
     elapsed = end_time - start_time
     print("Elapsed time: {}".format(datetime.timedelta(seconds=elapsed)))
-    return True
+    return success
 
 if __name__ == "__main__":
     sys.exit(not main())
@@ -22,7 +22,9 @@ import argparse
 import sys
 import time
 import datetime
-import batch_run_benchmark_rate
+import benchmark_rate_matrix
+
+matrix = benchmark_rate_matrix.TestMatrix()
 
 Test_Type_N310_XG = "N310_XG"
 Test_Type_N310_Liberio = "N310_Liberio"
@@ -70,20 +72,18 @@ def parse_args():
         "--use_dpdk",
         action='store_true',
         help="enable DPDK")
+    benchmark_rate_matrix.add_arguments(parser)
     args = parser.parse_args()
 
     return args.path, args.test_type, args.addr, args.second_addr,\
-        args.mgmt_addr, args.use_dpdk
+        args.mgmt_addr, args.use_dpdk, args
 
 def run_test(path, params, iterations, label):
     """
-    Runs benchmark rate for the number of iterations in the command line arguments
+    Adds a benchmark rate configuration to the test matrix. The tests are run
+    once all configurations have been added.
     """
-    print("-----------------------------------------------------------")
-    print(label + "\n")
-    results = batch_run_benchmark_rate.run(path, iterations, params)
-    stats = batch_run_benchmark_rate.calculate_stats(results)
-    print(batch_run_benchmark_rate.get_summary_string(stats, iterations, params))
+    matrix.add(label, params, iterations)
 
 
 def run_N310_tests_for_single_10G(
@@ -1048,7 +1048,7 @@ def run_N320_tests_for_dual_10G(
 
 
 def main():
-    path, test_type, addr, second_addr, mgmt_addr, use_dpdk = parse_args()
+    path, test_type, addr, second_addr, mgmt_addr, use_dpdk, matrix_args = parse_args()
     start_time = time.time()
 
     if test_type == Test_Type_N310_XG:
@@ -1076,10 +1076,12 @@ def main():
         run_N320_tests_for_dual_10G(
             path, addr, second_addr, 10, 30, use_dpdk, mgmt_addr)
 
+    success = benchmark_rate_matrix.run_matrix(matrix, path, matrix_args)
+
     end_time = time.time()
     elapsed = end_time - start_time
     print("Elapsed time: {}".format(datetime.timedelta(seconds=elapsed)))
-    return True
+    return success
 
 if __name__ == "__main__":
     sys.exit(not main())
@@ -14,12 +14,17 @@ parameter:
 
 Example usage::
 run_X4xx_max_rate_tests.py --path <benchmark_rate_dir>/benchmark_rate --addr 192.168.10.2 --second_addr 192.168.20.2 --mgmt_addr 192.168.40.2 --test_type 1x100Gbe --use_dpdk 1
+
+Passing the path to the Python benchmark_rate.py example instead runs all
+tests within this process, reusing a single device session.
 """
 import argparse
 import sys
 import time
 import datetime
-import batch_run_benchmark_rate
+import benchmark_rate_matrix
+
+matrix = benchmark_rate_matrix.TestMatrix()
 
 
 def parse_args():
@@ -58,18 +63,16 @@ def parse_args():
         default = False,
         action="store_true",
         help="enable DPDK (you must run the script as root to use this)")
+    benchmark_rate_matrix.add_arguments(parser)
 
     return parser.parse_args()
 
 def run_test(path, params, iterations, label):
     """
-    Runs benchmark rate for the number of iterations in the command line arguments.
+    Adds a benchmark rate configuration to the test matrix. The tests are run
+    once all configurations have been added.
     """
-    print("-----------------------------------------------------------")
-    print(label + "\n")
-    results = batch_run_benchmark_rate.run(path, iterations, params)
-    stats = batch_run_benchmark_rate.calculate_stats(results)
-    print(batch_run_benchmark_rate.get_summary_string(stats, iterations, params))
+    matrix.add(label, params, iterations)
 
 def run_tests_for_single(path, base_params, iterations, duration, rate):
 
@@ -122,7 +125,7 @@ def run_tests_for_single(path, base_params, iterations, duration, rate):
     run_test(path, trx_params, iterations, "2xTRX @"+ str(rate/2e6) +" Msps")
 
 
-def run_tests_for_dual(base_params, path, duration, iterations, rate):
+def run_tests_for_dual(path, base_params, iterations, duration, rate):
 
     base_params["duration"] = duration
 
@@ -184,10 +187,12 @@ def main():
     # Run 2 test iterations for 600 seconds each
     test_config[args.test_type](args.path, base_params, 2, 600, rate[args.test_type])
 
+    success = benchmark_rate_matrix.run_matrix(matrix, args.path, args)
+
     end_time = time.time()
     elapsed = end_time - start_time
     print("Elapsed time: {}".format(datetime.timedelta(seconds=elapsed)))
-    return True
+    return success
 
 if __name__ == "__main__":
     sys.exit(not main())
@@ -9,11 +9,13 @@ example.
 import argparse
 import subprocess
 
-def run(path, params):
+def run(path, params, host=None):
     """
     Run benchmark rate and return a CompletedProcess object.
+
+    If host is given, benchmark rate is run on that machine using ssh.
     """
-    proc_params = [path]
+    proc_params = ["ssh", host, path] if host else [path]
 
     for key, val in params.items():
         proc_params.append("--" + str(key))
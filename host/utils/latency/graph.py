@@ -6,11 +6,9 @@
 # SPDX-License-Identifier: GPL-3.0-or-later
 #
 
-import sys, re
+import os, sys, re
 from optparse import OptionParser
 
-import matplotlib.pyplot as plt
-import matplotlib.font_manager
 import numpy as np
 
 try:
@@ -55,18 +53,10 @@ def _sort(series, keys):
 
 
 def _order(series, sort_list):
-    if len(sort_list) == 0:
-        return series
-    (sort_key, sort_key_list) = sort_list[0]
-    if len(sort_key_list) == 0:
-        return []
-    #print sort_key, sort_key_list
-    l = []
-    for s in series:
-        if s[sort_key] == sort_key_list[0]:
-            l += [s]
-    #print l
-    return _order(l, sort_list[1:]) + _order(series, [(sort_list[0][0], sort_list[0][1][1:])] + sort_list[1:])
+    # Sort by the rank of each value within its (already ordered) key list.
+    # The sort is stable, so series with identical keys keep their order.
+    ranks = [(key, {val: idx for idx, val in enumerate(vals)}) for (key, vals) in sort_list]
+    return sorted(series, key=lambda s: tuple(rank[s[key]] for (key, rank) in ranks))
 
 
 def get_option_parser():
@@ -85,6 +75,8 @@ def get_option_parser():
     parser.add_option("", "--title", type="string", help="additional title [default: %default]", default=None)
     parser.add_option("", "--legend", type="string", help="legend position [default: %default]", default="lower right")
     parser.add_option("", "--diff", action="store_true", help="compare results instead of just plotting them", default=None)
+    parser.add_option("", "--no-cache", action="store_true", help="always parse the text files, don't read or write binary caches", default=False)
+    parser.add_option("", "--no-plot", action="store_true", help="only load (and diff) the data, don't plot it", default=False)
     return parser
 
 
@@ -116,7 +108,7 @@ def get_sorted_series(args, options):
             if options.id is None:
                 options.id = x['id']
             elif options.id != x['id']:
-                print "Different IDs:", options.id, x['id']
+                print("Different IDs:", options.id, x['id'])
         idx = line.find("-rate_")
         if idx > -1:
             idx += 6
@@ -131,7 +123,7 @@ def get_sorted_series(args, options):
         if idx > -1:
             idx += 5
             #idx2 = line.find(".", idx)
-            idx2 = re.search("\D", line[idx:])
+            idx2 = re.search(r"\D", line[idx:])
             if idx2:
                 idx2 = idx + idx2.start()
             else:
@@ -139,17 +131,17 @@ def get_sorted_series(args, options):
             x['spp'] = int(line[idx:idx2])
         idx = line.rfind(".")
         if idx > -1 and idx >= idx2:
-            idx2 = re.search("\d", line[::-1][len(line) - idx:])
+            idx2 = re.search(r"\d", line[::-1][len(line) - idx:])
             if idx2 and (idx2.start() > 0):
                 idx2 = idx2.start()
                 x['suffix'] = line[::-1][len(line) - idx:][0:idx2][::-1]
-        print x
+        print(x)
         series += [x]
 
     sort_keys = options.sort.split()
-    print sort_keys
+    print(sort_keys)
     sorted_key_list = _sort(series, sort_keys)
-    print sorted_key_list
+    print(sorted_key_list)
     series = _order(series, sorted_key_list)
 
     return series
@@ -167,27 +159,68 @@ def main():
     series = get_sorted_series(args, options)
 
     # Read in actual data sets from file
-    data = read_series_data(series)
+    data = read_series_data(series, use_cache=not options.no_cache)
 
     if options.diff:
         data = calculate_data_diff(data)
 
+    if options.no_plot:
+        return 0
 
     # Get all the wanted properties for this plot
     plt_props = get_plt_props(options)
-    print plt_props
+    print(plt_props)
 
     mpl_plot(data, plt_props)
 
     return 0
 
 
-def read_series_data(series):
+def parse_series_file(filename):
+    """
+    Parse a text file with one 'x y' pair per line into a 2xN array.
+    """
+    with open(filename, 'rb') as f:
+        values = np.array(f.read().split(), dtype=np.float64)
+    if values.size % 2:
+        # Not a plain list of pairs, let loadtxt figure it out
+        return np.loadtxt(filename, delimiter=" ", unpack=True)
+    return values.reshape(-1, 2).T
+
+
+def load_series_file(filename, use_cache=True):
+    """
+    Load a data set as a 2xN array of x and y values.
+
+    Parsed files are cached as .<filename>.npy next to the original file
+    (hidden, so they don't show up when globbing for result files). The cache
+    is used as long as it is newer than the text file.
+    """
+    cache_name = os.path.join(os.path.dirname(filename),
+                              "." + os.path.basename(filename) + ".npy")
+    if use_cache:
+        try:
+            if os.path.getmtime(cache_name) >= os.path.getmtime(filename):
+                return np.load(cache_name)
+        except (OSError, ValueError):
+            pass
+    data = parse_series_file(filename)
+    if use_cache:
+        try:
+            with open(cache_name + ".tmp", 'wb') as f:
+                np.save(f, data)
+            os.replace(cache_name + ".tmp", cache_name)
+        except OSError:
+            pass # Read-only directory, just don't cache
+    return data
+
+
+def read_series_data(series, use_cache=True):
     if series is None: return []
     result = []
     for s in series:
         data = {}
-        [data_x, data_y] = np.loadtxt(s['file'], delimiter=" ", unpack=True)
+        [data_x, data_y] = load_series_file(s['file'], use_cache)
         data['x'] = data_x
         data['y'] = data_y
         data['metadata'] = s
@@ -204,13 +237,21 @@ def find_values(data, key):
     return result
 
 
-def find_match(data, key, val):
-    result = []
+def group_data(data, keys):
+    """
+    Group data sets by the values of their metadata keys, in a single pass.
+
+    Returns a list of lists of data sets. The groups are ordered by the order
+    in which the values of each key first appear in data (the first key being
+    the most significant one).
+    """
+    groups = {}
     for d in data:
-        meta = d['metadata']
-        if meta[key] == val:
-            result.append(d)
-    return result
+        groups.setdefault(tuple(d['metadata'][key] for key in keys), []).append(d)
+    first_seen = [{val: idx for idx, val in enumerate(find_values(data, key))} for key in keys]
+    order = sorted(groups, key=lambda group_key: tuple(
+        rank[val] for rank, val in zip(first_seen, group_key)))
+    return [groups[group_key] for group_key in order]
 
 def get_data_diff(data):
     if not data:
@@ -218,13 +259,11 @@ def get_data_diff(data):
     if len(data) < 2:
         return data[0] # Single data set. Can't calculate a diff.
 
-    print "diff %d: rate %s, spb %s, spp %s" % (len(data), data[0]['metadata']['rate'], data[0]['metadata']['spb'], data[0]['metadata']['spp'])
+    print("diff %d: rate %s, spb %s, spp %s" % (len(data), data[0]['metadata']['rate'], data[0]['metadata']['spb'], data[0]['metadata']['spp']))
 
     data = align_data(data)
 
-    min_len = len(data[0]['x'])
-    for d in data:
-        min_len = min(min_len, len(d['x']))
+    min_len = min(len(d['x']) for d in data)
 
     metadiff = ""
     for d in data:
@@ -234,14 +273,10 @@ def get_data_diff(data):
         metadiff += m + "-"
 
     xd = data[0]['x'][0:min_len]
-    yd = data[0]['y'][0:min_len]
     meta = data[0]['metadata']
     meta['diff'] = metadiff
-    other = data[1:]
-    for d in other:
-        y = d['y']
-        for i in range(len(yd)):
-            yd[i] -= y[i]
+    # Subtract all other data sets from the first one
+    yd = data[0]['y'][0:min_len] - np.sum([d['y'][0:min_len] for d in data[1:]], axis=0)
 
     result = {}
     result['x'] = xd
@@ -250,12 +285,11 @@ def get_data_diff(data):
     return result
 
 def align_data(data):
-    x_start = 0
-    for d in data:
-        x_start = max(x_start, d['x'][0])
+    x_start = max([0] + [d['x'][0] for d in data])
 
     for i in range(len(data)):
-        s = np.where(data[i]['x'] == x_start)[0]
+        s = np.flatnonzero(data[i]['x'] == x_start)
+        s = s[0] if len(s) else np.searchsorted(data[i]['x'], x_start)
         data[i]['x'] = data[i]['x'][s:]
         data[i]['y'] = data[i]['y'][s:]
 
@@ -266,18 +300,8 @@ def calculate_data_diff(data):
     spps = find_values(data, "spp")
     spbs = find_values(data, "spb")
     rates = find_values(data, "rate")
-    print spps, "\t", spbs, "\t", rates
-    result = []
-    for rate in rates:
-        rd = find_match(data, "rate", rate)
-        for spb in spbs:
-            bd = find_match(rd, "spb", spb)
-            for spp in spps:
-                pd = find_match(bd, "spp", spp)
-                if len(pd) > 0:
-                    result.append(get_data_diff(pd))
-
-    return result
+    print(spps, "\t", spbs, "\t", rates)
+    return [get_data_diff(pd) for pd in group_data(data, ["rate", "spb", "spp"])]
 
 
 def get_plt_props(options):
@@ -318,6 +342,10 @@ def get_plt_props(options):
 
 
 def mpl_plot(data, props):
+    # Only needed for plotting, which is optional
+    import matplotlib.pyplot as plt
+    import matplotlib.font_manager
+
     plt_out = props['output']
     plt_title = props['title']
     plt_xlabel = props['xlabel']
@@ -362,7 +390,7 @@ def mpl_plot(data, props):
 
 def get_legend_str(meta):
     lt = ""
-    if meta.has_key('diff') and meta['diff']:
+    if meta.get('diff'):
         lt += meta['diff'] + " "
     lt += "%ssps, SPB %d, SPP %d" % (_format_rate(meta['rate']), meta['spb'], meta['spp'])
     return lt
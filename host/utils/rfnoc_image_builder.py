@@ -26,6 +26,7 @@ import yaml
 
 logging.basicConfig(format='[%(levelname).3s] %(message)s')
 
+from uhd.imgbuilder import builder_cache
 from uhd.imgbuilder import image_builder
 from uhd.imgbuilder import yaml_utils
 
@@ -105,11 +106,21 @@ def setup_parser():
         help="Path to the base install for Xilinx Vivado if not in default "
              "location (e.g., /tools/Xilinx/Vivado).",
         default=None)
+    parser.add_argument(
+        "--no-cache",
+        help="Do not use cached configuration files and always regenerate "
+             "the image core files",
+        action="store_true")
+    parser.add_argument(
+        "--cache-file",
+        help="Path to the image builder cache file "
+             "(default: {})".format(builder_cache.get_default_cache_path()),
+        default=None)
 
     return parser
 
 
-def image_config(args):
+def image_config(args, cache=None):
     """
     Load image configuration.
 
@@ -117,10 +128,11 @@ def image_config(args):
     GNU Radio Companion grc. In latter case the grc files is converted into a
     RFNoC image configuration on the fly.
     :param args: arguments passed to the script.
+    :param cache: optional BuilderCache to skip repeated schema validations
     :return: image configuration as dictionary
     """
     if args.yaml_config:
-        config = yaml_utils.load_config(args.yaml_config, get_config_path())
+        config = yaml_utils.load_config(args.yaml_config, get_config_path(), cache)
         device = config.get('device') if args.device is None else args.device
         target = config.get('default_target') if args.target is None else args.target
         image_core_name = config.get('image_core_name') if args.image_core_name is None else args.image_core_name
@@ -201,7 +213,8 @@ def main():
     if args.log_level is not None:
         logging.root.setLevel(args.log_level.upper())
 
-    config, source, device, image_core_name, target = image_config(args)
+    cache = builder_cache.BuilderCache(args.cache_file, enabled=not args.no_cache)
+    config, source, device, image_core_name, target = image_config(args, cache)
     source_hash = hashlib.sha256()
     with open(source, "rb") as source_file:
         source_hash.update(source_file.read())
@@ -222,6 +235,7 @@ def main():
         router_hex_path=args.router_hex_output,
         include_paths=args.include_dir,
         vivado_path=args.vivado_path,
+        cache=cache,
         )
 
 if __name__ == "__main__":
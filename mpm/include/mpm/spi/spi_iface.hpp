@@ -10,6 +10,7 @@
 #include <boost/noncopyable.hpp>
 #include <memory>
 #include <string>
+#include <vector>
 
 namespace mpm { namespace spi {
 
@@ -36,6 +37,25 @@ public:
      */
     virtual uint32_t transfer24_16(const uint32_t data) = 0;
 
+    /*! Convenience function: A sequence of 24 bits write, 16 bits read xfers.
+     *
+     * Implementations may combine all xfers into a single bus access. The
+     * default implementation calls transfer24_16() for every xfer.
+     *
+     * \param data The write data for each xfer
+     *
+     * \return 16 bits worth of the return xfer for every xfer
+     */
+    virtual std::vector<uint32_t> transfer24_16_multi(const std::vector<uint32_t>& data)
+    {
+        std::vector<uint32_t> result;
+        result.reserve(data.size());
+        for (const uint32_t xfer_data : data) {
+            result.push_back(transfer24_16(xfer_data));
+        }
+        return result;
+    }
+
     /*! Convenience function: SPI xfer is 64 bits write, 40 bits read.
      *
      * \param data The write data for this xfer
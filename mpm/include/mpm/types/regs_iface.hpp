@@ -8,6 +8,8 @@
 
 #include <boost/noncopyable.hpp>
 #include <memory>
+#include <stdexcept>
+#include <vector>
 
 namespace mpm { namespace types {
 
@@ -34,6 +36,37 @@ public:
      */
     virtual void poke16(const uint32_t addr, const uint16_t data) = 0;
 
+    /*! Return 16-bit values from a list of addresses
+     *
+     * Implementations may combine all reads into a single bus access. The
+     * default implementation calls peek16() for every address.
+     */
+    virtual std::vector<uint16_t> peek16_multi(const std::vector<uint32_t>& addrs)
+    {
+        std::vector<uint16_t> result;
+        result.reserve(addrs.size());
+        for (const uint32_t addr : addrs) {
+            result.push_back(peek16(addr));
+        }
+        return result;
+    }
+
+    /*! Write 16-bit values to a list of addresses
+     *
+     * Implementations may combine all writes into a single bus access. The
+     * default implementation calls poke16() for every address.
+     */
+    virtual void poke16_multi(
+        const std::vector<uint32_t>& addrs, const std::vector<uint16_t>& data)
+    {
+        if (addrs.size() != data.size()) {
+            throw std::invalid_argument("Number of addresses and values must match");
+        }
+        for (size_t i = 0; i < addrs.size(); i++) {
+            poke16(addrs[i], data[i]);
+        }
+    }
+
     /*! Return a 32-bit value from a given address
      */
     virtual uint32_t peek32(const uint64_t addr) = 0;
@@ -11,6 +11,7 @@
 #include "log_buf.hpp"
 #include "mmap_regs_iface.hpp"
 #include "regs_iface.hpp"
+#include <pybind11/stl.h>
 
 void export_types(py::module& top_module)
 {
@@ -26,6 +27,8 @@ void export_types(py::module& top_module)
         .def("poke8", &regs_iface::poke8)
         .def("peek16", &regs_iface::peek16)
         .def("poke16", &regs_iface::poke16)
+        .def("peek16_multi", &regs_iface::peek16_multi)
+        .def("poke16_multi", &regs_iface::poke16_multi)
         .def("peek32", &regs_iface::peek32)
         .def("poke32", &regs_iface::poke32);
 
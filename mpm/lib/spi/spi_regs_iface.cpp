@@ -72,6 +72,41 @@ public:
         _spi_iface->transfer24_16(transaction);
     }
 
+    std::vector<uint16_t> peek16_multi(const std::vector<uint32_t>& addrs)
+    {
+        std::vector<uint32_t> transactions;
+        transactions.reserve(addrs.size());
+        for (const uint32_t addr : addrs) {
+            transactions.push_back(0 | (addr << _addr_shift) | _read_flags);
+        }
+
+        std::vector<uint16_t> result;
+        result.reserve(addrs.size());
+        for (const uint32_t data : _spi_iface->transfer24_16_multi(transactions)) {
+            if ((data & 0xFFFF0000) != 0) {
+                throw mpm::runtime_error("SPI read returned too much data");
+            }
+            result.push_back(data);
+        }
+        return result;
+    }
+
+    void poke16_multi(
+        const std::vector<uint32_t>& addrs, const std::vector<uint16_t>& data)
+    {
+        if (addrs.size() != data.size()) {
+            throw mpm::runtime_error("Number of addresses and values must match");
+        }
+        std::vector<uint32_t> transactions;
+        transactions.reserve(addrs.size());
+        for (size_t i = 0; i < addrs.size(); i++) {
+            transactions.push_back(0 | _write_flags | (addrs[i] << _addr_shift)
+                                   | (data[i] << _data_shift));
+        }
+
+        _spi_iface->transfer24_16_multi(transactions);
+    }
+
     uint32_t peek32(const uint64_t addr)
     {
         /* Note: _addr_shift and _read_flags will be offset from the
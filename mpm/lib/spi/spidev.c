@@ -138,3 +138,42 @@ int transfer(
     return 0;
 }
 
+int transfer_multi(
+        int fd,
+        uint8_t *tx, uint8_t *rx, uint32_t len, uint32_t num_xfers,
+        uint32_t speed_hz, uint8_t bits_per_word, uint16_t delay_us
+) {
+    int err;
+    struct spi_ioc_transfer tr[SPIDEV_MAX_XFERS_PER_MSG];
+
+    while (num_xfers > 0) {
+        const uint32_t num_msg_xfers = (num_xfers > SPIDEV_MAX_XFERS_PER_MSG) ?
+            SPIDEV_MAX_XFERS_PER_MSG : num_xfers;
+        memset(tr, 0, sizeof(tr));
+        for (uint32_t i = 0; i < num_msg_xfers; i++) {
+            tr[i].tx_buf = (unsigned long) (tx + i * len);
+            tr[i].rx_buf = (unsigned long) (rx + i * len);
+            tr[i].len = len;
+            tr[i].speed_hz = speed_hz;
+            tr[i].delay_usecs = delay_us;
+            tr[i].bits_per_word = bits_per_word;
+            // Deassert chip select between transfers (the last transfer
+            // deasserts it anyway)
+            tr[i].cs_change = (i + 1 < num_msg_xfers) ? 1 : 0;
+            tr[i].tx_nbits = 1; // Standard SPI
+            tr[i].rx_nbits = 1; // Standard SPI
+        }
+
+        err = ioctl(fd, SPI_IOC_MESSAGE(num_msg_xfers), tr);
+        if (err < 0) {
+            fprintf(stderr, "%s: Failed ioctl: %d\n", __func__, err);
+            perror("ioctl: \n");
+            return err;
+        }
+        tx += num_msg_xfers * len;
+        rx += num_msg_xfers * len;
+        num_xfers -= num_msg_xfers;
+    }
+
+    return 0;
+}
@@ -43,3 +43,31 @@ int transfer(
         uint32_t speed_hz, uint8_t bits_per_word, uint16_t delay_us
 );
 
+
+/*! Maximum number of transfers that transfer_multi() combines into a single
+ * spidev message
+ */
+#define SPIDEV_MAX_XFERS_PER_MSG 128
+
+/*! Do a sequence of SPI transactions of equal length over spidev
+ *
+ * The transactions are handed to the kernel in as few spidev messages as
+ * possible. Chip select is deasserted between transactions.
+ *
+ * \param tx Buffer of data to be written, num_xfers * len bytes
+ * \param rx Must match tx buffer length; results will be written here
+ * \param len Number of bytes per transaction
+ * \param num_xfers Number of transactions
+ * \param speed_hz Speed of the transactions in Hz
+ * \param bits_per_word 8, dude
+ * \param delay_us Delay between transfers
+ *
+ * Assumption: spidev was configured properly beforehand.
+ *
+ * \returns 0 if all is golden
+ */
+int transfer_multi(
+        int fd,
+        uint8_t *tx, uint8_t *rx, uint32_t len, uint32_t num_xfers,
+        uint32_t speed_hz, uint8_t bits_per_word, uint16_t delay_us
+);
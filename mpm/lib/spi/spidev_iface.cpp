@@ -14,6 +14,7 @@ extern "C" {
 #include <linux/spi/spidev.h>
 #include <boost/format.hpp>
 #include <iostream>
+#include <vector>
 
 using namespace mpm::spi;
 
@@ -79,6 +80,32 @@ public:
         return uint32_t(rx[1] << 8 | rx[2]);
     }
 
+    std::vector<uint32_t> transfer24_16_multi(const std::vector<uint32_t>& data)
+    {
+        std::vector<uint8_t> tx;
+        tx.reserve(3 * data.size());
+        for (const uint32_t xfer_data : data) {
+            tx.push_back((xfer_data >> 16) & 0xFF);
+            tx.push_back((xfer_data >> 8) & 0xFF);
+            tx.push_back(xfer_data & 0xFF);
+        }
+        std::vector<uint8_t> rx(tx.size()); // Buffer length must match tx buffer
+
+        if (!data.empty()
+            && transfer_multi(
+                   _fd, tx.data(), rx.data(), 3, data.size(), _speed, _bits, _delay)
+                   != 0) {
+            throw mpm::runtime_error(str(boost::format("SPI Transaction failed!")));
+        }
+
+        std::vector<uint32_t> result;
+        result.reserve(data.size());
+        for (size_t i = 0; i < data.size(); i++) {
+            result.push_back(uint32_t(rx[3 * i + 1] << 8 | rx[3 * i + 2]));
+        }
+        return result;
+    }
+
     uint64_t transfer64_40(const uint64_t data_)
     {
         uint64_t data    = data_;
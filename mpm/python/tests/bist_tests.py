@@ -0,0 +1,114 @@
+#
+# Copyright 2021 Ettus Research, a National Instruments Brand
+#
+# SPDX-License-Identifier: GPL-3.0-or-later
+#
+"""
+Tests related to usrp_mpm.bist
+"""
+
+import os
+import time
+import shutil
+import tempfile
+import threading
+import unittest
+from argparse import Namespace
+from base_tests import TestBase
+from usrp_mpm import bist
+
+
+class MockBIST(bist.UsrpBIST):
+    """
+    UsrpBIST that doesn't parse the command line
+    """
+    usrp_type = "MOCK"
+    test_resources = {
+        'rtc': set(),
+        'temp': {'thermal'},
+        'fan': {'fan'},
+        'gpsdo': {'gps', 'thermal'},
+    }
+    cache_ttl = {'tpm': 60}
+
+    def __init__(self, cache_dir, jobs=4):
+        # pylint: disable=super-init-not-called
+        self.args = Namespace(
+            jobs=jobs, no_cache=False, dry_run=False, option={})
+        self.mb_rev = 0
+        self.CACHE_DIR = cache_dir
+        self._cache_lock = threading.Lock()
+
+
+class TestUsrpBIST(TestBase):
+    """
+    Tests for the UsrpBIST scheduler and results cache
+    """
+    def setUp(self):
+        self.cache_dir = os.path.join(tempfile.mkdtemp(), 'cache')
+        self.bist = MockBIST(self.cache_dir)
+
+    def tearDown(self):
+        shutil.rmtree(os.path.dirname(self.cache_dir))
+
+    def test_can_start(self):
+        """
+        Checks that only tests without shared resources can run together
+        """
+        self.assertTrue(self.bist.can_start('ddr3', []))
+        self.assertTrue(self.bist.can_start('fan', ['temp', 'rtc']))
+        self.assertFalse(self.bist.can_start('gpsdo', ['temp']))
+        # Undeclared tests run by themselves
+        self.assertFalse(self.bist.can_start('ddr3', ['rtc']))
+        self.assertFalse(self.bist.can_start('rtc', ['ddr3']))
+        self.bist.args.jobs = 1
+        self.assertFalse(self.bist.can_start('fan', ['temp']))
+
+    def test_run_tests(self):
+        """
+        Checks that all tests are run, and conflicting tests never overlap
+        """
+        lock = threading.Lock()
+        running = set()
+        overlaps = []
+        def execute_test(test):
+            with lock:
+                overlaps.extend(
+                    (test, other) for other in running
+                    if not self.bist.can_start(test, [other]))
+                running.add(test)
+            time.sleep(0.05)
+            with lock:
+                running.remove(test)
+            return True, {'test': test}
+        tests = {'rtc', 'temp', 'fan', 'gpsdo', 'ddr3', 'tpm'}
+        results = self.bist.run_tests(tests, execute_test)
+        self.assertEqual(set(results), tests)
+        self.assertEqual(results['fan'], (True, {'test': 'fan'}))
+        self.assertEqual(overlaps, [])
+
+    def test_cache(self):
+        """
+        Checks that successful results of cacheable tests are reused until
+        their TTL expires
+        """
+        self.bist.store_cached_result('tpm', True, {'caps': 'foo'})
+        self.bist.store_cached_result('rtc', True, {'time': 0})
+        self.assertEqual(self.bist.get_cached_result('tpm'),
+                         (True, {'caps': 'foo'}))
+        self.assertIsNone(self.bist.get_cached_result('rtc'))
+        self.assertEqual(os.stat(self.cache_dir).st_mode & 0o777, 0o700)
+        self.bist.args.no_cache = True
+        self.assertIsNone(self.bist.get_cached_result('tpm'))
+        self.bist.args.no_cache = False
+        self.bist.cache_ttl = {'tpm': -1}
+        self.assertIsNone(self.bist.get_cached_result('tpm'))
+        # Failed results are never cached
+        self.bist.cache_ttl = {'tpm': 60}
+        os.unlink(self.bist.get_cache_file())
+        self.bist.store_cached_result('tpm', False, {})
+        self.assertIsNone(self.bist.get_cached_result('tpm'))
+
+
+if __name__ == '__main__':
+    unittest.main()
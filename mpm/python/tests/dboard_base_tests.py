@@ -0,0 +1,80 @@
+#
+# Copyright 2021 Ettus Research, a National Instruments Brand
+#
+# SPDX-License-Identifier: GPL-3.0-or-later
+#
+"""
+Tests related to the init state tracking of usrp_mpm.dboard_manager.base
+"""
+
+import unittest
+from base_tests import TestBase
+from usrp_mpm import mpmlog
+from usrp_mpm.dboard_manager.base import DboardManagerBase
+
+
+class MockDboard(DboardManagerBase):
+    """
+    Daughterboard with multiple init stages
+    """
+    init_stages = [
+        ('clocks', [('ref_clk_freq', '10e6')]),
+        ('jesd', [('jesd_rate', 'auto')]),
+        ('cals', [('init_cals', 'DEFAULT'), ('tracking_cals', 'DEFAULT')]),
+    ]
+
+    def __init__(self):
+        DboardManagerBase.__init__(self, 0)
+        self.master_clock_rate = 125e6
+
+    def get_init_state(self, args):
+        return {'clocks': {'master_clock_rate': self.master_clock_rate}}
+
+
+class TestDboardInitState(TestBase):
+    """
+    Tests for DboardManagerBase.get_init_stages()
+    """
+    def setUp(self):
+        mpmlog.get_main_logger(use_console=False, use_journal=False)
+        self.dboard = MockDboard()
+
+    def test_stages(self):
+        """
+        Checks that a changed stage reruns it and all following stages
+        """
+        all_stages = ['clocks', 'jesd', 'cals']
+        args = {'jesd_rate': '4915.2e6'}
+        self.assertEqual(self.dboard.get_init_stages(args), all_stages)
+        self.dboard.set_init_done(args)
+        self.assertEqual(self.dboard.get_init_stages(args), [])
+        # Default values are part of the state
+        self.assertEqual(
+            self.dboard.get_init_stages(dict(args, init_cals='DEFAULT')), [])
+        self.assertEqual(
+            self.dboard.get_init_stages(dict(args, tracking_cals='ALL')),
+            ['cals'])
+        self.assertEqual(
+            self.dboard.get_init_stages(dict(args, jesd_rate='auto')),
+            ['jesd', 'cals'])
+        self.dboard.master_clock_rate = 122.88e6
+        self.assertEqual(self.dboard.get_init_stages(args), all_stages)
+        self.dboard.set_init_done(args)
+        self.assertEqual(self.dboard.get_init_stages(args), [])
+
+    def test_full_init(self):
+        """
+        Checks that invalidating the state or force_reinit runs all stages
+        """
+        all_stages = ['clocks', 'jesd', 'cals']
+        self.dboard.set_init_done({})
+        self.assertEqual(
+            self.dboard.get_init_stages({'force_reinit': '1'}), all_stages)
+        self.assertEqual(
+            self.dboard.get_init_stages({'force_reinit': '0'}), [])
+        self.dboard.invalidate_init_state()
+        self.assertEqual(self.dboard.get_init_stages({}), all_stages)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -3,6 +3,7 @@
 #
 # SPDX-License-Identifier: GPL-3.0-or-later
 #
+import threading
 import unittest
 from base_tests import TestBase
 from usrp_mpm import mpmutils
@@ -50,6 +51,87 @@ class TestMpmUtils(TestBase):
         finally:
             self.assertEqual(my_resource.locked, False)
 
+    def test_task_graph_order(self):
+        """
+        Checks that tasks only run after their dependencies have completed
+        """
+        for serialize in (False, True):
+            order = []
+            tasks = mpmutils.TaskGraph(serialize=serialize)
+            tasks.add('a', lambda: order.append('a'))
+            tasks.add('b', lambda: order.append('b'), deps=['a'])
+            tasks.add('c', lambda: order.append('c'))
+            tasks.add('d', lambda: order.append('d'), deps=['b', 'c'])
+            tasks.run()
+            self.assertEqual(sorted(order), ['a', 'b', 'c', 'd'])
+            self.assertLess(order.index('a'), order.index('b'))
+            self.assertLess(order.index('b'), order.index('d'))
+            self.assertLess(order.index('c'), order.index('d'))
+            self.assertEqual(list(tasks.get_durations()), ['a', 'b', 'c', 'd'])
+            if serialize:
+                self.assertEqual(order, ['a', 'b', 'c', 'd'])
+        with self.assertRaises(ValueError):
+            tasks.add('e', lambda: None, deps=['f'])
+        with self.assertRaises(ValueError):
+            tasks.add('a', lambda: None)
+
+    def test_task_graph_concurrency(self):
+        """
+        Checks that independent tasks run concurrently
+        """
+        barrier = threading.Barrier(2, timeout=5)
+        tasks = mpmutils.TaskGraph()
+        tasks.add('a', barrier.wait)
+        tasks.add('b', barrier.wait)
+        tasks.run()
+
+    def test_task_graph_failure(self):
+        """
+        Checks that a failing task stops its dependents and raises
+        """
+        def fail():
+            raise RuntimeError("This is just a drill")
+        ran = []
+        tasks = mpmutils.TaskGraph()
+        tasks.add('a', fail)
+        tasks.add('b', lambda: ran.append('b'), deps=['a'])
+        with self.assertRaises(RuntimeError):
+            tasks.run()
+        self.assertEqual(ran, [])
+        self.assertEqual(list(tasks.get_durations()), ['a'])
+
+    def test_wait_for(self):
+        """
+        Checks that wait_for() returns once the state check succeeds, times
+        out otherwise, and records both in the wait statistics
+        """
+        mpmutils.reset_wait_stats()
+        checks = []
+        def state_check():
+            checks.append(None)
+            return len(checks) == 3
+        self.assertTrue(mpmutils.wait_for(state_check, 1000, 10))
+        self.assertEqual(len(checks), 3)
+        self.assertFalse(
+            mpmutils.wait_for(lambda: False, 20, 5, name='always_false'))
+        stats = mpmutils.get_wait_stats()
+        self.assertEqual(stats['always_false']['timeouts'], 1)
+        site = [name for name in stats if name.endswith('state_check')][0]
+        self.assertEqual(stats[site]['count'], 1)
+        self.assertEqual(stats[site]['timeouts'], 0)
+        self.assertEqual(stats[site]['checks'], 3)
+
+    def test_wait_for_event(self):
+        """
+        Checks that wait_for() wakes up on events instead of polling
+        """
+        event = threading.Event()
+        def event_wait(timeout_s):
+            event.wait(timeout_s)
+        threading.Timer(0.01, event.set).start()
+        self.assertTrue(mpmutils.wait_for(
+            event.is_set, 5000, 5000, event_wait=event_wait))
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -12,6 +12,9 @@ import sys
 import argparse
 from sys_utils_tests import TestNet
 from mpm_utils_tests import TestMpmUtils
+from status_monitor_tests import TestStatusMonitor
+from bist_tests import TestUsrpBIST
+from dboard_base_tests import TestDboardInitState
 from eeprom_tests import TestEeprom
 from usrp_mpm import __simulated__
 
@@ -23,6 +26,9 @@ TESTS = {
     '__all__': {
         TestNet,
         TestMpmUtils,
+        TestStatusMonitor,
+        TestUsrpBIST,
+        TestDboardInitState,
         TestEeprom,
     },
     'n3xx': set(),
@@ -0,0 +1,101 @@
+#
+# Copyright 2021 Ettus Research, a National Instruments Brand
+#
+# SPDX-License-Identifier: GPL-3.0-or-later
+#
+"""
+Tests related to usrp_mpm.status_monitor
+"""
+
+import os
+import threading
+import unittest
+from base_tests import TestBase
+from usrp_mpm import mpmlog
+from usrp_mpm import mpmutils
+from usrp_mpm.status_monitor import StatusMonitor
+
+
+class TestStatusMonitor(TestBase):
+    """
+    Tests for the StatusMonitor scheduler
+    """
+    def setUp(self):
+        self.monitor = StatusMonitor(
+            mpmlog.get_main_logger(use_console=False, use_journal=False))
+
+    def tearDown(self):
+        self.monitor.stop()
+
+    def test_periodic_check(self):
+        """
+        Checks that periodic checks run, cache their value, and call
+        on_change only when the value changes
+        """
+        values = iter([False, False, True])
+        changes = []
+        done = threading.Event()
+        def on_change(value):
+            changes.append(value)
+            if value:
+                done.set()
+        self.monitor.add_check(
+            'locked', lambda: next(values, True), 0.01, on_change=on_change)
+        self.monitor.start()
+        self.assertTrue(done.wait(2))
+        self.assertEqual(changes, [False, True])
+        self.assertTrue(self.monitor.get_state('locked'))
+        self.assertIsNone(self.monitor.get_state('locked', max_age=-1))
+        self.assertIsNone(self.monitor.get_state('unknown'))
+
+    def test_trigger(self):
+        """
+        Checks that trigger() invalidates the state and reruns the check
+        """
+        calls = []
+        rerun = threading.Event()
+        def check():
+            calls.append(None)
+            if len(calls) > 1:
+                rerun.set()
+            return len(calls)
+        self.monitor.add_check('count', check, 60)
+        self.monitor.start()
+        self.monitor.trigger('count')
+        self.assertTrue(rerun.wait(2))
+
+    def test_event_check(self):
+        """
+        Checks that event checks run when their file descriptor is readable
+        """
+        read_fd, write_fd = os.pipe()
+        fault = threading.Event()
+        def on_fault():
+            os.read(read_fd, 1)
+            fault.set()
+            return True
+        self.monitor.add_event_check('fault', read_fd, on_fault)
+        self.monitor.start()
+        os.write(write_fd, b'\0')
+        self.assertTrue(fault.wait(2))
+        self.monitor.stop()
+        self.assertTrue(self.monitor.get_state('fault'))
+        os.close(read_fd)
+        os.close(write_fd)
+
+    def test_closed_event_fd(self):
+        """
+        Checks that an event check whose file descriptor was closed is
+        dropped, and doesn't keep the monitor busy
+        """
+        read_fd, write_fd = os.pipe()
+        self.monitor.add_event_check('fault', read_fd, lambda: True)
+        self.monitor.start()
+        os.close(read_fd)
+        os.close(write_fd)
+        self.monitor.trigger('fault')
+        self.assertTrue(mpmutils.wait_for(
+            lambda: 'fault' not in self.monitor._checks, 2000, 10))
+
+if __name__ == '__main__':
+    unittest.main()
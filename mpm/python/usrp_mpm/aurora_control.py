@@ -12,6 +12,7 @@ import time
 from builtins import str
 from builtins import object
 from usrp_mpm.mpmlog import get_logger
+from usrp_mpm.mpmutils import wait_for
 
 def mean(vals):
     " Calculate arithmetic mean of vals "
@@ -46,6 +47,18 @@ class AuroraControl(object):
 
     DEFAULT_BUS_CLK_RATE = 200e6
 
+    # Timeouts for link-state waits, in milliseconds
+    PHY_LINK_TIMEOUT = 1500
+    BIST_LOCK_TIMEOUT = 500
+    DRAIN_TIMEOUT = 500
+    # Time for the MAC to come out of a clear, in seconds. There is no status
+    # bit for this (the PHY link stays up while the MAC is cleared), so this
+    # can't be replaced by a wait on the link state.
+    RESET_SETTLE_TIME = 1.5
+    # Time the generator runs in every iteration of the latency BIST, in
+    # seconds, before the latency is read from the MAC status
+    LATENCY_RUN_TIME = 0.05
+
     def __init__(self, peeker_poker32, base_addr=None, bus_clk_rate=None):
         assert hasattr(peeker_poker32, 'peek32') \
                 and callable(peeker_poker32.peek32)
@@ -62,8 +75,11 @@ class AuroraControl(object):
         )
         self.peek32 = lambda addr: self._regs.peek32(addr + base_addr)
         self.mac_ctrl = 0x000
+        # State of the current BER BIST, see start_ber_bist()
+        self._ber_start_time = None
+        self._ber_samples = []
         self.set_mac_ctrl(self.mac_ctrl)
-        time.sleep(.5)
+        self.wait_for_phy_link(timeout_ms=500)
         self.bus_clk_rate = bus_clk_rate
         if self.bus_clk_rate is None:
             self.bus_clk_rate = self.DEFAULT_BUS_CLK_RATE
@@ -198,6 +214,49 @@ class AuroraControl(object):
         """
         return bool(self.read_phy_ctrl_status() & 0x1)
 
+    def is_bist_locked(self):
+        """
+        Return True if the BIST checker has locked onto the PRBS word.
+        """
+        return bool(self.read_mac_ctrl_status() & self.MAC_STATUS_BIST_LOCKED_MSK)
+
+    def wait_for_phy_link(self, timeout_ms=PHY_LINK_TIMEOUT):
+        """
+        Wait until the PHY link is up. Returns True if it came up in time.
+        """
+        return wait_for(self.is_phy_link_up, timeout_ms, 50,
+                        name='AuroraControl.wait_for_phy_link')
+
+    def wait_for_bist_lock(self, timeout_ms=BIST_LOCK_TIMEOUT):
+        """
+        Wait until the BIST checker has locked. Returns True if it locked in
+        time.
+        """
+        return wait_for(self.is_bist_locked, timeout_ms, 10,
+                        name='AuroraControl.wait_for_bist_lock')
+
+    def wait_for_drain(self, timeout_ms=DRAIN_TIMEOUT):
+        """
+        Wait until the BIST checker has stopped counting samples, i.e., all
+        data that was in flight has been received. Returns True if the checker
+        stopped within the timeout.
+        """
+        return wait_for(self.make_drain_check(), timeout_ms, 10, 10,
+                        name='AuroraControl.wait_for_drain')
+
+    def make_drain_check(self):
+        """
+        Return a function that returns True once the BIST sample counter
+        stopped changing between two calls.
+        """
+        last_samps = [None]
+        def _drained():
+            samps = self.read_bist_checker_samps()
+            drained = samps == last_samps[0]
+            last_samps[0] = samps
+            return drained
+        return _drained
+
     def reset_core(self):
         " Reset MAC. PHY reset not necessary"
         self.clear_control_reg()
@@ -214,7 +273,8 @@ class AuroraControl(object):
 
         slave -- the other sfp core gets set to loopback mode
         ctrl -- sorta the master sfp core
-        duration -- time we want to run the bist
+        duration -- time we want to run the bist. The BIST is run
+                    repeatedly until this time has passed.
         requested_rate -- Requested BIST rate in bits/s
         """
         rate_word, coerced_rate = \
@@ -231,16 +291,21 @@ class AuroraControl(object):
             'mst_hard_errors': 0,
             'mst_overruns': 0,
         }
+        end_time = time.monotonic() + duration
         try:
-            for _ in range(duration*10):
+            while time.monotonic() < end_time:
                 self.set_bist_rate(rate_word)
                 self.set_bist_checker_and_gen(enable=True)
+                gen_stop_time = time.monotonic() + self.LATENCY_RUN_TIME
                 # Wait and check if BIST locked
-                time.sleep(0.05)
-                mst_status = self.read_mac_ctrl_status()
-                if not mst_status & self.MAC_STATUS_BIST_LOCKED_MSK:
+                if not self.wait_for_bist_lock(
+                        timeout_ms=self.LATENCY_RUN_TIME * 1000):
                     results['mst_lock_errors'] += 1
-                self.log.info('lock errors: %d', results['mst_lock_errors'])
+                    self.log.debug(
+                        'lock errors: %d', results['mst_lock_errors'])
+                # Let the generator run for the full time even if the checker
+                # locked early, the latency is measured while it's running
+                time.sleep(max(0, gen_stop_time - time.monotonic()))
                 # Turn off the BIST generator
                 self.set_bist_gen(0)
                 # Validate status and no overruns
@@ -248,7 +313,7 @@ class AuroraControl(object):
                 results['mst_overruns'] = self.read_overruns()
                 if mst_status & self.MAC_STATUS_HARD_ERR_MSK:
                     results['mst_hard_errors'] += 1
-                time.sleep(0.05)
+                self.wait_for_drain(timeout_ms=50)
                 self.clear_control_reg()
                 # Compute latency
                 results['latencies'].append(
@@ -281,49 +346,74 @@ class AuroraControl(object):
         self.log.info('- Roundtrip Latency Stdev    = %.6fus',
                       stddev(results['latencies'], mu=mu_lat))
         # Turn off BIST loopback
-        time.sleep(0.5)
+        self.wait_for_drain()
         if slave is not None:
             results['sla_overruns'], results['sla_hard_errors'] = \
                     self._get_slave_status(slave)
         self._post_test_cleanup(slave)
         return results
 
-    def run_ber_loopback_bist(self, duration, requested_rate, slave=None):
+    def run_ber_loopback_bist(self, duration, requested_rate, slave=None,
+                              sample_interval=1.0, stop_on_error=False):
         """
         Run BER Bist. Pump lots of bits through, and see how many come back
         correctly.
 
         duration -- Time to run the test in seconds
+        sample_interval -- Time between two reads of the BIST counters
+        stop_on_error -- Stop the test as soon as an error was detected
+
+        See AuroraBist.run() for the other arguments and the results.
+        """
+        return AuroraBist([(self, slave)], self.log).run(
+            duration, requested_rate, sample_interval, stop_on_error)[0]
+
+    def start_ber_bist(self, requested_rate):
+        """
+        Enable the BIST generator and checker for a BER test. Use
+        sample_ber_bist() to read the counters while the test is running, and
+        stop_ber_bist() and get_ber_bist_results() to end it.
         """
         rate_word, coerced_rate = \
                 self.get_rate_setting(requested_rate, self.bus_clk_rate)
-        self.log.info('Running BER Loopback BIST at {}MB/s for {}s...'.format(
-            coerced_rate/8e6, duration
+        self.log.info('Running BER Loopback BIST at {}MB/s...'.format(
+            coerced_rate/8e6
         ))
-        self._pre_test_init(slave)
-        mst_overruns = 0
-        self.log.info("Starting BER test...")
-        start_time = time.time()
         self.set_bist_rate(rate_word)
         self.set_bist_checker_and_gen(enable=True)
-        # Wait and check if BIST locked
-        time.sleep(0.5)
+        self._ber_start_time = time.monotonic()
+        self._ber_samples = []
+
+    def sample_ber_bist(self):
+        """
+        Read the BIST counters of a running BER test, and append them to the
+        time series of this test. Returns the new sample.
+        """
         mst_status = self.read_mac_ctrl_status()
-        if not mst_status & self.MAC_STATUS_BIST_LOCKED_MSK:
-            error_msg = 'BIST engine did not lock onto a PRBS word! ' \
-                        'MAC status word: 0x{:08X}'.format(mst_status)
-            self.log.error(error_msg)
-            raise RuntimeError(error_msg)
-        # Wait for requested time
-        try:
-            time.sleep(duration)
-        except KeyboardInterrupt:
-            self.log.warning('Operation cancelled by user.')
-        # Turn off the BIST generator and loopback
+        sample = {
+            'time': time.monotonic() - self._ber_start_time,
+            'samps': 65536 * self.read_bist_checker_samps(),
+            'errors': self.read_bist_checker_errors(),
+            'hard_error': bool(mst_status & self.MAC_STATUS_HARD_ERR_MSK),
+        }
+        self._ber_samples.append(sample)
+        return sample
+
+    def stop_ber_bist(self):
+        """
+        Turn off the BIST generator. Returns the time the test was running.
+        """
         self.set_bist_gen(enable=False)
+        return time.monotonic() - self._ber_start_time
+
+    def get_ber_bist_results(self, time_elapsed, slave=None):
+        """
+        Read the final counters of a BER test (after the BIST checker was
+        drained), and return the results dictionary.
+        """
         results = {}
-        results['time_elapsed'] = time.time() - start_time
-        time.sleep(0.5)
+        results['time_elapsed'] = time_elapsed
+        results['samples'] = self._ber_samples
         # Validate status and no overruns
         mst_status = self.read_mac_ctrl_status()
         results['mst_overruns'] = self.read_overruns()
@@ -332,7 +422,7 @@ class AuroraControl(object):
         if mst_status & self.MAC_STATUS_HARD_ERR_MSK:
             self.log.error('Hard errors in master PHY')
             results['mst_hard_errors'] = True
-        if mst_overruns > 0:
+        if results['mst_overruns'] > 0:
             self.log.error('Buffer overruns in master PHY')
         if slave is not None:
             results['sla_overruns'], results['sla_hard_errors'] = \
@@ -359,7 +449,6 @@ class AuroraControl(object):
                           results['approx_throughput'] / 1e6)
         else:
             self.log.error('No samples received -- BIST Failed!')
-        self._post_test_cleanup(slave)
         return results
 
     def _get_slave_status(self, slave):
@@ -386,10 +475,18 @@ class AuroraControl(object):
 
     def _pre_test_init(self, slave=None):
         " Set up core(s) for BISTing "
+        self._pre_test_reset(slave)
+        time.sleep(self.RESET_SETTLE_TIME)
+        self._pre_test_loopback(slave)
+
+    def _pre_test_reset(self, slave=None):
+        " Reset core(s) before BISTing "
         self.reset_core()
         if slave is not None:
             slave.reset_core()
-        time.sleep(1.5)
+
+    def _pre_test_loopback(self, slave=None):
+        " Set the slave (if any) into loopback mode, and check the link "
         if slave is not None:
             self.set_loopback(enable=False)
             slave.set_loopback(enable=True)
@@ -401,12 +498,114 @@ class AuroraControl(object):
 
     def _post_test_cleanup(self, slave=None):
         " Drain and Cleanup "
+        self._post_test_drain(slave)
+        self.wait_for_drain()
+        self._post_test_clear(slave)
+
+    def _post_test_drain(self, slave=None):
+        " Enable the checker(s) to drain the remaining data "
         self.log.info('Cleaning up...')
         self.set_bist_checker(enable=True)
         if slave is not None:
             slave.set_bist_checker(enable=True)
-        time.sleep(0.5)
+
+    def _post_test_clear(self, slave=None):
+        " Clear the control register(s) after draining "
         self.clear_control_reg()
         if slave is not None:
             slave.clear_control_reg()
 
+
+class AuroraBist(object):
+    """
+    Runs BER BISTs on multiple Aurora cores (e.g., all SFP ports of a device)
+    at the same time.
+
+    All cores are reset together (so they share a single settle time), and all
+    generators and checkers are started at once. While the tests are running,
+    the BIST counters of all cores are sampled periodically into a time
+    series, so errors are detected while the test is running. Instead of fixed
+    sleeps, the test waits for the checkers to lock and the data to drain.
+    """
+    def __init__(self, links, log=None):
+        """
+        links -- List of (master, slave) tuples of AuroraControl objects. The
+                 slave is set into loopback mode, it can be None if there is a
+                 loopback module plugged into the master's port.
+        """
+        self.log = log or get_logger("AuroraBist")
+        self._links = links
+
+    def _wait_all(self, check, timeout_ms, interval_ms, name):
+        " Wait until check(core) is True for all masters "
+        checks = {master: check(master) for master, _ in self._links}
+        return wait_for(
+            lambda: all([check() for check in checks.values()]),
+            timeout_ms, interval_ms, name=name)
+
+    def run(self, duration, requested_rate, sample_interval=1.0,
+            stop_on_error=False):
+        """
+        Run the BER BIST on all links.
+
+        duration -- Time to run the test in seconds
+        requested_rate -- Requested BIST rate in bits/s
+        sample_interval -- Time between two reads of the BIST counters
+        stop_on_error -- Stop all tests as soon as an error was detected on
+                         any link
+
+        Returns a list with one results dictionary per link. Besides the
+        final counters, the results contain the time series of the counters
+        as 'samples'.
+        """
+        self.log.info("Running BER Loopback BIST on %d link(s) for %.0fs...",
+                      len(self._links), duration)
+        for master, slave in self._links:
+            master._pre_test_reset(slave)
+        # All cores were reset at once, so they only need to settle once
+        time.sleep(AuroraControl.RESET_SETTLE_TIME)
+        for master, slave in self._links:
+            master._pre_test_loopback(slave)
+        for master, _ in self._links:
+            master.start_ber_bist(requested_rate)
+        # Wait and check if BIST locked
+        self._wait_all(lambda core: core.is_bist_locked,
+                       AuroraControl.BIST_LOCK_TIMEOUT, 10,
+                       name='AuroraBist.wait_for_bist_locks')
+        for master, _ in self._links:
+            mst_status = master.read_mac_ctrl_status()
+            if not mst_status & AuroraControl.MAC_STATUS_BIST_LOCKED_MSK:
+                error_msg = 'BIST engine did not lock onto a PRBS word! ' \
+                            'MAC status word: 0x{:08X}'.format(mst_status)
+                master.log.error(error_msg)
+                raise RuntimeError(error_msg)
+        # Sample the counters until the requested time is over
+        end_time = time.monotonic() + duration
+        try:
+            while time.monotonic() < end_time:
+                time.sleep(max(0, min(sample_interval, end_time - time.monotonic())))
+                samples = [master.sample_ber_bist() for master, _ in self._links]
+                if stop_on_error and \
+                        any([s['errors'] or s['hard_error'] for s in samples]):
+                    self.log.error("Errors detected after %.1fs, stopping BIST.",
+                                   samples[0]['time'])
+                    break
+        except KeyboardInterrupt:
+            self.log.warning('Operation cancelled by user.')
+        # Turn off the BIST generators and loopback
+        elapsed = [master.stop_ber_bist() for master, _ in self._links]
+        self._wait_all(lambda core: core.make_drain_check(),
+                       AuroraControl.DRAIN_TIMEOUT, 10,
+                       name='AuroraBist.wait_for_drain')
+        results = [
+            master.get_ber_bist_results(time_elapsed, slave)
+            for (master, slave), time_elapsed in zip(self._links, elapsed)
+        ]
+        for master, slave in self._links:
+            master._post_test_drain(slave)
+        self._wait_all(lambda core: core.make_drain_check(),
+                       AuroraControl.DRAIN_TIMEOUT, 10,
+                       name='AuroraBist.wait_for_drain')
+        for master, slave in self._links:
+            master._post_test_clear(slave)
+        return results
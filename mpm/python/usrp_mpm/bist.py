@@ -14,11 +14,15 @@ import time
 import json
 import select
 import socket
+import tempfile
+import threading
+from concurrent import futures
 from datetime import datetime
 import argparse
 import subprocess
 from six import iteritems
 from usrp_mpm.sys_utils import ectool
+from usrp_mpm.mpmutils import poll_with_timeout # pylint: disable=unused-import
 
 ##############################################################################
 # Aurora/SFP BIST code
@@ -74,31 +78,52 @@ def run_aurora_bist(
     """
     Spawn a BER test
     """
-    from usrp_mpm import aurora_control
-    from usrp_mpm.sys_utils.uio import open_uio
+    return run_aurora_bists(
+        device_args,
+        product_id,
+        [(master, slave)],
+        requested_rate,
+        aurora_image_type,
+    )[0]
 
-    class DummyContext(object):
-        """Dummy class for context managers"""
-        def __enter__(self):
-            return
+def run_aurora_bists(
+        device_args,
+        product_id,
+        links,
+        requested_rate=1300*8e6,
+        aurora_image_type='AA',
+        duration=10):
+    """
+    Spawn BER tests on multiple links at the same time. links is a list of
+    (master, slave) tuples of UIO labels; slave may be None.
 
-        def __exit__(self, exc_type, exc_value, traceback):
-            return exc_type is None
+    Returns a list of results dictionaries, one per link.
+    """
+    from contextlib import ExitStack
+    from usrp_mpm import aurora_control
+    from usrp_mpm.sys_utils.uio import open_uio
 
     # Go, go, go!
     try:
-        assert_aurora_image(master, slave, device_args, product_id, aurora_image_type)
-        with open_uio(label=master, read_only=False) as master_au_uio:
-            master_au_ctrl = aurora_control.AuroraControl(master_au_uio)
-            with open_uio(label=slave, read_only=False)\
-                    if slave is not None else DummyContext() as slave_au_uio:
-                slave_au_ctrl = aurora_control.AuroraControl(slave_au_uio)\
-                    if slave is not None else None
-                return master_au_ctrl.run_ber_loopback_bist(
-                    duration=10,
-                    requested_rate=requested_rate,
-                    slave=slave_au_ctrl,
-                )
+        for master, slave in links:
+            assert_aurora_image(
+                master, slave, device_args, product_id, aurora_image_type)
+        with ExitStack() as stack:
+            def make_au_ctrl(label):
+                " Open the UIO for label and return an AuroraControl for it "
+                if label is None:
+                    return None
+                au_uio = stack.enter_context(
+                    open_uio(label=label, read_only=False))
+                return aurora_control.AuroraControl(au_uio)
+            au_links = [
+                (make_au_ctrl(master), make_au_ctrl(slave))
+                for master, slave in links
+            ]
+            return aurora_control.AuroraBist(au_links).run(
+                duration=duration,
+                requested_rate=requested_rate,
+            )
     except Exception as ex:
         print("Unexpected exception: {}".format(str(ex)))
         exit(1)
@@ -138,21 +163,6 @@ def sock_read_line(my_sock, timeout=60, interval=0.1):
             time.sleep(interval)
     raise RuntimeError("sock_read_line() exceeded read timeout!")
 
-def poll_with_timeout(state_check, timeout_ms, interval_ms):
-    """
-    Calls state_check() every interval_ms until it returns a positive value, or
-    until a timeout is exceeded.
-
-    Returns True if state_check() returned True within the timeout.
-    """
-    max_time = time.time() + (float(timeout_ms) / 1000)
-    interval_s = float(interval_ms) / 1000
-    while time.time() < max_time:
-        if state_check():
-            return True
-        time.sleep(interval_s)
-    return False
-
 def expand_options(option_list):
     """
     Turn a list ['foo=bar', 'spam=eggs'] into a dictionary {'foo': 'bar',
@@ -481,6 +491,18 @@ class UsrpBIST(object):
         'standard': ["rtc",],
         'extended': "*",
     }
+    # Resources (hardware or software) used by individual tests. Tests that
+    # don't share a resource can run at the same time. Tests that are not
+    # listed here (e.g., because they load FPGA images) always run by
+    # themselves.
+    test_resources = {
+        'rtc': set(),
+    }
+    # Tests whose results can be reused by later BIST runs, and for how long
+    # (in seconds). Only successful results are cached.
+    cache_ttl = {}
+    # Directory for cached results. It is only accessible by its owner.
+    CACHE_DIR = '/var/cache/usrp_bist'
     # Default FPGA image type
     DEFAULT_FPGA_TYPE = None
     lv_compat_format = None
@@ -517,6 +539,15 @@ class UsrpBIST(object):
                  "output does not necessarily reflect the actual system "
                  "status when using this mode.",
         )
+        parser.add_argument(
+            '-j', '--jobs', type=int, default=4,
+            help="Maximum number of tests to run at the same time. Only tests "
+                 "that don't share resources are run concurrently.",
+        )
+        parser.add_argument(
+            '--no-cache', action='store_true',
+            help="Don't use cached results of previous BIST runs.",
+        )
         parser.add_argument(
             '--skip-fpga-reload', action='store_true',
             help="Skip reloading the default FPGA image post-test. Note: by"
@@ -555,6 +586,7 @@ class UsrpBIST(object):
             default_rev = self.default_rev
         self.mb_rev = int(self.args.option.get('mb_rev', default_rev))
         self.tests_to_run = set()
+        self._cache_lock = threading.Lock()
         for test in self.args.tests:
             if test in self.collections:
                 for this_test in self.expand_collection(test):
@@ -585,10 +617,138 @@ class UsrpBIST(object):
             tests = set(tests)
         return tests
 
+    def get_cache_file(self):
+        """
+        Return the path of the file that stores cached test results
+        """
+        return os.path.join(
+            self.CACHE_DIR,
+            '{}_bist_cache.json'.format(self.usrp_type.lower()))
+
+    def _get_cache_key(self, testname):
+        " Cached results are only valid for the same test options "
+        return json.dumps([testname, self.mb_rev, self.args.option],
+                          sort_keys=True)
+
+    def _read_cache(self):
+        """
+        Return the cached results. Results are only trusted if the cache file
+        is owned by us, anything else could have been planted by another user.
+        """
+        try:
+            fd = os.open(self.get_cache_file(), os.O_RDONLY | os.O_NOFOLLOW)
+        except OSError:
+            return {}
+        with os.fdopen(fd) as cache_file:
+            if os.fstat(fd).st_uid != os.getuid():
+                sys.stderr.write("Ignoring BIST cache {}: Not owned by current "
+                                 "user.\n".format(self.get_cache_file()))
+                return {}
+            try:
+                return json.load(cache_file)
+            except ValueError:
+                return {}
+
+    def _write_cache(self, cache):
+        """
+        Atomically replace the cache file
+        """
+        os.makedirs(self.CACHE_DIR, mode=0o700, exist_ok=True)
+        cache_dir_stat = os.lstat(self.CACHE_DIR)
+        if cache_dir_stat.st_uid != os.getuid() \
+                or cache_dir_stat.st_mode & 0o022:
+            raise OSError("Cache directory {} is not owned by and only "
+                          "writable by the current user".format(self.CACHE_DIR))
+        fd, tmp_file = tempfile.mkstemp(dir=self.CACHE_DIR)
+        try:
+            with os.fdopen(fd, 'w') as cache_file:
+                json.dump(cache, cache_file)
+            os.replace(tmp_file, self.get_cache_file())
+        except Exception:
+            os.unlink(tmp_file)
+            raise
+
+    def get_cached_result(self, testname):
+        """
+        Return the cached (status, data) of a previous run of this test, or
+        None if there is no valid cached result.
+        """
+        if testname not in self.cache_ttl or self.args.no_cache \
+                or self.args.dry_run:
+            return None
+        with self._cache_lock:
+            entry = self._read_cache().get(self._get_cache_key(testname))
+        if entry is None or \
+                not 0 <= time.time() - entry['time'] <= self.cache_ttl[testname]:
+            return None
+        return entry['status'], entry['data']
+
+    def store_cached_result(self, testname, status, data):
+        """
+        Store the result of a test in the cache, if it is cacheable
+        """
+        if testname not in self.cache_ttl or not status or self.args.dry_run:
+            return
+        with self._cache_lock:
+            cache = self._read_cache()
+            cache[self._get_cache_key(testname)] = {
+                'time': time.time(),
+                'status': status,
+                'data': data,
+            }
+            try:
+                self._write_cache(cache)
+            except (OSError, TypeError) as ex:
+                sys.stderr.write("Could not store BIST results: {}\n".format(
+                    str(ex)))
+
+    def can_start(self, testname, running_tests):
+        """
+        Return True if a test does not conflict with the running tests (see
+        test_resources), and there is a free job slot.
+        """
+        if not running_tests:
+            return True
+        resources = self.test_resources.get(testname)
+        if resources is None or len(running_tests) >= max(self.args.jobs, 1):
+            return False
+        return all(
+            other is not None and not resources & other
+            for other in [self.test_resources.get(test) for test in running_tests]
+        )
+
+    def run_tests(self, tests, execute_test):
+        """
+        Call execute_test() for all tests, running tests that don't conflict
+        concurrently. Returns a dictionary test name -> (status, data).
+        """
+        results = {}
+        pending = sorted(tests)
+        running = {}
+        with futures.ThreadPoolExecutor(max(self.args.jobs, 1)) as executor:
+            while pending or running:
+                for test in list(pending):
+                    if not self.can_start(test, running.values()):
+                        # Don't let tests that need to run by themselves wait
+                        # forever for other tests
+                        if self.test_resources.get(test) is None:
+                            break
+                        continue
+                    pending.remove(test)
+                    running[executor.submit(execute_test, test)] = test
+                done, _ = futures.wait(
+                    running, return_when=futures.FIRST_COMPLETED)
+                for future in done:
+                    results[running.pop(future)] = future.result()
+        return results
+
     def run(self):
         """
         Execute tests.
 
+        Tests that don't share resources (see test_resources) are run
+        concurrently, using up to --jobs threads.
+
         Returns True on Success.
         """
         def execute_test(testname):
@@ -596,6 +756,12 @@ class UsrpBIST(object):
             Actually run a test.
             """
             testmethod_name = "bist_{0}".format(testname)
+            cached_result = self.get_cached_result(testname)
+            if cached_result is not None:
+                sys.stderr.write(
+                    "Using cached result for test: {0}\n\n".format(testname)
+                )
+                return cached_result
             sys.stderr.write(
                 "Executing test method: {0}\n\n".format(testmethod_name)
             )
@@ -606,6 +772,7 @@ class UsrpBIST(object):
                 status, data = getattr(self, testmethod_name)()
                 data['status'] = status
                 data['error_msg'] = data.get('error_msg', '')
+                self.store_cached_result(testname, status, data)
                 return status, data
             except Exception as ex:
                 sys.stderr.write(
@@ -616,8 +783,8 @@ class UsrpBIST(object):
                 return False, {'error_msg': str(ex)}
         tests_successful = True
         result = {}
-        for test in self.tests_to_run:
-            status, result_data = execute_test(test)
+        for test, (status, result_data) in \
+                self.run_tests(self.tests_to_run, execute_test).items():
             tests_successful = tests_successful and status
             result[test] = result_data
         if self.args.lv_compat:
@@ -10,6 +10,7 @@ LMK04828 parent driver class
 import math
 from builtins import object
 from usrp_mpm.mpmlog import get_logger
+from usrp_mpm.mpmutils import wait_for
 
 class LMK04828(object):
     """
@@ -73,6 +74,25 @@ class LMK04828(object):
                 check_pll_lock("PLL2", 0x183)
         return lock_status
 
+    def wait_for_plls_locked(self, timeout_ms, interval_ms):
+        """
+        Clear the lock detect stickies and check the PLL lock status until
+        both PLLs are locked, or until timeout_ms expired.
+
+        Returns True if both PLLs locked within the timeout.
+        """
+        def _clear_stickies_and_check_locked():
+            self.pokes8((
+                (0x182, 0x1), # Clear Lock Detect Sticky
+                (0x182, 0x0), # Clear Lock Detect Sticky
+                (0x183, 0x1), # Clear Lock Detect Sticky
+                (0x183, 0x0), # Clear Lock Detect Sticky
+            ))
+            return self.check_plls_locked()
+        return wait_for(
+            _clear_stickies_and_check_locked, timeout_ms, interval_ms,
+            name='{}.wait_for_plls_locked'.format(type(self).__name__))
+
 
 ## Register bitfield definitions ##
 
@@ -149,10 +149,43 @@ class LMX2572(object):
         """
         Apply a series of pokes.
         pokes16((0,1),(0,2)) is the same as calling poke16(0,1), poke16(0,2).
+        If the register interface can apply multiple pokes in one transaction
+        (pokes16()), that is used instead.
         """
+        if hasattr(self.regs_iface, 'pokes16'):
+            self.regs_iface.pokes16(list(addr_vals))
+            return
         for addr, val in addr_vals:
             self._poke16(addr, val)
 
+    def _burst_poke16(self, start_addr, values):
+        """
+        Write values to consecutive registers, starting at start_addr. Uses a
+        burst write if the register interface supports it (burst_poke16()).
+        """
+        if hasattr(self.regs_iface, 'burst_poke16'):
+            self.regs_iface.burst_poke16(start_addr, values)
+        else:
+            self._pokes16(zip(range(start_addr, start_addr + len(values)), values))
+
+    def _write_changed_registers(self, addrs):
+        """
+        Write those of the given registers that changed since they were last
+        written. Runs of consecutive registers are written as bursts. If the
+        power-up sequence did not run yet, all given registers are written.
+        """
+        regs = self._lmx2572_regs
+        try:
+            addrs = regs.get_changed_addrs() & set(addrs)
+        except RuntimeError:
+            addrs = set(addrs)
+        for start_addr, values in regs.get_addr_runs(addrs):
+            self._burst_poke16(start_addr, values)
+        try:
+            regs.clear_changed_addrs(addrs)
+        except RuntimeError:
+            pass
+
     def _set_output_a_enable(self, enable_output):
         """
         Sets output A (OUTA_PD)
@@ -264,48 +297,33 @@ class LMX2572(object):
             if register in LMX2572.READ_ONLY_REGISTERS:
                 continue
             self._poke16(register, self._lmx2572_regs.get_reg(register))
+        # From here on, only registers that change need to be written
+        self._lmx2572_regs.save_state()
 
     def _write_registers_frequency_tuning(self):
         """
-        This function writes just the registers for frequency tuning
-        """
-        # Write PLL_N to registers R34 and R36
-        self._poke16(34, self._lmx2572_regs.get_reg(34))
-        self._poke16(36, self._lmx2572_regs.get_reg(36))
-        # Write PLL_DEN to registers R38 and R39
-        self._poke16(38, self._lmx2572_regs.get_reg(38))
-        self._poke16(39, self._lmx2572_regs.get_reg(39))
-        # Write PLL_NUM to registers R42 and R43
-        self._poke16(42, self._lmx2572_regs.get_reg(42))
-        self._poke16(43, self._lmx2572_regs.get_reg(43))
-        
-        # MASH_SEED to registers R40 and R41
-        self._poke16(40, self._lmx2572_regs.get_reg(40))
-        self._poke16(41, self._lmx2572_regs.get_reg(41))
-
-        # Write OUTA_PWR to register R44 or OUTB_PWR to register R45
-        # Write OUTA_MUX to register R45 and/or OUTB_MUX to register R46 
-        self._poke16(44, self._lmx2572_regs.get_reg(44))
-        self._poke16(45, self._lmx2572_regs.get_reg(45))
-        self._poke16(46, self._lmx2572_regs.get_reg(46))
-
-        # Write CHDIV to register R75
-        self._poke16(75, self._lmx2572_regs.get_reg(75))
-
-        # Write CPG to register R14
-        self._poke16(14, self._lmx2572_regs.get_reg(14))
-
-        # Write PFD_DLY_SEL to register R37
-        self._poke16(37, self._lmx2572_regs.get_reg(37))
-
-        # Write VCO_SEL to register R20
-        self._poke16(20, self._lmx2572_regs.get_reg(20))
-
-        # Write VCO_DACISET_STRT to register R17
-        self._poke16(17, self._lmx2572_regs.get_reg(17))
-
-        # Write VCO_CALCTRL_STRT to register R78
-        self._poke16(78, self._lmx2572_regs.get_reg(78))
+        This function writes just the registers for frequency tuning (if they
+        changed since they were last written)
+        """
+        self._write_changed_registers([
+            # PLL_N (R34, R36), PLL_DEN (R38, R39), PLL_NUM (R42, R43) and
+            # MASH_SEED (R40, R41)
+            34, 36, 38, 39, 40, 41, 42, 43,
+            # OUTA_PWR (R44), OUTB_PWR and OUTA_MUX (R45), OUTB_MUX (R46)
+            44, 45, 46,
+            # CHDIV (R75)
+            75,
+            # CPG (R14)
+            14,
+            # PFD_DLY_SEL (R37)
+            37,
+            # VCO_SEL (R20)
+            20,
+            # VCO_DACISET_STRT (R17)
+            17,
+            # VCO_CALCTRL_STRT (R78)
+            78,
+        ])
 
         # Write R0 to latch double buffered registers
         self._poke16(0, self._lmx2572_regs.get_reg(0))
@@ -319,20 +337,11 @@ class LMX2572(object):
         # Write FCAL_LPFD_ADJ to register R0
         self._poke16(0, self._lmx2572_regs.get_reg(0))
 
-        # Write MULT_HI to register R9
-        # Write OSC_2X to register R9
-        self._poke16(9, self._lmx2572_regs.get_reg(9))
-
-        # Write MULT to register R10
-        self._poke16(10, self._lmx2572_regs.get_reg(10))
-
-        # Write PLL_R to register R11
-        self._poke16(11, self._lmx2572_regs.get_reg(11))
-        # Write PLL_R_PRE to register R12
-        self._poke16(12, self._lmx2572_regs.get_reg(12))
+        # Write MULT_HI and OSC_2X (R9), MULT (R10), PLL_R (R11) and
+        # PLL_R_PRE (R12), if they changed
+        self._write_changed_registers([9, 10, 11, 12])
 
-        # if Phase SYNC being used: 
+        # if Phase SYNC being used:
         # Write MASH_RST_COUNT to registers R69 and 70
         if self.get_synchronization():
-            self._poke16(70, self._lmx2572_regs.get_reg(70))
-            self._poke16(69, self._lmx2572_regs.get_reg(69))
+            self._write_changed_registers([69, 70])
@@ -80,6 +80,13 @@ Using the Eye Scan tool:
          Valid range is -127 to 127 (full range), corresponding to 0.39 %
          increments.
          Definition example: {'start':-127, 'stop':127, 'step': 2}
+       Sweep mode.
+         'full' measures every point of the ranges. 'adaptive' first measures every
+         coarse_factor-th point in both directions, and then only the points whose
+         grid cell is crossed by the eye boundary. The remaining points reuse the
+         counters of the nearest coarse point, which cuts the scan time considerably
+         for large ranges.
+         Valid values for this tool: 'full', 'adaptive'.
 
   3. Determine which GT(s) will be scanned.
      The tool supports single scan and parallel multi-lane scan. The previous GT
@@ -166,8 +173,11 @@ Future work ideas:
 """
 
 import os
+import sys
 import time
 import math
+import array
+import bisect
 import datetime
 from builtins import object
 from usrp_mpm.mpmlog import get_logger
@@ -219,9 +229,13 @@ class EyeScanTool(object):
             assert self.rxout_div in (1, 2, 4, 8, 16)
             assert self.rx_int_datawidth in (16, 20, 32, 40)
             assert self.eq_mode.upper() in ('LPM', 'DFE')
+            assert self.sweep_mode in ('full', 'adaptive')
+            assert self.coarse_factor >= 1
+            assert self.exit_after >= 1
             self.log.debug("Valid Eye Scan configuration: prescale=%d rxout_div=%d"
-                           " rx_int_datawidth=%d eq_mode=%s",
-                           self.prescale, self.rxout_div, self.rx_int_datawidth, self.eq_mode)
+                           " rx_int_datawidth=%d eq_mode=%s sweep_mode=%s",
+                           self.prescale, self.rxout_div, self.rx_int_datawidth, self.eq_mode,
+                           self.sweep_mode)
         #
         self.slot_idx = slot_idx
         self.log = get_logger("EyeScanTool-{}".format(self.slot_idx))
@@ -254,6 +268,18 @@ class EyeScanTool(object):
         # Valid values = 'LPM', 'DFE'.
         self.eq_mode = 'LPM'
         #
+        # Sweep mode: measure every point of the given ranges ('full'), or do a
+        # coarse pass first and only measure the remaining points close to the eye
+        # boundary ('adaptive').
+        # Valid values = 'full', 'adaptive'.
+        self.sweep_mode = 'full'
+        #
+        # Spacing (in range steps) of the coarse pass of an adaptive sweep.
+        self.coarse_factor = 4
+        #
+        # Number of status polls after which a single measurement times out.
+        self.exit_after = 10000
+        #
         # Overwrite the default configuration parameters with the ones given
         # by the user (host) through kwargs.
         for key, new_val in list(kwargs.items()):
@@ -420,6 +446,45 @@ class EyeScanTool(object):
         return
 
 
+    @staticmethod
+    def _control_reg_value(drp_x03d_rb, err_det_en=True, run=False, arm=False):
+        """
+        Returns the value of DRP register 0x03D for the given control settings,
+        based on its current value drp_x03d_rb.
+        """
+        ARM_TRIGGER_ON = {"error_detected"   : 0b0001,\
+                          "qualifier_pattern": 0b0010,\
+                          "es_trigger"       : 0b0100,\
+                          "immediate"        : 0b1000}
+        EYE_SCAN_EN_VAL = 0b1
+        # Determine the GT Channel attributes to be changed.
+        es_errdet_en   = int(err_det_en)
+        es_eye_scan_en = EYE_SCAN_EN_VAL
+        es_control     = (int(run)                         << 0) | \
+                         (int(arm)                         << 1) | \
+                         (ARM_TRIGGER_ON["error_detected"] << 2)
+        return ((drp_x03d_rb & ~0x023F) << 0) | \
+               (es_errdet_en            << 9) | \
+               (es_eye_scan_en          << 8) | \
+               (es_control              << 0)
+
+
+    @staticmethod
+    def _offset_reg_values(drp_x03b_rb, drp_x03c_rb, hor_offset=0, ver_offset=0, ut_sign='+UT'):
+        """
+        Returns the values of DRP registers 0x03B and 0x03C for the given offsets,
+        based on their current values drp_x03b_rb and drp_x03c_rb.
+        """
+        UT_SIGN_BIT = {'+UT': 0b0, '-UT': 0b1}
+        es_vert_offset = ((abs(ver_offset) & 0x007F) << 0) | \
+                         ( int(ver_offset < 0)       << 7) | \
+                         ( UT_SIGN_BIT[ut_sign.upper()] << 8)
+        es_horz_offset = (hor_offset & 0x0FFF)
+        drp_x03b_wr = (drp_x03b_rb & ~0x01FF) | (es_vert_offset & 0x01FF)
+        drp_x03c_wr = (drp_x03c_rb & ~0x0FFF) | (es_horz_offset & 0x0FFF)
+        return drp_x03b_wr, drp_x03c_wr
+
+
     def eyescan_control(self, err_det_en=True, run=False, arm=False):
         """
         Configures the eye scan control state machine for the current XCVR lane.
@@ -436,28 +501,14 @@ class EyeScanTool(object):
                         to the READ state if one of the states of bits x03D[5:2] below is
                         not met.
         """
-        ARM_TRIGGER_ON = {"error_detected"   : 0b0001,\
-                          "qualifier_pattern": 0b0010,\
-                          "es_trigger"       : 0b0100,\
-                          "immediate"        : 0b1000}
-        EYE_SCAN_EN_VAL = 0b1
         self.log.trace("Eyescan state machine control for MGT #%d", self.lane_num)
         # Read the current register values.
         drp_x03d_rb = self.jesdcore.drp_access(rd=True, addr=0x03D)
-        # Determine the GT Channel attributes to be changed.
-        es_errdet_en   = int(err_det_en)
-        es_eye_scan_en = EYE_SCAN_EN_VAL
-        es_control     = (int(run)                         << 0) | \
-                         (int(arm)                         << 1) | \
-                         (ARM_TRIGGER_ON["error_detected"] << 2)
-        self.log.trace("Control attributes... ES_ERRDET_EN:0b{0:b}"
-                       " ES_EYE_SCAN_EN:0b{1:b} ES_CONTROL:0b{2:06b}"
-                       .format(es_errdet_en, es_eye_scan_en, es_control))
         # Build and write the new register values.
-        drp_x03d_wr = ((drp_x03d_rb & ~0x023F) << 0) | \
-                      (es_errdet_en            << 9) | \
-                      (es_eye_scan_en          << 8) | \
-                      (es_control              << 0)
+        drp_x03d_wr = self._control_reg_value(drp_x03d_rb, err_det_en, run, arm)
+        self.log.trace("Control attributes... ES_ERRDET_EN:0b{0:b} RUN:0b{1:b} ARM:0b{2:b}"
+                       " (DRP 0x03D: 0x{3:04X})"
+                       .format(int(err_det_en), int(run), int(arm), drp_x03d_wr))
         self.jesdcore.drp_access(rd=False, addr=0x03D, wr_data=drp_x03d_wr)
         return drp_x03d_rb != drp_x03d_wr # Return True when the register changed.
 
@@ -475,7 +526,6 @@ class EyeScanTool(object):
                         [-127, 127] corresponding to 0.39% increments.
           ut_sign    -> UT tap sign: '+UT' or '-UT'.
         """
-        UT_SIGN_BIT = {'+UT': 0b0, '-UT': 0b1}
         self.log.trace("Offset configuration for MGT #{}:".format(self.lane_num))
         # Do some input validation for the given parameters.
         assert ut_sign.upper() in ('+UT', '-UT')
@@ -484,16 +534,11 @@ class EyeScanTool(object):
         # Read the current register values.
         drp_x03b_rb = self.jesdcore.drp_access(rd=True, addr=0x03B)
         drp_x03c_rb = self.jesdcore.drp_access(rd=True, addr=0x03C)
-        # Determine the GT channel attributes to be changed.
-        es_vert_offset = ((abs(ver_offset) & 0x007F) << 0) | \
-                         ( int(ver_offset < 0)       << 7) | \
-                         ( UT_SIGN_BIT[ut_sign]      << 8)
-        es_horz_offset = (hor_offset & 0x0FFF)
-        self.log.trace("Offset attributes... ES_HORZ_OFFSET:0b{0:012b} ES_VERT_OFFSET:0b{1:09b}"
-                       .format(es_horz_offset, es_vert_offset))
         # Build and write new register values.
-        drp_x03b_wr = (drp_x03b_rb & ~0x01FF) | (es_vert_offset & 0x01FF)
-        drp_x03c_wr = (drp_x03c_rb & ~0x0FFF) | (es_horz_offset & 0x0FFF)
+        drp_x03b_wr, drp_x03c_wr = self._offset_reg_values(
+            drp_x03b_rb, drp_x03c_rb, hor_offset, ver_offset, ut_sign)
+        self.log.trace("Offset attributes... DRP 0x03B: 0x{0:04X} DRP 0x03C: 0x{1:04X}"
+                       .format(drp_x03b_wr, drp_x03c_wr))
         self.jesdcore.drp_access(rd=False, addr=0x03B, wr_data=drp_x03b_wr)
         self.jesdcore.drp_access(rd=False, addr=0x03C, wr_data=drp_x03c_wr)
         # Return True when at least one of the two registers changed.
@@ -634,6 +679,183 @@ class EyeScanTool(object):
         return acq_counters
 
 
+    def _read_lanes(self, lanes, addrs):
+        """
+        Reads the given DRP registers from all given lanes in one pass. Returns a
+        dictionary that maps each lane to the list of values read.
+        """
+        if hasattr(self.jesdcore, 'drp_read_lanes'):
+            return self.jesdcore.drp_read_lanes(lanes, addrs)
+        results = {}
+        for lane in lanes:
+            self.set_global_lane(lane)
+            results[lane] = [self.jesdcore.drp_access(rd=True, addr=addr) for addr in addrs]
+        return results
+
+
+    def _write_shadowed(self, shadow, addr, value):
+        """
+        Writes a DRP register of the current lane, unless the shadow copy of the
+        register (a dictionary addr -> value) shows it already holds value.
+        """
+        if shadow[addr] != value:
+            self.jesdcore.drp_access(rd=False, addr=addr, wr_data=value)
+            shadow[addr] = value
+
+
+    def _measure_points(self, points, lane_points, results):
+        """
+        Pipelined acquisition engine. Measures the given points on each lane, and
+        stores the counters in results.
+
+        Every lane works through its own list of measurements: as soon as a lane's
+        FSM reaches the END state, its counters are read and its next measurement is
+        started, so fast lanes never wait for slow ones. The status and counter
+        registers of all busy lanes are read in one pass, and the offset/control
+        registers are only written when their value changes.
+
+        Parameters:
+          points      -> List of (hor_offset, ver_offset) tuples.
+          lane_points -> Dictionary that maps each lane to the list of indexes (into
+                         points) that are to be measured on that lane.
+          results     -> array.array('H') in .pes data order (see eyescan_sweep()),
+                         with len(points) * len(self.lanes) * num_ut * 2 elements.
+        """
+        ES_CONTROL_STATUS_ADDR = 0x151
+        ES_ERROR_COUNT_ADDR    = 0x14F
+        ES_SAMPLE_COUNT_ADDR   = 0x150
+        STATE_END              = 0b010
+        ut_signs = ('+UT', '-UT') if self.eq_mode == 'DFE' else ('+UT',)
+        num_lanes = len(self.lanes)
+        lane_idx = {lane: idx for idx, lane in enumerate(self.lanes)}
+        # Each lane's queue of (point index, UT sign index) measurements.
+        queues = {lane: [(point, ut_idx) for point in lane_points[lane]
+                         for ut_idx in range(len(ut_signs))]
+                  for lane in self.lanes}
+        total_jobs = sum(len(queue) for queue in queues.values())
+        next_job = {lane: 0 for lane in self.lanes}
+        polls = {lane: 0 for lane in self.lanes}
+        # Read the offset and control registers once, then keep shadow copies.
+        shadows = {lane: dict(zip((0x03B, 0x03C, 0x03D), values)) for lane, values in
+                   self._read_lanes(self.lanes, (0x03B, 0x03C, 0x03D)).items()}
+        delay = 2 ** (self.prescale - 13) if (self.prescale > 13) else 0
+        #
+        def start_next(lane):
+            """
+            Starts the next measurement of the given lane. Returns False if there are
+            no more measurements for this lane.
+            """
+            if next_job[lane] >= len(queues[lane]):
+                return False
+            point, ut_idx = queues[lane][next_job[lane]]
+            hor_offset, ver_offset = points[point]
+            shadow = shadows[lane]
+            self.set_global_lane(lane)
+            # The FSM only starts on a rising edge of the run bit.
+            self._write_shadowed(shadow, 0x03D, self._control_reg_value(
+                shadow[0x03D], err_det_en=True, run=False, arm=False))
+            drp_x03b_wr, drp_x03c_wr = self._offset_reg_values(
+                shadow[0x03B], shadow[0x03C], hor_offset, ver_offset, ut_signs[ut_idx])
+            self._write_shadowed(shadow, 0x03B, drp_x03b_wr)
+            self._write_shadowed(shadow, 0x03C, drp_x03c_wr)
+            self._write_shadowed(shadow, 0x03D, self._control_reg_value(
+                shadow[0x03D], err_det_en=True, run=True, arm=False))
+            polls[lane] = 0
+            return True
+        #
+        busy = [lane for lane in self.lanes if start_next(lane)]
+        jobs_done = 0
+        while busy:
+            status = self._read_lanes(busy, (ES_CONTROL_STATUS_ADDR,
+                                             ES_ERROR_COUNT_ADDR,
+                                             ES_SAMPLE_COUNT_ADDR))
+            still_busy = []
+            for lane in busy:
+                es_control_status, error_count, sample_count = status[lane]
+                if ((es_control_status & 0x000E) >> 1) != STATE_END:
+                    polls[lane] += 1
+                    if polls[lane] >= self.exit_after:
+                        self.log.error("END state was not reached at GT #%d after %d polls.",
+                                       lane, polls[lane])
+                        self.set_global_lane(None)
+                        raise Exception("Eyescan status timed out, see log for details.")
+                    still_busy.append(lane)
+                    continue
+                point, ut_idx = queues[lane][next_job[lane]]
+                index = ((point * num_lanes + lane_idx[lane]) * len(ut_signs) + ut_idx) * 2
+                results[index + 0] = sample_count & 0xFFFF
+                results[index + 1] = error_count & 0xFFFF
+                self.log.trace("Results %s GT #%d (H=%d, V=%d)... Errors=%d  Samples=%d.",
+                               ut_signs[ut_idx], lane, points[point][0], points[point][1],
+                               error_count & 0xFFFF, sample_count & 0xFFFF)
+                jobs_done += 1
+                if jobs_done % (self.PRINT_STATUS_EVERY * num_lanes * len(ut_signs)) == 0:
+                    self.log.info("Eye Scan progress for GTs %s: %.2f %% of %d measurements",
+                                  self.lanes, jobs_done / total_jobs * 100, total_jobs)
+                next_job[lane] += 1
+                if start_next(lane):
+                    still_busy.append(lane)
+                else:
+                    # Leave the FSM of this lane in the WAIT state.
+                    self.set_global_lane(lane)
+                    self._write_shadowed(shadows[lane], 0x03D, self._control_reg_value(
+                        shadows[lane][0x03D], err_det_en=True, run=False, arm=False))
+            if len(still_busy) == len(busy):
+                time.sleep(delay / 1000.0)
+            busy = still_busy
+        self.set_global_lane(None)
+
+
+    def _get_refine_points(self, hor_iterations, ver_iterations, coarse, results, lane):
+        """
+        Determines which grid points need a fine measurement on the given lane after
+        the coarse pass of an adaptive sweep, and which coarse point the remaining
+        points take their counters from.
+
+        A point is measured when the coarse points at the corners of its grid cell
+        disagree on whether the eye is open (no errors) or closed for any UT sign,
+        i.e., when the cell is crossed by the eye boundary. Returns a tuple (refine, copy_from),
+        where refine is the list of point indexes to measure and copy_from maps
+        every other non-coarse point index to a coarse point index.
+        """
+        hor_coarse, ver_coarse = coarse
+        num_ut = 2 if self.eq_mode == 'DFE' else 1
+        num_lanes = len(self.lanes)
+        lane_idx = self.lanes.index(lane)
+        #
+        def is_open(hor_idx, ver_idx):
+            # One flag per UT sign, the eye boundary differs for +UT and -UT.
+            point = hor_idx * ver_iterations + ver_idx
+            index = (point * num_lanes + lane_idx) * num_ut * 2
+            return tuple(results[index + ut_idx * 2 + 1] == 0 for ut_idx in range(num_ut))
+        #
+        def neighbors(coarse_idxs, idx):
+            pos = bisect.bisect_left(coarse_idxs, idx)
+            return coarse_idxs[pos - 1], coarse_idxs[pos]
+        #
+        hor_set = set(hor_coarse)
+        ver_set = set(ver_coarse)
+        refine = []
+        copy_from = {}
+        for hor_idx in range(hor_iterations):
+            for ver_idx in range(ver_iterations):
+                if hor_idx in hor_set and ver_idx in ver_set:
+                    continue
+                hor_lo, hor_hi = (hor_idx, hor_idx) if hor_idx in hor_set \
+                                 else neighbors(hor_coarse, hor_idx)
+                ver_lo, ver_hi = (ver_idx, ver_idx) if ver_idx in ver_set \
+                                 else neighbors(ver_coarse, ver_idx)
+                corners = {is_open(h, v) for h in (hor_lo, hor_hi) for v in (ver_lo, ver_hi)}
+                point = hor_idx * ver_iterations + ver_idx
+                if len(corners) > 1:
+                    refine.append(point)
+                else:
+                    nearest_hor = min((hor_lo, hor_hi), key=lambda h: abs(h - hor_idx))
+                    nearest_ver = min((ver_lo, ver_hi), key=lambda v: abs(v - ver_idx))
+                    copy_from[point] = nearest_hor * ver_iterations + nearest_ver
+        return refine, copy_from
+
+
     def eyescan_sweep(self, bin_file, parsed_ranges):
         """
         Performs Eye Scan "measurement loop" (error counting) acquisitions across the
@@ -644,71 +866,87 @@ class EyeScanTool(object):
           (8-bit) at the given position. The bytes are saved as follows:
 
           If eq_mode = 'LPM'...
-            file[offset + 4*lanes*i + 4*curr_lane + 0] = sample_count[15:0] (+UT) (ith acquisition)
-            file[offset + 4*lanes*i + 4*curr_lane + 2] =  error_count[15:0] (+UT) (ith acquisition)
+            file[offset + 4*lanes*i + 4*lane_idx + 0] = sample_count[15:0] (+UT) (ith acquisition)
+            file[offset + 4*lanes*i + 4*lane_idx + 2] =  error_count[15:0] (+UT) (ith acquisition)
 
           If eq_mode = 'DFE'...
-            file[offset + 4*lanes*(i*2 + 0) + 4*curr_lane + 0] = sample_count[15:0] (+UT) (ith acquisition)
-            file[offset + 4*lanes*(i*2 + 0) + 4*curr_lane + 2] =  error_count[15:0] (+UT) (ith acquisition)
-            file[offset + 4*lanes*(i*2 + 1) + 4*curr_lane + 0] = sample_count[15:0] (-UT) (ith acquisition)
-            file[offset + 4*lanes*(i*2 + 1) + 4*curr_lane + 2] =  error_count[15:0] (-UT) (ith acquisition)
+            file[offset + 8*lanes*i + 8*lane_idx + 0] = sample_count[15:0] (+UT) (ith acquisition)
+            file[offset + 8*lanes*i + 8*lane_idx + 2] =  error_count[15:0] (+UT) (ith acquisition)
+            file[offset + 8*lanes*i + 8*lane_idx + 4] = sample_count[15:0] (-UT) (ith acquisition)
+            file[offset + 8*lanes*i + 8*lane_idx + 6] =  error_count[15:0] (-UT) (ith acquisition)
 
           Where,
             i         -> single acquisition iteration number, ranging from 0 to
-                         (hor_iterations * ver_iterations - 1).
+                         (hor_iterations * ver_iterations - 1). The horizontal offset
+                         is iterated in the outer loop, the vertical in the inner one.
             offset    -> set offset for metadata to be stored at the beginning of
                          the binary file.
             lanes     -> total number of lanes to be scanned. Defined as len(self.lanes).
-            curr_lane -> a given lane number. It should be any value in the lanes array.
+            lane_idx  -> index of a given lane number in the lanes array.
+
+        The results are buffered in memory and written to the file once the sweep
+        is complete. When sweep_mode is 'adaptive', the grid is first measured at
+        every coarse_factor-th point in both directions, and only the points in grid
+        cells crossed by the eye boundary are measured afterwards. All other points
+        reuse the counters of the nearest coarse point of their cell, so the file
+        layout is the same as for a full sweep.
 
         Parameters:
           bin_file      -> Binary file reference to write data to. Passed from top level function.
           parsed_ranges -> This is a keyed list with parsed parameters from parse_ranges().
         """
-        def write_byte_counters(acq_counters):
-            """
-            This method writes the acquisition counters for each lane to the binary file.
-            """
-            # Write the sample and error counters for all given lanes.
-            for current_lane in self.lanes:
-                # Write the counters for the current lane.
-                sl_counters = acq_counters[current_lane]
-                self.log.debug("Writing +UT counters for GT #{0}: {1}"
-                               .format(current_lane, sl_counters))
-                byte_number = (sl_counters['+UT']['sample_count']).to_bytes(2, 'little')
-                bin_file.write(byte_number)
-                byte_number = (sl_counters['+UT']['error_count' ]).to_bytes(2, 'little')
-                bin_file.write(byte_number)
-                # -UT results only exists when DFE eq. mode is used.
-                if '-UT' in sl_counters:
-                    self.log.debug("Writing -UT counters for GT #%d...", current_lane)
-                    byte_number = (sl_counters['-UT']['sample_count']).to_bytes(2, 'little')
-                    bin_file.write(byte_number)
-                    byte_number = (sl_counters['-UT']['error_count' ]).to_bytes(2, 'little')
-                    bin_file.write(byte_number)
-        #
         gts_string = "GTs {}".format(self.lanes)
-        self.log.trace("Starting sweep for %s ...", gts_string)
-        # Perform the Eye Scan sweep!
-        acq_counters = []
-        total_iterations = parsed_ranges['hor_iterations'] * parsed_ranges['ver_iterations']
-        iterations = 0
-        # Outer loop iterates horizontally.
-        for hor_offset in range(parsed_ranges['hor_start'], parsed_ranges['hor_stop'] + 1,
-                                parsed_ranges['hor_step']):
-            # Inner loop iterates vertically.
-            for ver_offset in range(parsed_ranges['ver_start'], parsed_ranges['ver_stop'] + 1,
-                                    parsed_ranges['ver_step']):
-                # Perform a single acquisition at each "coordinate".
-                acq_counters = self.eyescan_acquisition(hor_offset, ver_offset)
-                # Write the data to a binary file.
-                write_byte_counters(acq_counters)
-                # Report Eye Scan progress.
-                iterations += 1
-                progress = iterations / total_iterations * 100
-                # Only print status messages every PRINT_STATUS_EVERY iterations.
-                if iterations % self.PRINT_STATUS_EVERY == 0:
-                    self.log.info("Eye Scan progress for %s sweep: %.2f %%", gts_string, progress)
+        self.log.trace("Starting %s sweep for %s ...", self.sweep_mode, gts_string)
+        hor_offsets = list(range(parsed_ranges['hor_start'], parsed_ranges['hor_stop'] + 1,
+                                 parsed_ranges['hor_step']))
+        ver_offsets = list(range(parsed_ranges['ver_start'], parsed_ranges['ver_stop'] + 1,
+                                 parsed_ranges['ver_step']))
+        points = [(hor_offset, ver_offset)
+                  for hor_offset in hor_offsets for ver_offset in ver_offsets]
+        num_ut = 2 if self.eq_mode == 'DFE' else 1
+        results = array.array('H', [0]) * (len(points) * len(self.lanes) * num_ut * 2)
+        if self.sweep_mode == 'full':
+            self._measure_points(
+                points, {lane: list(range(len(points))) for lane in self.lanes}, results)
+        else:
+            def coarse_idxs(iterations):
+                idxs = list(range(0, iterations, self.coarse_factor))
+                if idxs[-1] != iterations - 1:
+                    idxs.append(iterations - 1)
+                return idxs
+            coarse = (coarse_idxs(len(hor_offsets)), coarse_idxs(len(ver_offsets)))
+            coarse_points = [hor_idx * len(ver_offsets) + ver_idx
+                             for hor_idx in coarse[0] for ver_idx in coarse[1]]
+            self.log.debug("Coarse pass: %d of %d points", len(coarse_points), len(points))
+            self._measure_points(
+                points, {lane: coarse_points for lane in self.lanes}, results)
+            refine_points = {}
+            copy_from = {}
+            for lane in self.lanes:
+                refine_points[lane], copy_from[lane] = self._get_refine_points(
+                    len(hor_offsets), len(ver_offsets), coarse, results, lane)
+                self.log.debug("Fine pass for GT #%d: %d of %d points",
+                               lane, len(refine_points[lane]), len(points))
+            self._measure_points(points, refine_points, results)
+            # Fill in the points that were not measured.
+            block = num_ut * 2
+            for lane_index, lane in enumerate(self.lanes):
+                for point, source in copy_from[lane].items():
+                    dst = (point * len(self.lanes) + lane_index) * block
+                    src = (source * len(self.lanes) + lane_index) * block
+                    results[dst:dst + block] = results[src:src + block]
+        # Report how many points of the eye are error free.
+        for lane_index, lane in enumerate(self.lanes):
+            open_points = sum(
+                1 for point in range(len(points))
+                if all(results[((point * len(self.lanes) + lane_index) * num_ut + ut_idx) * 2 + 1]
+                       == 0 for ut_idx in range(num_ut)))
+            self.log.info("Eye Scan for GT #%d: %d of %d points error free.",
+                          lane, open_points, len(points))
+        # Write the data to the binary file (little endian).
+        if sys.byteorder != 'little':
+            results.byteswap()
+        bin_file.write(results.tobytes())
 
 
     def create_pes_file(self, hor_range, ver_range):
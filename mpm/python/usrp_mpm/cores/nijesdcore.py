@@ -12,6 +12,7 @@ from six import iteritems
 from builtins import hex
 from builtins import object
 from usrp_mpm.mpmlog import get_logger
+from usrp_mpm.mpmutils import wait_for
 
 class NIJESDCore(object):
     """
@@ -251,16 +252,16 @@ class NIJESDCore(object):
         self.regs.poke32(mgt_reg, 0x10)
         if not reset_only:
             self.regs.poke32(mgt_reg, 0x20)
-            rb = -1
-            for _ in range(20):
-                rb = self.regs.peek32(mgt_reg)
-                if rb & 0xFFFF0000 == 0x000F0000:
-                    self.log.trace("%s MGT Reset Cleared!" % tx_or_rx.upper())
-                    return True
-                time.sleep(0.001)
+            rb = [-1]
+            def _reset_cleared():
+                rb[0] = self.regs.peek32(mgt_reg)
+                return rb[0] & 0xFFFF0000 == 0x000F0000
+            if wait_for(_reset_cleared, 20, 1, name='NIJESDCore._gt_reset'):
+                self.log.trace("%s MGT Reset Cleared!" % tx_or_rx.upper())
+                return True
             raise RuntimeError('Timeout in GT {trx} Reset (Readback: 0x{rb:X})'.format(
                 trx=tx_or_rx.upper(),
-                rb=(rb & 0xFFFF0000),
+                rb=(rb[0] & 0xFFFF0000),
             ))
         return True
 
@@ -312,20 +313,24 @@ class NIJESDCore(object):
                 self.regs.poke32(self.MGT_QPLL_CONTROL, reg_val)
                 self.log.trace("Clearing QPLL reset...")
 
-                # Check for lock a short time later.
-                time.sleep(0.010)
-                # Clear all QPLL sticky bits
-                self.regs.poke32(self.MGT_QPLL_CONTROL, 0b1 << 16)
                 # Check for lock on active quads only.
-                rb = self.regs.peek32(self.MGT_QPLL_CONTROL)
                 rb_mask = 0x0
                 locked_val = 0x0
                 for nibble in range(qplls):
-                    if (rb & (0xF << nibble*4)) != (0x2 << nibble*4):
-                        self.log.warning("GT QPLL {} failed to lock!".format(nibble))
                     locked_val = locked_val | 0x2 << nibble*4
                     rb_mask    = rb_mask    | 0xF << nibble*4
-                if (rb & rb_mask) != locked_val:
+                rb = [0x0]
+                def _qplls_locked():
+                    # Clear all QPLL sticky bits
+                    self.regs.poke32(self.MGT_QPLL_CONTROL, 0b1 << 16)
+                    rb[0] = self.regs.peek32(self.MGT_QPLL_CONTROL)
+                    return (rb[0] & rb_mask) == locked_val
+                # Wait up to the time we used to wait before checking for lock.
+                wait_for(_qplls_locked, 10, 2, name='NIJESDCore.qpll_lock')
+                for nibble in range(qplls):
+                    if (rb[0] & (0xF << nibble*4)) != (0x2 << nibble*4):
+                        self.log.warning("GT QPLL {} failed to lock!".format(nibble))
+                if (rb[0] & rb_mask) != locked_val:
                     raise RuntimeError("One or more GT QPLLs failed to lock!")
                 self.log.trace("QPLL(s) reporting locked!")
 
@@ -436,3 +441,19 @@ class NIJESDCore(object):
                 self.log.error("DRP read after write failed to match!")
 
         return rd_data
+
+    def drp_read_lanes(self, lanes, addrs):
+        """
+        Reads the given DRP registers from several MGTs in a single pass. The DRP
+        busy flag is only checked once per MGT. Returns a dictionary that maps each
+        lane to the list of values read from addrs. The DRP target is left pointing
+        at the last lane; call disable_drp_target() when done.
+        """
+        results = {}
+        for lane in lanes:
+            self.set_drp_target('mgt', lane)
+            if (self.regs.peek32(self.JESD_MGT_DRP_CONTROL) & (0b1 << 20)) != 0:
+                self.log.error("MGT/QPLL DRP Port is reporting busy during an attempted access.")
+                raise RuntimeError("MGT/QPLL DRP Port is reporting busy during an attempted access.")
+            results[lane] = [self.regs.peek32(0x2800 + (addr << 2)) for addr in addrs]
+        return results
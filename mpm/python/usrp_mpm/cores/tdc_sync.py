@@ -9,15 +9,34 @@ TDC clock synchronization
 
 import time
 import math
-from fractions import gcd
+from math import gcd
 from functools import reduce
 from builtins import object
 from usrp_mpm.mpmutils import poll_with_timeout
 from usrp_mpm.mpmlog import get_logger
 
-def mean(vals):
-    " Calculate arithmetic mean of vals "
-    return float(sum(vals)) / max(len(vals), 1)
+def get_stats(vals, max_dev):
+    """
+    Robust statistics of vals: Values further than max_dev from the median are
+    rejected as outliers. Returns a tuple (mean, variance, num_inliers,
+    num_outliers) of the remaining values.
+
+    When vals are integers, the sums are exact, so no precision is lost when
+    the values are large compared to their spread.
+    """
+    ordered = sorted(vals)
+    num_vals = len(ordered)
+    median = (ordered[(num_vals - 1) // 2] + ordered[num_vals // 2]) / 2
+    inliers = [x for x in ordered if abs(x - median) <= max_dev]
+    num_inliers = len(inliers)
+    if num_inliers == 0:
+        return median, 0.0, 0, num_vals
+    total = sum(inliers)
+    # Sum of squared deviations, computed as n*sum(x^2) - sum(x)^2 to stay exact
+    # for integer inputs.
+    sq_dev = (num_inliers * sum(x * x for x in inliers) - total * total) / num_inliers
+    variance = sq_dev / (num_inliers - 1) if num_inliers > 1 else 0.0
+    return total / num_inliers, max(variance, 0.0), num_inliers, num_vals - num_inliers
 
 
 class ClockSynchronizer(object):
@@ -47,6 +66,25 @@ class ClockSynchronizer(object):
     SYNC_OLDESTCOMPAT        = 0x108
     SYNC_SCRATCH             = 0x10C
 
+    # Measurement settings. measure() reads the TDC in bursts of MEAS_BURST_SIZE
+    # samples, and checks for convergence after each burst (once it has at least
+    # MIN_NUM_MEAS samples). The estimate has converged when the confidence
+    # interval (MEAS_CONFIDENCE_Z standard errors) is within the requested
+    # precision.
+    MIN_NUM_MEAS       = 32
+    MEAS_BURST_SIZE    = 16
+    MEAS_CONFIDENCE_Z  = 3.0 # 99.7 %
+    # Default precision of the measurements taken by run(). This is well below
+    # the resolution of the fine phase shift (~1 ps) times the residual error
+    # tolerated by the callers (100 ps).
+    MEAS_PRECISION     = 2e-12
+    # All the measurements taken in a single run should be nearly identical. The
+    # expected max delta between all measurements (from accuracy calculations) is
+    # 1 ns. Values further than MAX_SKEW from the median are rejected as outliers,
+    # if there are more than MAX_OUTLIER_RATIO of them, the measurement fails.
+    MAX_SKEW           = 0.5e-9
+    MAX_OUTLIER_RATIO  = 0.05
+
     def __init__(
             self,
             regs_iface,
@@ -63,6 +101,7 @@ class ClockSynchronizer(object):
             slot_idx
         ):
         self._iface = regs_iface
+        self._offset = offset
         self.log = get_logger("Sync-{}".format(slot_idx))
         self.slot_idx = slot_idx
         self.peek32 = lambda addr: self._iface.peek32(addr + offset)
@@ -187,11 +226,15 @@ class ClockSynchronizer(object):
         self.configured = False
 
 
-    def run(self, num_meas, target_offset=0.0e-9):
+    def run(self, num_meas, target_offset=0.0e-9, precision=MEAS_PRECISION):
         """
         Perform a basic synchronization routine by calling configure(), measure(), and
         align(). The last two calls are repeated for the length of num_meas, and the last
         call only reports the offset value without shifting the clocks.
+
+        Every entry of num_meas is the maximum number of measurements for that run;
+        measuring stops early once the offset is known to within precision (see
+        measure()). Set precision to None to always take all measurements.
         """
 
         self.log.debug("Starting clock synchronization...")
@@ -204,7 +247,7 @@ class ClockSynchronizer(object):
             # On the last alignment run, only report the final offset value. If there is
             # only one run requested, then run the full alignment sequence.
             report_only = (len(num_meas) > 1) & (x == (len(num_meas)-1))
-            meas   = self.measure(num_meas[x])
+            meas   = self.measure(num_meas[x], precision)
             offset = self.align(
                 target_offset=target_offset,
                 current_value=meas,
@@ -302,7 +345,7 @@ class ClockSynchronizer(object):
             """
             # The Restart-pulser must run at the GCD of the RP and SP rates, not the
             # Reference Clock and Radio Clock rates!
-            pulse_rate = find_rate(self.ref_clk_freq, [gcd(rp_rate, sp_rate)])
+            pulse_rate = find_rate(self.ref_clk_freq, [gcd(int(rp_rate), int(sp_rate))])
             period = int(self.ref_clk_freq/pulse_rate)
             hi_time = int(math.floor(period/2))
             # The re-pulse is broken into two registers:
@@ -387,10 +430,14 @@ class ClockSynchronizer(object):
         self.configured = True
 
 
-    def measure(self, num_meas=512):
+    def measure(self, num_meas=512, precision=None):
         """
-        Read num_meas measurements from the device. Average them and return the final
-        offset value.
+        Read up to num_meas measurements from the device. Average them and return the
+        final offset value.
+
+        If precision (in seconds) is given, stop as soon as the confidence interval of
+        the average is narrower than +/- precision, but take at least MIN_NUM_MEAS
+        measurements. Otherwise, always take num_meas measurements.
         """
 
         # Make sure the TDC is configured before attempting to read measurements.
@@ -398,31 +445,42 @@ class ClockSynchronizer(object):
             self.log.error("TDC is not configured prior to requesting measurements!")
             raise RuntimeError("TDC is not configured prior to requesting measurements!")
 
-        measure_offset = lambda: self._read_tdc_meas(
-            self.meas_clk_freq, self.ref_clk_freq, self.radio_clk_freq
-        )
+        # All statistics are calculated on the raw TDC ticks, which are converted to
+        # seconds at the very end.
+        ticks_per_sec = self.meas_clk_freq * (1 << 27)
+        max_skew = self.MAX_SKEW * ticks_per_sec
+        if precision is not None:
+            precision *= ticks_per_sec
 
         # Retrieve the measurements.
         tdc_start_time = time.time()
-        self.log.trace("Reading {} TDC measurements from device...".format(num_meas))
-        measurements = [measure_offset() for _ in range(num_meas)]
-
-        # All the measurements taken in a single run should be nearly identical. The
-        # expected max delta between all measurements (from accuracy calculations)
-        # is 1 ns. Take the average of the measurements and then compare each value mean
-        # to see if it fits this criteria.
-        current_value = mean(measurements)
-
-        max_skew = 0.5e-9 # 500 ps of tolerated skew either direction
-        meas_err = bool(sum([x < current_value-max_skew for x in measurements])) or \
-                   bool(sum([x > current_value+max_skew for x in measurements]))
+        self.log.trace("Reading up to {} TDC measurements from device...".format(num_meas))
+        measurements = []
+        while len(measurements) < num_meas:
+            measurements.extend(self._read_tdc_ticks(
+                min(self.MEAS_BURST_SIZE, num_meas - len(measurements))))
+            if precision is None or len(measurements) < self.MIN_NUM_MEAS:
+                continue
+            current_value, variance, num_inliers, num_outliers = \
+                get_stats(measurements, max_skew)
+            if num_outliers <= self.MAX_OUTLIER_RATIO * len(measurements) and \
+                    self.MEAS_CONFIDENCE_Z * math.sqrt(variance / num_inliers) <= precision:
+                break
+
+        current_value, variance, num_inliers, num_outliers = \
+            get_stats(measurements, max_skew)
         meas_range = max(measurements) - min(measurements)
+        current_value = self._ticks_to_offset(current_value)
 
         self.log.trace("TDC Measurements Collected! Average = {:.3f} ns. "
-                       "Range: {:.3f} ns".format(current_value*1e9, meas_range*1e9))
+                       "Std. dev.: {:.3f} ps. Range: {:.3f} ns. "
+                       "Used {} of {} measurements ({} outliers)."
+                       .format(current_value*1e9, math.sqrt(variance)/ticks_per_sec*1e12,
+                               meas_range/ticks_per_sec*1e9,
+                               len(measurements), num_meas, num_outliers))
         self.log.trace("TDC Measurement Duration: {:.3f} s" \
                        .format(time.time()-tdc_start_time))
-        if meas_err:
+        if num_outliers > self.MAX_OUTLIER_RATIO * len(measurements):
             self.log.error("TDC measurements show a wide range of values! "
                            "Check your clock rates for incompatibilities.")
             raise RuntimeError("TDC measurement out of expected range!")
@@ -483,45 +541,60 @@ class ClockSynchronizer(object):
         return distance_to_target
 
 
-    def _read_tdc_meas(
+    def _read_tdc_ticks(self, num_meas=1):
+        """
+        Read num_meas consecutive TDC runs and return the raw SP to RP offsets (in
+        units of 2^-27 measurement clock ticks) as a list of integers.
+        """
+        # Resolve the register addresses and the peek method once per burst; this
+        # loop is what limits the measurement rate.
+        peek32 = self._iface.peek32
+        sp_offset_1 = self.SP_OFFSET_1 + self._offset
+        sp_offset_0 = self.SP_OFFSET_0 + self._offset
+        rp_offset_1 = self.RP_OFFSET_1 + self._offset
+        rp_offset_0 = self.RP_OFFSET_0 + self._offset
+        results = []
+        for _ in range(num_meas):
+            # Current worst-case time given a 40kHz pulse rate and 2^17 measurements
+            # for the period average operation is ~3.28 s... Round up to 5.0 s. This
+            # value is only for the first measurement to appear... subsequent repeat
+            # runs should be only a few us long.
+            timeout = time.time() + 5.0
+            while True:
+                sp_offset_msb = peek32(sp_offset_1)
+                if sp_offset_msb & 0x100 == 0x100:
+                    break
+                if time.time() > timeout:
+                    error_msg = "Offsets failed to update within timeout."
+                    self.log.error(error_msg)
+                    raise RuntimeError(error_msg)
+            # CRITICAL: These register values are locked when SP_OFFSET_1 is read and
+            # reloaded when SP_OFFSET_1 is read again, to keep one value from updating
+            # before the other. The SP and RP measurements are only meaningful when
+            # compared to one another from the same TDC run.
+            sp_offset_lsb = peek32(sp_offset_0)
+            rp_offset_msb = peek32(rp_offset_1)
+            rp_offset_lsb = peek32(rp_offset_0)
+            results.append((((sp_offset_msb & 0xFF) << 32) | sp_offset_lsb) -
+                           (((rp_offset_msb & 0xFF) << 32) | rp_offset_lsb))
+        return results
+
+
+    def _ticks_to_offset(
             self,
-            meas_clk_freq=170.542641116e6,
-            ref_clk_freq=10e6,
-            radio_clk_freq=125e6,
+            ticks,
+            meas_clk_freq=None,
+            ref_clk_freq=None,
+            radio_clk_freq=None,
         ):
         """
-        Return the offset (in seconds) from the SP to the RP.
+        Convert a raw TDC reading (see _read_tdc_ticks()) into the offset (in
+        seconds) from the SP to the RP.
         """
-        # Current worst-case time given a 40kHz pulse rate and 2^17 measurements for
-        # the period average operation is ~3.28 s... Round up to 5.0 s. This value is
-        # only for the first measurement to appear... subsequent repeat runs should be
-        # only a few us long.
-        timeout = time.time() + 5.0
-        while True:
-            sp_offset_msb = self.peek32(self.SP_OFFSET_1)
-            if sp_offset_msb & 0x100 == 0x100:
-                break
-            if time.time() > timeout:
-                error_msg = "Offsets failed to update within timeout."
-                self.log.error(error_msg)
-                raise RuntimeError(error_msg)
-
-        # CRITICAL: These register values are locked when SP_OFFSET_1 is read and
-        # reloaded when SP_OFFSET_1 is read again, to keep one value from updating before
-        # the other. The SP and RP measurements are only meaningful when compared to one
-        # another from the same TDC run.
-        sp_offset_lsb = self.peek32(self.SP_OFFSET_0)
-        rp_offset_msb = self.peek32(self.RP_OFFSET_1)
-        rp_offset_lsb = self.peek32(self.RP_OFFSET_0)
-
-        sp_offset = (sp_offset_msb & 0xFF) << 32
-        sp_offset = (sp_offset | sp_offset_lsb)
-        rp_offset = (rp_offset_msb & 0xFF) << 32
-        rp_offset = (rp_offset | rp_offset_lsb)
-
-        # Do the subtraction before converting to floating point.
-        sp_rp = float(sp_offset - rp_offset) / (1<<27)
-
+        meas_clk_freq = meas_clk_freq or self.meas_clk_freq
+        ref_clk_freq = ref_clk_freq or self.ref_clk_freq
+        radio_clk_freq = radio_clk_freq or self.radio_clk_freq
+        sp_rp = float(ticks) / (1<<27)
         # Some Math...
         # Convert the reading from meas_clk ticks to picoseconds
         sp_rp_samp = sp_rp/meas_clk_freq
@@ -530,6 +603,19 @@ class ClockSynchronizer(object):
         return offset
 
 
+    def _read_tdc_meas(
+            self,
+            meas_clk_freq=170.542641116e6,
+            ref_clk_freq=10e6,
+            radio_clk_freq=125e6,
+        ):
+        """
+        Return the offset (in seconds) from the SP to the RP.
+        """
+        return self._ticks_to_offset(
+            self._read_tdc_ticks(1)[0], meas_clk_freq, ref_clk_freq, radio_clk_freq)
+
+
     def _oracle(self, target_values, current_value, lmk_vco_freq, fine_delay_step):
         """
         target_values -- The desired offset (seconds). Can be a list of values,
@@ -10,7 +10,7 @@ dboard base implementation module
 from builtins import object
 from six import iteritems
 from usrp_mpm.mpmlog import get_logger
-from usrp_mpm.mpmutils import to_native_str
+from usrp_mpm.mpmutils import to_native_str, str2bool
 
 class DboardManagerBase(object):
     """
@@ -36,6 +36,12 @@ class DboardManagerBase(object):
     # maps these keys to actual spidev paths. Also throws a warning/error if
     # the SPI configuration is invalid.
     spi_chipselect = {}
+    # Init stages: A list of (stage name, init args) tuples, in the order in
+    # which init() runs them. The init args are a list of (arg name, default
+    # value) tuples. If any of these args change between two init() calls, the
+    # stage and all stages following it need to be re-run. See
+    # get_init_stages().
+    init_stages = []
     ### End of overridables #################################################
 
     def __init__(self, slot_idx, **kwargs):
@@ -55,7 +61,9 @@ class DboardManagerBase(object):
             self.spi_chipselect
         )
         self.log.debug("spidev device node map: {}".format(self._spi_nodes))
-
+        # The init state of the last successful init(), see get_init_stages().
+        # None means we don't know what state the dboard is in.
+        self._init_state = None
 
     def _init_spi_nodes(self, spi_devices, chip_select_map):
         """
@@ -87,6 +95,83 @@ class DboardManagerBase(object):
         """
         raise NotImplementedError("DboardManagerBase::init() not implemented!")
 
+    ##########################################################################
+    # Init state tracking
+    ##########################################################################
+    def get_init_state(self, args):
+        """
+        Return additional state that defines the init stages, as a dictionary
+        stage name -> {name: value}. Use this for hardware state (e.g., the
+        master clock rate) and for init args whose default values are only
+        known at runtime. Values are compared by their string representation.
+
+        May be overridden.
+        """
+        return {}
+
+    def _get_init_state(self, args):
+        """
+        Return the init state for args: A dictionary stage name ->
+        {name: value string} for all stages in init_stages.
+        """
+        extra_state = self.get_init_state(args)
+        init_state = {}
+        for stage, stage_args in self.init_stages:
+            stage_state = {
+                arg_name: str(args.get(arg_name, default))
+                for arg_name, default in stage_args
+            }
+            stage_state.update({
+                name: str(value)
+                for name, value in extra_state.get(stage, {}).items()
+            })
+            init_state[stage] = stage_state
+        return init_state
+
+    def get_init_stages(self, args):
+        """
+        Return the list of init stages that need to run to bring the dboard
+        into the state requested by args. This is compared against the state
+        of the last successful init(), which needs to be reported by calling
+        set_init_done().
+
+        All stages are returned if there was no successful init() yet, the
+        state was invalidated, or args contains force_reinit=1. If nothing
+        changed, an empty list is returned.
+        """
+        stages = [stage for stage, _ in self.init_stages]
+        if str2bool(args.get('force_reinit', False)):
+            self.log.debug("Forcing full re-init.")
+            return stages
+        if self._init_state is None:
+            return stages
+        new_state = self._get_init_state(args)
+        for idx, stage in enumerate(stages):
+            old_stage_state = self._init_state.get(stage, {})
+            changed = sorted(
+                name for name, value in new_state[stage].items()
+                if old_stage_state.get(name) != value)
+            if changed:
+                self.log.debug(
+                    "The following init state changed and requires running "
+                    "init stage `{}': {}".format(stage, ", ".join(changed)))
+                return stages[idx:]
+        self.log.debug("Init state unchanged, skipping all init stages.")
+        return []
+
+    def set_init_done(self, args):
+        """
+        Store the init state after a successful init() with args.
+        """
+        self._init_state = self._get_init_state(args)
+
+    def invalidate_init_state(self):
+        """
+        Forget the init state. Call this whenever the hardware is put into a
+        state that requires a full init(), e.g., when powering it down.
+        """
+        self._init_state = None
+
     def deinit(self):
         """
         Power down the dboard. Does not have be implemented. If it does, it
@@ -8,6 +8,7 @@ Gain table control for Rhodium
 """
 
 from __future__ import print_function
+from usrp_mpm.mpmlog import get_logger
 from usrp_mpm.dboard_manager.gaintables_rh import RX_LOWBAND_GAIN_TABLE
 from usrp_mpm.dboard_manager.gaintables_rh import RX_HIGHBAND_GAIN_TABLE
 from usrp_mpm.dboard_manager.gaintables_rh import TX_LOWBAND_GAIN_TABLE
@@ -40,6 +41,53 @@ GAIN_TBL_SEL_DATA_BOTH_LOW = \
     (GAIN_TBL_SEL_LOW_BAND << GAIN_TBL_SEL_TX_SHIFT) | \
     (GAIN_TBL_SEL_LOW_BAND << GAIN_TBL_SEL_RX_SHIFT)
 
+# The loader returns {dsa1, dsa2} of the addressed entry in these bits
+GAIN_TBL_READBACK_SHIFT = 4
+GAIN_TBL_READBACK_MASK = 0x3FF
+
+###############################################################################
+# Helpers
+###############################################################################
+
+def _create_spi_loader_message(table, index, dsa1, dsa2):
+    """
+    Return the (addr, data) pair that loads dsa1/dsa2 into a gain table index
+    """
+    addr = 0
+    data = 0
+    if table == "rx":
+        tableindex = 1
+    elif table == "tx":
+        tableindex = 2
+    else:
+        raise RuntimeError("Invalid table selected in gain loader: " + table)
+    addr |= (tableindex << 6)
+    addr |= (index << 0)
+    data |= (dsa1 << 5)
+    data |= (dsa2 << 0)
+    return addr, data
+
+_GAIN_TABLE_MESSAGES = {}
+
+def get_gain_table_messages(table, gain_table):
+    """
+    Return the lists of addresses and data words that load gain_table into the
+    table "rx" or "tx". The gain tables are static, so the messages are only
+    computed once.
+    """
+    key = (table, id(gain_table))
+    if key not in _GAIN_TABLE_MESSAGES:
+        messages = [
+            _create_spi_loader_message(
+                table, i, gain_table[i][0], gain_table[i][1])
+            for i in range(GAIN_TABLE_MIN_INDEX, GAIN_TABLE_MAX_INDEX)
+        ]
+        _GAIN_TABLE_MESSAGES[key] = (
+            [addr for addr, _ in messages],
+            [data for _, data in messages],
+        )
+    return _GAIN_TABLE_MESSAGES[key]
+
 ###############################################################################
 # Main class
 ###############################################################################
@@ -57,27 +105,25 @@ class GainTableRh():
         assert hasattr(self.gain_tbl_regs, 'poke16')
 
     def _load_default_table(self, table, gain_table):
-        def _create_spi_loader_message(table, index, dsa1, dsa2):
-            addr = 0
-            data = 0
-            if table == "rx":
-                tableindex = 1
-            elif table == "tx":
-                tableindex = 2
-            else:
-                raise RuntimeError("Invalid table selected in gain loader: " + table)
-            addr |= (tableindex << 6)
-            addr |= (index << 0)
-            data |= (dsa1 << 5)
-            data |= (dsa2 << 0)
-            return addr, data
-        for i in range(GAIN_TABLE_MIN_INDEX, GAIN_TABLE_MAX_INDEX):
-            addr, data = _create_spi_loader_message(
-                table,
-                i,
-                gain_table[i][0],
-                gain_table[i][1])
-            self.gain_tbl_regs.poke16(addr, data)
+        """
+        Load gain_table into the currently selected band of the table "rx" or
+        "tx", unless the CPLD already holds it.
+        """
+        addrs, data = get_gain_table_messages(table, gain_table)
+        if not hasattr(self.gain_tbl_regs, 'poke16_multi'):
+            for addr, value in zip(addrs, data):
+                self.gain_tbl_regs.poke16(addr, value)
+            return
+        # The loader returns the current table entry on every transaction,
+        # so we can check if the table needs loading at all.
+        readback = [
+            (value >> GAIN_TBL_READBACK_SHIFT) & GAIN_TBL_READBACK_MASK
+            for value in self.gain_tbl_regs.peek16_multi(addrs)
+        ]
+        if readback == data:
+            self.log.trace("CPLD already holds the %s gain table", table)
+            return
+        self.gain_tbl_regs.poke16_multi(addrs, data)
 
     def init(self):
         """
@@ -7,7 +7,6 @@
 LMK04828 driver for use with Magnesium
 """
 
-import time
 import math
 from usrp_mpm.chips import LMK04828
 
@@ -198,24 +197,11 @@ class LMK04828Mg(LMK04828):
             (0x173, 0x00), # Do not power down PLL2 or prescaler
         ))
 
-        # Poll for PLL1/2 lock. Total time = 6 * 50 ms = 300 ms
+        # Poll for PLL1/2 lock for up to 300 ms
         self.log.trace("Polling for PLL lock...")
-        locked = False
-        for _ in range(6):
-            time.sleep(0.050)
-            # Clear stickies
-            self.pokes8((
-                (0x182, 0x1), # Clear Lock Detect Sticky
-                (0x182, 0x0), # Clear Lock Detect Sticky
-                (0x183, 0x1), # Clear Lock Detect Sticky
-                (0x183, 0x0), # Clear Lock Detect Sticky
-            ))
-            if self.check_plls_locked():
-                locked = True
-                self.log.trace("PLLs are Locked!")
-                break
-        if not locked:
+        if not self.wait_for_plls_locked(300, 50):
             raise RuntimeError("At least one PLL did not lock! Check the logs for details.")
+        self.log.trace("PLLs are Locked!")
 
         self.log.trace("Synchronizing output dividers...")
         self.pokes8((
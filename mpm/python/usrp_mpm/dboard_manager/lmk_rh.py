@@ -7,7 +7,6 @@
 LMK04828 driver for use with Rhodium
 """
 
-import time
 from ..mpmlog import get_logger
 from ..chips import LMK04828
 
@@ -242,24 +241,11 @@ class LMK04828Rh(LMK04828):
             (0x173, 0x00), # Do not power down PLL2 or prescaler
         ))
 
-        # Poll for PLL1/2 lock. Total time = 100 * 10 ms = 1000 ms max.
+        # Poll for PLL1/2 lock for up to 1000 ms
         self.log.trace("Polling for PLL lock...")
-        locked = False
-        for _ in range(100):
-            time.sleep(0.01)
-            # Clear stickies
-            self.pokes8((
-                (0x182, 0x1), # Clear Lock Detect Sticky
-                (0x182, 0x0), # Clear Lock Detect Sticky
-                (0x183, 0x1), # Clear Lock Detect Sticky
-                (0x183, 0x0), # Clear Lock Detect Sticky
-            ))
-            if self.check_plls_locked():
-                locked = True
-                self.log.trace("LMK PLLs Locked!")
-                break
-        if not locked:
+        if not self.wait_for_plls_locked(1000, 10):
             raise RuntimeError("At least one LMK PLL did not lock! Check the logs for details.")
+        self.log.trace("LMK PLLs Locked!")
 
         self.log.trace("Setting SYNC and SYSREF config...")
         self.pokes8((
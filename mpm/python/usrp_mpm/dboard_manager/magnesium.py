@@ -88,6 +88,19 @@ class Magnesium(BfrfsEEPROM, DboardManagerBase):
     }
     # Maps the chipselects to the corresponding devices:
     spi_chipselect = {"cpld": 0, "lmk": 1, "mykonos": 2, "phase_dac": 3}
+    # If any of these changes, we need a full re-init:
+    # We're being super conservative for now, because the only reliable reset
+    # sequence we have for AD9371 is the full Monty. As we learn more about the
+    # chip, we might be able to get away with a partial (fast) reinit even when
+    # some of these values change.
+    init_stages = [
+        ('full', [
+            ('rx_lo_source', 'internal'),
+            ('tx_lo_source', 'internal'),
+            ('init_cals', 'DEFAULT'),
+            ('tracking_cals', 'DEFAULT'),
+        ]),
+    ]
     ### End of overridables #################################################
     # Class-specific, but constant settings:
     spi_factories = {
@@ -246,29 +259,25 @@ class Magnesium(BfrfsEEPROM, DboardManagerBase):
             error_msg = "Cannot run init(), peripherals are not initialized!"
             self.log.error(error_msg)
             raise RuntimeError(error_msg)
-        # Check if ref clock freq changed (would require a full init)
-        ref_clk_freq_changed = False
+        # Changing the ref clock freq or master clock rate requires a full
+        # init, see get_init_state()
         if 'ref_clk_freq' in args:
             new_ref_clock_freq = float(args['ref_clk_freq'])
             assert new_ref_clock_freq in (10e6, 20e6, 25e6)
             if new_ref_clock_freq != self.ref_clock_freq:
                 self.ref_clock_freq = float(args['ref_clk_freq'])
-                ref_clk_freq_changed = True
                 self.log.debug(
                     "Updating reference clock frequency to {:.02f} MHz!"
                     .format(self.ref_clock_freq / 1e6)
                 )
         assert self.ref_clock_freq is not None
-        # Check if master clock freq changed (would require a full init)
         master_clock_rate = \
             float(args.get('master_clock_rate',
                            self.default_master_clock_rate))
         assert master_clock_rate in (122.88e6, 125e6, 153.6e6), \
                 "Invalid master clock rate: {:.02f} MHz".format(
                     master_clock_rate / 1e6)
-        master_clock_rate_changed = \
-            master_clock_rate != self.master_clock_rate
-        if master_clock_rate_changed:
+        if master_clock_rate != self.master_clock_rate:
             self.master_clock_rate = master_clock_rate
             self.log.debug(
                 "Updating master clock rate to {:.02f} MHz!"
@@ -276,10 +285,7 @@ class Magnesium(BfrfsEEPROM, DboardManagerBase):
             )
         # Track if we're able to do a "fast reinit", which means there were no
         # major changes and can skip all slow initialization steps.
-        fast_reinit = \
-            not bool(args.get("force_reinit", False)) \
-            and not master_clock_rate_changed \
-            and not ref_clk_freq_changed
+        fast_reinit = not self.get_init_stages(args)
         if fast_reinit:
             self.log.debug(
                 "Attempting fast re-init with the following settings: "
@@ -289,14 +295,30 @@ class Magnesium(BfrfsEEPROM, DboardManagerBase):
                     self.ref_clock_freq,
                 )
             )
+        else:
+            self.invalidate_init_state()
         # Note: MagnesiumInitManager.init() can still override fast_reinit.
         # Consider it a hint.
         result = MagnesiumInitManager(self, self._spi_ifaces).init(
-            args, self._init_args, fast_reinit)
+            args, fast_reinit)
         if result:
             self._init_args = args
+            self.set_init_done(args)
         return result
 
+    def get_init_state(self, args):
+        """
+        Besides the init args in init_stages, a change of the clock rates or
+        the init cal timeout requires a full init.
+        """
+        return {'full': {
+            'master_clock_rate': self.master_clock_rate,
+            'ref_clk_freq': self.ref_clock_freq,
+            'init_cals_timeout': args.get(
+                'init_cals_timeout',
+                str(self.mykonos.DEFAULT_INIT_CALS_TIMEOUT)),
+        }}
+
 
     ##########################################################################
     # Clocking control APIs
@@ -313,6 +335,7 @@ class Magnesium(BfrfsEEPROM, DboardManagerBase):
         if self._init_args is None:
             # Then we're already in a safe state
             return
+        self.invalidate_init_state()
         # Reset Mykonos, since it receives a copy of the clock from the LMK.
         self.cpld.reset_mykonos(keep_in_reset=True)
         with open_uio(
@@ -355,7 +378,8 @@ class Magnesium(BfrfsEEPROM, DboardManagerBase):
         args["ref_clk_freq"] = self.ref_clock_freq
         # If we add API calls to reset the cals, they need to update
         # self._init_args
-        self.master_clock_rate = None # <= This will force a re-init
+        self.master_clock_rate = None
+        self.invalidate_init_state() # <= This will force a re-init
         self.init(args)
         # self.master_clock_rate is now OK again
 
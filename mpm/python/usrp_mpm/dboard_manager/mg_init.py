@@ -564,47 +564,26 @@ class MagnesiumInitManager(object):
         return True
 
 
-    def init(self, args, old_args, fast_reinit):
+    def init(self, args, fast_reinit):
         """
         Runs the actual initialization.
 
         Arguments:
         args -- Dictionary with user-specified args
-        old_args -- Dictionary with user-specified args from the previous
-                    initialization run.
         fast_reinit -- A hint to do a fast reinit. If nothing changes, then
                        we don't have to re-init everything and their dogs, we
-                       can skip a whole bunch of things.
+                       can skip a whole bunch of things. The args that define
+                       whether anything changed are declared in
+                       Magnesium.init_stages.
         """
-        # If any of these changes, we need a full re-init:
-        # TODO: This is not very DRY (because we're repeating default values),
-        # and is generally smelly design. However, we're being super
-        # conservative for now, because the only reliable reset sequence we
-        # have for AD9371 is the full Monty. As we learn more about the chip,
-        # we might be able to get away with a partial (fast) reinit even when
-        # some of these values change.
-        args_that_must_not_change = [
-            ('rx_lo_source', 'internal'),
-            ('tx_lo_source', 'internal'),
-            ('init_cals', 'DEFAULT'),
-            ('tracking_cals', 'DEFAULT'),
-            ('init_cals_timeout', str(self.mykonos.DEFAULT_INIT_CALS_TIMEOUT)),
-        ]
         if fast_reinit:
-            for arg_key, arg_default in args_that_must_not_change:
-                old_value = old_args.get(arg_key, arg_default)
-                new_value = args.get(arg_key, arg_default)
-                if old_value != new_value:
-                    self.log.debug(
-                        "The following init arg changed and caused "
-                        "a full re-init sequence: {}".format(arg_key))
-                    fast_reinit = False
             # TODO: Maybe we can switch to digital loopback without running the
             # initialization. For now, force init when rfic_digital_loopback is
             # set because we're being conservative.
             if 'rfic_digital_loopback' in args:
                 self.log.debug("Using rfic_digital_loopback flag causes a "
                                "full re-init sequence.")
+                self.mg_class.invalidate_init_state()
                 fast_reinit = False
         # If we can't do fast re-init, start from scratch:
         if not fast_reinit:
@@ -616,10 +595,7 @@ class MagnesiumInitManager(object):
                 ):
                 return False
         else:
-            self.log.debug("Running fast re-init with the following settings:")
-            for arg_key, arg_default in args_that_must_not_change:
-                self.log.debug(
-                    "{}={}".format(arg_key, args.get(arg_key, arg_default)))
+            self.log.debug("Running fast re-init.")
             return True
         if str2bool(args.get('rfic_digital_loopback')):
             self.log.warning(
@@ -169,6 +169,11 @@ class Rhodium(BfrfsEEPROM, DboardManagerBase):
     }
     default_master_clock_rate = 245.76e6
     default_time_source = 'internal'
+    # If any of these changes, we need a full re-init (the time source
+    # determines the LMK configuration):
+    init_stages = [
+        ('full', [('time_source', default_time_source)]),
+    ]
     default_current_jesd_rate = 4915.2e6
 
     # Provide a mapping of direction and pin number to
@@ -290,26 +295,23 @@ class Rhodium(BfrfsEEPROM, DboardManagerBase):
             error_msg = "Cannot run init(), peripherals are not initialized!"
             self.log.error(error_msg)
             raise RuntimeError(error_msg)
-        # Check if ref clock freq changed (would require a full init)
-        ref_clk_freq_changed = False
+        # Changing the ref clock freq or master clock rate requires a full
+        # init, see get_init_state()
         if 'ref_clk_freq' in args:
             new_ref_clock_freq = float(args['ref_clk_freq'])
             assert new_ref_clock_freq in (10e6, 20e6, 25e6)
             if new_ref_clock_freq != self.ref_clock_freq:
                 self.ref_clock_freq = new_ref_clock_freq
-                ref_clk_freq_changed = True
                 self.log.debug(
                     "Updating reference clock frequency to {:.02f} MHz!"
                     .format(self.ref_clock_freq / 1e6)
                 )
         assert self.ref_clock_freq is not None
-        # Check if master clock freq changed (would require a full init)
         new_master_clock_rate = \
             float(args.get('master_clock_rate', self.default_master_clock_rate))
         assert new_master_clock_rate in (200e6, 245.76e6, 250e6), \
                 "Invalid master clock rate: {:.02f} MHz".format(new_master_clock_rate / 1e6)
-        master_clock_rate_changed = new_master_clock_rate != self.master_clock_rate
-        if master_clock_rate_changed:
+        if new_master_clock_rate != self.master_clock_rate:
             self.master_clock_rate = new_master_clock_rate
             self.log.debug("Updating master clock rate to {:.02f} MHz!".format(
                 self.master_clock_rate / 1e6
@@ -328,21 +330,30 @@ class Rhodium(BfrfsEEPROM, DboardManagerBase):
             ))
         # Track if we're able to do a "fast reinit", which means there were no
         # major changes and can skip all slow initialization steps.
-        fast_reinit = \
-            not bool(args.get("force_reinit", False)) \
-            and not master_clock_rate_changed \
-            and not ref_clk_freq_changed
+        fast_reinit = not self.get_init_stages(args)
         if fast_reinit:
             self.log.debug("Attempting fast re-init with the following settings: "
                            "master_clock_rate={} MHz ref_clk_freq={} MHz"
                            .format(self.master_clock_rate / 1e6, self.ref_clock_freq / 1e6))
             init_result = True
         else:
+            self.invalidate_init_state()
             init_result = RhodiumInitManager(self, self._spi_ifaces).init(args)
         if init_result:
             self._init_args = args
+            self.set_init_done(args)
         return init_result
 
+    def get_init_state(self, args):
+        """
+        Besides the init args in init_stages, a change of the clock rates
+        requires a full init.
+        """
+        return {'full': {
+            'master_clock_rate': self.master_clock_rate,
+            'ref_clk_freq': self.ref_clock_freq,
+        }}
+
     def enable_lo_export(self, direction, enable):
         """
         For N321 devices. If enable is true, connect the RX 1:4 splitter to the
@@ -403,6 +414,7 @@ class Rhodium(BfrfsEEPROM, DboardManagerBase):
         if self._init_args is None:
             # Then we're already in a safe state
             return
+        self.invalidate_init_state()
         # Put the ADC and the DAC in a safe state because they receive a LMK's clock.
         # The DAC37J82 datasheet only recommends disabling its analog output before
         # a clock is provided to the chip.
@@ -434,7 +446,8 @@ class Rhodium(BfrfsEEPROM, DboardManagerBase):
         args["ref_clk_freq"] = self.ref_clock_freq
         # If we add API calls to reset the cals, they need to update
         # self._init_args
-        self.master_clock_rate = None # <= This will force a re-init
+        self.master_clock_rate = None
+        self.invalidate_init_state() # <= This will force a re-init
         self.init(args)
         # self.master_clock_rate is now OK again
 
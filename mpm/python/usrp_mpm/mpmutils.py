@@ -7,14 +7,117 @@
 Miscellaneous utilities for MPM
 """
 
+import os
+import sys
 import time
-import pyudev
+import threading
+from concurrent import futures
 from contextlib import contextmanager
+import pyudev
+
+# Statistics of all waits, see get_wait_stats()
+_wait_stats = {}
+_wait_stats_lock = threading.Lock()
+
+# Initial sleep time between state checks in wait_for(), in milliseconds
+WAIT_MIN_INTERVAL_MS = 1
+
+def _get_wait_site(state_check, depth):
+    """
+    Return a name for a wait site: The qualified name of state_check, or, for
+    lambdas, the file and line of the caller (depth frames up).
+    """
+    qualname = getattr(state_check, '__qualname__', '')
+    if qualname and '<lambda>' not in qualname:
+        return qualname
+    frame = sys._getframe(depth + 1)
+    return "{}:{}".format(
+        os.path.basename(frame.f_code.co_filename), frame.f_lineno)
+
+def _wait_for(site, state_check, timeout_ms, interval_ms, min_interval_ms,
+              event_wait):
+    """
+    Implementation of wait_for()
+    """
+    start_time = time.monotonic()
+    deadline = start_time + float(timeout_ms) / 1000
+    max_interval_s = float(interval_ms) / 1000
+    interval_s = min(float(min_interval_ms) / 1000, max_interval_s)
+    num_checks = 0
+    success = False
+    while True:
+        num_checks += 1
+        if state_check():
+            success = True
+            break
+        remaining_s = deadline - time.monotonic()
+        if remaining_s <= 0:
+            break
+        if event_wait is not None:
+            # We still check the state every interval_ms, in case we missed
+            # an event.
+            event_wait(min(remaining_s, max_interval_s))
+        else:
+            time.sleep(min(remaining_s, interval_s))
+            interval_s = min(2 * interval_s, max_interval_s)
+    duration = time.monotonic() - start_time
+    with _wait_stats_lock:
+        stats = _wait_stats.setdefault(site, {
+            'count': 0,
+            'timeouts': 0,
+            'checks': 0,
+            'total_time': 0.0,
+            'max_time': 0.0,
+        })
+        stats['count'] += 1
+        stats['timeouts'] += int(not success)
+        stats['checks'] += num_checks
+        stats['total_time'] += duration
+        stats['max_time'] = max(stats['max_time'], duration)
+    return success
+
+def wait_for(state_check, timeout_ms, interval_ms,
+             min_interval_ms=WAIT_MIN_INTERVAL_MS, event_wait=None, name=None):
+    """
+    Wait until state_check() returns a positive value, or until a timeout is
+    exceeded.
+
+    Without event_wait, state_check() is polled with an exponential backoff:
+    The first sleep is min_interval_ms long, and every following sleep is
+    twice as long as the previous one, up to interval_ms. Short waits thus
+    return early, and long waits don't turn into a busy loop.
+
+    If the hardware can signal a change of state (e.g., a GPIO edge or a UIO
+    interrupt), pass a function that waits for that as event_wait. Then,
+    state_check() is called whenever event_wait() returns.
+
+    state_check() is always called once more after the timeout expired.
+
+    Every wait is recorded in the wait statistics, see get_wait_stats().
+
+    Returns True if state_check() returned True within the timeout.
+
+    Arguments:
+    state_check -- Functor that returns a Boolean success value, and takes no
+                   arguments.
+    timeout_ms -- The total timeout in milliseconds. state_check() has to
+                  return True within this time.
+    interval_ms -- Maximum time between calls to state_check().
+    min_interval_ms -- Time between the first two calls to state_check(), if
+                       polling.
+    event_wait -- Functor that takes a timeout in seconds, and returns once an
+                  event occurred or the timeout expired.
+    name -- Name of this wait site for the statistics. Defaults to the name of
+            state_check, or the file and line of the caller for lambdas.
+    """
+    return _wait_for(
+        name or _get_wait_site(state_check, 1),
+        state_check, timeout_ms, interval_ms, min_interval_ms, event_wait)
 
 def poll_with_timeout(state_check, timeout_ms, interval_ms):
     """
-    Calls state_check() every interval_ms until it returns a positive value, or
-    until a timeout is exceeded.
+    Calls state_check() until it returns a positive value, or until a timeout
+    is exceeded. This is wait_for() with default arguments.
 
     Returns True if state_check() returned True within the timeout.
 
@@ -23,20 +126,40 @@ def poll_with_timeout(state_check, timeout_ms, interval_ms):
                    arguments.
     timeout_ms -- The total timeout in milliseconds. state_check() has to
                   return True within this time.
-    interval_ms -- Sleep time between calls to state_check(). Note that if
-                   interval_ms is larger than timeout_ms, state_check() will be
-                   called exactly once, and then poll_with_timeout() will still
-                   sleep for interval_ms milliseconds. Typically, interval_ms
-                   should be chosen much smaller than timeout_ms, but not too
-                   small for this to become a busy loop.
-    """
-    max_time = time.time() + (float(timeout_ms) / 1000)
-    interval_s = float(interval_ms) / 1000
-    while time.time() < max_time:
-        if state_check():
-            return True
-        time.sleep(interval_s)
-    return False
+    interval_ms -- Maximum sleep time between calls to state_check().
+                   Typically, interval_ms should be chosen much smaller than
+                   timeout_ms.
+    """
+    return _wait_for(
+        _get_wait_site(state_check, 1),
+        state_check, timeout_ms, interval_ms, WAIT_MIN_INTERVAL_MS, None)
+
+def get_wait_stats():
+    """
+    Return the statistics of all waits (see wait_for()) since the last call to
+    reset_wait_stats(), as a dictionary wait site -> stats, sorted by the total
+    time spent waiting. The stats are a dictionary with the keys:
+    - count: Number of waits
+    - timeouts: Number of waits that timed out
+    - checks: Total number of state checks
+    - total_time: Total time spent waiting in seconds
+    - max_time: Longest wait in seconds
+    """
+    with _wait_stats_lock:
+        return {
+            site: dict(stats)
+            for site, stats in sorted(
+                _wait_stats.items(),
+                key=lambda item: item[1]['total_time'],
+                reverse=True)
+        }
+
+def reset_wait_stats():
+    """
+    Clear the wait statistics
+    """
+    with _wait_stats_lock:
+        _wait_stats.clear()
 
 def to_native_str(str_or_bstr):
     """
@@ -170,6 +293,122 @@ def async_exec(parent, method_name, *args):
     while not awaitable_method():
         time.sleep(0.1)
 
+class TaskGraph:
+    """
+    Run a set of named tasks with declared dependencies.
+
+    A task is started as soon as all the tasks it depends on have completed,
+    so independent tasks run concurrently in a thread pool. Dependencies must
+    be added before the tasks that depend on them, which rules out cycles.
+    If a task fails, no further tasks are started; run() waits for the tasks
+    that are still running and then re-raises the first exception.
+
+    The run time of every task is recorded, see get_durations().
+
+    Example:
+    >>> tasks = TaskGraph(log)
+    >>> tasks.add('cpld', init_cpld)
+    >>> tasks.add('clocks', init_clocks, deps=['cpld'])
+    >>> tasks.add('gps', init_gps)
+    >>> tasks.run() # Runs 'gps' concurrently to 'cpld' and 'clocks'
+    >>> tasks.get_durations()
+    {'gps': 0.2, 'cpld': 0.1, 'clocks': 1.3}
+
+    Arguments:
+    log -- Logger. If given, the task durations are logged at debug level.
+    max_workers -- Maximum number of tasks to run concurrently. Defaults to the
+                   number of tasks.
+    serialize -- If True, tasks are run one at a time, in the order they were
+                 added. Useful for debugging.
+    """
+    def __init__(self, log=None, max_workers=None, serialize=False):
+        self.log = log
+        self._max_workers = 1 if serialize else max_workers
+        self._serialize = serialize
+        self._tasks = {}
+        self._durations = {}
+        self._lock = threading.Lock()
+
+    def add(self, name, func, deps=None):
+        """
+        Add a task.
+
+        Arguments:
+        name -- Unique name of the task
+        func -- Callable that takes no arguments. Its return value is ignored.
+        deps -- List of names of tasks that need to complete before this one.
+        """
+        deps = frozenset(deps or ())
+        if name in self._tasks:
+            raise ValueError("Duplicate task name: {}".format(name))
+        unknown_deps = deps.difference(self._tasks)
+        if unknown_deps:
+            raise ValueError("Task {} depends on unknown task(s): {}".format(
+                name, ", ".join(sorted(unknown_deps))))
+        self._tasks[name] = (func, deps)
+
+    def _run_task(self, name, func):
+        """ Run a single task and record its duration """
+        start_time = time.monotonic()
+        try:
+            func()
+        finally:
+            with self._lock:
+                self._durations[name] = time.monotonic() - start_time
+
+    def run(self):
+        """
+        Run all tasks. Returns once all tasks have completed, or raises the
+        exception of the first task that failed.
+        """
+        pending = dict(self._tasks)
+        done = set()
+        running = {}
+        first_exception = None
+        num_workers = self._max_workers or max(len(pending), 1)
+        with futures.ThreadPoolExecutor(max_workers=num_workers) as executor:
+            while True:
+                if first_exception is None:
+                    candidates = list(pending.items())
+                    if self._serialize:
+                        # Strictly in the order the tasks were added (which
+                        # also satisfies all dependencies)
+                        candidates = candidates[:1] if not running else []
+                    for name, (func, deps) in candidates:
+                        if deps.issubset(done):
+                            del pending[name]
+                            running[executor.submit(self._run_task, name, func)] = name
+                if not running:
+                    break
+                finished, _ = futures.wait(
+                    running, return_when=futures.FIRST_COMPLETED)
+                for future in finished:
+                    name = running.pop(future)
+                    try:
+                        future.result()
+                        done.add(name)
+                    except Exception as ex:
+                        if self.log is not None:
+                            self.log.error("Task `%s' failed: %s", name, str(ex))
+                        if first_exception is None:
+                            first_exception = ex
+        if self.log is not None:
+            self.log.debug("Task durations: %s", ", ".join(
+                "{}={:.3f}s".format(name, duration)
+                for name, duration in self.get_durations().items()))
+        if first_exception is not None:
+            raise first_exception
+
+    def get_durations(self):
+        """
+        Return a dictionary task name -> run time in seconds of all tasks that
+        were run, in the order they were added.
+        """
+        with self._lock:
+            return {name: self._durations[name]
+                    for name in self._tasks if name in self._durations}
+
+
 @contextmanager
 def lock_guard(lockable):
     """Context-based lock guard
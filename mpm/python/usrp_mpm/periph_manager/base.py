@@ -28,6 +28,8 @@ from usrp_mpm.sys_utils import net
 from usrp_mpm import eeprom
 from usrp_mpm.rpc_server import no_claim, no_rpc
 from usrp_mpm import prefs
+from usrp_mpm import mpmutils
+from usrp_mpm.status_monitor import StatusMonitor
 
 def get_dboard_class_from_pid(pid):
     """
@@ -246,6 +248,11 @@ class PeriphManagerBase(object):
         # Set up logging
         self.log = get_logger('PeriphManager')
         self.claimed = False
+        # Runs the periodic status checks (ref lock, LEDs, fault lines, ...)
+        # of the motherboard. Child classes register their checks and start
+        # it once the peripherals are initialized.
+        self._status_monitor = StatusMonitor(
+            self.log, name="{}StatusMonitorThread".format(type(self).__name__))
         try:
             self.mboard_info = self._get_mboard_info()
             self.log.info("Device serial number: {}"
@@ -766,6 +773,7 @@ class PeriphManagerBase(object):
         deconstruction.
         """
         self.log.trace("Teardown called for Peripheral Manager base.")
+        self._status_monitor.stop()
         for each in self.dboards:
             each.tear_down()
 
@@ -841,6 +849,15 @@ class PeriphManagerBase(object):
         """
         return dtoverlay.list_overlays()
 
+    @no_claim
+    def get_wait_stats(self):
+        """
+        Returns the statistics of all hardware waits (PLL locks, resets, power
+        good signals, ...) since MPM was started, ordered by the total time
+        spent waiting. See mpmutils.get_wait_stats().
+        """
+        return mpmutils.get_wait_stats()
+
     @no_rpc
     def get_device_info(self):
         """
@@ -10,7 +10,6 @@ N3xx implementation module
 from __future__ import print_function
 import copy
 import re
-import threading
 import time
 from six import iteritems, itervalues
 from usrp_mpm.cores import WhiteRabbitRegsControl
@@ -42,6 +41,7 @@ N32X_DEFAULT_QSFP_DRIVER_PRESET = 'Optical'
 N32X_QSFP_I2C_LABEL = 'qsfp-i2c'
 N3XX_FPGA_COMPAT = (8, 0)
 N3XX_MONITOR_THREAD_INTERVAL = 1.0 # seconds
+N3XX_MONITOR_MAX_INTERVAL = 4.0 # seconds
 N3XX_BUS_CLK = 200e6
 N3XX_GPIO_BANKS = ["FP0",]
 N3XX_GPIO_SRC_PS = "PS"
@@ -203,8 +203,6 @@ class n3xx(ZynqComponents, PeriphManagerBase):
     # Ctor and device initialization tasks
     ###########################################################################
     def __init__(self, args):
-        self._tear_down = False
-        self._status_monitor_thread = None
         self._ext_clock_freq = None
         self._clock_source = None
         self._time_source = None
@@ -300,29 +298,19 @@ class n3xx(ZynqComponents, PeriphManagerBase):
         if not self.mboard_regs_control.get_meas_clock_mmcm_lock():
             raise RuntimeError("Measurement clock failed to init")
 
-    def _monitor_status(self):
+    def _read_ref_locked(self):
         """
-        Status monitoring thread: This should be executed in a thread. It will
-        continuously monitor status of the following peripherals:
-
-        - GPS lock (update back-panel GPS LED)
-        - REF lock (update back-panel REF LED)
+        Return the combined ref lock status of all daughterboards (see
+        get_ref_lock_sensor()).
         """
-        self.log.trace("Launching monitor loop...")
-        cond = threading.Condition()
-        cond.acquire()
-        while not self._tear_down:
-            gps_locked = bool(self._gpios.get("GPS-LOCKOK"))
-            self._bp_leds.set(self._bp_leds.LED_GPS, int(gps_locked))
-            ref_locked = self.get_ref_lock_sensor()['value'] == 'true'
-            self._bp_leds.set(self._bp_leds.LED_REF, int(ref_locked))
-            # Now wait
-            if cond.wait_for(
-                    lambda: self._tear_down,
-                    N3XX_MONITOR_THREAD_INTERVAL):
-                break
-        cond.release()
-        self.log.trace("Terminating monitor loop.")
+        self.log.trace(
+            "Querying ref lock status from %d dboards.",
+            len(self.dboards)
+        )
+        return all([
+            not hasattr(db, 'get_ref_lock') or db.get_ref_lock()
+            for db in self.dboards
+        ])
 
     def _init_peripherals(self, args):
         """
@@ -379,14 +367,18 @@ class n3xx(ZynqComponents, PeriphManagerBase):
         self._xport_mgrs = {
             'udp': N3xxXportMgrUDP(self.log.getChild('UDP'), args),
         }
-        # Spawn status monitoring thread
-        self.log.trace("Spawning status monitor thread...")
-        self._status_monitor_thread = threading.Thread(
-            target=self._monitor_status,
-            name="N3xxStatusMonitorThread",
-            daemon=True,
-        )
-        self._status_monitor_thread.start()
+        # Start status monitoring (updates the back-panel GPS and REF LEDs)
+        self._status_monitor.add_check(
+            'gps_locked', lambda: bool(self._gpios.get("GPS-LOCKOK")),
+            N3XX_MONITOR_THREAD_INTERVAL, N3XX_MONITOR_MAX_INTERVAL,
+            on_change=lambda locked: self._bp_leds.set(
+                self._bp_leds.LED_GPS, int(locked)))
+        self._status_monitor.add_check(
+            'ref_locked', self._read_ref_locked,
+            N3XX_MONITOR_THREAD_INTERVAL, N3XX_MONITOR_MAX_INTERVAL,
+            on_change=lambda locked: self._bp_leds.set(
+                self._bp_leds.LED_REF, int(locked)))
+        self._status_monitor.start()
         # Init complete.
         self.log.debug("Device info: {}".format(self.device_info))
 
@@ -471,12 +463,7 @@ class n3xx(ZynqComponents, PeriphManagerBase):
         For N3xx, this means the overlay.
         """
         self.log.trace("Tearing down N3xx device...")
-        self._tear_down = True
-        if self._device_initialized:
-            self._status_monitor_thread.join(3 * N3XX_MONITOR_THREAD_INTERVAL)
-            if self._status_monitor_thread.is_alive():
-                self.log.error("Could not terminate monitor thread! "
-                               "This could result in resource leaks.")
+        self._status_monitor.stop(3 * N3XX_MONITOR_THREAD_INTERVAL)
         active_overlays = self.list_active_overlays()
         self.log.trace("N3xx has active device tree overlays: {}".format(
             active_overlays
@@ -649,6 +636,7 @@ class n3xx(ZynqComponents, PeriphManagerBase):
             # SKY13350 needs to be in known state
             self._gpios.reset("CLK-MAINSEL-25MHz")
         self._clock_source = clock_source
+        self._status_monitor.trigger('ref_locked')
         self.log.debug("Reference clock source is: {}" \
                        .format(self._clock_source))
         self.log.debug("Reference clock frequency is: {} MHz" \
@@ -875,15 +863,15 @@ class n3xx(ZynqComponents, PeriphManagerBase):
         historically considered a motherboard-level sensor, we will return the
         combined lock status of all daughterboards. If no dboard is connected,
         or none has a ref lock sensor, we simply return True.
-        """
-        self.log.trace(
-            "Querying ref lock status from %d dboards.",
-            len(self.dboards)
-        )
-        lock_status = all([
-            not hasattr(db, 'get_ref_lock') or db.get_ref_lock()
-            for db in self.dboards
-        ])
+
+        If the status monitor has read the lock status recently, that value is
+        returned without accessing the daughterboards.
+        """
+        lock_status = self._status_monitor.get_state(
+            'ref_locked', max_age=N3XX_MONITOR_THREAD_INTERVAL)
+        if lock_status is None:
+            lock_status = self._read_ref_locked()
+            self._status_monitor.update_state('ref_locked', lock_status)
         return {
             'name': 'ref_locked',
             'type': 'BOOLEAN',
@@ -935,8 +923,12 @@ class n3xx(ZynqComponents, PeriphManagerBase):
         """
         Get lock status of GPS as a sensor dict
         """
-        self.log.trace("Reading status GPS lock pin from port expander")
-        gps_locked = bool(self._gpios.get("GPS-LOCKOK"))
+        gps_locked = self._status_monitor.get_state(
+            'gps_locked', max_age=N3XX_MONITOR_THREAD_INTERVAL)
+        if gps_locked is None:
+            self.log.trace("Reading status GPS lock pin from port expander")
+            gps_locked = bool(self._gpios.get("GPS-LOCKOK"))
+            self._status_monitor.update_state('gps_locked', gps_locked)
         return {
             'name': 'gps_lock',
             'type': 'BOOLEAN',
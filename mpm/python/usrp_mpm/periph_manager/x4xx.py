@@ -7,7 +7,6 @@
 X400 implementation module
 """
 
-import threading
 import copy
 from time import sleep
 from os import path
@@ -23,6 +22,7 @@ from usrp_mpm.sys_utils.gpio import Gpio
 from usrp_mpm.sys_utils.udev import dt_symbol_get_spidev
 from usrp_mpm.rpc_server import no_claim, no_rpc
 from usrp_mpm.mpmutils import assert_compat_number, poll_with_timeout
+from usrp_mpm.mpmutils import TaskGraph, str2bool
 from usrp_mpm.periph_manager import PeriphManagerBase
 from usrp_mpm.xports import XportMgrUDP
 from usrp_mpm.periph_manager.x4xx_periphs import MboardRegsControl
@@ -47,6 +47,7 @@ X400_DEFAULT_ENABLE_PPS_EXPORT = True
 X400_FPGA_COMPAT = (7, 3)
 X400_DEFAULT_TRIG_DIRECTION = ClockingAuxBrdControl.DIRECTION_OUTPUT
 X400_MONITOR_THREAD_INTERVAL = 1.0 # seconds
+X400_MONITOR_MAX_INTERVAL = 4.0 # seconds
 QSFPModuleConfig = namedtuple("QSFPModuleConfig", "modprs modsel devsymbol")
 X400_QSFP_I2C_CONFIGS = [
         QSFPModuleConfig(modprs='QSFP0_MODPRS', modsel='QSFP0_MODSEL_n', devsymbol='qsfp0_i2c'),
@@ -283,10 +284,9 @@ class x4xx(ZynqComponents, PeriphManagerBase):
     def __init__(self, args):
         super(x4xx, self).__init__()
 
-        self._tear_down = False
         self._rpu_initialized = False
-        self._status_monitor_thread = None
         self._master_clock_rate = None
+        self._clock_state = None
         self._gps_mgr = None
         self._clk_mgr = None
         self._safe_sync_source = {
@@ -298,14 +298,34 @@ class x4xx(ZynqComponents, PeriphManagerBase):
         self.ctrlport_regs = None
         self.cpld_control = None
         self.dio_control = None
+        self._qsfp_modules = []
+        self._fpga_device_info = None
         try:
-            self._init_peripherals(args)
-            self.init_dboards(args)
+            tasks = TaskGraph(
+                self.log, serialize=str2bool(args.get('serialize_init', False)))
+            self._init_peripherals(args, tasks)
+            # The daughterboards reset their PLL reference clock and talk to
+            # the RFDC during construction, so they have to wait for the
+            # sample clock to be stable.
+            tasks.add('dboards', lambda: self.init_dboards(args),
+                      deps=['rfdc', 'ctrlport'])
             # We need to init dio_control separately from peripherals
-            # since it needs information about available dboards
-            self._init_dio_control(args)
+            # since it needs information about available dboards. It also
+            # accesses the CPLD, so it has to wait for the CMI setup.
+            tasks.add('dio_control', lambda: self._init_dio_control(args),
+                      deps=['dboards', 'mb_regs', 'cpld', 'cmi'])
+            tasks.run()
             self._clk_mgr.set_dboard_reset_cb(
                 lambda enable: [db.reset_clock(enable) for db in self.dboards])
+            # Start status monitoring (the DIO fault lines were registered
+            # by dio_control)
+            self._status_monitor.add_check(
+                'ref_locked', self._clk_mgr.get_ref_locked,
+                X400_MONITOR_THREAD_INTERVAL, X400_MONITOR_MAX_INTERVAL,
+                on_change=self._set_ref_lock_led)
+            self._status_monitor.start()
+            # Init complete.
+            self.log.debug("Device info: {}".format(self.device_info))
         except Exception as ex:
             self.log.error("Failed to initialize motherboard: %s", str(ex), exc_info=ex)
             self._initialization_status = str(ex)
@@ -373,27 +393,13 @@ class x4xx(ZynqComponents, PeriphManagerBase):
         self.mboard_sensor_callback_map.update(new_methods)
         return gps_mgr
 
-    def _monitor_status(self):
+    def _set_ref_lock_led(self, ref_locked):
         """
-        Status monitoring thread: This should be executed in a thread. It will
-        continuously monitor status of the following peripherals:
-
-        - REF lock (update back-panel REF LED)
+        Status monitor callback: Update the back-panel REF LED whenever the
+        ref lock status changes.
         """
-        self.log.trace("Launching monitor loop...")
-        cond = threading.Condition()
-        cond.acquire()
-        while not self._tear_down:
-            ref_locked = self.get_ref_lock_sensor()['value'] == 'true'
-            if self._clocking_auxbrd is not None:
-                self._clocking_auxbrd.set_ref_lock_led(ref_locked)
-            # Now wait
-            if cond.wait_for(
-                    lambda: self._tear_down,
-                    X400_MONITOR_THREAD_INTERVAL):
-                break
-        cond.release()
-        self.log.trace("Terminating monitor loop.")
+        if self._clocking_auxbrd is not None:
+            self._clocking_auxbrd.set_ref_lock_led(ref_locked)
 
     def _assert_rfdc_powered(self):
         """
@@ -416,151 +422,166 @@ class x4xx(ZynqComponents, PeriphManagerBase):
             serial_number = self._eeprom_head["serial"]
         return serial_number.rstrip(b'\x00')
 
-    def _init_peripherals(self, args):
+    def _init_peripherals(self, args, tasks):
         """
-        Turn on all peripherals. This may throw an error on failure, so make
-        sure to catch it.
+        Add the tasks that turn on all peripherals to the init task graph
+        tasks. The tasks may throw an error on failure, so make sure to catch
+        it when running the graph.
+
+        The dependencies encode the required bring-up order: The CPLD needs to
+        be up before talking to the clocking ICs, the overlay must be applied
+        after clocks have been configured, and everything that lives in the
+        FPGA needs the overlay. Anything else (RPU, clocking aux board, QSFP
+        modules, GPS, CHDR transports, ctrlport and CMI) is independent of the
+        RFDC bring-up and runs while the SPLL locks and the converters sync.
         """
         # Sanity checks
         assert self.mboard_info.get('product') in self.pids.values(), \
             "Device product could not be determined!"
-        # Init peripherals
-        self._rfdc_powered = Gpio('RFDC_POWERED', Gpio.INPUT)
-        # Init RPU Manager
-        self.log.trace("Initializing RPU manager peripheral...")
-        self.init_rpu()
-        # Init clocking aux board
-        self.log.trace("Initializing Clocking Aux Board controls...")
-        has_gps = False
-        try:
-            self._clocking_auxbrd = ClockingAuxBrdControl()
-            self.log.trace("Initialized Clocking Aux Board controls")
-            has_gps = self._clocking_auxbrd.is_gps_supported()
-        except RuntimeError:
-            self.log.warning(
-                "GPIO I2C bus could not be found for the Clocking Aux Board, "
-                "disabling Clocking Aux Board functionality.")
-            self._clocking_auxbrd = None
+        self._clocking_auxbrd = None
         self._safe_sync_source = {
             'clock_source': X4xxClockMgr.CLOCK_SOURCE_MBOARD,
             'time_source': X4xxClockMgr.TIME_SOURCE_INTERNAL,
         }
+        serial_number = self._get_serial_number()
 
-        initial_clock_source = args.get('clock_source', X400_DEFAULT_CLOCK_SOURCE)
-        if self._clocking_auxbrd:
-            self._add_public_methods(self._clocking_auxbrd, "clkaux")
-        else:
-            initial_clock_source = X4xxClockMgr.CLOCK_SOURCE_MBOARD
-
-        # Init CPLD before talking to clocking ICs
-        cpld_spi_node = dt_symbol_get_spidev('mb_cpld')
-        self.cpld_control = MboardCPLD(cpld_spi_node, self.log)
-        self.cpld_control.check_signature()
-        self.cpld_control.check_compat_version()
-        self.cpld_control.trace_git_hash()
-
-        self._assert_rfdc_powered()
-        # Init clocking after CPLD as the SPLL communication is relying on it.
-        # We try and guess the correct master clock rate here based on defaults
-        # and args. Since we are still in __init__(), the args that come from mpm.conf
-        # are empty. We can't detect the real default MCR, because we need
-        # the RFDC controls for that -- but they won't work without clocks. So
-        # let's pick a sensible default MCR value, init the clocks, and fix the
-        # MCR value further down.
-        self._master_clock_rate = float(
-            args.get('master_clock_rate', X400_DEFAULT_MASTER_CLOCK_RATE))
-        sample_clock_freq, _, is_legacy_mode, _ = \
-            X4xxRfdcCtrl.master_to_sample_clk[self._master_clock_rate]
-        self._clk_mgr = X4xxClockMgr(
-            initial_clock_source,
-            time_source=args.get('time_source', X400_DEFAULT_TIME_SOURCE),
-            ref_clock_freq=float(args.get(
-                'ext_clock_freq', X400_DEFAULT_EXT_CLOCK_FREQ)),
-            sample_clock_freq=sample_clock_freq,
-            is_legacy_mode=is_legacy_mode,
-            clk_aux_board=self._clocking_auxbrd,
-            cpld_control=self.cpld_control,
-            log=self.log)
-        self._add_public_methods(
-            self._clk_mgr,
-            prefix="",
-            filter_cb=lambda name, method: not hasattr(method, '_norpc')
-        )
+        def init_rfdc_power():
+            self._rfdc_powered = Gpio('RFDC_POWERED', Gpio.INPUT)
+            self._assert_rfdc_powered()
+
+        def init_clk_aux():
+            # Init clocking aux board
+            self.log.trace("Initializing Clocking Aux Board controls...")
+            try:
+                self._clocking_auxbrd = ClockingAuxBrdControl()
+                self.log.trace("Initialized Clocking Aux Board controls")
+            except RuntimeError:
+                self.log.warning(
+                    "GPIO I2C bus could not be found for the Clocking Aux Board, "
+                    "disabling Clocking Aux Board functionality.")
+                self._clocking_auxbrd = None
+            if self._clocking_auxbrd:
+                self._add_public_methods(self._clocking_auxbrd, "clkaux")
+
+        def init_cpld():
+            # Init CPLD before talking to clocking ICs
+            cpld_spi_node = dt_symbol_get_spidev('mb_cpld')
+            self.cpld_control = MboardCPLD(cpld_spi_node, self.log)
+            self.cpld_control.check_signature()
+            self.cpld_control.check_compat_version()
+            self.cpld_control.trace_git_hash()
+
+        def init_clk_mgr():
+            initial_clock_source = args.get('clock_source', X400_DEFAULT_CLOCK_SOURCE)
+            if not self._clocking_auxbrd:
+                initial_clock_source = X4xxClockMgr.CLOCK_SOURCE_MBOARD
+            # Init clocking after CPLD as the SPLL communication is relying on it.
+            # We try and guess the correct master clock rate here based on defaults
+            # and args. Since we are still in __init__(), the args that come from mpm.conf
+            # are empty. We can't detect the real default MCR, because we need
+            # the RFDC controls for that -- but they won't work without clocks. So
+            # let's pick a sensible default MCR value, init the clocks, and fix the
+            # MCR value further down.
+            self._master_clock_rate = float(
+                args.get('master_clock_rate', X400_DEFAULT_MASTER_CLOCK_RATE))
+            sample_clock_freq, _, is_legacy_mode, _ = \
+                X4xxRfdcCtrl.master_to_sample_clk[self._master_clock_rate]
+            self._clk_mgr = X4xxClockMgr(
+                initial_clock_source,
+                time_source=args.get('time_source', X400_DEFAULT_TIME_SOURCE),
+                ref_clock_freq=float(args.get(
+                    'ext_clock_freq', X400_DEFAULT_EXT_CLOCK_FREQ)),
+                sample_clock_freq=sample_clock_freq,
+                is_legacy_mode=is_legacy_mode,
+                clk_aux_board=self._clocking_auxbrd,
+                cpld_control=self.cpld_control,
+                log=self.log)
+            self._add_public_methods(
+                self._clk_mgr,
+                prefix="",
+                filter_cb=lambda name, method: not hasattr(method, '_norpc')
+            )
+
+        def init_mb_regs():
+            self.log.trace("Initializing MBoard reg controls...")
+            self.mboard_regs_control = MboardRegsControl(
+                self.mboard_regs_label, self.log)
+            self._check_fpga_compat()
+            self.mboard_regs_control.set_serial_number(serial_number)
+            self.mboard_regs_control.get_git_hash()
+            self.mboard_regs_control.get_build_timestamp()
+            self._clk_mgr.mboard_regs_control = self.mboard_regs_control
+
+        def init_rfdc():
+            # Create control for RFDC
+            self.rfdc = X4xxRfdcCtrl(self._clk_mgr.get_spll_freq, self.log)
+            self._add_public_methods(
+                self.rfdc, prefix="",
+                filter_cb=lambda name, method: not hasattr(method, '_norpc')
+            )
+            self._update_fpga_type()
+            # Force reset the RFDC to ensure it is in a good state
+            self.rfdc.set_reset(reset=True)
+            self.rfdc.set_reset(reset=False)
+            # Synchronize SYSREF and clock distributed to all converters
+            self.rfdc.sync()
+            self._clk_mgr.set_rfdc_reset_cb(self.rfdc.set_reset)
+            # The initial default mcr only works if we have an FPGA with
+            # a decimation of 2. But we need the overlay applied before we
+            # can detect decimation, and that requires clocks to be initialized.
+            self.set_master_clock_rate(self.rfdc.get_default_mcr())
+
+        def init_ctrlport():
+            # Init ctrlport endpoint. The ctrlport runs off a PS clock, so it
+            # does not need to wait for the sample clock.
+            self.ctrlport_regs = CtrlportRegs(self.ctrlport_regs_label, self.log)
+
+        def init_cmi():
+            # Init IPass cable status forwarding and CMI
+            self.cpld_control.set_serial_number(serial_number)
+            self.cpld_control.set_cmi_device_ready(
+                self.mboard_regs_control.is_pcie_present())
+            # The CMI transmission can be disabled by setting the cable status
+            # to be not connected. All images except for the LV PCIe variant
+            # provide a fixed "cables are unconnected" status. The LV PCIe image
+            # reports the correct status. As the FPGA holds this information it
+            # is possible to always enable the iPass cable present forwarding.
+            self.ctrlport_regs.enable_cable_present_forwarding(True)
+
+        def init_qsfp():
+            for idx, config in enumerate(X400_QSFP_I2C_CONFIGS):
+                attr = QSFPModule(
+                    config.modprs, config.modsel, config.devsymbol, self.log,
+                    self._status_monitor, "qsfp{}".format(idx))
+                setattr(self, "_qsfp_module{}".format(idx), attr)
+                self._qsfp_modules.append(attr)
+                self._add_public_methods(attr, "qsfp{}".format(idx))
+
+        def init_gps():
+            if self._clocking_auxbrd and self._clocking_auxbrd.is_gps_supported():
+                self._gps_mgr = self._init_gps_mgr()
+
+        def init_xports():
+            self._xport_mgrs = {
+                'udp': X400XportMgrUDP(self.log, args),
+            }
 
+        tasks.add('rpu', self.init_rpu)
+        tasks.add('rfdc_power', init_rfdc_power)
+        tasks.add('clk_aux', init_clk_aux)
+        tasks.add('cpld', init_cpld)
+        tasks.add('clk_mgr', init_clk_mgr, deps=['clk_aux', 'cpld', 'rfdc_power'])
         # Overlay must be applied after clocks have been configured
-        self.overlay_apply()
-
-        # Init Mboard Regs
-        self.log.trace("Initializing MBoard reg controls...")
-        serial_number = self._get_serial_number()
-        self.mboard_regs_control = MboardRegsControl(
-            self.mboard_regs_label, self.log)
-        self._check_fpga_compat()
-        self.mboard_regs_control.set_serial_number(serial_number)
-        self.mboard_regs_control.get_git_hash()
-        self.mboard_regs_control.get_build_timestamp()
-        self._clk_mgr.mboard_regs_control = self.mboard_regs_control
-
-        # Create control for RFDC
-        self.rfdc = X4xxRfdcCtrl(self._clk_mgr.get_spll_freq, self.log)
-        self._add_public_methods(
-            self.rfdc, prefix="",
-            filter_cb=lambda name, method: not hasattr(method, '_norpc')
-        )
-
-        self._update_fpga_type()
-
-        # Force reset the RFDC to ensure it is in a good state
-        self.rfdc.set_reset(reset=True)
-        self.rfdc.set_reset(reset=False)
-
-        # Synchronize SYSREF and clock distributed to all converters
-        self.rfdc.sync()
-        self._clk_mgr.set_rfdc_reset_cb(self.rfdc.set_reset)
-
-        # The initial default mcr only works if we have an FPGA with
-        # a decimation of 2. But we need the overlay applied before we
-        # can detect decimation, and that requires clocks to be initialized.
-        self.set_master_clock_rate(self.rfdc.get_default_mcr())
-
-        # Init ctrlport endpoint
-        self.ctrlport_regs = CtrlportRegs(self.ctrlport_regs_label, self.log)
-
-        # Init IPass cable status forwarding and CMI
-        self.cpld_control.set_serial_number(serial_number)
-        self.cpld_control.set_cmi_device_ready(
-            self.mboard_regs_control.is_pcie_present())
-        # The CMI transmission can be disabled by setting the cable status
-        # to be not connected. All images except for the LV PCIe variant
-        # provide a fixed "cables are unconnected" status. The LV PCIe image
-        # reports the correct status. As the FPGA holds this information it
-        # is possible to always enable the iPass cable present forwarding.
-        self.ctrlport_regs.enable_cable_present_forwarding(True)
-
-        # Init QSFP modules
-        for idx, config in enumerate(X400_QSFP_I2C_CONFIGS):
-            attr = QSFPModule(
-                config.modprs, config.modsel, config.devsymbol, self.log)
-            setattr(self, "_qsfp_module{}".format(idx), attr)
-            self._add_public_methods(attr, "qsfp{}".format(idx))
-
-        # Init GPS
-        if has_gps:
-            self._gps_mgr = self._init_gps_mgr()
-        # Init CHDR transports
-        self._xport_mgrs = {
-            'udp': X400XportMgrUDP(self.log, args),
-        }
-        # Spawn status monitoring thread
-        self.log.trace("Spawning status monitor thread...")
-        self._status_monitor_thread = threading.Thread(
-            target=self._monitor_status,
-            name="X4xxStatusMonitorThread",
-            daemon=True,
-        )
-        self._status_monitor_thread.start()
-        # Init complete.
-        self.log.debug("Device info: {}".format(self.device_info))
+        tasks.add('overlay', self.overlay_apply, deps=['clk_mgr'])
+        tasks.add('mb_regs', init_mb_regs, deps=['overlay'])
+        tasks.add('rfdc', init_rfdc, deps=['mb_regs'])
+        tasks.add('ctrlport', init_ctrlport, deps=['overlay'])
+        # CMI setup writes to the CPLD, which the SPLL configuration (part of
+        # setting the MCR) also does. Keep the original order of the two.
+        tasks.add('cmi', init_cmi, deps=['ctrlport', 'mb_regs', 'cpld', 'rfdc'])
+        tasks.add('qsfp', init_qsfp, deps=['overlay'])
+        tasks.add('gps', init_gps, deps=['clk_aux'])
+        tasks.add('xports', init_xports, deps=['overlay'])
 
     def _init_dio_control(self, _):
         """
@@ -570,7 +591,7 @@ class x4xx(ZynqComponents, PeriphManagerBase):
         if self._check_compat_aux_board(DIOAUX_EEPROM, DIOAUX_PID):
             self.dio_control = DioControl(self.mboard_regs_control,
                                           self.cpld_control, self.log,
-                                          self.dboards)
+                                          self.dboards, self._status_monitor)
             # add dio_control public methods to MPM API
             self._add_public_methods(self.dio_control, "dio")
 
@@ -624,19 +645,44 @@ class x4xx(ZynqComponents, PeriphManagerBase):
     ###########################################################################
     def init(self, args):
         """
-        Calls init() on the parent class, and then programs the Ethernet
-        dispatchers accordingly.
+        Calls init() on the parent class, and programs the Ethernet
+        dispatchers accordingly. Both run concurrently.
         """
         if not self._device_initialized:
             self.log.warning(
                 "Cannot run init(), device was never fully initialized!")
             return False
 
+        # The CHDR transports don't depend on the clocks, so they are brought
+        # up while the clocks and daughterboards are being initialized.
+        tasks = TaskGraph(
+            self.log, serialize=str2bool(args.get('serialize_init', False)))
+        result = []
+        tasks.add('radio', lambda: result.append(self._init_radio(args)))
+        for xport_type, xport_mgr in self._xport_mgrs.items():
+            tasks.add('xport_' + xport_type,
+                      lambda xport_mgr=xport_mgr: xport_mgr.init(args))
+        tasks.run()
+        return result[0]
+
+    def _init_radio(self, args):
+        """
+        Session init of the clocks and daughterboards. Returns the result of
+        the parent class' init().
+        """
         # We need to disable the PPS out during clock and dboard initialization in order
         # to avoid glitches.
         if self._clocking_auxbrd is not None:
             self._clocking_auxbrd.set_trig(False)
 
+        # Keep the motherboard registers mapped for the duration of the session
+        # (avoids opening and closing the UIO on every register access).
+        self.mboard_regs_control.init()
+
+        if str2bool(args.get('force_reinit', False)):
+            self.log.debug("Forcing reconfiguration of all clocks.")
+            self._clock_state = None
+
         # If the caller has not specified clock_source or time_source, set them
         # to the values currently configured.
         args['clock_source'] = args.get('clock_source', self._clk_mgr.get_clock_source())
@@ -662,8 +708,6 @@ class x4xx(ZynqComponents, PeriphManagerBase):
                 args.get('trig_direction', X400_DEFAULT_TRIG_DIRECTION)
                 )
 
-        for xport_mgr in self._xport_mgrs.values():
-            xport_mgr.init(args)
         return result
 
     def deinit(self):
@@ -683,6 +727,7 @@ class x4xx(ZynqComponents, PeriphManagerBase):
             self.set_sync_source(source)
         super(x4xx, self).deinit()
         self.ctrlport_regs.deinit()
+        self.mboard_regs_control.deinit()
         for xport_mgr in self._xport_mgrs.values():
             xport_mgr.deinit()
 
@@ -693,18 +738,17 @@ class x4xx(ZynqComponents, PeriphManagerBase):
         For X400, this means the overlay.
         """
         self.log.trace("Tearing down X4xx device...")
-        self._tear_down = True
-        if self._device_initialized:
-            self._status_monitor_thread.join(3 * X400_MONITOR_THREAD_INTERVAL)
-            if self._status_monitor_thread.is_alive():
-                self.log.error("Could not terminate monitor thread! "
-                               "This could result in resource leaks.")
+        self._status_monitor.stop(3 * X400_MONITOR_THREAD_INTERVAL)
         # call tear_down on daughterboards first
         super(x4xx, self).tear_down()
         if self.dio_control is not None:
             self.dio_control.tear_down()
+        for qsfp_module in self._qsfp_modules:
+            qsfp_module.tear_down()
         self.rfdc.tear_down()
         self._clk_mgr.unset_cbs()
+        if self.mboard_regs_control is not None:
+            self.mboard_regs_control.deinit(force=True)
         # remove x4xx overlay
         active_overlays = self.list_active_overlays()
         self.log.trace("X4xx has active device tree overlays: {}".format(
@@ -756,13 +800,19 @@ class x4xx(ZynqComponents, PeriphManagerBase):
         if not self._device_initialized:
             return {}
         device_info = self._xport_mgrs['udp'].get_xport_info()
-        device_info.update({
-            'fpga_version': "{}.{}".format(
-                *self.mboard_regs_control.get_compat_number()),
-            'fpga_version_hash': "{:x}.{}".format(
-                *self.mboard_regs_control.get_git_hash()),
-            'fpga': self.updateable_components.get('fpga', {}).get('type', ""),
-        })
+        # The FPGA can't change during the lifetime of this object (loading a
+        # new bitfile re-creates the periph manager), so we only read its
+        # version once.
+        if self._fpga_device_info is None:
+            self._fpga_device_info = {
+                'fpga_version': "{}.{}".format(
+                    *self.mboard_regs_control.get_compat_number()),
+                'fpga_version_hash': "{:x}.{}".format(
+                    *self.mboard_regs_control.get_git_hash()),
+            }
+        device_info.update(self._fpga_device_info)
+        device_info['fpga'] = \
+            self.updateable_components.get('fpga', {}).get('type', "")
         return device_info
 
     def is_db_gpio_ifc_present(self, slot_id):
@@ -882,6 +932,9 @@ class x4xx(ZynqComponents, PeriphManagerBase):
         ret_val = self._clk_mgr.set_sync_source(clock_source, time_source)
         if ret_val == self._clk_mgr.SetSyncRetVal.NOP:
             return
+        # The clock manager has reset the SPLL and everything downstream of it
+        self._clock_state = None
+        self._status_monitor.trigger('ref_locked')
         try:
             # Re-set master clock rate. If this doesn't work, it will time out
             # and throw an exception. We need to put the device back into a safe
@@ -908,6 +961,10 @@ class x4xx(ZynqComponents, PeriphManagerBase):
         """
         Sets the master clock rate by configuring the RFDC decimation and SPLL,
         and then resetting downstream clocks.
+
+        Only the clock stages whose configuration changed are reconfigured
+        (see _get_clock_state()). If the requested configuration matches the
+        current one and all clocks are locked, this is a no-op.
         """
         if master_clock_rate not in self.rfdc.master_to_sample_clk:
             self.log.error('Unsupported master clock rate selection {}'
@@ -922,11 +979,59 @@ class x4xx(ZynqComponents, PeriphManagerBase):
                        f'with FPGA which expected decimation {db_rfdc_resamp}')
                 self.log.error(msg)
                 raise RuntimeError(msg)
-        self.log.trace(f"Set master clock rate (SPLL) to: {master_clock_rate}")
-        self._clk_mgr.set_spll_rate(sample_clock_freq, is_legacy_mode)
+        new_state = self._get_clock_state(master_clock_rate)
+        old_state = self._clock_state or {}
+        if old_state and not self._clk_mgr.get_ref_locked():
+            self.log.debug("Clocks are not locked, reconfiguring all clocks.")
+            old_state = {}
+        stages = [stage for stage, config in new_state.items()
+                  if old_state.get(stage) != config]
+        if not stages:
+            self.log.trace("Clock configuration for master clock rate "
+                           f"{master_clock_rate} is unchanged, skipping.")
+            self._master_clock_rate = master_clock_rate
+            return
+        self.log.trace(f"Reconfiguring clock stages: {', '.join(stages)}")
+        # If anything below fails, we no longer know what state the clocks are
+        # in.
+        self._clock_state = None
+        if 'spll' in stages:
+            self.log.trace(f"Set master clock rate (SPLL) to: {master_clock_rate}")
+            self._clk_mgr.set_spll_rate(sample_clock_freq, is_legacy_mode)
+            self._status_monitor.trigger('ref_locked')
         self._master_clock_rate = master_clock_rate
-        self.rfdc.sync()
-        self._clk_mgr.config_pps_to_timekeeper(master_clock_rate)
+        if 'rfdc' in stages:
+            self.rfdc.sync()
+        if 'pps' in stages:
+            self._clk_mgr.config_pps_to_timekeeper(master_clock_rate)
+        self._clock_state = new_state
+
+    def _get_clock_state(self, master_clock_rate):
+        """
+        Return the fingerprint of the clock configuration for the given master
+        clock rate and the current sync sources.
+
+        The fingerprint is a dictionary stage -> configuration of that stage,
+        in the order the stages need to be configured. A stage needs to be
+        reconfigured when its configuration changes. Every stage includes the
+        configuration of the stages it depends on:
+        - spll: Reference clock and sample PLL
+        - rfdc: RFDC SYSREF/clock synchronization
+        - pps: PPS path to the timekeeper
+        """
+        sample_clock_freq, decimation, is_legacy_mode, halfband = \
+                self.rfdc.master_to_sample_clk[master_clock_rate]
+        spll_config = (
+            self._clk_mgr.get_clock_source(),
+            self._clk_mgr.get_ref_clock_freq(),
+            sample_clock_freq,
+            is_legacy_mode,
+        )
+        return {
+            'spll': spll_config,
+            'rfdc': (spll_config, decimation, halfband),
+            'pps': (spll_config, self._clk_mgr.get_time_source(), master_clock_rate),
+        }
 
     def set_trigger_io(self, direction):
         """
@@ -1269,8 +1374,15 @@ class x4xx(ZynqComponents, PeriphManagerBase):
         """
         Return main refclock lock status. This is the lock status of the
         reference and sample PLLs.
+
+        If the status monitor has read the lock status recently, that value is
+        returned without accessing the PLLs.
         """
-        lock_status = self._clk_mgr.get_ref_locked()
+        lock_status = self._status_monitor.get_state(
+            'ref_locked', max_age=X400_MONITOR_THREAD_INTERVAL)
+        if lock_status is None:
+            lock_status = self._clk_mgr.get_ref_locked()
+            self._status_monitor.update_state('ref_locked', lock_status)
         return {
             'name': 'ref_locked',
             'type': 'BOOLEAN',
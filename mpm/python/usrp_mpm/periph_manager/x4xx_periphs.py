@@ -9,9 +9,9 @@ X4xx peripherals
 
 import re
 import time
-import signal
 import struct
-from multiprocessing import Process, Event, Value
+import threading
+from collections import namedtuple
 from statistics import mean
 from usrp_mpm import lib  # Pulls in everything from C++-land
 from usrp_mpm.sys_utils import i2c_dev
@@ -20,6 +20,7 @@ from usrp_mpm.sys_utils.uio import UIO
 from usrp_mpm.mpmutils import poll_with_timeout
 from usrp_mpm.sys_utils.sysfs_thermal import read_thermal_sensor_value
 from usrp_mpm.periph_manager.common import MboardRegsCommon
+from usrp_mpm.rpc_server import no_rpc
 
 class DioControl:
     """
@@ -220,11 +221,12 @@ class DioControl:
             self.mboard_regs.poke32(self.offset, self.value)
 
 
-    def __init__(self, mboard_regs, mboard_cpld, log, dboards):
+    def __init__(self, mboard_regs, mboard_cpld, log, dboards, status_monitor):
         """
         Initializes access to hardware components as well as creating known
         port mappings
         :param log: logger to be used for output
+        :param status_monitor: StatusMonitor that watches the DIO fault lines
         """
         self.log = log.getChild(self.__class__.__name__)
         self.port_control = {port: self._PortControl(port) for port in self.DIO_PORTS}
@@ -241,23 +243,21 @@ class DioControl:
             self.DIO_MAP_NAME, self.DIO_PIN_NAMES,
             self.DIO_PORT_MAP, self.DIO_FIRST_PIN)
         self.set_port_mapping(self.HDMI_MAP_NAME)
-        self.log.trace("Spawning DIO fault monitors...")
-        self._tear_down_monitor = Event()
+        self.log.trace("Registering DIO fault monitors...")
+        self._status_monitor = status_monitor
         self._dio_fault = {
-            "PORTA": Value('b', 0),
-            "PORTB": Value('b', 0),
+            "PORTA": False,
+            "PORTB": False,
         }
-        self._dio0_fault_monitor = Process(
-            target=self._monitor_dio_fault,
-            args=('A', "DIO_INT0", self._tear_down_monitor, self._dio_fault["PORTA"])
-        )
-        self._dio1_fault_monitor = Process(
-            target=self._monitor_dio_fault,
-            args=('B', "DIO_INT1", self._tear_down_monitor, self._dio_fault["PORTB"])
-        )
-        signal.signal(signal.SIGINT, self._monitor_int_handler)
-        self._dio0_fault_monitor.start()
-        self._dio1_fault_monitor.start()
+        self._dio_fault_lines = {
+            "PORTA": Gpio("DIO_INT0", Gpio.FALLING_EDGE),
+            "PORTB": Gpio("DIO_INT1", Gpio.FALLING_EDGE),
+        }
+        for port, fault_line in self._dio_fault_lines.items():
+            self._status_monitor.add_event_check(
+                'dio_fault_' + port.lower(),
+                fault_line.request_events(),
+                lambda port=port: self._handle_dio_fault(port))
 
         # Init GPIO sources
         gpio_srcs = [
@@ -279,34 +279,18 @@ class DioControl:
         self.set_voltage_level("PORTA", "3V3")
         self.set_voltage_level("PORTB", "3V3")
 
-    def _monitor_dio_fault(self, dio_port, fault, tear_down, fault_state):
+    def _handle_dio_fault(self, port):
         """
-        Monitor the DIO_INT lines to detect an external power fault.
-        If there is a fault, turn off external power.
+        Called by the status monitor when the DIO_INT line of a port saw a
+        falling edge, which signals an external power fault. Turns off
+        external power.
         """
-        self.log.trace("Launching monitor loop...")
-        fault_line = Gpio(fault, Gpio.FALLING_EDGE)
-        while True:
-            try:
-                if fault_line.event_wait():
-                    # If we saw a fault, disable the external power
-                    self.log.warning("DIO fault occurred on port {} - turning off external power"
-                                     .format(dio_port))
-                    self.set_external_power(dio_port, 0)
-                    fault_state.value = 1
-            # If the event wait gets interrupted because we are trying to tear down then stop
-            # the monitoring process. If not, keep monitoring
-            except InterruptedError:
-                pass
-            if tear_down.is_set():
-                break
-
-    def _monitor_int_handler(self, signum, frame):
-        """
-        If we see an expected interrupt signal, mark the DIO fault monitors
-        for tear down.
-        """
-        self._tear_down_monitor.set()
+        self._dio_fault_lines[port].read_event()
+        self.log.warning("DIO fault occurred on port {} - turning off external power"
+                         .format(port))
+        self.set_external_power(port, 0)
+        self._dio_fault[port] = True
+        return True
 
     # --------------------------------------------------------------------------
     # Helper methods
@@ -628,16 +612,11 @@ class DioControl:
 
     def tear_down(self):
         """
-        Mark the DIO monitoring processes for tear down and terminate the processes
+        Stop monitoring the DIO fault lines
         """
-        self._tear_down_monitor.set()
-        self._dio0_fault_monitor.terminate()
-        self._dio1_fault_monitor.terminate()
-        self._dio0_fault_monitor.join(3)
-        self._dio1_fault_monitor.join(3)
-        if self._dio0_fault_monitor.is_alive() or \
-           self._dio1_fault_monitor.is_alive():
-            self.log.warning("DIO monitor didn't exit properly")
+        for port, fault_line in self._dio_fault_lines.items():
+            self._status_monitor.remove_check('dio_fault_' + port.lower())
+            fault_line.release()
 
     def set_port_mapping(self, mapping):
         """
@@ -806,8 +785,7 @@ class DioControl:
         # wait for <port>_PG to go high
         if not level == self.DIO_VOLTAGE_LEVELS[0]: # off
             port_control.enable.set(1)
-            if not poll_with_timeout(
-                    lambda: port_control.power_good.get() == 1, 1000, 10):
+            if not port_control.power_good.wait_for_value(1, 1000):
                 raise RuntimeError(
                     "Power good pin did not go high after power up")
 
@@ -831,7 +809,7 @@ class DioControl:
         assert value in (0, 1)
         assert port in self.DIO_PORTS
         self.port_control[port].ext_pwr.set(value)
-        self._dio_fault[port].value = 0
+        self._dio_fault[port] = False
 
     def get_external_power_state(self, port):
         """
@@ -841,7 +819,7 @@ class DioControl:
         > get_external_power_state PORTA
         """
         port = self._normalize_port_name(port)
-        if self._dio_fault[port].value == 1:
+        if self._dio_fault[port]:
             return "FAULT"
         if self.port_control[port].ext_pwr.get() == 1:
             return "ON"
@@ -914,6 +892,14 @@ class MboardRegsControl(MboardRegsCommon):
     >>> with mb_regs_control.regs:
     ...     mb_regs_control.poke32(addr0, data0)
     ...     mb_regs_control.poke32(addr1, data1)
+
+    For longer periods of time (e.g., a UHD session), users can keep the UIO
+    mapped by calling init() and deinit(). Every user is identified by name,
+    and the UIO stays mapped while at least one user holds a session. Outside
+    of a session, every peek and poke opens and closes the UIO.
+    >>> mb_regs_control.init("session")
+    >>> mb_regs_control.peek32(addr) # No open/mmap/munmap/close
+    >>> mb_regs_control.deinit("session")
     """
     # Motherboard registers
     # pylint: disable=bad-whitespace
@@ -967,23 +953,69 @@ class MboardRegsControl(MboardRegsCommon):
 
     def __init__(self, label, log):
         MboardRegsCommon.__init__(self, label, log)
+        # Names of the users that currently keep the UIO mapped (see init())
+        self._session_users = set()
+        self._session_lock = threading.Lock()
         def peek32(address):
             """
-            Safe peek (opens and closes UIO).
+            Safe peek (opens and closes UIO, unless a session is active).
             """
-            with self.regs:
-                return self.regs.peek32(address)
+            with self._session_lock:
+                if self._session_users:
+                    return self.regs.peek32(address)
+                with self.regs:
+                    return self.regs.peek32(address)
         def poke32(address, value):
             """
-            Safe poke (opens and closes UIO).
+            Safe poke (opens and closes UIO, unless a session is active).
             """
-            with self.regs:
-                self.regs.poke32(address, value)
+            with self._session_lock:
+                if self._session_users:
+                    self.regs.poke32(address, value)
+                    return
+                with self.regs:
+                    self.regs.poke32(address, value)
         # MboardRegsCommon.poke32() and ...peek32() don't open the UIO, so we
         # overwrite them with "safe" versions that do open the UIO.
         self.peek32 = peek32
         self.poke32 = poke32
 
+    def init(self, user="session"):
+        """
+        Keep the UIO mapped until deinit() is called for the same user. Calling
+        init() repeatedly for the same user is a no-op, so a user can't leak
+        mappings by missing a deinit().
+        """
+        with self._session_lock:
+            if user in self._session_users:
+                return
+            if not self._session_users:
+                self.log.trace("Mapping motherboard registers")
+                self.regs._open()
+            self._session_users.add(user)
+
+    def deinit(self, user="session", force=False):
+        """
+        Release the mapping held by user. The UIO is unmapped once the last user
+        is gone. If force is True, all users are released (use this on tear
+        down to make sure no file descriptors are leaked).
+        """
+        with self._session_lock:
+            if force:
+                users = set(self._session_users)
+            elif user in self._session_users:
+                users = {user}
+            else:
+                self.log.debug("deinit() called for inactive session user `{}'"
+                               .format(user))
+                return
+            if not users:
+                return
+            self._session_users -= users
+            if not self._session_users:
+                self.log.trace("Unmapping motherboard registers")
+                self.regs._close()
+
     def set_serial_number(self, serial_number):
         """
         Set serial number register
@@ -1452,22 +1484,58 @@ QSFP_CONNECTOR_TYPE = {
     0x24: "MXC 2x16"
 }
 
+# Immutable identity of a QSFP module, read from the lower page and upper
+# page 00h according to SFF-8636 rev 2.9 chapter 6
+QSFPIdentity = namedtuple(
+    "QSFPIdentity",
+    "adapter_id revision_compliance flat_mem connector "
+    "vendor_name vendor_oui vendor_pn vendor_rev vendor_sn date_code")
+
+# Interval in which the status monitor refreshes the QSFP diagnostic
+# monitoring (DDM) values
+QSFP_DDM_INTERVAL = 5.0 # seconds
+
 class QSFPModule:
     """
     QSFPModule enables access to the I2C register interface of an QSFP module.
 
     The class queries the module register using I2C commands according to
     SFF-8486 rev 4.9 specification.
+
+    The lower page and the upper page 00h are read in one I2C transaction
+    each. The identity fields (vendor, part number, connector, ...) can't
+    change while the module is plugged in, so they are read once and cached
+    until ModPrsL changes. If a status monitor is given, ModPrsL edges are
+    detected by the monitor, and the diagnostic monitoring values
+    (temperature, RX power, ...) are refreshed in the background.
     """
 
-    def __init__(self, gpio_modprs, gpio_modsel, devsymbol, log):
+    # SFF-8636 memory map
+    LOWER_PAGE = 0
+    UPPER_PAGE = 128
+    PAGE_SIZE = 128
+    PAGE_SELECT = 127
+    STATUS = 2
+    DDM_START = 22
+    DDM_END = 58
+
+    def __init__(self, gpio_modprs, gpio_modsel, devsymbol, log,
+                 status_monitor=None, name="qsfp"):
         """
         modprs: Name of the GPIO pin that reports module presence
         modsel: Name of the GPIO pin that controls ModSel of QSFP module
         devsymbol: Symbol name of the device used for I2C communication
+        status_monitor: StatusMonitor that watches ModPrsL and refreshes the
+                        DDM values (optional)
+        name: Name of this module for the status monitor checks
         """
 
         self.log = log.getChild('QSFP')
+        self._status_monitor = status_monitor
+        self._presence_check = name + "_present"
+        self._ddm_check = name + "_ddm"
+        self._identity = None
+        self._identity_lock = threading.Lock()
 
         # Hold the ModSelL GPIO low for communication over I2C. Because X4xx
         # uses a I2C switch to communicate with the QSFP modules we can keep
@@ -1476,7 +1544,10 @@ class QSFPModule:
         self.modsel = Gpio(gpio_modsel, Gpio.OUTPUT, 0)
 
         # ModPrs pin read pin MODPRESL from QSFP connector
-        self.modprs = Gpio(gpio_modprs, Gpio.INPUT, 0)
+        if status_monitor is not None:
+            self.modprs = Gpio(gpio_modprs, Gpio.BOTH_EDGES)
+        else:
+            self.modprs = Gpio(gpio_modprs, Gpio.INPUT, 0)
 
         # resolve device node name for I2C communication
         devname = i2c_dev.dt_symbol_get_i2c_bus(devsymbol)
@@ -1489,6 +1560,18 @@ class QSFPModule:
             100,     # timeout_ms
             1        # reg_addr_size
         )
+        # raw I2C interface for block reads
+        self.qsfp_i2c = lib.i2c.make_i2cdev(devname, 0x50, False, 100)
+
+        if status_monitor is not None:
+            status_monitor.add_event_check(
+                self._presence_check,
+                self.modprs.request_events(),
+                self._handle_modprs_event)
+            status_monitor.add_check(
+                self._ddm_check,
+                lambda: self._read_ddm() if self.is_available() else None,
+                QSFP_DDM_INTERVAL)
 
     def _peek8(self, address):
         """
@@ -1503,6 +1586,102 @@ class QSFPModule:
             self.log.debug("Could not read QSFP register ({})".format(err))
             return None
 
+    def _read_block(self, address, length):
+        """
+        Read length bytes starting at address in a single I2C transaction.
+
+        Returns None in case of failed communication (e.g. missing or broken
+        adapter).
+        """
+        try:
+            return list(self.qsfp_i2c.transfer([address], length, True))
+        except RuntimeError as err:
+            self.log.debug("Could not read QSFP registers ({})".format(err))
+            return None
+
+    def _read_identity(self):
+        """
+        Read the lower page and the upper page 00h, and parse the identity
+        fields. Returns None if the module can't be read.
+        """
+        lower = self._read_block(self.LOWER_PAGE, self.PAGE_SIZE)
+        if lower is None:
+            return None
+        flat_mem = bool(lower[self.STATUS] & 0b100)
+        if not flat_mem and lower[self.PAGE_SELECT] != 0:
+            try:
+                self.qsfp_regs.poke8(self.PAGE_SELECT, 0)
+            except RuntimeError as err:
+                self.log.debug("Could not select QSFP page 00h ({})".format(err))
+                return None
+        upper = self._read_block(self.UPPER_PAGE, self.PAGE_SIZE)
+        if upper is None:
+            return None
+        def _ascii(start, end):
+            return "".join(
+                chr(i) for i in upper[start - self.UPPER_PAGE:end - self.UPPER_PAGE]
+            ).rstrip("\0 ")
+        return QSFPIdentity(
+            adapter_id=lower[0],
+            revision_compliance=lower[1],
+            flat_mem=flat_mem,
+            connector=upper[130 - self.UPPER_PAGE],
+            vendor_name=_ascii(148, 164),
+            vendor_oui=upper[165 - self.UPPER_PAGE:168 - self.UPPER_PAGE],
+            vendor_pn=_ascii(168, 184),
+            vendor_rev=_ascii(184, 186),
+            vendor_sn=_ascii(196, 212),
+            date_code=_ascii(212, 220),
+        )
+
+    def _get_identity(self):
+        """
+        Return the cached identity of the module, reading it if necessary.
+        Returns None if no module is present or it can't be read.
+        """
+        with self._identity_lock:
+            if not self.is_available():
+                self._identity = None
+            elif self._identity is None:
+                self._identity = self._read_identity()
+            return self._identity
+
+    def _read_ddm(self):
+        """
+        Read the diagnostic monitoring values of the lower page according to
+        SFF-8636 rev 2.9 chapter 6.2.4 in a single I2C transaction. Returns
+        None if the module can't be read, or its data is not ready.
+        """
+        data = self._read_block(self.STATUS, self.DDM_END - self.STATUS)
+        if data is None or data[0] & 0b001: # Data_Not_Ready
+            return None
+        def _u16(address):
+            offset = address - self.STATUS
+            return (data[offset] << 8) | data[offset + 1]
+        temperature = _u16(22)
+        if temperature & 0x8000:
+            temperature -= 0x10000
+        return {
+            'temperature': temperature / 256, # deg C
+            'voltage': _u16(26) * 100e-6, # V
+            'rx_power': [_u16(34 + 2 * lane) * 0.1 for lane in range(4)], # uW
+            'tx_bias': [_u16(42 + 2 * lane) * 2e-3 for lane in range(4)], # mA
+            'tx_power': [_u16(50 + 2 * lane) * 0.1 for lane in range(4)], # uW
+        }
+
+    def _handle_modprs_event(self):
+        """
+        Status monitor callback for ModPrsL edges: Drop the cached identity
+        and refresh the DDM values.
+        """
+        self.modprs.read_event()
+        with self._identity_lock:
+            self._identity = None
+        present = self.is_available()
+        self.log.debug("QSFP module {}".format("inserted" if present else "removed"))
+        self._status_monitor.trigger(self._ddm_check)
+        return present
+
     def _revision_compliance(self, status):
         """
         Map the revison compliance status byte to a human readable string
@@ -1514,6 +1693,16 @@ class QSFPModule:
             return "Reserved"
         return QSFP_REVISION_COMPLIANCE[status]
 
+    @no_rpc
+    def tear_down(self):
+        """
+        Stop monitoring this module
+        """
+        if self._status_monitor is not None:
+            self._status_monitor.remove_check(self._presence_check)
+            self._status_monitor.remove_check(self._ddm_check)
+            self.modprs.release()
+
     def is_available(self):
         """
         Checks whether QSFP adapter is available by checking modprs pin
@@ -1534,7 +1723,8 @@ class QSFPModule:
         """
         Returns QSFP adapter ID as a byte (None if not present)
         """
-        return self._peek8(0)
+        identity = self._get_identity()
+        return identity.adapter_id if identity else None
 
     def adapter_id_name(self):
         """
@@ -1557,13 +1747,10 @@ class QSFPModule:
         Return the 2 byte QSFP adapter status according to SFF-8636
         rev 2.9 table 6-2
         """
-        compliance = self._peek8(1)
-        status = self._peek8(2)
-        if compliance is None or status is None:
+        status = self._read_block(1, 2)
+        if status is None:
             return None
-        assert isinstance(compliance, int)
-        assert isinstance(status, int)
-        return (compliance, status)
+        return tuple(status)
 
     def decoded_status(self):
         """
@@ -1584,30 +1771,58 @@ class QSFPModule:
         """
         Return vendor name according to SFF-8436 rev 4.9 chapter 7.6.2.14
         """
-        content = [self._peek8(i) for i in range(148, 163)]
+        identity = self._get_identity()
+        return identity.vendor_name if identity else None
 
-        if all(content): # list must not contain any None values
-            # convert ASCII codes to string and strip whitespaces at the end
-            return "".join([chr(i) for i in content]).rstrip()
+    def vendor_part_number(self):
+        """
+        Return vendor part number according to SFF-8636 rev 2.9 chapter 6.3.20
+        """
+        identity = self._get_identity()
+        return identity.vendor_pn if identity else None
 
-        return None
+    def vendor_serial_number(self):
+        """
+        Return vendor serial number according to SFF-8636 rev 2.9 chapter
+        6.3.25
+        """
+        identity = self._get_identity()
+        return identity.vendor_sn if identity else None
 
     def connector_type(self):
         """
         Return connector type according to SFF-8029 rev 3.2 table 4-3
         """
-        ctype = self._peek8(130)
-        if ctype is None:
+        identity = self._get_identity()
+        if identity is None:
             return None
-        assert isinstance(ctype, int)
-        assert 0 <= ctype <= 255
-
+        ctype = identity.connector
         if (0x0D < ctype < 0x20) or (0x24 < ctype < 0x80):
             return "Reserved"
         if ctype > 0x7F:
             return "Vendor Specific"
         return QSFP_CONNECTOR_TYPE[ctype]
 
+    def ddm(self):
+        """
+        Return the diagnostic monitoring values of the module as a dictionary
+        (temperature in deg C, voltage in V, per-lane rx_power and tx_power in
+        uW, and tx_bias in mA), or None if no module is present or it does not
+        provide the values.
+
+        If the status monitor refreshed the values recently, these are returned
+        without accessing the module.
+        """
+        if self._status_monitor is not None:
+            ddm = self._status_monitor.get_state(
+                self._ddm_check, max_age=2 * QSFP_DDM_INTERVAL)
+            if ddm is not None:
+                return ddm
+        ddm = self._read_ddm() if self.is_available() else None
+        if self._status_monitor is not None:
+            self._status_monitor.update_state(self._ddm_check, ddm)
+        return ddm
+
     def info(self):
         """
         Human readable string of important QSFP module information
@@ -1615,11 +1830,14 @@ class QSFPModule:
         if self.is_available():
             status = self.decoded_status()
             return "Vendor name:    {}\n" \
+                   "Part number:    {}\n" \
+                   "Serial number:  {}\n" \
                    "id:             {}\n" \
                    "Connector type: {}\n" \
                    "Compliance:     {}\n" \
                    "Status:         {}".format(
-                       self.vendor_name(), self.adapter_id_name(),
+                       self.vendor_name(), self.vendor_part_number(),
+                       self.vendor_serial_number(), self.adapter_id_name(),
                        self.connector_type(), status[0], status[1:])
 
         return "No module detected"
@@ -0,0 +1,329 @@
+#
+# Copyright 2021 Ettus Research, a National Instruments Brand
+#
+# SPDX-License-Identifier: GPL-3.0-or-later
+#
+"""
+Status monitor: Runs periodic and event-triggered status checks on a single
+thread, and caches their results for sensors.
+"""
+
+import os
+import time
+import select
+import threading
+from contextlib import ExitStack
+from usrp_mpm.mpmlog import get_logger
+
+# Time to wait before retrying after select() failed, in seconds
+ERROR_BACKOFF = 0.1
+
+
+class _Check:
+    """
+    Book-keeping for a single status check
+    """
+    def __init__(self, name, func, interval, max_interval, on_change, group, fd):
+        self.name = name
+        self.func = func
+        self.min_interval = interval
+        self.max_interval = max(interval or 0, max_interval or 0) or None
+        self.interval = interval
+        self.on_change = on_change
+        self.group = group
+        self.fd = fd
+        self.next_time = 0.0
+        self.failed = False
+
+
+class StatusMonitor:
+    """
+    Runs status checks (e.g., reference lock, fault lines) on a single thread.
+
+    There are two kinds of checks:
+    - Periodic checks (add_check()) are called every interval seconds. As long
+      as their value doesn't change, the interval is doubled after every call,
+      up to max_interval. When the value changes, the interval is reset.
+    - Event checks (add_event_check()) are called whenever a file descriptor
+      (e.g., the one of a GPIO line that was requested for edge events)
+      becomes readable.
+
+    Periodic checks can be assigned to a group (e.g., all checks that read from
+    the same bus). When a check of a group is due, all checks of that group
+    that are due within half of their interval are run with it, and the
+    group's context (see add_group()) is only entered once for all of them.
+
+    The latest value of every check is cached, and can be read via get_state()
+    without accessing the hardware. Whenever the value of a check changes, its
+    on_change callback is called with the new value.
+    """
+    def __init__(self, parent_log=None, name="StatusMonitorThread"):
+        self.log = \
+            parent_log.getChild("StatusMonitor") if parent_log is not None \
+            else get_logger("StatusMonitor")
+        self._name = name
+        self._checks = {}
+        self._groups = {}
+        self._state = {}
+        self._lock = threading.RLock()
+        self._thread = None
+        self._stop = False
+        self._wake_fds = None
+
+    def add_group(self, group, context):
+        """
+        Register a context for a group of checks. context is called without
+        arguments, and must return a context manager. The context manager is
+        entered before the checks of this group run, and exited afterwards
+        (e.g., to keep a UIO mapped, or to hold a bus lock).
+        """
+        with self._lock:
+            self._groups[group] = context
+
+    def add_check(self, name, func, interval, max_interval=None,
+                  on_change=None, group=None):
+        """
+        Register a periodic check.
+
+        Arguments:
+        name -- Name of the check, and key for get_state()
+        func -- Function that takes no arguments and returns the current value
+        interval -- Time between two calls to func in seconds, when the value
+                    is changing
+        max_interval -- Maximum time between two calls to func in seconds. If
+                        not given, func is called every interval seconds.
+        on_change -- Function that is called with the new value whenever the
+                     value changed
+        group -- Checks with the same group are run together
+        """
+        self._add(_Check(
+            name, func, interval, max_interval, on_change, group, None))
+
+    def add_event_check(self, name, fd, func, on_change=None):
+        """
+        Register an event-triggered check. func is called without arguments
+        whenever fd is readable, and must consume the event (otherwise, it will
+        be called again immediately). Its return value is stored as the state.
+        """
+        self._add(_Check(name, func, None, None, on_change, None, fd))
+
+    def _add(self, check):
+        with self._lock:
+            assert check.name not in self._checks, \
+                "Duplicate status check: {}".format(check.name)
+            self._checks[check.name] = check
+        self._wake()
+
+    def remove_check(self, name):
+        """
+        Remove a check and its cached state
+        """
+        with self._lock:
+            self._checks.pop(name, None)
+            self._state.pop(name, None)
+        self._wake()
+
+    def trigger(self, name):
+        """
+        Invalidate the cached state of a periodic check and run it as soon as
+        possible. Call this whenever the monitored state is expected to change
+        (e.g., after reconfiguring the clocking).
+        """
+        with self._lock:
+            self._state.pop(name, None)
+            check = self._checks.get(name)
+            if check is not None and check.fd is None:
+                check.interval = check.min_interval
+                check.next_time = 0.0
+        self._wake()
+
+    def get_state(self, name, max_age=None):
+        """
+        Return the latest value of a check, or None if there is none, or it is
+        older than max_age seconds.
+        """
+        with self._lock:
+            value, timestamp = self._state.get(name, (None, None))
+        if timestamp is None or \
+                (max_age is not None and time.monotonic() - timestamp > max_age):
+            return None
+        return value
+
+    def update_state(self, name, value):
+        """
+        Store a value that was read outside of the monitor (e.g., by a sensor
+        that found the cached state too old). This calls on_change if the value
+        changed.
+        """
+        with self._lock:
+            check = self._checks.get(name)
+            old_value, _ = self._state.get(name, (None, None))
+            self._state[name] = (value, time.monotonic())
+            changed = value != old_value
+            if check is not None and check.fd is None and changed:
+                check.interval = check.min_interval
+                check.next_time = time.monotonic() + check.interval
+        if changed and check is not None and check.on_change is not None:
+            try:
+                check.on_change(value)
+            except Exception as ex:
+                self.log.error("Status change handler for %s failed: %s",
+                               name, str(ex))
+
+    def start(self):
+        """
+        Start the monitor thread
+        """
+        assert self._thread is None
+        self.log.trace("Spawning status monitor thread...")
+        self._stop = False
+        with self._lock:
+            self._wake_fds = os.pipe()
+            # A full pipe means a wake-up is pending anyway, so never block
+            os.set_blocking(self._wake_fds[1], False)
+        self._thread = threading.Thread(
+            target=self._run, name=self._name, daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=3.0):
+        """
+        Stop the monitor thread. It is safe to call this repeatedly, or if the
+        monitor was never started.
+        """
+        if self._thread is None:
+            return
+        self._stop = True
+        self._wake()
+        self._thread.join(timeout)
+        if self._thread.is_alive():
+            self.log.error("Could not terminate monitor thread! "
+                           "This could result in resource leaks.")
+            return
+        self._thread = None
+        with self._lock:
+            for fd in self._wake_fds:
+                os.close(fd)
+            self._wake_fds = None
+
+    def _wake(self):
+        " Wake up the monitor thread, e.g., to reschedule checks "
+        with self._lock:
+            if self._wake_fds is not None:
+                try:
+                    os.write(self._wake_fds[1], b'\0')
+                except BlockingIOError:
+                    pass
+
+    def _drop_bad_event_checks(self, event_checks):
+        """
+        Remove event checks whose file descriptor is no longer valid (e.g., it
+        was closed without calling remove_check()). If there are none, wait a
+        bit, so a persistent select() error doesn't make us spin.
+        """
+        dropped = False
+        for fd, check in event_checks.items():
+            try:
+                os.fstat(fd)
+            except OSError:
+                with self._lock:
+                    if self._checks.get(check.name) is check:
+                        self.log.error("Removing status check %s: Its file "
+                                       "descriptor is invalid", check.name)
+                        del self._checks[check.name]
+                        dropped = True
+        if not dropped:
+            time.sleep(ERROR_BACKOFF)
+
+    def _run_check(self, check):
+        """
+        Call a check and store its value
+        """
+        try:
+            value = check.func()
+        except Exception as ex:
+            # Only log the first failure, these are called periodically.
+            if not check.failed:
+                self.log.error("Status check %s failed: %s",
+                               check.name, str(ex))
+            check.failed = True
+            if check.fd is None:
+                check.next_time = time.monotonic() + check.interval
+            return
+        if check.failed:
+            self.log.info("Status check %s recovered", check.name)
+            check.failed = False
+        with self._lock:
+            old_value, _ = self._state.get(check.name, (None, None))
+            changed = value != old_value
+            if check.fd is None:
+                if changed or check.max_interval is None:
+                    check.interval = check.min_interval
+                else:
+                    check.interval = min(2 * check.interval, check.max_interval)
+                check.next_time = time.monotonic() + check.interval
+            self._state[check.name] = (value, time.monotonic())
+        if changed and check.on_change is not None:
+            try:
+                check.on_change(value)
+            except Exception as ex:
+                self.log.error("Status change handler for %s failed: %s",
+                               check.name, str(ex))
+
+    def _get_due_checks(self, now):
+        """
+        Return a dictionary group -> list of periodic checks that are due,
+        including the checks of the same group that are almost due.
+        """
+        with self._lock:
+            periodic = [c for c in self._checks.values() if c.fd is None]
+            due_groups = {c.group for c in periodic if c.next_time <= now}
+            due = {}
+            for check in periodic:
+                if check.next_time <= now or (
+                        check.group is not None and check.group in due_groups
+                        and check.next_time <= now + check.interval / 2):
+                    due.setdefault(check.group, []).append(check)
+            return due
+
+    def _run(self):
+        """
+        Monitor thread
+        """
+        self.log.trace("Launching monitor loop...")
+        wake_fd = self._wake_fds[0]
+        while not self._stop:
+            for group, checks in self._get_due_checks(time.monotonic()).items():
+                with ExitStack() as stack:
+                    if group in self._groups:
+                        try:
+                            stack.enter_context(self._groups[group]())
+                        except Exception as ex:
+                            self.log.error("Failed to prepare status checks "
+                                           "of group %s: %s", group, str(ex))
+                            for check in checks:
+                                check.next_time = \
+                                    time.monotonic() + check.interval
+                            continue
+                    for check in checks:
+                        self._run_check(check)
+            with self._lock:
+                next_times = [c.next_time for c in self._checks.values()
+                              if c.fd is None]
+                event_checks = {c.fd: c for c in self._checks.values()
+                                if c.fd is not None}
+            timeout = max(0, min(next_times) - time.monotonic()) \
+                if next_times else None
+            try:
+                readable, _, _ = select.select(
+                    [wake_fd] + list(event_checks), [], [], timeout)
+            except (OSError, ValueError):
+                # An event check's file descriptor was closed while we were
+                # waiting on it.
+                self._drop_bad_event_checks(event_checks)
+                continue
+            for fd in readable:
+                if fd == wake_fd:
+                    os.read(wake_fd, 64)
+                elif not self._stop:
+                    self._run_check(event_checks[fd])
+        self.log.trace("Terminating monitor loop.")
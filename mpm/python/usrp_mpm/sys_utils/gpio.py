@@ -9,6 +9,7 @@ Access to GPIOs via libgpiod
 
 import contextlib
 import gpiod
+from usrp_mpm.mpmutils import wait_for
 
 
 @contextlib.contextmanager
@@ -31,6 +32,7 @@ class Gpio:
     INPUT = gpiod.LINE_REQ_DIR_IN
     OUTPUT = gpiod.LINE_REQ_DIR_OUT
     FALLING_EDGE = gpiod.LINE_REQ_EV_FALLING_EDGE
+    BOTH_EDGES = gpiod.LINE_REQ_EV_BOTH_EDGES
 
     def __init__(self, name, direction=INPUT, default_val=None):
         self._direction = direction
@@ -49,6 +51,10 @@ class Gpio:
         if self._direction == self.OUTPUT:
             return self._out_value
 
+        # Lines requested with request_events() stay requested
+        if self._line.is_requested():
+            return bool(self._line.get_value())
+
         with request_gpio(self._line, self._direction) as gpio:
             return bool(gpio.get_value())
 
@@ -68,3 +74,45 @@ class Gpio:
             while True:
                 if gpio.event_wait(sec=1):
                     return True
+
+    def request_events(self):
+        """
+        Request this line for edge events, and keep it requested until
+        release() is called. Returns a file descriptor that becomes readable
+        when an event occurred, which can then be consumed with read_event().
+        """
+        self._line.request(consumer='mpm', type=self._direction)
+        return self._line.event_get_fd()
+
+    def read_event(self):
+        """
+        Read the next event from a line requested with request_events()
+        """
+        return self._line.event_read()
+
+    def release(self):
+        """
+        Release a line requested with request_events()
+        """
+        self._line.release()
+
+    def wait_for_value(self, value, timeout_ms, interval_ms=100):
+        """
+        Wait until this input has the given value, or until timeout_ms expired.
+        Instead of polling, this waits for edges on the line, and reads the
+        value every time an edge occurred (or every interval_ms).
+
+        Returns True if the line had the requested value within the timeout.
+        """
+        assert self._direction == self.INPUT
+        def _event_wait(timeout_s):
+            # libgpiod rejects nsec values of a second or more
+            if gpio.event_wait(sec=int(timeout_s),
+                               nsec=int((timeout_s % 1) * 1e9)):
+                gpio.event_read()
+        with request_gpio(self._line, self.BOTH_EDGES) as gpio:
+            return wait_for(
+                lambda: bool(gpio.get_value()) == bool(value),
+                timeout_ms, interval_ms,
+                event_wait=_event_wait,
+                name='Gpio({}).wait_for_value'.format(self._line.name()))
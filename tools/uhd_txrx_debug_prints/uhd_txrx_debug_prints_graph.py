@@ -1,4 +1,4 @@
-#!/usr/bin/env python
+#!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 #
 # Copyright 2013-2014 Ettus Research LLC
@@ -25,169 +25,197 @@ import argparse
 import matplotlib.pyplot as plt
 import numpy as np
 
-# This is a top level function to load a debug file. It will return a list of lists with all the data.
+# All known record types. Each line of the debug output starts with a number
+# of comma-separated prefix fields, which identify the record type, followed by
+# the record's fields. Every record type is stored as a set of typed columns.
+RECORD_TYPES = {
+    # wallclock, timeout, requested_samps, received_samps, one_packet, error_code, sob, eob, more_fragments, fragment_offset, has_timespec, time_spec
+    'recv': (('super_recv_packet_handler', 'recv'),
+             [np.uint64, np.float64, np.int64, np.int64, np.bool_, np.int64, np.bool_, np.bool_, np.bool_, np.int64, np.bool_, np.uint64]),
+    # wallclock, timeout, avail_samps, sent_samps, sob, eob, has_time_spec, time_spec (ticks)
+    'send': (('super_send_packet_handler', 'send'),
+             [np.uint64, np.float64, np.int64, np.int64, np.bool_, np.bool_, np.bool_, np.uint64]),
+    # buff_num, actual_length, status, end_time, start_time
+    'libusb_rx': (('libusb1_zero_copy', 'libusb_async_cb', 'rx'),
+                  [np.int64, np.int64, np.int64, np.uint64, np.uint64]),
+    'libusb_tx': (('libusb1_zero_copy', 'libusb_async_cb', 'tx'),
+                  [np.int64, np.int64, np.int64, np.uint64, np.uint64]),
+}
+
+# These are the 3 known starting lines. More might be added in the future.
+KNOWN_PREFIXES = ['super_recv_packet_handler', 'super_send_packet_handler', 'libusb1_zero_copy']
+
+# Sometimes 'O' etc. get printed to stderr, in the same line as a debug print.
+# These known patterns are removed from the start of every line.
+CORRUPTION_PATTERNS = {'O': 'O', 'D': 'D', 'exit_msg': 'Press Enter to quit: '}
+
+# Number of lines of a record type that are converted at once
+CHUNK_LINES = 1 << 16
+
+# Number of unknown lines that are kept for inspection
+MAX_UNKNOWN_LINES = 100
+
+
+class ColumnStore(object):
+    """
+    Typed column arrays for a single record type. The arrays are preallocated
+    and grow geometrically, so appending is amortized O(1) and the memory
+    footprint is that of the binary data, not of the text.
+    """
+    def __init__(self, dtypes, capacity=CHUNK_LINES):
+        self.dtypes = dtypes
+        self.size = 0
+        self.num_corrupted = 0
+        self._columns = [np.empty(capacity, dtype=dtype) for dtype in dtypes]
+
+    def _convert(self, rows):
+        """ Convert a list of rows of strings to a list of typed column arrays """
+        raw = np.array(rows, dtype=str).reshape(len(rows), len(self.dtypes))
+        return [raw[:, i] == 'true' if dtype == np.bool_ else raw[:, i].astype(dtype)
+                for i, dtype in enumerate(self.dtypes)]
+
+    def append(self, rows):
+        """ Append a chunk of rows. Rows that can't be converted are dropped. """
+        num_rows = len(rows)
+        rows = [row for row in rows if len(row) == len(self.dtypes)]
+        try:
+            columns = self._convert(rows)
+        except (ValueError, OverflowError):
+            # There's garbage in at least one line. Find it the slow way.
+            good_rows = []
+            for row in rows:
+                try:
+                    self._convert([row])
+                    good_rows.append(row)
+                except (ValueError, OverflowError):
+                    pass
+            rows = good_rows
+            columns = self._convert(rows)
+        self.num_corrupted += num_rows - len(rows)
+        num_rows = len(rows)
+        if self.size + num_rows > len(self._columns[0]):
+            capacity = max(2 * len(self._columns[0]), self.size + num_rows)
+            for i, column in enumerate(self._columns):
+                self._columns[i] = np.resize(column, capacity)
+        for column, new_data in zip(self._columns, columns):
+            column[self.size:self.size + num_rows] = new_data
+        self.size += num_rows
+
+    def get_columns(self):
+        """ Return the list of columns, trimmed to the actual number of rows """
+        return [column[:self.size] for column in self._columns]
+
+
+def clean_line(fields, counts):
+    """
+    Remove known corruption patterns from the first field of a line, and count
+    them in counts.
+    """
+    first = fields[0]
+    found = True
+    while found:
+        found = False
+        for name, pattern in CORRUPTION_PATTERNS.items():
+            if first.startswith(pattern):
+                counts[name] += 1
+                first = first[len(pattern):]
+                found = True
+    fields[0] = first
+    return fields
+
+
+# This is a top level function to load a debug file. It reads the file line by
+# line and returns a dictionary with the typed columns of every record type in
+# RECORD_TYPES (a list of numpy arrays, one per field). The file is never held
+# in memory as a whole, so huge traces can be processed.
 def get_data(filename):
-    res = []
-    with open(filename) as f:
-        for line in f.readlines():
-            line = line.rstrip('\n')
-            s = line.split(',')
-            res.append(s)
-    res = fix_known_data_corruption_patterns(res)
-    return res
-
-# Sometimes 'O' etc. get printed to stderr. This disturbs further processing. Thus, known pattern will be removed here.
-def fix_known_data_corruption_patterns(data):
-    # Some lines might be corrupted in the way that e.g. UHD prints sth else in the same line.
-    # O, D, Press Enter... are known patterns. These should be fixed.
-    counts = {'O': 0, 'D': 0, 'exit_msg': 0}
-    for i in range(len(data)):
-        if data[i][0].startswith('O'):
-            counts['O'] += 1
-            data[i][0] = data[i][0].replace('O', '')
-        if data[i][0].startswith('D'):
-            counts['D'] += 1
-            data[i][0] = data[i][0].replace('D', '')
-        if data[i][0].startswith('Press Enter to quit: '):
-            counts['exit_msg'] += 1
-            data[i][0] = data[i][0].replace('Press Enter to quit: ', '')
-    print counts
-    return data
-
-# Extract lines with a certain prefix.
-def extract_lines(prefix, data):
-    res = []
-    for line in data:
-        if line[0] == prefix:
-            res.append(line[1:])
+    stores = {name: ColumnStore(dtypes) for name, (_, dtypes) in RECORD_TYPES.items()}
+    # Map the prefix fields to (record type, number of prefix fields)
+    routes = {prefix: (name, len(prefix)) for name, (prefix, _) in RECORD_TYPES.items()}
+    max_prefix_len = max(len(prefix) for prefix in routes)
+    pending = {name: [] for name in RECORD_TYPES}
+    counts = {name: 0 for name in CORRUPTION_PATTERNS}
+    counts['unknown'] = 0
+    unknown = []
+    with open(filename, errors='replace') as f:
+        for line in f:
+            fields = clean_line(line.rstrip('\n').split(','), counts)
+            for num_prefix in range(1, max_prefix_len + 1):
+                route = routes.get(tuple(fields[:num_prefix]))
+                if route is not None:
+                    break
+            if route is None:
+                if fields[0] not in KNOWN_PREFIXES:
+                    counts['unknown'] += 1
+                    if len(unknown) < MAX_UNKNOWN_LINES:
+                        unknown.append(fields)
+                continue
+            name, num_prefix = route
+            rows = pending[name]
+            rows.append(fields[num_prefix:])
+            if len(rows) >= CHUNK_LINES:
+                stores[name].append(rows)
+                pending[name] = []
+    for name, rows in pending.items():
+        if rows:
+            stores[name].append(rows)
+    counts.update({name + '_corrupted': store.num_corrupted for name, store in stores.items()})
+    print(counts)
+    res = {name: store.get_columns() for name, store in stores.items()}
+    res['unknown'] = unknown
     return res
 
-# boolean values are stored as true/false. Convert them to real booleans again.
-def convert_to_bool(data):
-    res = []
-    for d in data:
-        res.append(d == "true")
-    return res
-
-# The different outputs have different structures. With this function you can conert them back to their actual type.
-def convert_data_set(data, reqtype):
-    zdata = zip(*data)
-    res = []
-    if len(zdata) == 0:
-        return res
-    for i in range(len(reqtype)):
-        if reqtype[i] == np.bool:
-            res.append(np.asarray(convert_to_bool(zdata[i]), dtype=np.bool))
-        else:
-            res.append(np.asarray(zdata[i], dtype=reqtype[i]))
-    return res
-
-# Wrapper for super_send_packet_handler data to be used with convert_data_set
-def convert_super_send_packet_handler_data(data):
-    # wallclock, timeout, avail_samps, sent_samps, sob, eob, has_time_spec, time_spec (ticks)
-    reqtype = [np.uint64, np.float, np.int, np.int, np.bool, np.bool, np.bool, np.uint64]
-    cdata = convert_data_set(data, reqtype)
-    return cdata
-
-# same o' same o'
-def convert_super_recv_packet_handler_data(data):
-    # wallclock, timeout, requested_samps, received_samps, one_packet, error_code, sob, eob, more_fragments, fragment_offset, has_timespec, time_spec
-    reqtype = [np.uint64, np.float, np.int, np.int, np.bool, np.int, np.bool, np.bool, np.bool, np.int, np.bool, np.uint64]
-    cdata = convert_data_set(data, reqtype)
-    return cdata
 
 def extract_super_recv_packet_handler_data(data):
-    pref1 = "super_recv_packet_handler"
-    pref2 = "recv"
-    super_recv = extract_lines(pref1, data)
-    recv = extract_lines(pref2, super_recv)
-    recv = convert_super_recv_packet_handler_data(recv)
-    return recv
+    return data['recv']
+
 
 # Sometimes TX or RX is interrupted by system jiffies. Those are found by this function.
 def find_jiffy(data, thr):
-    res = []
-    last = data[0]
-    for i in range(len(data)):
-        if data[i] - last > thr:
-            res.append([last, data[i]])
-        last = data[i]
-    return res
+    data = np.asarray(data)
+    idx = np.flatnonzero(np.diff(data.astype(np.int64)) > thr)
+    return np.column_stack((data[idx], data[idx + 1]))
 
 
 # Get difference between tx and rx wallclock
 def get_diff(tx, rx):
-    print "get diff, len(rx) = ", len(rx)
-    diff = [0] * len(rx[0])
-    for i in range(len(diff)):
-        r = rx[3][i]
-        idx = rx[0][i] - 1 # call count starts at 1. idx is 0 based.
-        t = tx[3][idx]
-        diff[i] = t - r
-    return diff
+    idx = np.asarray(rx[0]) - 1 # call count starts at 1. idx is 0 based.
+    return np.asarray(tx[3])[idx].astype(np.int64) - np.asarray(rx[3]).astype(np.int64)
 
 
 def bps(samps, time):
-    bp = []
-    last = time[0]-1000
-    for i in range(len(samps)):
-        td = time[i] - last
-        last = time[i]
-        td = td /1e6
-        bp.append(samps[i] * 4 / td)
-    return bp
+    time = np.asarray(time, dtype=np.float64)
+    td = np.diff(time, prepend=time[0] - 1000) / 1e6
+    return np.asarray(samps) * 4 / td
 
 
 # same as the other wrappers this time for libusb1
 def extract_libusb(trx, data):
-    pr1 = "libusb1_zero_copy"
-    pr2 = "libusb_async_cb"
-    ldata = extract_lines(pr1, data)
-    edata = extract_lines(pr2, ldata)
-    d = extract_lines(trx, edata)
-    # buff_num, actual_length, status, end_time, start_time
-    reqtype = [np.int, np.int, np.int, np.uint64, np.uint64]
-    return convert_data_set(d, reqtype)
+    return data['libusb_' + trx]
 
 
 # Extract data for stream buffers. Typically there are 16 TX and 16 RX buffers. And there numbers are static. Though the number of buffers might be changed and the constant parameters must be adjusted in this case.
 def extract_txrx(data):
-    tx = [[], [], [], [], []]
-    rx = [[], [], [], [], []]
-    for i in range(len(data[0])):
-        print data[0][i]
-        if data[0][i] > 31 and data[0][i] < 48:
-            rx[0].append(data[0][i])
-            rx[1].append(data[1][i])
-            rx[2].append(data[2][i])
-            rx[3].append(data[3][i])
-            rx[4].append(data[4][i])
-            #print "tx\t", data[0][i], "\t", data[3][i], "\t", data[4][i]
-        if data[0][i] > 47 and data[0][i] < 64:
-            tx[0].append(data[0][i])
-            tx[1].append(data[1][i])
-            tx[2].append(data[2][i])
-            tx[3].append(data[3][i])
-            tx[4].append(data[4][i])
-            #print "rx\t", data[0][i], "\t", data[3][i], "\t", data[4][i]
+    buff_num = data[0]
+    rx_mask = (buff_num > 31) & (buff_num < 48)
+    tx_mask = (buff_num > 47) & (buff_num < 64)
+    tx = [column[tx_mask] for column in data[:5]]
+    rx = [column[rx_mask] for column in data[:5]]
     return [tx, rx]
 
 # Calculate momentary throughput
 def throughput(data):
-    start = data[2][0]
-    total = data[1][-1] - data[2][0]
-    print total
-    thr = np.zeros(total)
-
-    for i in range(len(data[0])):
-        s = data[2][i] - start
-        f = data[1][i] - start
-        ticks = data[1][i] - data[2][i]
-        pertick = 1. * data[0][i] / ticks
-        vals = [pertick] * ticks
-        thr[s:f] = np.add(thr[s:f], vals)
-        #print pertick
-    print np.shape(thr)
+    samps = np.asarray(data[0], dtype=np.float64)
+    stop = np.asarray(data[1], dtype=np.int64)
+    start = np.asarray(data[2], dtype=np.int64)
+    total = stop[-1] - start[0]
+    # Every buffer contributes samps/ticks per tick between its start and
+    # stop. Add the steps to a difference array and integrate once.
+    pertick = samps / (stop - start)
+    steps = np.zeros(total + 1)
+    np.add.at(steps, np.clip(start - start[0], 0, total), pertick)
+    np.add.at(steps, np.clip(stop - start[0], 0, total), -pertick)
+    thr = np.cumsum(steps[:total])
     return thr
 
 
@@ -195,13 +223,9 @@ def throughput(data):
 def ma(data, wl):
     ap = np.zeros(wl)
     data = np.concatenate((ap, data, ap))
-    print np.shape(data)
-    res = np.zeros(len(data)-wl)
-    for i in range(len(data)-wl):
-        av = np.sum(data[i:i+wl]) / wl
-        res[i] = av
-        print i, "\t", av
-    return res
+    csum = np.concatenate(([0.], np.cumsum(data)))
+    num = len(data) - wl
+    return (csum[wl:wl + num] - csum[:num]) / wl
 
 
 def get_x_axis(stamps):
@@ -211,17 +235,13 @@ def get_x_axis(stamps):
 
 # plot status codes.
 def plot_status_codes_over_time(data, fignum):
-    print "printing status numbers over time"
+    print("printing status numbers over time")
 
     # extract and convert the data
     recv = extract_super_recv_packet_handler_data(data)
-    libusb_rx = extract_libusb("rx", data)
-    libusb_tx = extract_libusb("tx", data)
 
     # Plot all data
     plt.figure(fignum) # Make sure these plots are printed to a new figure.
-    #plt.plot(get_x_axis(libusb_rx[3]), libusb_rx[2], marker='x', label='RX')
-    #plt.plot(get_x_axis(libusb_tx[3]), libusb_tx[2], marker='x', label='TX')
 
     pos = 5
     recv_error_codes = recv[pos]
@@ -232,36 +252,27 @@ def plot_status_codes_over_time(data, fignum):
     plt.grid()
     plt.legend()
 
-    for i in range(len(recv[0])):
-        if recv[pos][i] == 8:
-            xaxis = get_x_axis([recv[0][i]])
-            plt.axvline(xaxis, color='b')
-
+    for xaxis in get_x_axis(recv[0][recv_error_codes == 8]):
+        plt.axvline(xaxis, color='b')
 
     # Get some statistics and print them too
-    codes = []
-    code_dict = {}
-    for i in range(len(recv_error_codes)):
-        if recv_error_codes[i] != 0:
-            code = rx_metadata_error_codes[recv_error_codes[i]]
-            pair = [i, code]
-            codes.append(pair)
-            if not code_dict.has_key(code):
-                code_dict[code] = 0
-            code_dict[code] += 1
-    print codes
-    print code_dict
+    error_idx = np.flatnonzero(recv_error_codes != 0)
+    codes = [[i, rx_metadata_error_codes[recv_error_codes[i]]] for i in error_idx]
+    values, num = np.unique(recv_error_codes[error_idx], return_counts=True)
+    code_dict = {rx_metadata_error_codes[v]: int(n) for v, n in zip(values, num)}
+    print(codes)
+    print(code_dict)
 
 
 # plot rtt times as peaks. That's the fast and easy way.
 def plot_rtt_times(data, fignum):
-    print "plot RTT times"
+    print("plot RTT times")
     rx = extract_libusb("rx", data)
     tx = extract_libusb("tx", data)
 
     scale = 10e-6
-    rx_diff = np.multiply(np.subtract(rx[3], rx[4]), scale)
-    tx_diff = np.multiply(np.subtract(tx[3], tx[4]), scale)
+    rx_diff = np.multiply(np.subtract(rx[3], rx[4], dtype=np.int64), scale)
+    tx_diff = np.multiply(np.subtract(tx[3], tx[4], dtype=np.int64), scale)
 
     plt.figure(fignum)
     plt.plot(get_x_axis(rx[3]), rx_diff, marker='x', ls='', label="rx RTT")
@@ -273,29 +284,31 @@ def plot_rtt_times(data, fignum):
 
 
 # plot RTT as actual lines as long as buffers are on the fly.
-# This can take a long time if the function has to print a lot of small lines. Careful with this!
+# All lines are drawn with a single plot call (separated by NaNs).
 def plot_rtt_lines(data, fignum):
-    print "plot RTT lines"
+    print("plot RTT lines")
     rx = extract_libusb("rx", data)
-    #tx = extract_libusb("tx", data)
 
-    if len(data) == 0 or len(rx) == 0:
+    if len(rx[0]) == 0:
         return
 
+    valid = rx[0] > -1
+    start = rx[4][valid]
+    stop = rx[3][valid]
+    status = rx[2][valid]
+    val = rx[0][valid] + np.where(status != 0, 0.5, 0.)
+    print("status = 2: ", np.count_nonzero(status == 2))
+
+    num = len(val)
+    xaxis = np.full((num, 3), np.nan)
+    xaxis[:, 0] = get_x_axis(start)
+    xaxis[:, 1] = get_x_axis(stop)
+    yaxis = np.full((num, 3), np.nan)
+    yaxis[:, 0] = val
+    yaxis[:, 1] = val
+
     plt.figure(fignum)
-    for i in range(len(rx[0])):
-        if rx[0][i] > -1:
-            start = rx[4][i]
-            stop = rx[3][i]
-            status = rx[2][i]
-
-            val = rx[0][i]#(stop - start) * scale
-            if not status == 0:
-                if status == 2:
-                    print "status = ", status
-                val +=0.5
-            xaxis = get_x_axis([start, stop])
-            plt.plot(xaxis, [val, val], marker='x')
+    plt.plot(xaxis.ravel(), yaxis.ravel(), marker='x')
     plt.ylabel('buffer number')
 
     # Careful with these lines here.
@@ -307,27 +320,20 @@ def plot_rtt_lines(data, fignum):
     plt.grid()
 
 
-# only plot on-the-fly buffers.
+# only get on-the-fly buffers.
 def plot_buff_otf(trx, nrange, data):
     d = extract_libusb(trx, data)
-    res = [[], []]
-    num = 0
-    for i in range(len(d[0])):
-        if d[0][i] in nrange:
-            res
+    mask = np.isin(d[0], list(nrange))
+    return [column[mask] for column in d]
 
 
 # If there are still unknown lines after cleanup, they can be caught and printed here.
 # This way you can check what got caught but shouldn't have been caught.
+# Only the first MAX_UNKNOWN_LINES unknown lines are kept by get_data().
 def get_unknown_lines(data):
-    # These are the 3 known starting lines. More might be added in the future.
-    known = ['super_recv_packet_handler', 'super_send_packet_handler', 'libusb1_zero_copy']
-    res = []
-    for i in range(len(data)):
-        if not data[i][0] in known:
-            print data[i]
-            res.append(data[i])
-    return res
+    for line in data['unknown']:
+        print(line)
+    return data['unknown']
 
 # LUT for all the return codes
 rx_metadata_error_codes = {0x0: "NONE", 0x1: "TIMEOUT", 0x2: "LATE_COMMAND", 0x4: "BROKEN_CHAIN", 0x8: "OVERFLOW",
@@ -346,7 +352,7 @@ def parse_args():
 def main():
     args = parse_args()
     filename = args.filename
-    print "get data from: ", filename
+    print("get data from: ", filename)
     #pref1 = "super_recv_packet_handler"
     #pref2 = "recv"
 
@@ -410,6 +416,6 @@ def main():
     plt.show()
 
 if __name__ == '__main__':
-    print "[WARNING] This tool is in alpha status. Only use if you know what you're doing!"
+    print("[WARNING] This tool is in alpha status. Only use if you know what you're doing!")
     main()
 